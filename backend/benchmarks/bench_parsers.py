@@ -0,0 +1,110 @@
+"""
+Microbenchmark of the field parsers (amounts, invoice numbers, dates)
+
+Runs every parser over a corpus of OCR strings as read in invoice zones and
+reports the time per string for:
+  - dates: historical path (strptime formats then dateparser) for every string,
+    against the tokenizer with dateparser for the leftovers only;
+  - all parsers: first call (memo cache cleared) and repeated calls (memoized).
+
+Usage (from backend/):
+    python -m benchmarks.bench_parsers [--corpus strings.txt] [--repeat 5]
+
+The corpus file holds one OCR string per line; a built-in corpus is used otherwise.
+"""
+import argparse
+import importlib
+import time
+
+from services import field_parsers
+from services.field_parsers import extract_number, is_valid_invoice_number, parse_date_try
+
+CORPUS = [
+    # Montants
+    "1 234,50", "1234.50", "246,90", "1 481,40 EUR", "12 500,00 €", "€ 99,99", "-15,00",
+    "1.234,56", "1,234.56", "0,00", "246.9", "TOTAL HT", "Montant HT", "20 %", "5,5%",
+    "TVA 20%", "3 456 789,12", "1O0,00", "12,5", "EUR",
+    # Numéros de facture
+    "FA-2024-00123", "Facture N° 2024-0457", "N° F240315", "INV-88231", "No. 004512",
+    "2024/000457", "FAC 24 00123", "123456", "Réf. client 88", "Page 1/2",
+    # Dates
+    "15/03/2024", "15.03.2024", "15-03-2024", "2024-03-15", "2024/03/15", "03/2024",
+    "15/03/24", "15.03.24", "1/2/2024", "15 03 2024", "Date : 15/03/2024",
+    "le 15/03/2024", "Date de facturation 15.03.2024", "15 mars 2024", "mars 2024",
+    "31/02/2024", "Echéance 30 jours", "Le 2 janvier 2024", "15/03/2024 10:30",
+    "Date", "Tél. 01 23 45 67 89",
+]
+
+
+def time_per_call(function, strings, repeat: int) -> float:
+    """Mean time of one call in microseconds"""
+    started = time.perf_counter()
+    for _ in range(repeat):
+        for text in strings:
+            function(text)
+    return (time.perf_counter() - started) / (repeat * len(strings)) * 1e6
+
+
+def clean_date_text(text: str) -> str:
+    """Same cleaning as parse_date_try"""
+    text = text.lower().strip()
+    return field_parsers._SPACES.sub(' ', field_parsers._NOT_DATE_CHARS.sub(' ', text)).strip()
+
+
+def date_candidate(text: str):
+    """Cleaned text as parsed by parse_date_try, None when rejected upfront"""
+    text = text.strip()
+    if len(text) < 3 or not any(c.isdigit() for c in text):
+        return None
+    if len(text) < 5 and not any(sep in text for sep in ['/', '-', '.']):
+        return None
+    return clean_date_text(text)
+
+
+def historical_parse_date(text: str):
+    """parse_date_try without tokenizer nor memo: strptime formats then dateparser"""
+    candidate = date_candidate(text)
+    return None if candidate is None else field_parsers._dateparser_date(candidate)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--corpus", help="File of OCR strings, one per line")
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    strings = CORPUS
+    if args.corpus:
+        with open(args.corpus, "r", encoding="utf-8") as f:
+            strings = [line.rstrip("\n") for line in f if line.strip()]
+
+    # Coût de l'import de dateparser, fait à la demande par parse_date_try
+    started = time.perf_counter()
+    importlib.import_module("dateparser")
+    import_ms = (time.perf_counter() - started) * 1000.0
+    # Premier appel de dateparser: chargement des données de langue, hors mesure
+    field_parsers._dateparser_date("15/03/24")
+
+    candidates = [c for c in map(date_candidate, strings) if c is not None]
+    leftovers = sum(field_parsers._tokenized_date(c) is field_parsers._UNDECIDED for c in candidates)
+    print(f"{len(strings)} strings, {len(candidates)} date candidates, {leftovers} left to dateparser "
+          f"(dateparser import: {import_ms:.0f} ms, now lazy)")
+    print(f"{'parser':<24} {'historical us':>14} {'first call us':>14} {'memoized us':>12}")
+
+    historical = time_per_call(historical_parse_date, strings, args.repeat)
+    for name, function in (
+        ("extract_number", extract_number),
+        ("is_valid_invoice_number", is_valid_invoice_number),
+        ("parse_date_try", parse_date_try),
+    ):
+        first = 0.0
+        for _ in range(args.repeat):
+            function.cache_clear()
+            first += time_per_call(function, strings, 1)
+        memoized = time_per_call(function, strings, args.repeat)
+        reference = f"{historical:>14.1f}" if function is parse_date_try else f"{'-':>14}"
+        print(f"{name:<24} {reference} {first / args.repeat:>14.1f} {memoized:>12.2f}")
+
+
+if __name__ == "__main__":
+    main()
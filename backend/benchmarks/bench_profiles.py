@@ -0,0 +1,133 @@
+"""
+Benchmark of the OCR profiles (latency vs field accuracy on a labelled sample set)
+
+Each sample is a PDF or image file with a sibling JSON file of the same name
+holding the expected values and the template to apply:
+
+    facture_001.pdf
+    facture_001.json   {"template_id": 3, "expected": {"montantHT": "1234.50", "numFacture": "F-2024-001"}}
+
+The text layer and the OCR cache are disabled so that every extraction runs
+the OCR of the profile under test. Templates are read from DATABASE_URL.
+
+Usage (from backend/):
+    python -m benchmarks.bench_profiles samples/ [--profiles fast,accurate] [--repeat 1] [--json]
+"""
+import os
+
+# Avant les imports OCR: mesurer l'OCR, pas la couche texte ni le cache
+os.environ.setdefault("OCR_TEXT_LAYER_ENABLED", "false")
+os.environ["OCR_CACHE_MEMORY_MB"] = "0"
+os.environ["OCR_CACHE_DISK_MB"] = "0"
+
+import argparse
+import asyncio
+import json
+import statistics
+import sys
+import time
+
+from documents.document_store import DocumentInput, document_kind
+from ocr.ocr_pool import ocr_pool
+from ocr.ocr_profiles import OCR_PROFILES
+from services.extraction_service import extract_document
+
+FIELDS = ["montantHT", "montantTVA", "numFacture", "dateFacturation"]
+
+
+def load_samples(directory: str) -> list:
+    """(path, template_id, expected) of every labelled file in directory"""
+    samples = []
+    for name in sorted(os.listdir(directory)):
+        path = os.path.join(directory, name)
+        label_path = os.path.splitext(path)[0] + ".json"
+        if document_kind(name) is None or not os.path.exists(label_path):
+            continue
+        with open(label_path, "r", encoding="utf-8") as f:
+            label = json.load(f)
+        samples.append((path, str(label["template_id"]), label.get("expected") or {}))
+    return samples
+
+
+def normalize(value) -> str:
+    return "".join(str(value or "").split()).replace(",", ".").lower()
+
+
+async def run_profile(name: str, samples: list, repeat: int) -> dict:
+    """Extract every sample with one profile and compare the fields to the labels"""
+    documents = []
+    for path, template_id, expected in samples:
+        with open(path, "rb") as f:
+            content = f.read()
+        documents.append((DocumentInput(os.path.basename(path), os.path.basename(path), content), template_id, expected))
+
+    # Warm-up: construction du prédicteur du profil dans le worker
+    await extract_document(documents[0][0], documents[0][1], profile_name=name)
+
+    latencies = []
+    correct = {field: 0 for field in FIELDS}
+    labelled = {field: 0 for field in FIELDS}
+    for _ in range(repeat):
+        for document, template_id, expected in documents:
+            start = time.perf_counter()
+            result = await extract_document(document, template_id, profile_name=name)
+            latencies.append(time.perf_counter() - start)
+            data = result.get("data") or {}
+            for field in FIELDS:
+                if field not in expected:
+                    continue
+                labelled[field] += 1
+                if normalize(data.get(field)) == normalize(expected[field]):
+                    correct[field] += 1
+
+    total_labelled = sum(labelled.values())
+    return {
+        "profile": name,
+        "documents": len(latencies),
+        "p50_ms": statistics.median(latencies) * 1000.0,
+        "mean_ms": statistics.mean(latencies) * 1000.0,
+        "max_ms": max(latencies) * 1000.0,
+        "accuracy": sum(correct.values()) / total_labelled if total_labelled else None,
+        "fields": {field: correct[field] / labelled[field] for field in FIELDS if labelled[field]},
+    }
+
+
+async def run(profiles: list, samples: list, repeat: int) -> list:
+    await ocr_pool.start()
+    try:
+        return [await run_profile(name, samples, repeat) for name in profiles]
+    finally:
+        await ocr_pool.shutdown()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("samples", help="Directory of labelled documents")
+    parser.add_argument("--profiles", default=",".join(OCR_PROFILES), help="Comma-separated profile names")
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument("--json", action="store_true", help="Print the raw results as JSON")
+    args = parser.parse_args()
+
+    profiles = [name.strip() for name in args.profiles.split(",") if name.strip()]
+    unknown = [name for name in profiles if name not in OCR_PROFILES]
+    if unknown:
+        parser.error(f"unknown profile(s): {', '.join(unknown)}")
+    samples = load_samples(args.samples)
+    if not samples:
+        parser.error(f"no labelled document in {args.samples}")
+
+    results = asyncio.run(run(profiles, samples, args.repeat))
+    if args.json:
+        json.dump(results, sys.stdout, indent=2)
+        print()
+        return
+
+    print(f"{'profile':<10} {'docs':>5} {'p50 ms':>9} {'mean ms':>9} {'max ms':>9} {'accuracy':>9}")
+    for r in results:
+        accuracy = "-" if r["accuracy"] is None else f"{r['accuracy']:.1%}"
+        print(f"{r['profile']:<10} {r['documents']:>5} {r['p50_ms']:>9.0f} {r['mean_ms']:>9.0f} "
+              f"{r['max_ms']:>9.0f} {accuracy:>9}")
+
+
+if __name__ == "__main__":
+    main()
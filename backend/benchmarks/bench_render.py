@@ -0,0 +1,132 @@
+"""
+Benchmark of the page rendering pipeline (legacy PNG round-trip vs direct render)
+
+Measures the CPU time per page and the peak RSS of each pipeline. Every
+pipeline runs in its own subprocess so that peak RSS values are comparable.
+
+Usage (from backend/):
+    python -m benchmarks.bench_render [file.pdf] [--repeat 5]
+"""
+import argparse
+import json
+import os
+import resource
+import subprocess
+import sys
+import tempfile
+import time
+from io import BytesIO
+
+import numpy as np
+import pymupdf as fitz
+from PIL import Image
+
+from documents.document_render import render_page_array, standard_size
+
+RENDER_SCALE = 2
+
+
+def legacy_pipeline(file_content: bytes) -> list:
+    """Previous implementation: PNG encode/decode, LANCZOS resize, paste, np.array"""
+    target_width, target_height = standard_size(RENDER_SCALE)
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    arrays = []
+    for page in doc:
+        pix = page.get_pixmap(matrix=fitz.Matrix(RENDER_SCALE, RENDER_SCALE))
+        img = Image.open(BytesIO(pix.tobytes("png")))
+        img_ratio = img.width / img.height
+        if img_ratio > target_width / target_height:
+            new_width, new_height = target_width, int(target_width / img_ratio)
+        else:
+            new_width, new_height = int(target_height * img_ratio), target_height
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+        result = Image.new('RGB', (target_width, target_height), (255, 255, 255))
+        result.paste(img, ((target_width - new_width) // 2, (target_height - new_height) // 2))
+        arrays.append(np.array(result))
+    doc.close()
+    return arrays
+
+
+def direct_pipeline(file_content: bytes) -> list:
+    """Current implementation: render at fit size, NumPy view, preallocated canvas"""
+    target_width, target_height = standard_size(RENDER_SCALE)
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    arrays = [render_page_array(page, target_width, target_height) for page in doc]
+    doc.close()
+    return arrays
+
+
+PIPELINES = {"legacy": legacy_pipeline, "direct": direct_pipeline}
+
+
+def sample_pdf(pages: int = 3) -> bytes:
+    """Small synthetic invoice-like PDF (A4 and US Letter pages)"""
+    doc = fitz.open()
+    for i in range(pages):
+        width, height = (595, 842) if i % 2 == 0 else (612, 792)
+        page = doc.new_page(width=width, height=height)
+        for line in range(40):
+            page.insert_text((50, 60 + line * 18), f"Ligne {line} - Montant HT 1 234,{line:02d} EUR")
+    data = doc.tobytes()
+    doc.close()
+    return data
+
+
+def run_one(name: str, path: str, repeat: int) -> dict:
+    """Run one pipeline in the current process and report its measurements"""
+    with open(path, "rb") as f:
+        file_content = f.read()
+    pipeline = PIPELINES[name]
+    pipeline(file_content)  # warm-up
+
+    pages = 0
+    cpu_start = time.process_time()
+    wall_start = time.perf_counter()
+    for _ in range(repeat):
+        pages += len(pipeline(file_content))
+    cpu = time.process_time() - cpu_start
+    wall = time.perf_counter() - wall_start
+
+    peak_kb = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    if sys.platform == "darwin":
+        peak_kb //= 1024  # bytes on macOS
+    return {
+        "pipeline": name,
+        "pages": pages,
+        "cpu_ms_per_page": cpu * 1000.0 / pages,
+        "wall_ms_per_page": wall * 1000.0 / pages,
+        "peak_rss_mb": peak_kb / 1024.0,
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("pdf", nargs="?", help="PDF file (a synthetic document is used by default)")
+    parser.add_argument("--repeat", type=int, default=5)
+    parser.add_argument("--child", choices=list(PIPELINES), help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(run_one(args.child, args.pdf, args.repeat)))
+        return
+
+    path = args.pdf
+    if path is None:
+        with tempfile.NamedTemporaryFile(suffix=".pdf", delete=False) as f:
+            f.write(sample_pdf())
+            path = f.name
+
+    print(f"{'pipeline':<10} {'pages':>6} {'cpu ms/page':>12} {'wall ms/page':>13} {'peak RSS MB':>12}")
+    for name in PIPELINES:
+        out = subprocess.run(
+            [sys.executable, "-m", "benchmarks.bench_render", path, "--repeat", str(args.repeat), "--child", name],
+            capture_output=True, text=True, check=True,
+            cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+        )
+        r = json.loads(out.stdout.strip().splitlines()[-1])
+        print(f"{r['pipeline']:<10} {r['pages']:>6} {r['cpu_ms_per_page']:>12.1f} "
+              f"{r['wall_ms_per_page']:>13.1f} {r['peak_rss_mb']:>12.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -15,14 +15,18 @@ if not RAW_DATABASE_URL:
 ASYNC_DATABASE_URL = RAW_DATABASE_URL.replace("mysql://", "mysql+asyncmy://", 1)
 SYNC_DATABASE_URL  = RAW_DATABASE_URL.replace("mysql://", "mysql+pymysql://", 1)
 
+# SQLite (local tests of the extraction worker): sqlite:///path/to/file.db
+IS_SQLITE = RAW_DATABASE_URL.startswith("sqlite")
+if IS_SQLITE:
+    ASYNC_DATABASE_URL = RAW_DATABASE_URL.replace("sqlite://", "sqlite+aiosqlite://", 1)
+    SYNC_DATABASE_URL = RAW_DATABASE_URL
+
 # Async engine (FastAPI runtime)
 async_engine = create_async_engine(
     ASYNC_DATABASE_URL,
     echo=False,
     pool_pre_ping=True,
-    pool_recycle=3600,
-    pool_size=10,
-    max_overflow=20,
+    **({} if IS_SQLITE else {"pool_recycle": 3600, "pool_size": 10, "max_overflow": 20}),
     future=True,
 )
 
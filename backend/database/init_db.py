@@ -12,6 +12,25 @@ from auth.auth_database import get_password_hash
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Image standardisée des mappings enregistrés en pixels (PDF_RENDER_SCALE = 2)
+LEGACY_MAPPING_PAGE_SIZE = (1190, 1684)
+
+MAPPINGS_NORMALIZED_COLUMN_CHECK = """
+    SELECT COUNT(*)
+    FROM information_schema.COLUMNS
+    WHERE TABLE_SCHEMA = DATABASE()
+    AND TABLE_NAME = 'mappings'
+    AND COLUMN_NAME = 'normalized'
+"""
+
+# Conversion des mappings en pixels vers des fractions de la page (idempotente)
+MAPPINGS_NORMALIZE_UPDATE = """
+    UPDATE mappings
+    SET `left` = `left` / {0}, `top` = `top` / {1}, `width` = `width` / {0}, `height` = `height` / {1},
+        normalized = 1
+    WHERE normalized = 0
+""".format(*LEGACY_MAPPING_PAGE_SIZE)
+
 
 def update_database_schema():
     """Update database schema with new columns"""
@@ -39,6 +58,33 @@ def update_database_schema():
                 ))
                 conn.commit()
                 logger.info("Added timestamp columns to templates table")
+
+            # Check and add ocr_profile if it doesn't exist
+            result = conn.execute(text(
+                """
+                SELECT COUNT(*)
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'templates'
+                AND COLUMN_NAME = 'ocr_profile'
+                """
+            ))
+
+            if result.scalar() == 0:
+                conn.execute(text("ALTER TABLE templates ADD COLUMN ocr_profile VARCHAR(32) NULL"))
+                conn.commit()
+                logger.info("Added ocr_profile column to templates table")
+
+            # Coordonnées des mappings normalisées (indépendantes de la résolution de rendu)
+            result = conn.execute(text(MAPPINGS_NORMALIZED_COLUMN_CHECK))
+            if result.scalar() == 0:
+                conn.execute(text("ALTER TABLE mappings ADD COLUMN normalized TINYINT(1) NOT NULL DEFAULT 0"))
+                conn.commit()
+                logger.info("Added normalized column to mappings table")
+            result = conn.execute(text(MAPPINGS_NORMALIZE_UPDATE))
+            conn.commit()
+            if result.rowcount:
+                logger.info(f"Converted {result.rowcount} mapping(s) to normalized coordinates")
                 
     except Exception as e:
         logger.error(f"Error updating database schema: {e}")
@@ -90,6 +136,33 @@ async def update_database_schema_async():
                 ))
                 await conn.commit()
                 logger.info("Added timestamp columns to templates table")
+
+            # Check and add ocr_profile if it doesn't exist
+            result = await conn.execute(text(
+                """
+                SELECT COUNT(*)
+                FROM information_schema.COLUMNS
+                WHERE TABLE_SCHEMA = DATABASE()
+                AND TABLE_NAME = 'templates'
+                AND COLUMN_NAME = 'ocr_profile'
+                """
+            ))
+
+            if result.scalar() == 0:
+                await conn.execute(text("ALTER TABLE templates ADD COLUMN ocr_profile VARCHAR(32) NULL"))
+                await conn.commit()
+                logger.info("Added ocr_profile column to templates table")
+
+            # Coordonnées des mappings normalisées (indépendantes de la résolution de rendu)
+            result = await conn.execute(text(MAPPINGS_NORMALIZED_COLUMN_CHECK))
+            if result.scalar() == 0:
+                await conn.execute(text("ALTER TABLE mappings ADD COLUMN normalized TINYINT(1) NOT NULL DEFAULT 0"))
+                await conn.commit()
+                logger.info("Added normalized column to mappings table")
+            result = await conn.execute(text(MAPPINGS_NORMALIZE_UPDATE))
+            await conn.commit()
+            if result.rowcount:
+                logger.info(f"Converted {result.rowcount} mapping(s) to normalized coordinates")
                 
     except Exception as e:
         logger.error(f"Error updating database schema: {e}")
@@ -1,10 +1,11 @@
 """
 SQLAlchemy ORM models for the application
 """
+import json
 from datetime import datetime
 from typing import Optional, List
-from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, DECIMAL, Date, TIMESTAMP
-from sqlalchemy.orm import relationship, Mapped
+from sqlalchemy import Column, Integer, String, Float, Boolean, DateTime, ForeignKey, Text, DECIMAL, Date, TIMESTAMP, LargeBinary, Index
+from sqlalchemy.orm import relationship, Mapped, deferred
 from sqlalchemy.ext.declarative import declared_attr
 from database.config import Base
 
@@ -52,6 +53,8 @@ class Template(Base, TimestampMixin):
     id: Mapped[int] = Column(Integer, primary_key=True, index=True)
     name: Mapped[str] = Column(String(255), nullable=False)
     serial: Mapped[str] = Column(String(9), unique=True, nullable=True)
+    # Profil OCR utilisé pour les factures de ce template (NULL = OCR_PROFILE)
+    ocr_profile: Mapped[Optional[str]] = Column(String(32), nullable=True)
     created_by: Mapped[int] = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
     
     # Relationships
@@ -74,6 +77,8 @@ class Mapping(Base):
     top: Mapped[float] = Column(Float, nullable=False)
     width: Mapped[float] = Column(Float, nullable=False)
     height: Mapped[float] = Column(Float, nullable=False)
+    # True: fractions de la page; False: pixels de l'image standardisée (lignes d'avant la migration)
+    normalized: Mapped[bool] = Column(Boolean, nullable=False, default=False, server_default="0")
    
     created_by: Mapped[int] = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
     
@@ -115,3 +120,63 @@ class Facture(Base):
             "date_creation": self.date_creation.isoformat() if self.date_creation else None,
             "created_by": self.created_by
         }
+
+
+# Extraction job states
+JOB_QUEUED = "queued"
+JOB_RUNNING = "running"
+JOB_SUCCEEDED = "succeeded"
+JOB_FAILED = "failed"
+
+
+class ExtractionJob(Base, TimestampMixin):
+    """Durable extraction job, claimed by the workers with SELECT ... FOR UPDATE SKIP LOCKED"""
+    __tablename__ = "extraction_jobs"
+
+    id: Mapped[int] = Column(Integer, primary_key=True, index=True)
+    status: Mapped[str] = Column(String(20), default=JOB_QUEUED, nullable=False)
+    priority: Mapped[int] = Column(Integer, default=0, nullable=False)
+    attempts: Mapped[int] = Column(Integer, default=0, nullable=False)
+    max_attempts: Mapped[int] = Column(Integer, default=3, nullable=False)
+    doc_id: Mapped[str] = Column(String(64), nullable=False)
+    filename: Mapped[str] = Column(String(255), nullable=False)
+    # Contenu du fichier, pour les workers d'autres nœuds (vidé une fois le job terminé)
+    document: Mapped[Optional[bytes]] = deferred(Column(LargeBinary(length=2**32 - 1), nullable=True))
+    template_id: Mapped[Optional[int]] = Column(Integer, nullable=True)
+    fournisseur: Mapped[Optional[str]] = Column(String(255), nullable=True)
+    result: Mapped[Optional[str]] = Column(Text(length=2**24 - 1), nullable=True)  # JSON de /ocr-preview
+    error: Mapped[Optional[str]] = Column(Text, nullable=True)
+    worker_id: Mapped[Optional[str]] = Column(String(100), nullable=True)
+    available_at: Mapped[datetime] = Column(DateTime, default=datetime.utcnow, nullable=False)
+    lease_until: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+    started_at: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+    finished_at: Mapped[Optional[datetime]] = Column(DateTime, nullable=True)
+    created_by: Mapped[int] = Column(Integer, ForeignKey("utilisateurs.id"), nullable=False)
+
+    __table_args__ = (
+        # Sélection du prochain job: WHERE status = 'queued' ORDER BY priority DESC, id
+        Index("ix_extraction_jobs_claim", "status", "priority", "id"),
+    )
+
+    def to_dict(self, include_result: bool = True) -> dict:
+        """Convert model to dictionary (the file content is never included)"""
+        data = {
+            "id": self.id,
+            "status": self.status,
+            "priority": self.priority,
+            "attempts": self.attempts,
+            "max_attempts": self.max_attempts,
+            "doc_id": self.doc_id,
+            "filename": self.filename,
+            "template_id": self.template_id,
+            "fournisseur": self.fournisseur,
+            "error": self.error,
+            "worker_id": self.worker_id,
+            "created_at": self.created_at.isoformat() if self.created_at else None,
+            "started_at": self.started_at.isoformat() if self.started_at else None,
+            "finished_at": self.finished_at.isoformat() if self.finished_at else None,
+            "created_by": self.created_by,
+        }
+        if include_result:
+            data["result"] = json.loads(self.result) if self.result else None
+        return data
@@ -4,10 +4,14 @@ Repository pattern for database operations
 from typing import List, Optional, Dict, Any
 from sqlalchemy.ext.asyncio import AsyncSession
 from sqlalchemy import select, func, delete, update, and_, or_
-from sqlalchemy.orm import selectinload
+from sqlalchemy.orm import selectinload, undefer
 from sqlalchemy.sql.expression import desc
 from sqlalchemy import String
-from database.models import User, Template, Mapping, FieldName, Facture
+from datetime import datetime, timedelta
+from database.models import (
+    User, Template, Mapping, FieldName, Facture, ExtractionJob,
+    JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, JOB_FAILED
+)
 
 
 class BaseRepository:
@@ -46,6 +50,20 @@ class UserRepository(BaseRepository):
 class TemplateRepository(BaseRepository):
     """Repository for template operations"""
     
+    async def get_by_id(self, template_id: int) -> Optional[Template]:
+        """Get template by ID"""
+        result = await self.session.execute(
+            select(Template).where(Template.id == template_id)
+        )
+        return result.scalar_one_or_none()
+    
+    async def get_ocr_profile(self, template_id: int) -> Optional[str]:
+        """OCR profile of a template (None = default profile)"""
+        result = await self.session.execute(
+            select(Template.ocr_profile).where(Template.id == template_id)
+        )
+        return result.scalar_one_or_none()
+    
     async def get_by_name_and_user(self, name: str, user_id: int) -> Optional[Template]:
         """Get template by name and user ID"""
         result = await self.session.execute(
@@ -341,3 +359,136 @@ class FactureRepository(BaseRepository):
         )
         await self.session.commit()
         return True
+
+
+class ExtractionJobRepository(BaseRepository):
+    """Repository for the durable extraction job queue"""
+
+    async def create_many(self, jobs_data: List[dict]) -> List[ExtractionJob]:
+        """Enqueue several jobs in one transaction"""
+        jobs = [ExtractionJob(**data) for data in jobs_data]
+        self.session.add_all(jobs)
+        await self.session.commit()
+        for job in jobs:
+            await self.session.refresh(job)
+        return jobs
+
+    async def get_by_id(self, job_id: int) -> Optional[ExtractionJob]:
+        """Get job by ID (without the file content)"""
+        result = await self.session.execute(
+            select(ExtractionJob).where(ExtractionJob.id == job_id)
+        )
+        return result.scalar_one_or_none()
+
+    async def get_by_user(self, user_id: int, status: str = None, limit: int = 100) -> List[ExtractionJob]:
+        """Latest jobs of a user, optionally filtered by status"""
+        stmt = select(ExtractionJob).where(ExtractionJob.created_by == user_id)
+        if status:
+            stmt = stmt.where(ExtractionJob.status == status)
+        result = await self.session.execute(stmt.order_by(desc(ExtractionJob.id)).limit(limit))
+        return result.scalars().all()
+
+    async def claim(self, worker_id: str, limit: int, lease_seconds: float) -> List[ExtractionJob]:
+        """
+        Claim up to `limit` queued jobs for a worker
+
+        The candidates are selected with FOR UPDATE SKIP LOCKED so that concurrent
+        workers never wait on each other; the conditional UPDATE also protects
+        databases without row locks (SQLite).
+        """
+        now = datetime.utcnow()
+        result = await self.session.execute(
+            select(ExtractionJob.id)
+            .where(and_(ExtractionJob.status == JOB_QUEUED, ExtractionJob.available_at <= now))
+            .order_by(desc(ExtractionJob.priority), ExtractionJob.id)
+            .limit(limit)
+            .with_for_update(skip_locked=True)
+        )
+        claimed = []
+        for job_id in result.scalars().all():
+            updated = await self.session.execute(
+                update(ExtractionJob)
+                .where(and_(ExtractionJob.id == job_id, ExtractionJob.status == JOB_QUEUED))
+                .values(
+                    status=JOB_RUNNING,
+                    attempts=ExtractionJob.attempts + 1,
+                    worker_id=worker_id,
+                    started_at=now,
+                    lease_until=now + timedelta(seconds=lease_seconds),
+                    updated_at=now,
+                )
+            )
+            if updated.rowcount == 1:
+                claimed.append(job_id)
+        await self.session.commit()
+        if not claimed:
+            return []
+
+        result = await self.session.execute(
+            select(ExtractionJob)
+            .options(undefer(ExtractionJob.document))
+            .where(ExtractionJob.id.in_(claimed))
+            .order_by(desc(ExtractionJob.priority), ExtractionJob.id)
+        )
+        return result.scalars().all()
+
+    async def complete(self, job_id: int, worker_id: str, result_json: str, error: str = None) -> bool:
+        """
+        Store the final result of a job claimed by this worker and drop its file content
+
+        A job whose extraction ran but found nothing (error given) is failed without retry.
+        """
+        now = datetime.utcnow()
+        updated = await self.session.execute(
+            update(ExtractionJob)
+            .where(and_(ExtractionJob.id == job_id, ExtractionJob.worker_id == worker_id,
+                        ExtractionJob.status == JOB_RUNNING))
+            .values(status=JOB_FAILED if error else JOB_SUCCEEDED, result=result_json, error=error,
+                    document=None, finished_at=now, lease_until=None, updated_at=now)
+        )
+        await self.session.commit()
+        return updated.rowcount == 1
+
+    async def fail(self, job_id: int, worker_id: str, error: str, retry_delay: float) -> bool:
+        """Record a failed attempt: the job is queued again until max_attempts is reached"""
+        now = datetime.utcnow()
+        job = await self.get_by_id(job_id)
+        if job is None or job.worker_id != worker_id or job.status != JOB_RUNNING:
+            return False
+        if job.attempts < job.max_attempts:
+            values = dict(status=JOB_QUEUED, available_at=now + timedelta(seconds=retry_delay * job.attempts))
+        else:
+            values = dict(status=JOB_FAILED, document=None, finished_at=now)
+        await self.session.execute(
+            update(ExtractionJob)
+            .where(ExtractionJob.id == job_id)
+            .values(error=error[:10000], lease_until=None, updated_at=now, **values)
+        )
+        await self.session.commit()
+        return True
+
+    async def requeue_expired(self) -> int:
+        """Queue again the running jobs whose worker died (lease expired)"""
+        now = datetime.utcnow()
+        expired = ExtractionJob.lease_until < now
+        failed = await self.session.execute(
+            update(ExtractionJob)
+            .where(and_(ExtractionJob.status == JOB_RUNNING, expired,
+                        ExtractionJob.attempts >= ExtractionJob.max_attempts))
+            .values(status=JOB_FAILED, error="Worker lease expired", document=None,
+                    finished_at=now, lease_until=None, updated_at=now)
+        )
+        requeued = await self.session.execute(
+            update(ExtractionJob)
+            .where(and_(ExtractionJob.status == JOB_RUNNING, expired))
+            .values(status=JOB_QUEUED, lease_until=None, available_at=now, updated_at=now)
+        )
+        await self.session.commit()
+        return failed.rowcount + requeued.rowcount
+
+    async def count_by_status(self) -> Dict[str, int]:
+        """Number of jobs per status"""
+        result = await self.session.execute(
+            select(ExtractionJob.status, func.count(ExtractionJob.id)).group_by(ExtractionJob.status)
+        )
+        return {status: count for status, count in result.all()}
@@ -0,0 +1,24 @@
+import os
+
+# Répertoire de base du backend
+_BACKEND_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Échelle de rendu des pages PDF (affecte tous les rendus d'images PDF)
+PDF_RENDER_SCALE = 2
+
+# Magasin de documents (fichier envoyé une seule fois, référencé ensuite par doc_id)
+DOCUMENT_STORE_DIR = os.getenv("DOCUMENT_STORE_DIR", os.path.join(_BACKEND_DIR, "cache", "documents"))
+DOCUMENT_STORE_TTL = float(os.getenv("DOCUMENT_STORE_TTL", "86400"))  # Durée de vie depuis le dernier accès (s)
+DOCUMENT_STORE_DISK_MB = float(os.getenv("DOCUMENT_STORE_DISK_MB", "1024"))  # Quota disque total
+DOCUMENT_STORE_MEMORY_MB = float(os.getenv("DOCUMENT_STORE_MEMORY_MB", "64"))  # Documents récents gardés en mémoire
+DOCUMENT_MAX_FILE_MB = float(os.getenv("DOCUMENT_MAX_FILE_MB", "50"))  # Taille max d'un fichier envoyé
+DOCUMENT_STORE_CLEANUP_INTERVAL = float(os.getenv("DOCUMENT_STORE_CLEANUP_INTERVAL", "600"))  # Purge des expirés (s)
+
+# Extensions acceptées par type de document
+PDF_EXTENSIONS = ('.pdf',)
+IMAGE_EXTENSIONS = ('.png', '.jpg', '.jpeg')
+
+# Images des pages servies en binaire (GET /documents/{doc_id}/pages/{n})
+PAGE_IMAGE_FORMAT = os.getenv("PAGE_IMAGE_FORMAT", "jpeg")  # jpeg, webp ou png
+PAGE_IMAGE_QUALITY = int(os.getenv("PAGE_IMAGE_QUALITY", "80"))  # Qualité WebP/JPEG par défaut
+PAGE_IMAGE_MAX_AGE = int(os.getenv("PAGE_IMAGE_MAX_AGE", "86400"))  # Cache-Control max-age (s)
@@ -0,0 +1,166 @@
+"""
+Streamed page previews (NDJSON or Server-Sent Events)
+
+Pages are rendered one by one in a small thread pool and each preview is sent
+as soon as it is ready, so the first thumbnails show up before the whole PDF
+is rendered. At most PREVIEW_THREADS pages are rendered ahead of the client.
+The PDF is opened once per stream, off the event loop; PyMuPDF documents are
+not thread-safe, so the pages of one stream are loaded and rasterized under a
+lock while the image encoding runs in parallel.
+"""
+import asyncio
+import base64
+import json
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, AsyncIterator, Callable, Dict, Optional, Tuple
+
+import pymupdf as fitz
+from PIL import Image
+
+from documents.document_config import PAGE_IMAGE_FORMAT, PAGE_IMAGE_QUALITY
+from documents.document_render import IMAGE_MEDIA_TYPES, encode_image, page_pixel_size, pdf_page_variant
+
+PREVIEW_THREADS = max(1, int(os.getenv("PREVIEW_THREADS", "2")))
+
+STREAM_NDJSON = "ndjson"
+STREAM_SSE = "sse"
+STREAM_MEDIA_TYPES = {
+    STREAM_NDJSON: "application/x-ndjson",
+    STREAM_SSE: "text/event-stream",
+}
+
+# Threads dédiés au rendu des aperçus (n'occupent pas le pool par défaut de asyncio)
+_preview_executor = ThreadPoolExecutor(max_workers=PREVIEW_THREADS, thread_name_prefix="preview")
+
+
+def page_range(page_count: int, first_page: Optional[int], last_page: Optional[int]) -> range:
+    """Clamp an inclusive [first_page, last_page] range to the document"""
+    first = max(0, first_page or 0)
+    last = page_count - 1 if last_page is None else min(last_page, page_count - 1)
+    return range(first, last + 1)
+
+
+class _PreviewDocument:
+    """PDF opened once for a whole preview stream, shared by the preview threads"""
+
+    def __init__(self, file_content: bytes):
+        self.doc = fitz.open(stream=file_content, filetype="pdf")
+        self.page_count = self.doc.page_count
+        self.lock = threading.Lock()
+
+    def preview_size(self, page_index: int, width: Optional[int]) -> Tuple[int, int]:
+        """Size of a preview page without rendering it"""
+        with self.lock:
+            page_width, page_height = page_pixel_size(self.doc.load_page(page_index), 1)
+        if width and page_width > width:
+            page_width, page_height = width, max(1, round(page_height * width / page_width))
+        return page_width, page_height
+
+    def render(self, page_index: int, width: Optional[int], fmt: str) -> Dict[str, Any]:
+        """Render and encode one preview page (runs in the preview thread pool)"""
+        with self.lock:
+            img = pdf_page_variant(self.doc.load_page(page_index), "preview", 1, width)
+        return _encode_preview(img, page_index, fmt)
+
+    def close(self) -> None:
+        """Close the PDF once the page being rendered, if any, is done"""
+        with self.lock:
+            self.doc.close()
+
+
+def _encode_preview(img: Image.Image, page_index: int, fmt: str) -> Dict[str, Any]:
+    """Preview event of a rendered page (the image is inlined as base64)"""
+    data = base64.b64encode(encode_image(img, fmt, PAGE_IMAGE_QUALITY)).decode()
+    return {
+        "page_number": page_index,
+        "image": f"data:{IMAGE_MEDIA_TYPES[fmt]};base64,{data}",
+        "width": img.width,
+        "height": img.height,
+    }
+
+
+def format_event(kind: str, event: str, payload: Dict[str, Any]) -> bytes:
+    """Serialize one event as an NDJSON line or an SSE message"""
+    data = json.dumps(payload, ensure_ascii=False)
+    if kind == STREAM_SSE:
+        return f"event: {event}\ndata: {data}\n\n".encode("utf-8")
+    return (json.dumps({"event": event, **payload}, ensure_ascii=False) + "\n").encode("utf-8")
+
+
+async def stream_page_previews(
+    file_content: bytes,
+    doc_id: str,
+    kind: str = STREAM_NDJSON,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    width: Optional[int] = None,
+    image_url: Optional[Callable[[int], str]] = None,
+    fmt: str = PAGE_IMAGE_FORMAT,
+) -> AsyncIterator[bytes]:
+    """
+    Yield a "meta" event, one "page" event per rendered page, then "done"
+
+    Args:
+        file_content: PDF bytes
+        doc_id: Identifier of the document (echoed in the meta event)
+        kind: STREAM_NDJSON or STREAM_SSE
+        first_page, last_page: Optional inclusive page range (0-based)
+        width: Optional thumbnail width
+        image_url: When given, pages carry this URL instead of an inline image (no rendering)
+        fmt: Image format of the inline previews
+    """
+    loop = asyncio.get_running_loop()
+    # Ouverture (analyse du PDF) hors de la boucle d'événements
+    document = await loop.run_in_executor(_preview_executor, _PreviewDocument, file_content)
+    pending = []
+    try:
+        pages = page_range(document.page_count, first_page, last_page)
+        yield format_event(kind, "meta", {
+            "doc_id": doc_id,
+            "total_pages": document.page_count,
+            "first_page": pages.start,
+            "last_page": pages.stop - 1,
+        })
+
+        if image_url is not None:
+            # Pas de rendu: seule la taille de chaque page est lue, au fil du flux
+            for n in pages:
+                page_width, page_height = await loop.run_in_executor(
+                    _preview_executor, document.preview_size, n, width
+                )
+                yield format_event(kind, "page", {
+                    "page_number": n,
+                    "image": image_url(n),
+                    "width": page_width,
+                    "height": page_height,
+                })
+            yield format_event(kind, "done", {"pages": len(pages)})
+            return
+
+        remaining = iter(pages)
+        # Garder PREVIEW_THREADS rendus en avance, envoyer les pages dans l'ordre
+        for n in remaining:
+            pending.append(loop.run_in_executor(_preview_executor, document.render, n, width, fmt))
+            if len(pending) >= PREVIEW_THREADS:
+                break
+        while pending:
+            try:
+                preview = await pending.pop(0)
+            except Exception as e:
+                logging.error(f"Erreur lors du rendu de l'aperçu de {doc_id}: {e}")
+                yield format_event(kind, "error", {"detail": f"Erreur lors de la génération des aperçus: {str(e)}"})
+                return
+            next_page = next(remaining, None)
+            if next_page is not None:
+                pending.append(loop.run_in_executor(_preview_executor, document.render, next_page, width, fmt))
+            yield format_event(kind, "page", preview)
+        yield format_event(kind, "done", {"pages": len(pages)})
+    finally:
+        # Client déconnecté: les rendus pas encore démarrés sont abandonnés
+        for future in pending:
+            future.cancel()
+        # Fermé dans le pool, après le rendu éventuellement en cours (même verrou)
+        _preview_executor.submit(document.close)
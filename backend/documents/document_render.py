@@ -0,0 +1,170 @@
+"""
+Page rendering pipeline producing standardized pages as NumPy arrays
+
+PDF pages are rendered by PyMuPDF directly at the size that fits the target
+(no PNG round-trip, no LANCZOS resize) and copied once into a preallocated
+white canvas. The same arrays feed OCR, previews and dataprep.
+"""
+from io import BytesIO
+from typing import List, Optional, Tuple
+
+import numpy as np
+import pymupdf as fitz
+from PIL import Image
+
+# A4 page size in PDF points, the reference of the standardized image
+A4_WIDTH_PT = 595
+A4_HEIGHT_PT = 842
+
+
+def standard_size(render_scale: float) -> Tuple[int, int]:
+    """Size of the standardized image for a render scale (1190x1684 at scale 2)"""
+    return int(A4_WIDTH_PT * render_scale), int(A4_HEIGHT_PT * render_scale)
+
+
+def fit_size(width: float, height: float, target_width: int, target_height: int) -> Tuple[int, int]:
+    """Largest size with the same aspect ratio fitting in the target (same rounding as before)"""
+    img_ratio = width / height
+    target_ratio = target_width / target_height
+    if img_ratio > target_ratio:
+        return target_width, int(target_width / img_ratio)
+    return int(target_height * img_ratio), target_height
+
+
+def _paste_centered(pixels: np.ndarray, target_width: int, target_height: int) -> np.ndarray:
+    """Copy an HxWx3 array into the center of a preallocated white canvas"""
+    canvas = np.full((target_height, target_width, 3), 255, dtype=np.uint8)
+    h = min(pixels.shape[0], target_height)
+    w = min(pixels.shape[1], target_width)
+    y = (target_height - h) // 2
+    x = (target_width - w) // 2
+    canvas[y:y + h, x:x + w] = pixels[:h, :w, :3]
+    return canvas
+
+
+def render_page_array(page: "fitz.Page", target_width: int, target_height: int) -> np.ndarray:
+    """Render a PDF page directly at its fit size and return the standardized RGB array"""
+    rect = page.rect
+    new_width, new_height = fit_size(rect.width, rect.height, target_width, target_height)
+    matrix = fitz.Matrix(new_width / rect.width, new_height / rect.height)
+    pix = page.get_pixmap(matrix=matrix, alpha=False)
+    # Vue sur la mémoire du pixmap: la seule copie est celle vers le canvas
+    samples = np.frombuffer(pix.samples_mv, dtype=np.uint8).reshape(pix.height, pix.stride // pix.n, pix.n)
+    return _paste_centered(samples[:, :pix.width], target_width, target_height)
+
+
+def render_pdf_page_array(file_content: bytes, page_index: int, target_width: int, target_height: int) -> np.ndarray:
+    """Open the PDF bytes and render one standardized page"""
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        return render_page_array(doc.load_page(page_index), target_width, target_height)
+    finally:
+        doc.close()
+
+
+def pdf_page_count(file_content: bytes) -> int:
+    """Number of pages of a PDF"""
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        return doc.page_count
+    finally:
+        doc.close()
+
+
+def render_image_array(file_content: bytes, target_width: int, target_height: int) -> np.ndarray:
+    """Decode an image file and return the standardized RGB array"""
+    img = Image.open(BytesIO(file_content)).convert('RGB')
+    new_width, new_height = fit_size(img.width, img.height, target_width, target_height)
+    if (new_width, new_height) != img.size:
+        img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
+    return _paste_centered(np.asarray(img), target_width, target_height)
+
+
+def page_to_image(page: "fitz.Page", scale: float) -> Image.Image:
+    """Render a PDF page at a given scale as a PIL image (for previews)"""
+    pix = page.get_pixmap(matrix=fitz.Matrix(scale, scale), alpha=False)
+    # frombuffer garde une référence sur les octets: pas de copie supplémentaire
+    return Image.frombuffer("RGB", (pix.width, pix.height), pix.samples, "raw", "RGB", pix.stride, 1)
+
+
+def page_pixel_size(page: "fitz.Page", scale: float) -> Tuple[int, int]:
+    """Size of page_to_image(page, scale) without rendering the page"""
+    rect = (page.rect * fitz.Matrix(scale, scale)).irect
+    return rect.width, rect.height
+
+
+def pdf_to_images(file_content: bytes, scale: float) -> List[Image.Image]:
+    """Render every page of a PDF at a given scale"""
+    doc = fitz.open(stream=file_content, filetype="pdf")
+    try:
+        return [page_to_image(page, scale) for page in doc]
+    finally:
+        doc.close()
+
+
+# -------------------------
+# Page images served as binary (GET /documents/{doc_id}/pages/{n})
+# -------------------------
+# preview: aperçu léger (échelle 1), full: rendu à l'échelle PDF, standard: image standardisée de l'OCR
+PAGE_SIZES = ("preview", "full", "standard")
+
+IMAGE_MEDIA_TYPES = {
+    "webp": "image/webp",
+    "jpeg": "image/jpeg",
+    "png": "image/png",
+}
+
+
+def pdf_page_variant(
+    page: "fitz.Page", size: str, render_scale: float, max_width: Optional[int] = None
+) -> Image.Image:
+    """Render a loaded PDF page in the preview or full size variant"""
+    scale = 1 if size == "preview" else render_scale
+    if max_width:
+        # Miniature rendue directement à sa largeur, sans redimensionnement
+        scale = min(scale, max_width / page.rect.width)
+    img = page_to_image(page, scale)
+    if max_width and img.width > max_width:
+        img = img.resize((max_width, max(1, round(img.height * max_width / img.width))), Image.Resampling.LANCZOS)
+    return img
+
+
+def render_page_variant(
+    file_content: bytes,
+    is_pdf: bool,
+    page_index: int,
+    size: str,
+    render_scale: float,
+    max_width: Optional[int] = None,
+) -> Image.Image:
+    """Render one page of a document in the requested size variant"""
+    if size == "standard":
+        target = standard_size(render_scale)
+        if is_pdf:
+            img = Image.fromarray(render_pdf_page_array(file_content, page_index, *target))
+        else:
+            img = Image.fromarray(render_image_array(file_content, *target))
+    elif is_pdf:
+        doc = fitz.open(stream=file_content, filetype="pdf")
+        try:
+            img = pdf_page_variant(doc.load_page(page_index), size, render_scale, max_width)
+        finally:
+            doc.close()
+    else:
+        img = Image.open(BytesIO(file_content)).convert('RGB')
+
+    if max_width and img.width > max_width:
+        img = img.resize((max_width, max(1, round(img.height * max_width / img.width))), Image.Resampling.LANCZOS)
+    return img
+
+
+def encode_image(img: Image.Image, fmt: str, quality: int) -> bytes:
+    """Encode a PIL image as WebP, JPEG or PNG bytes"""
+    buffer = BytesIO()
+    if fmt == "png":
+        img.save(buffer, format="PNG", compress_level=1)
+    elif fmt == "jpeg":
+        img.save(buffer, format="JPEG", quality=quality, optimize=False)
+    else:
+        img.save(buffer, format="WEBP", quality=quality, method=2)
+    return buffer.getvalue()
@@ -0,0 +1,256 @@
+import asyncio
+import hashlib
+import logging
+from typing import Optional
+
+from fastapi import APIRouter, Depends, File, HTTPException, Request, Response, UploadFile, status
+from fastapi.responses import StreamingResponse
+
+from auth.auth_jwt import require_comptable_or_admin
+from documents.document_config import (
+    PAGE_IMAGE_FORMAT, PAGE_IMAGE_MAX_AGE, PAGE_IMAGE_QUALITY, PDF_RENDER_SCALE
+)
+from documents.document_previews import STREAM_MEDIA_TYPES, stream_page_previews
+from documents.document_render import IMAGE_MEDIA_TYPES, PAGE_SIZES, encode_image, render_page_variant
+from documents.document_store import DocumentInput, KIND_PDF, document_kind, document_store, is_valid_doc_id
+from ocr.ocr_cache import file_digest
+from services.ocr_prefetch import ocr_prefetcher
+
+router = APIRouter(prefix="/documents", tags=["documents"])
+
+# Incrémenter quand le rendu des pages change, pour invalider les ETags déjà distribués
+PAGE_IMAGE_VERSION = 2
+
+
+async def resolve_document(
+    file: Optional[UploadFile],
+    doc_id: Optional[str],
+    user_id: int,
+    store: bool = False,
+) -> DocumentInput:
+    """
+    Return the bytes of the document given to an endpoint
+
+    Args:
+        file: Uploaded file (legacy mode, takes precedence)
+        doc_id: Identifier returned by POST /documents
+        user_id: Current user: an uploaded file is stored for them, a doc_id must be theirs
+        store: Keep an uploaded file in the store so that later steps can use its doc_id
+
+    Raises:
+        HTTPException: 400 if no document is given, 404 if the doc_id is unknown, expired
+            or uploaded by another user
+    """
+    if file is not None:
+        content = await file.read()
+        if store:
+            try:
+                document = await asyncio.to_thread(document_store.put, content, file.filename or "", user_id)
+                return DocumentInput(document.doc_id, file.filename, content, True)
+            except (ValueError, OSError) as e:
+                logging.warning(f"Document not stored ({file.filename}): {e}")
+        return DocumentInput(file_digest(content), file.filename, content)
+
+    if not doc_id:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail="Fichier ou doc_id requis")
+    stored = await asyncio.to_thread(document_store.get, doc_id, user_id) if is_valid_doc_id(doc_id) else None
+    if stored is None:
+        raise HTTPException(
+            status_code=status.HTTP_404_NOT_FOUND,
+            detail="Document introuvable ou expiré, veuillez le renvoyer"
+        )
+    meta, content = stored
+    return DocumentInput(meta.doc_id, meta.filename, content, True)
+
+
+def page_image_url(
+    request: Request, doc_id: str, page_index: int, size: str = "full", width: Optional[int] = None
+) -> str:
+    """URL of the binary image of a page, used in JSON responses instead of base64"""
+    url = request.url_for("get_document_page", doc_id=doc_id, page_index=page_index)
+    params = {"size": size}
+    if width:
+        params["width"] = width
+    return str(url.include_query_params(**params))
+
+
+def preview_stream_response(
+    request: Request,
+    document: DocumentInput,
+    stream: str,
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    width: Optional[int] = None,
+    use_urls: bool = False,
+) -> StreamingResponse:
+    """
+    Stream the previews of a PDF page by page as NDJSON or SSE
+
+    Raises:
+        HTTPException: 400 if the stream kind or the thumbnail width is invalid
+    """
+    if stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format de flux non supporté: {stream}")
+    if width is not None and width <= 0:
+        raise HTTPException(status_code=400, detail="La largeur doit être positive")
+
+    def preview_url(n: int) -> str:
+        return page_image_url(request, document.doc_id, n, "preview", width)
+
+    events = stream_page_previews(
+        document.content, document.doc_id, stream, first_page, last_page, width,
+        preview_url if use_urls and document.stored else None
+    )
+    return StreamingResponse(
+        events,
+        media_type=STREAM_MEDIA_TYPES[stream],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def _page_etag(doc_id: str, page_index: int, size: str, width: Optional[int], fmt: str, quality: int) -> str:
+    """Strong ETag: the image only depends on the document bytes and the rendering options"""
+    raw = f"{doc_id}:{page_index}:{size}:{width}:{fmt}:{quality}:{PDF_RENDER_SCALE}:{PAGE_IMAGE_VERSION}"
+    return '"' + hashlib.sha256(raw.encode("utf-8")).hexdigest()[:32] + '"'
+
+
+def _etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    if not if_none_match:
+        return False
+    candidates = [tag.strip() for tag in if_none_match.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+@router.post("")
+async def upload_document(
+    file: UploadFile = File(...),
+    current_user = Depends(require_comptable_or_admin)
+):
+    """Stocke un fichier une seule fois et retourne son doc_id (hash du contenu)"""
+    content = await file.read()
+    try:
+        document = await asyncio.to_thread(document_store.put, content, file.filename or "", current_user["id"])
+    except ValueError as e:
+        raise HTTPException(status_code=status.HTTP_400_BAD_REQUEST, detail=str(e))
+    except OSError as e:
+        logging.error(f"Erreur lors du stockage du document: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors du stockage: {str(e)}")
+
+    return {
+        "success": True,
+        **document.public_dict(),
+        "expires_in": document_store.ttl_seconds,
+    }
+
+
+@router.get("/stats")
+async def document_stats(current_user = Depends(require_comptable_or_admin)):
+    """Statistiques du magasin de documents"""
+    return await asyncio.to_thread(document_store.stats)
+
+
+@router.get("/{doc_id}/pages/{page_index}")
+async def get_document_page(
+    doc_id: str,
+    page_index: int,
+    request: Request,
+    size: str = "full",
+    format: str = PAGE_IMAGE_FORMAT,
+    quality: int = PAGE_IMAGE_QUALITY,
+    width: Optional[int] = None,
+    current_user = Depends(require_comptable_or_admin)
+):
+    """
+    Image binaire d'une page (WebP, JPEG ou PNG) avec ETag et Cache-Control
+
+    size: preview (échelle 1), full (échelle de rendu PDF) ou standard (image
+    standardisée utilisée par l'OCR); width réduit l'image à une largeur max.
+    """
+    fmt = format.lower()
+    if fmt == "jpg":
+        fmt = "jpeg"
+    if fmt not in IMAGE_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format non supporté: {format}")
+    if size not in PAGE_SIZES:
+        raise HTTPException(status_code=400, detail=f"Taille non supportée: {size}")
+    if not 1 <= quality <= 100:
+        raise HTTPException(status_code=400, detail="La qualité doit être comprise entre 1 et 100")
+    if width is not None and width <= 0:
+        raise HTTPException(status_code=400, detail="La largeur doit être positive")
+
+    # Propriétaire et page vérifiés avant le 304: l'ETag se calcule à partir du doc_id
+    meta = await asyncio.to_thread(document_store.get_meta, doc_id, current_user["id"])
+    if meta is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document introuvable ou expiré")
+    if not 0 <= page_index < meta.page_count:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=f"Page introuvable: {page_index}")
+
+    etag = _page_etag(doc_id, page_index, size, width, fmt, quality)
+    headers = {
+        "ETag": etag,
+        # Réponse authentifiée: cache du navigateur uniquement, contenu immuable pour une URL donnée
+        "Cache-Control": f"private, max-age={PAGE_IMAGE_MAX_AGE}, immutable",
+    }
+    if _etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    stored = await asyncio.to_thread(document_store.get, doc_id, current_user["id"])
+    if stored is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document introuvable ou expiré")
+    meta, content = stored
+
+    def render() -> bytes:
+        img = render_page_variant(content, meta.kind == KIND_PDF, page_index, size, PDF_RENDER_SCALE, width)
+        return encode_image(img, fmt, quality)
+
+    try:
+        data = await asyncio.to_thread(render)
+    except Exception as e:
+        logging.error(f"Erreur lors du rendu de la page {page_index} de {doc_id}: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors du rendu de la page: {str(e)}")
+    return Response(content=data, media_type=IMAGE_MEDIA_TYPES[fmt], headers=headers)
+
+
+@router.get("/{doc_id}/previews")
+async def stream_document_previews(
+    doc_id: str,
+    request: Request,
+    stream: str = "ndjson",
+    first_page: Optional[int] = None,
+    last_page: Optional[int] = None,
+    width: Optional[int] = None,
+    image_mode: str = "base64",
+    current_user = Depends(require_comptable_or_admin)
+):
+    """
+    Aperçus des pages d'un PDF stocké, envoyés page par page (NDJSON ou SSE)
+
+    Événements: meta (nombre de pages), page (une par page rendue), done, ou error.
+    Avec image_mode=url, les pages portent l'URL de leur image au lieu du base64.
+    """
+    document = await resolve_document(None, doc_id, current_user["id"])
+    if document_kind(document.filename) != KIND_PDF:
+        raise HTTPException(status_code=400, detail="Le fichier doit être un PDF")
+    return preview_stream_response(
+        request, document, stream, first_page, last_page, width, image_mode == "url"
+    )
+
+
+@router.get("/{doc_id}")
+async def get_document(doc_id: str, current_user = Depends(require_comptable_or_admin)):
+    """Métadonnées d'un document stocké (404 s'il a été envoyé par un autre utilisateur)"""
+    document = await asyncio.to_thread(document_store.get_meta, doc_id, current_user["id"])
+    if document is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document introuvable ou expiré")
+    return {"success": True, **document.public_dict(), "expires_in": document_store.ttl_seconds}
+
+
+@router.delete("/{doc_id}")
+async def delete_document(doc_id: str, current_user = Depends(require_comptable_or_admin)):
+    """Supprime un document stocké pour l'utilisateur courant (les fichiers partent avec le dernier)"""
+    if not await asyncio.to_thread(document_store.delete, doc_id, current_user["id"]):
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Document introuvable")
+    # Plus aucun propriétaire: le préchargement OCR en cours est inutile
+    if await asyncio.to_thread(document_store.get_meta, doc_id) is None:
+        ocr_prefetcher.cancel(doc_id)
+    return {"success": True, "message": "Document supprimé"}
@@ -0,0 +1,392 @@
+"""
+Upload-once document store: files are kept on disk under their content hash (doc_id)
+
+A document is sent once to POST /documents and then referenced by its doc_id
+by every extraction step. Each entry records the ids of the users who uploaded
+it: a doc_id is only resolved for one of its owners. Entries expire DOCUMENT_STORE_TTL seconds after their
+last access and the least recently used ones are evicted when the disk quota
+is exceeded. The disk usage and document count are tracked as running totals:
+the store directory is walked once at first use, then only when the quota is
+exceeded or every DOCUMENT_STORE_CLEANUP_INTERVAL seconds. The methods do blocking file I/O and
+are called from a thread by the routes.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Any, Dict, List, NamedTuple, Optional, Tuple
+
+import pymupdf as fitz
+
+from documents.document_config import (
+    DOCUMENT_MAX_FILE_MB, DOCUMENT_STORE_CLEANUP_INTERVAL, DOCUMENT_STORE_DIR, DOCUMENT_STORE_DISK_MB,
+    DOCUMENT_STORE_MEMORY_MB, DOCUMENT_STORE_TTL, IMAGE_EXTENSIONS, PDF_EXTENSIONS
+)
+
+KIND_PDF = "pdf"
+KIND_IMAGE = "image"
+
+_DOC_ID_RE = re.compile(r"^[0-9a-f]{64}$")
+
+
+class StoredDocument(NamedTuple):
+    """Metadata of a stored document"""
+    doc_id: str
+    filename: str
+    kind: str
+    size: int
+    page_count: int
+    created_at: float
+    # Utilisateurs ayant envoyé ce contenu (seuls autorisés à le lire ou le supprimer)
+    owners: Tuple[int, ...] = ()
+
+    def is_owned_by(self, user_id: Optional[int]) -> bool:
+        """True if user_id uploaded the document (None: internal access, always allowed)"""
+        return user_id is None or user_id in self.owners
+
+    def public_dict(self) -> Dict[str, Any]:
+        """Metadata returned by the API (the owners are not disclosed)"""
+        data = self._asdict()
+        del data["owners"]
+        return data
+
+
+class DocumentInput(NamedTuple):
+    """File given to an endpoint or a job, either uploaded or referenced by doc_id"""
+    doc_id: str
+    filename: str
+    content: bytes
+    # True when the document can be served by GET /documents/{doc_id}/...
+    stored: bool = False
+
+
+def is_valid_doc_id(doc_id: Any) -> bool:
+    """A doc_id is the hex sha256 of the file bytes (also prevents path traversal)"""
+    return isinstance(doc_id, str) and bool(_DOC_ID_RE.match(doc_id))
+
+
+def document_kind(filename: Optional[str]) -> Optional[str]:
+    """Document kind from the file extension, None if unsupported"""
+    name = (filename or "").lower()
+    if name.endswith(PDF_EXTENSIONS):
+        return KIND_PDF
+    if name.endswith(IMAGE_EXTENSIONS):
+        return KIND_IMAGE
+    return None
+
+
+class DocumentStore:
+    """Content-addressed store of uploaded files with TTL and disk quota"""
+
+    def __init__(
+        self,
+        root: str = DOCUMENT_STORE_DIR,
+        ttl_seconds: float = DOCUMENT_STORE_TTL,
+        disk_bytes: int = int(DOCUMENT_STORE_DISK_MB * 1024 * 1024),
+        memory_bytes: int = int(DOCUMENT_STORE_MEMORY_MB * 1024 * 1024),
+        max_file_bytes: int = int(DOCUMENT_MAX_FILE_MB * 1024 * 1024),
+        cleanup_interval: float = DOCUMENT_STORE_CLEANUP_INTERVAL,
+    ):
+        self.root = root
+        self.ttl_seconds = ttl_seconds
+        self.disk_bytes = disk_bytes
+        self.memory_bytes = memory_bytes
+        self.max_file_bytes = max_file_bytes
+        self.cleanup_interval = cleanup_interval
+        # Octets et nombre des fichiers .bin sur disque (None: pas encore mesurés)
+        self._disk_used: Optional[int] = None
+        self._documents: Optional[int] = None
+        self._last_cleanup = 0.0
+        # Les méthodes sont appelées depuis plusieurs threads
+        self._lock = threading.RLock()
+        # Derniers documents lus: évite de relire le disque à chaque page
+        self._memory: "OrderedDict[str, bytes]" = OrderedDict()
+        self._memory_used = 0
+        self._counters = {"uploads": 0, "deduplicated": 0, "hits": 0, "misses": 0, "expired": 0, "evictions": 0}
+
+    # -------------------------
+    # Paths
+    # -------------------------
+    def _data_path(self, doc_id: str) -> str:
+        return os.path.join(self.root, doc_id[:2], f"{doc_id}.bin")
+
+    def _meta_path(self, doc_id: str) -> str:
+        return os.path.join(self.root, doc_id[:2], f"{doc_id}.json")
+
+    # -------------------------
+    # Memory tier
+    # -------------------------
+    def _memory_put(self, doc_id: str, content: bytes) -> None:
+        with self._lock:
+            if len(content) > self.memory_bytes or doc_id in self._memory:
+                return
+            self._memory[doc_id] = content
+            self._memory_used += len(content)
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, evicted = self._memory.popitem(last=False)
+                self._memory_used -= len(evicted)
+
+    def _memory_get(self, doc_id: str) -> Optional[bytes]:
+        with self._lock:
+            content = self._memory.get(doc_id)
+            if content is not None:
+                self._memory.move_to_end(doc_id)
+            return content
+
+    def _memory_drop(self, doc_id: str) -> None:
+        with self._lock:
+            content = self._memory.pop(doc_id, None)
+            if content is not None:
+                self._memory_used -= len(content)
+
+    # -------------------------
+    # Disk tier
+    # -------------------------
+    def _read_meta(self, doc_id: str) -> Optional[StoredDocument]:
+        try:
+            with open(self._meta_path(doc_id), "r", encoding="utf-8") as f:
+                data = json.load(f)
+            data["owners"] = tuple(data.get("owners") or ())
+            return StoredDocument(**data)
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, TypeError) as e:
+            logging.warning(f"Document store metadata unreadable for {doc_id}: {e}")
+            return None
+
+    def _is_expired(self, doc_id: str) -> bool:
+        try:
+            return time.time() - os.path.getmtime(self._data_path(doc_id)) > self.ttl_seconds
+        except OSError:
+            return True
+
+    def _touch(self, doc_id: str) -> None:
+        try:
+            os.utime(self._data_path(doc_id))  # Repousse l'expiration
+        except OSError:
+            pass
+
+    def _write_atomic(self, path: str, data: bytes) -> int:
+        """Write a file through a temp file, returns the size of the file it replaced (0 if none)"""
+        # Un fichier temporaire par thread: deux envois simultanés du même document ne se gênent pas
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        with self._lock:
+            try:
+                previous = os.path.getsize(path)
+            except OSError:
+                previous = 0
+            os.replace(tmp_path, path)
+        return previous
+
+    def _write_meta(self, document: StoredDocument, owner_id: Optional[int]) -> StoredDocument:
+        """Write the metadata of a document, adding owner_id to the owners already recorded"""
+        with self._lock:
+            existing = self._read_meta(document.doc_id)
+            owners = set(existing.owners if existing else ()) | set(document.owners)
+            if owner_id is not None:
+                owners.add(owner_id)
+            document = document._replace(owners=tuple(sorted(owners)))
+            if existing != document:
+                self._write_atomic(
+                    self._meta_path(document.doc_id),
+                    json.dumps(document._asdict(), ensure_ascii=False).encode("utf-8"),
+                )
+            return document
+
+    def _entries(self) -> List[Tuple[float, int, str]]:
+        """(last access, size, doc_id) of every stored document"""
+        entries = []
+        for root, _, files in os.walk(self.root):
+            for name in files:
+                if not name.endswith(".bin"):
+                    continue
+                try:
+                    st = os.stat(os.path.join(root, name))
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, name[:-len(".bin")]))
+        return entries
+
+    def _disk_usage(self) -> int:
+        with self._lock:
+            if self._disk_used is None:
+                entries = self._entries()
+                self._disk_used = sum(size for _, size, _ in entries)
+                self._documents = len(entries)
+            return self._disk_used
+
+    def _add_disk_usage(self, size: int, documents: int = 0) -> None:
+        with self._lock:
+            if self._disk_used is not None:
+                self._disk_used += size
+                self._documents += documents
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def put(self, content: bytes, filename: str, owner_id: Optional[int] = None) -> StoredDocument:
+        """
+        Store a file for owner_id and return its metadata (an existing copy is reused)
+
+        Raises:
+            ValueError: If the file type is unsupported, the file too large or the PDF unreadable
+        """
+        kind = document_kind(filename)
+        if kind is None:
+            raise ValueError("Type de fichier non supporté")
+        if len(content) > self.max_file_bytes:
+            raise ValueError(f"Fichier trop volumineux (max {self.max_file_bytes // (1024 * 1024)} Mo)")
+
+        doc_id = hashlib.sha256(content).hexdigest()
+        existing = self._read_meta(doc_id)
+        if existing is not None and os.path.exists(self._data_path(doc_id)):
+            self._touch(doc_id)
+            self._counters["deduplicated"] += 1
+            return self._write_meta(existing, owner_id)
+
+        page_count = 1
+        if kind == KIND_PDF:
+            try:
+                doc = fitz.open(stream=content, filetype="pdf")
+            except Exception as e:
+                raise ValueError(f"PDF illisible: {e}")
+            page_count = doc.page_count
+            doc.close()
+
+        document = StoredDocument(
+            doc_id=doc_id,
+            filename=os.path.basename(filename),
+            kind=kind,
+            size=len(content),
+            page_count=page_count,
+            created_at=time.time(),
+        )
+        os.makedirs(os.path.dirname(self._data_path(doc_id)), exist_ok=True)
+        self._disk_usage()
+        previous = self._write_atomic(self._data_path(doc_id), content)
+        self._add_disk_usage(len(content) - previous, 0 if previous else 1)
+        document = self._write_meta(document, owner_id)
+        self._memory_put(doc_id, content)
+        self._counters["uploads"] += 1
+        # Parcours du répertoire seulement au-delà du quota, ou périodiquement pour les expirés
+        if self._disk_usage() > self.disk_bytes or time.time() - self._last_cleanup > self.cleanup_interval:
+            self.cleanup()
+        return document
+
+    def get_meta(self, doc_id: str, owner_id: Optional[int] = None) -> Optional[StoredDocument]:
+        """Metadata of a stored document, None if unknown, expired or not owned by owner_id"""
+        if not is_valid_doc_id(doc_id):
+            return None
+        if self._is_expired(doc_id):
+            if os.path.exists(self._meta_path(doc_id)):
+                self.delete(doc_id)
+                self._counters["expired"] += 1
+            return None
+        meta = self._read_meta(doc_id)
+        if meta is None or not meta.is_owned_by(owner_id):
+            return None
+        return meta
+
+    def get(self, doc_id: str, owner_id: Optional[int] = None) -> Optional[Tuple[StoredDocument, bytes]]:
+        """Metadata and bytes of a stored document, None if unknown, expired or not owned by owner_id"""
+        meta = self.get_meta(doc_id, owner_id)
+        if meta is None:
+            self._counters["misses"] += 1
+            return None
+
+        content = self._memory_get(doc_id)
+        if content is None:
+            try:
+                with open(self._data_path(doc_id), "rb") as f:
+                    content = f.read()
+            except OSError as e:
+                logging.warning(f"Document store read failed for {doc_id}: {e}")
+                self._counters["misses"] += 1
+                return None
+            self._memory_put(doc_id, content)
+        self._touch(doc_id)
+        self._counters["hits"] += 1
+        return meta, content
+
+    def delete(self, doc_id: str, owner_id: Optional[int] = None) -> bool:
+        """
+        Remove a document, returns False if it was not stored (or not owned by owner_id)
+
+        With owner_id, only that owner is removed: the files are deleted with the last owner.
+        """
+        if not is_valid_doc_id(doc_id):
+            return False
+        if owner_id is not None:
+            with self._lock:
+                meta = self._read_meta(doc_id)
+                if meta is None or not meta.is_owned_by(owner_id):
+                    return False
+                owners = tuple(owner for owner in meta.owners if owner != owner_id)
+                if owners:
+                    self._write_atomic(
+                        self._meta_path(doc_id),
+                        json.dumps(meta._replace(owners=owners)._asdict(), ensure_ascii=False).encode("utf-8"),
+                    )
+                    return True
+        self._memory_drop(doc_id)
+        removed = False
+        for path in (self._data_path(doc_id), self._meta_path(doc_id)):
+            try:
+                size = os.path.getsize(path)
+                os.remove(path)
+                removed = True
+                if path.endswith(".bin"):
+                    self._add_disk_usage(-size, -1)
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logging.warning(f"Document store delete failed for {path}: {e}")
+        return removed
+
+    def cleanup(self) -> None:
+        """Remove expired documents, then the least recently used ones above the quota"""
+        now = time.time()
+        entries = []
+        for mtime, size, doc_id in self._entries():
+            if now - mtime > self.ttl_seconds:
+                self.delete(doc_id)
+                self._counters["expired"] += 1
+            else:
+                entries.append((mtime, size, doc_id))
+
+        used = sum(size for _, size, _ in entries)
+        evicted = 0
+        for _, size, doc_id in sorted(entries):
+            if used <= self.disk_bytes:
+                break
+            self.delete(doc_id)
+            used -= size
+            evicted += 1
+            self._counters["evictions"] += 1
+        with self._lock:
+            self._disk_used = used
+            self._documents = len(entries) - evicted
+            self._last_cleanup = now
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and occupancy of the store (running totals, no directory walk)"""
+        disk_used = self._disk_usage()
+        return {
+            **self._counters,
+            "documents": self._documents,
+            "disk_bytes": disk_used,
+            "disk_limit_bytes": self.disk_bytes,
+            "memory_documents": len(self._memory),
+            "memory_bytes": self._memory_used,
+            "ttl_seconds": self.ttl_seconds,
+        }
+
+
+# Shared document store
+document_store = DocumentStore()
@@ -1,4 +1,5 @@
 # Standard library imports
+import asyncio
 import json
 import logging
 import os
@@ -6,21 +7,17 @@ import re
 from datetime import date, datetime
 from io import BytesIO
 from typing import Any, Dict, List, Optional, Union
-import math
-import dateparser
 import time
 
 # Third-party imports
 import base64
 import dbf
-import numpy as np
 import pymupdf as fitz
 from fastapi import (
-    Depends, FastAPI, File, Form, HTTPException, Request, UploadFile
+    Depends, FastAPI, File, Form, Header, HTTPException, Request, UploadFile
 )
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse, JSONResponse, Response
-from paddleocr import PaddleOCR
+from fastapi.responses import FileResponse, JSONResponse, Response, StreamingResponse
 from PIL import Image, ImageEnhance, ImageOps
 from pydantic import BaseModel, Field, field_validator
 from dotenv import load_dotenv
@@ -29,13 +26,45 @@ from dotenv import load_dotenv
 from database.config import get_async_db, init_database
 from database.models import Base
 from services.template_service import TemplateService
+from services.template_coords import UNITS_PX, check_units
 from services.facture_service import FactureService
+from services.extraction_batches import BATCH_MAX_FILES, ExtractionBatch, batch_manager
+from services.extraction_service import extract_document, resolve_extraction_profile
+from services.field_extractors import field_times
+from services.extraction_jobs import enqueue_jobs
+from services.ocr_prefetch import OCR_PREFETCH_PAGES, ocr_prefetcher
+from database.repositories import ExtractionJobRepository
 
 # Authentication modules
 from auth.auth_routes import router as auth_router
 from auth.auth_jwt import require_comptable_or_admin
 from auth.auth_config import CORS_ORIGINS, CORS_ALLOW_CREDENTIALS
 
+# OCR execution subsystem
+from ocr.ocr_pool import ocr_pool
+from ocr.ocr_admission import OcrOverloaded, ocr_admission, overloaded_response
+from ocr.ocr_disconnect import ClientDisconnected, run_unless_disconnected, stats as disconnect_stats
+from ocr.ocr_batcher import ocr_scheduler, scheduler_stats
+from ocr.ocr_cache import ocr_cache
+from ocr.ocr_config import OCR_DEADLINE_MS
+from ocr.ocr_deadline import OcrDeadline, stage_times
+from ocr.ocr_pipeline import get_page_boxes
+from ocr.ocr_profiles import OCR_DEADLINE_FALLBACK_PROFILE, OCR_PROFILE, OCR_PROFILES, OcrProfile, get_profile
+from ocr.ocr_singleflight import ocr_singleflight
+from ocr.ocr_text_layer import pdf_text_layer_boxes
+from ocr.ocr_warmup import ocr_readiness
+
+# Page rendering pipeline
+from documents.document_render import (
+    page_pixel_size, page_to_image, pdf_to_images, render_image_array,
+    render_pdf_page_array, standard_size
+)
+from documents.document_config import PDF_RENDER_SCALE
+from documents.document_previews import STREAM_MEDIA_TYPES
+from documents.document_routes import (
+    DocumentInput, page_image_url, preview_stream_response, resolve_document, router as documents_router
+)
+
 if not os.getenv("DATABASE_URL"):
     print("⚠️ No DATABASE_URL found, loading from .env")
     load_dotenv()
@@ -68,22 +97,62 @@ init_database()  # Use synchronous initialization for simplicity
 
 # Include authentication routes
 app.include_router(auth_router)
+app.include_router(documents_router)
 
-# Initialize PaddleOCR with specified parameters
-ocr = PaddleOCR(
-    lang="fr",
-  
-    use_doc_orientation_classify=False,
-    use_doc_unwarping=False,
-    use_textline_orientation=False,
-    text_det_input_shape=[3, 1440, 1440],
-    precision="fp32",
-    enable_mkldnn=True,
-    text_det_unclip_ratio=1.3,
-    text_rec_score_thresh=0.8,
+# PaddleOCR runs in a pool of worker processes (see ocr/ocr_pool.py)
+_warmup_task: Optional[asyncio.Task] = None
 
 
-)
+@app.on_event("startup")
+async def start_ocr_pool():
+    global _warmup_task
+    await ocr_pool.start()
+    # Chauffe en arrière-plan: l'API répond déjà, /health/ready passe à 200 une fois finie
+    _warmup_task = asyncio.create_task(ocr_readiness.run())
+
+
+@app.on_event("shutdown")
+async def stop_ocr_pool():
+    if _warmup_task is not None:
+        _warmup_task.cancel()
+    await ocr_prefetcher.shutdown()
+    await ocr_pool.shutdown()
+
+
+@app.exception_handler(OcrOverloaded)
+async def ocr_overloaded_handler(request: Request, exc: OcrOverloaded):
+    return overloaded_response(exc)
+
+
+@app.exception_handler(ClientDisconnected)
+async def client_disconnected_handler(request: Request, exc: ClientDisconnected):
+    # Personne ne lira cette réponse (499: code nginx "client closed request")
+    return Response(status_code=499)
+
+
+def request_profile(name: Optional[str]) -> Optional[OcrProfile]:
+    """OCR profile asked by a request (None if not given), 400 if unknown"""
+    if not name:
+        return None
+    try:
+        return get_profile(name)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+def request_units(units: Optional[str]) -> str:
+    """Coordinate units asked by a request (px by default), 400 if unknown"""
+    try:
+        return check_units(units)
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+async def ocr_slot():
+    """Dependency holding an OCR admission slot for the whole request (429 when saturated)"""
+    async with ocr_admission.slot():
+        yield
+
 
 # =======================
 # Pydantic Models
@@ -115,6 +184,7 @@ class ExtractionResult(BaseModel):
 class SaveMappingRequest(BaseModel):
     template_id: str = "default"
     field_map: Dict[str, Any]  
+    units: str = UNITS_PX  # px (image standardisée) ou normalized (fractions de la page)
 
 
 class InvoiceUpdate(BaseModel):
@@ -149,6 +219,11 @@ class InvoiceResponse(BaseModel):
 # =======================
 # Utility Functions
 # =======================
+# Images des réponses JSON: PNG en base64 (historique) ou URL vers GET /documents/{doc_id}/pages/{n}
+IMAGE_MODE_BASE64 = "base64"
+IMAGE_MODE_URL = "url"
+
+
 def image_to_base64(img: Image.Image) -> str:
     """Convertir une image PIL en base64"""
     buffer = BytesIO()
@@ -157,9 +232,6 @@ def image_to_base64(img: Image.Image) -> str:
     return f"data:image/png;base64,{img_str}"
 
 
-# Add a single variable for PDF rendering scale
-PDF_RENDER_SCALE = 2  # Change this value to affect all PDF image renderings
-
 # Database connection function (for backward compatibility)
 def get_connection():
     """
@@ -184,74 +256,10 @@ def get_connection():
         from auth.auth_database import get_connection as get_mysql_connection
         return get_mysql_connection()
 
-def standardize_image_dimensions(img: Image.Image, target_width: int= 595*PDF_RENDER_SCALE, target_height: int=842*PDF_RENDER_SCALE) -> Image.Image:
-    """
-    Resize image to target dimensions while maintaining aspect ratio.
-    Adds padding if necessary to match target dimensions exactly.
-    """
-    # Calculate aspect ratios
-    img_ratio = img.width / img.height
-    target_ratio = target_width / target_height
-    
-    # Resize to fit within target dimensions while maintaining aspect ratio
-    if img_ratio > target_ratio:
-        # Image is wider than target, fit to width
-        new_width = target_width
-        new_height = int(target_width / img_ratio)
-    else:
-        # Image is taller than target, fit to height
-        new_height = target_height
-        new_width = int(target_height * img_ratio)
-    
-    # Resize the image
-    img = img.resize((new_width, new_height), Image.Resampling.LANCZOS)
-    
-    # Create new image with target size and paste the resized image
-    result = Image.new('RGB', (target_width, target_height), (255, 255, 255))  # White background
-    x = (target_width - new_width) // 2
-    y = (target_height - new_height) // 2
-    result.paste(img, (x, y))
-    
-    return result
-
-def process_pdf_to_image(file_content: bytes) -> Image.Image:
-    """Convertir un PDF en image en utilisant PyMuPDF"""
-    try:
-        doc = fitz.open(stream=file_content, filetype="pdf")
-        page = doc[0]
-        
-        # Utiliser la variable PDF_RENDER_SCALE
-        mat = fitz.Matrix(PDF_RENDER_SCALE, PDF_RENDER_SCALE)
-        pix = page.get_pixmap(matrix=mat)
-        
-        # Convertir en PIL Image
-        img_data = pix.tobytes("png")
-        img = Image.open(BytesIO(img_data))
-        
-        doc.close()
-        
-        # Standardize the image dimensions
-        img = standardize_image_dimensions(img)
-        
-        return img
-    except Exception as e:
-        logging.error(f"Erreur lors de la conversion PDF: {e}")
-        raise e
-
-
 def process_pdf_to_images(file_content: bytes) -> List[Image.Image]:
     """Convertir un PDF en une liste d'images (une par page) en utilisant PyMuPDF"""
     try:
-        doc = fitz.open(stream=file_content, filetype="pdf")
-        images = []
-        for page_num in range(doc.page_count):
-            page = doc[page_num]
-            pix = page.get_pixmap(matrix=fitz.Matrix(PDF_RENDER_SCALE, PDF_RENDER_SCALE))
-            img_data = pix.tobytes("png")
-            img = Image.open(BytesIO(img_data))
-            images.append(img)
-        doc.close()
-        return images
+        return pdf_to_images(file_content, PDF_RENDER_SCALE)
     except Exception as e:
         logging.error(f"Erreur lors de la conversion PDF en images: {e}")
         raise e
@@ -260,107 +268,188 @@ def process_pdf_to_images(file_content: bytes) -> List[Image.Image]:
 # =======================
 # API Routes
 # =======================
+@app.get("/ocr/stats")
+async def ocr_stats():
+    """Statistiques du moteur OCR (pool de workers, remplissage des batches, cache)"""
+    return {
+        "pool": ocr_pool.stats(),
+        "batcher": ocr_scheduler.stats(),
+        "batchers": scheduler_stats(),
+        "cache": ocr_cache.stats(),
+        "admission": ocr_admission.stats(),
+        "prefetch": ocr_prefetcher.stats(),
+        "singleflight": ocr_singleflight.stats(),
+        "disconnects": disconnect_stats(),
+        "stage_times": stage_times.stats(),
+        "field_times": field_times.stats(),
+        "readiness": ocr_readiness.stats(),
+    }
+
+
+@app.get("/ocr/profiles")
+async def ocr_profiles():
+    """Profils OCR disponibles (paramètre profile de /ocr-preview et /upload-for-dataprep)"""
+    return {
+        "default": OCR_PROFILE,
+        "deadline_fallback": OCR_DEADLINE_FALLBACK_PROFILE,
+        "profiles": [
+            {
+                "name": profile.name,
+                "description": profile.description,
+                "render_scale": profile.render_scale,
+                "params": profile.params,
+            }
+            for profile in OCR_PROFILES.values()
+        ],
+    }
+
+
+@app.get("/health/ready")
+async def health_ready():
+    """Prête à recevoir du trafic: modèles vérifiés et workers OCR chauffés (503 sinon)"""
+    return JSONResponse(status_code=200 if ocr_readiness.ready else 503, content=ocr_readiness.stats())
+
+
+@app.get("/health/ocr")
+async def health_ocr():
+    """État de la file OCR, pour les répartiteurs de charge et la supervision"""
+    admission = ocr_admission.stats()
+    pool = ocr_pool.stats()
+    if admission["saturated"]:
+        state = "saturated"
+    elif admission["waiting"] or pool["queued"]:
+        state = "busy"
+    else:
+        state = "ok"
+    return {
+        "status": state,
+        "in_flight": admission["in_flight"],
+        "queue_depth": admission["waiting"],
+        "max_in_flight": admission["max_in_flight"],
+        "max_queue_depth": admission["max_waiting"],
+        "pool_queued": pool["queued"],
+        "pool_running": pool["running"],
+        "service_time_avg": admission["service_time_avg"],
+        "retry_after": admission["retry_after"],
+    }
+
+
 @app.post("/upload-for-dataprep")
 async def upload_for_dataprep(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
     page_index: int = Form(0),  
-    current_user = Depends(require_comptable_or_admin)
+    doc_id: str = Form(None),
+    image_mode: str = Form(IMAGE_MODE_BASE64),
+    profile: str = Form(None),
+    current_user = Depends(require_comptable_or_admin),
+    _slot = Depends(ocr_slot)
 ):
-    """Upload d'un fichier pour DataPrep, retour de l'image en base64, des boîtes OCR détectées, et l'image unwarped si disponible pour la page spécifiée"""
+    """Upload d'un fichier pour DataPrep, retour de l'image en base64, des boîtes OCR détectées, et l'image unwarped si disponible pour la page spécifiée
+
+    Avec image_mode=url, l'image est renvoyée sous forme d'URL vers
+    GET /documents/{doc_id}/pages/{n} au lieu d'un PNG en base64.
+    profile choisit le profil OCR (voir GET /ocr/profiles).
+    """
+    ocr_profile = request_profile(profile)
+    document = await resolve_document(file, doc_id, current_user["id"], store=image_mode == IMAGE_MODE_URL)
+    use_urls = image_mode == IMAGE_MODE_URL and document.stored
     try:
-        file_content = await file.read()
+        file_content = document.content
+        target_width, target_height = standard_size(PDF_RENDER_SCALE)
        
-        if file.filename.lower().endswith('.pdf'):
+        if document.filename.lower().endswith('.pdf'):
             # Open PDF with PyMuPDF
             pdf_document = fitz.open(stream=file_content, filetype="pdf")
+            page_count = pdf_document.page_count
+            pdf_document.close()
            
-            if page_index >= pdf_document.page_count:
-                pdf_document.close()
+            if page_index >= page_count:
                 raise HTTPException(status_code=400, detail=f"Index de page invalide: {page_index}")
             if page_index < 0:
-                pdf_document.close()
                 raise HTTPException(status_code=400, detail="Index de page doit être positif")
             
-            # Process only the specified page
-            page = pdf_document.load_page(page_index)
-          
-            pix = page.get_pixmap(matrix=fitz.Matrix(PDF_RENDER_SCALE, PDF_RENDER_SCALE))  # Increase resolution
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
-            pdf_document.close()
-            # Standardize the image dimensions
-            img = standardize_image_dimensions(img)
-            images = [img]
-        elif file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            # Render only the specified page, directly at the standardized size
+            def render_page():
+                return render_pdf_page_array(file_content, page_index, target_width, target_height)
+        elif document.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             if page_index != 0:
                 raise HTTPException(status_code=400, detail="L'index de page n'est valide que pour les fichiers PDF")
-            img = Image.open(BytesIO(file_content)).convert('RGB')
             # Standardize the image dimensions
-            img = standardize_image_dimensions(img)
-            images = [img]
+            def render_page():
+                return render_image_array(file_content, target_width, target_height)
         else:
             raise HTTPException(status_code=400, detail="Type de fichier non supporté")
 
-        # Run OCR on the selected image
-        img_array = np.array(images[0])
-        result = ocr.predict(img_array)
-       
-        boxes = []
+        # Requête valide: les pages suivantes sont passées à l'OCR en arrière-plan, pendant que
+        # l'utilisateur mappe celle-ci
+        ocr_prefetcher.schedule(
+            document, range(page_index + 1, page_index + 1 + OCR_PREFETCH_PAGES), ocr_profile or get_profile(),
+            PDF_RENDER_SCALE
+        )
+
+        if use_urls:
+            # L'image est servie séparément: le rendu n'a lieu que si l'OCR en a besoin
+            image = page_image_url(request, document.doc_id, page_index, "standard")
+        else:
+            img_array = await asyncio.to_thread(render_page)
+            image = await asyncio.to_thread(lambda: image_to_base64(Image.fromarray(img_array)))
+
+            def render_page():
+                return img_array
+
+        # Run OCR on the selected image (served from the OCR cache when possible)
+        if document.filename.lower().endswith('.pdf'):
+            render_scale = PDF_RENDER_SCALE
+
+            def read_text_layer():
+                return pdf_text_layer_boxes(
+                    file_content, page_index, PDF_RENDER_SCALE, target_width, target_height
+                )
+        else:
+            render_scale = "image"
+            read_text_layer = None
+        page_boxes, ocr_path = await run_unless_disconnected(request, get_page_boxes(
+            document.doc_id, page_index, render_scale,
+            render_page, read_text_layer, profile=ocr_profile
+        ))
+
+        boxes = [
+            {
+                'id': box['id'],
+                'coords': {
+                    'left': box['left'],
+                    'top': box['top'],
+                    'width': box['width'],
+                    'height': box['height']
+                },
+                'text': box['text'],
+                'confidence': box['score']
+            }
+            for box in page_boxes
+        ]
+        # Le redressement de document est désactivé dans OCR_PARAMS: pas d'image "unwarped"
         unwarped_base64 = None
         unwarped_width = None
         unwarped_height = None
-        for res in result:
-            rec_polys = res.get('rec_polys', [])
-            rec_texts = res.get('rec_texts', [])
-            rec_scores = res.get('rec_scores', [])
-            doc_pre_res = res.get('doc_preprocessor_res', {})
-            original_points = doc_pre_res.get('original_points') if isinstance(doc_pre_res, dict) else None
-            doc_img = None
-            for key in ['doc_img', 'output_img', 'rot_img']:
-                if key in doc_pre_res:
-                    doc_img = doc_pre_res[key]
-                    break
-            if doc_img is not None and unwarped_base64 is None:
-                pil_img = Image.fromarray(doc_img)
-                buffer = BytesIO()
-                pil_img.save(buffer, format='PNG')
-                unwarped_base64 = f"data:image/png;base64,{base64.b64encode(buffer.getvalue()).decode()}"
-                unwarped_width = pil_img.width
-                unwarped_height = pil_img.height
-            for i, (poly, text, score) in enumerate(zip(rec_polys, rec_texts, rec_scores)):
-                if score is None or not text.strip():
-                    continue
-                mapped_poly = original_points[i] if original_points and i < len(original_points) else poly
-                x_coords = [float(pt[0]) for pt in mapped_poly]
-                y_coords = [float(pt[1]) for pt in mapped_poly]
-                left = float(min(x_coords))
-                top = float(min(y_coords))
-                width = float(max(x_coords) - left)
-                height = float(max(y_coords) - top)
-                boxes.append({
-                    'id': int(i),
-                    'coords': {
-                        'left': left,
-                        'top': top,
-                        'width': width,
-                        'height': height
-                    },
-                    'text': str(text).strip(),
-                    'confidence': float(score)
-                })
         response = {
             "success": True,
-            "image": image_to_base64(images[0]) if images else None,
-            "width": images[0].width if images else None,
-            "height": images[0].height if images else None,
+            "image": image,
+            "width": target_width,
+            "height": target_height,
             "boxes": boxes,
             "box_count": len(boxes),
             "unwarped_image": unwarped_base64,
             "unwarped_width": unwarped_width,
             "unwarped_height": unwarped_height,
-            "page_index": page_index
+            "page_index": page_index,
+            "ocr_path": ocr_path,
+            "doc_id": document.doc_id
         }
       
         return response
+    except ClientDisconnected:
+        raise
     except Exception as e:
         logging.error(f"Erreur lors de l'upload: {e}")
         raise HTTPException(status_code=500, detail=f"Erreur lors du traitement: {str(e)}")
@@ -368,23 +457,56 @@ async def upload_for_dataprep(
 
 @app.post("/pdf-page-previews")
 async def pdf_page_previews(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
+    doc_id: str = Form(None),
+    image_mode: str = Form(IMAGE_MODE_BASE64),
+    stream: str = Form(None),
+    first_page: int = Form(None),
+    last_page: int = Form(None),
+    width: int = Form(None),
+    template_id: str = Form(None),
+    profile: str = Form(None),
     current_user = Depends(require_comptable_or_admin)
 ):
-    """Génère des aperçus en base64 pour toutes les pages d'un PDF"""
+    """Génère des aperçus en base64 pour toutes les pages d'un PDF (ou des URLs avec image_mode=url)
+
+    Avec stream=ndjson ou stream=sse, les aperçus sont envoyés page par page dès
+    qu'ils sont rendus, éventuellement limités à [first_page, last_page] et réduits
+    à la largeur width. template_id et profile (optionnels) sont ceux de
+    l'extraction attendue ensuite : l'OCR de la 1re page est préchargé avec ce profil.
+    """
+    document = await resolve_document(file, doc_id, current_user["id"], store=image_mode == IMAGE_MODE_URL)
+    use_urls = image_mode == IMAGE_MODE_URL and document.stored
+    if document.filename.lower().endswith('.pdf'):
+        # Extraction probable dans la foulée
+        ocr_prefetcher.schedule(document, [0], request_profile(profile) or await resolve_extraction_profile(template_id))
+    if stream:
+        if not document.filename.lower().endswith('.pdf'):
+            raise HTTPException(status_code=400, detail="Le fichier doit être un PDF")
+        return preview_stream_response(request, document, stream, first_page, last_page, width, use_urls)
     try:
-        if not file.filename.lower().endswith('.pdf'):
+        if not document.filename.lower().endswith('.pdf'):
             raise HTTPException(status_code=400, detail="Le fichier doit être un PDF")
         
-        file_content = await file.read()
+        file_content = document.content
         pdf_document = fitz.open(stream=file_content, filetype="pdf")
     
         pages = []
 
         for page_num in range(pdf_document.page_count):
             page = pdf_document.load_page(page_num)
-            pix = page.get_pixmap(matrix=fitz.Matrix(1, 1))  # Lower resolution for previews
-            img = Image.frombytes("RGB", [pix.width, pix.height], pix.samples)
+            if use_urls:
+                # Seules les dimensions sont calculées, l'image est rendue à la demande
+                width, height = page_pixel_size(page, 1)
+                pages.append({
+                    "page_number": page_num,
+                    "image": page_image_url(request, document.doc_id, page_num, "preview"),
+                    "width": width,
+                    "height": height
+                })
+                continue
+            img = page_to_image(page, 1)  # Lower resolution for previews
             
             # Convert to base64
             buffer = BytesIO()
@@ -404,7 +526,8 @@ async def pdf_page_previews(
         return {
             "success": True,
             "total_pages": len(pages),
-            "pages": pages
+            "pages": pages,
+            "doc_id": document.doc_id
         }
         
     except Exception as e:
@@ -419,12 +542,14 @@ async def save_mapping(
     db = Depends(get_async_db)
 ):
     """Save field mappings to the database using ORM"""
+    units = request_units(request.units)
     try:
         template_service = TemplateService(db)
         success = await template_service.save_mapping(
             template_name=request.template_id,  
             field_map=request.field_map, 
-            current_user_id=current_user["id"]
+            current_user_id=current_user["id"],
+            units=units
         )
         
         if success:
@@ -440,13 +565,15 @@ async def save_mapping(
 @app.get("/load-mapping/{template_id}")
 async def load_mapping(
     template_id: str,
+    units: str = UNITS_PX,
     current_user = Depends(require_comptable_or_admin),
     db = Depends(get_async_db)
 ):
-    """Load field mappings from the database using ORM"""
+    """Load field mappings from the database using ORM (units: px ou normalized)"""
+    units = request_units(units)
     try:
         template_service = TemplateService(db)
-        result = await template_service.load_mapping(template_id)
+        result = await template_service.load_mapping(template_id, units)
         return result
         
     except Exception as e:
@@ -464,13 +591,14 @@ async def save_field_mapping(
     Save field mappings for a template using ORM
     
     Args:
-        request: Dictionary containing template_id and field_map
+        request: Dictionary containing template_id, field_map and optionally units (px or normalized)
         current_user: Authenticated user from JWT token
         db: Database session
         
     Returns:
         JSON response with success/error status
     """
+    units = request_units(request.get('units'))
     try:
         template_service = TemplateService(db)
         
@@ -501,7 +629,8 @@ async def save_field_mapping(
         success = await template_service.save_mapping(
             template_name=template_id,
             field_map=processed_map,
-            current_user_id=current_user['id']
+            current_user_id=current_user['id'],
+            units=units
         )
         
         if success:
@@ -523,13 +652,15 @@ async def save_field_mapping(
 
 @app.get("/mappings")
 async def get_mappings(
+    units: str = UNITS_PX,
     current_user = Depends(require_comptable_or_admin),
     db = Depends(get_async_db)
 ):
-    """Get all templates and mappings for the current user using ORM"""
+    """Get all templates and mappings for the current user using ORM (units: px ou normalized)"""
+    units = request_units(units)
     try:
         template_service = TemplateService(db)
-        result = await template_service.get_all_templates(current_user["id"])
+        result = await template_service.get_all_templates(current_user["id"], units)
         return result
         
     except Exception as e:
@@ -556,6 +687,22 @@ async def delete_mapping(
 
 
 
+@app.put("/templates/{template_id}/ocr-profile")
+async def set_template_ocr_profile(
+    template_id: str,
+    profile: str = Form(None),
+    current_user = Depends(require_comptable_or_admin),
+    db = Depends(get_async_db)
+):
+    """Profil OCR utilisé pour les factures d'un template (vide = profil par défaut)"""
+    try:
+        template_service = TemplateService(db)
+        return await template_service.set_ocr_profile(template_id, profile, current_user["id"])
+    except Exception as e:
+        logging.error(f"Error setting OCR profile: {e}")
+        raise HTTPException(status_code=500, detail=f"Error setting OCR profile: {str(e)}")
+
+
 @app.get("/factures")
 async def get_factures(
     skip: int = 0,
@@ -649,11 +796,50 @@ async def delete_facture(
 # =======================
 
 @app.post("/upload-basic")
-async def upload_basic(file: UploadFile = File(...)):
-    """Upload d'un fichier pour preview rapide (pas d'OCR, juste image(s) base64, width, height)"""
+async def upload_basic(
+    request: Request,
+    file: UploadFile = File(None),
+    doc_id: str = Form(None),
+    image_mode: str = Form(IMAGE_MODE_BASE64),
+    template_id: str = Form(None),
+    profile: str = Form(None),
+    current_user = Depends(require_comptable_or_admin)
+):
+    """Upload d'un fichier pour preview rapide (pas d'OCR, juste image(s) base64, width, height)
+
+    Le fichier est conservé dans le magasin de documents: le doc_id retourné peut
+    remplacer le fichier dans les étapes suivantes. Avec image_mode=url, les images
+    sont des URLs vers GET /documents/{doc_id}/pages/{n}. template_id et profile
+    (optionnels) sont ceux du /ocr-preview attendu ensuite.
+    """
+    document = await resolve_document(file, doc_id, current_user["id"], store=True)
+    # L'OCR de la 1re page sera prêt pour /ocr-preview (même profil, même clé de cache)
+    ocr_prefetcher.schedule(document, [0], request_profile(profile) or await resolve_extraction_profile(template_id))
     try:
-        file_content = await file.read()
-        if file.filename.lower().endswith('.pdf'):
+        file_content = document.content
+        if image_mode == IMAGE_MODE_URL and document.stored:
+            if document.filename.lower().endswith('.pdf'):
+                pdf_document = fitz.open(stream=file_content, filetype="pdf")
+                sizes = [page_pixel_size(page, PDF_RENDER_SCALE) for page in pdf_document]
+                pdf_document.close()
+            elif document.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+                sizes = [Image.open(BytesIO(file_content)).size]
+            else:
+                raise HTTPException(status_code=400, detail="Type de fichier non supporté")
+            if not sizes:
+                return {"success": False, "message": "No images extracted from PDF."}
+            urls = [page_image_url(request, document.doc_id, n, "full") for n in range(len(sizes))]
+            return {
+                "success": True,
+                "image": urls[0],
+                "width": sizes[0][0],
+                "height": sizes[0][1],
+                "images": urls,
+                "widths": [w for w, _ in sizes],
+                "heights": [h for _, h in sizes],
+                "doc_id": document.doc_id
+            }
+        if document.filename.lower().endswith('.pdf'):
             images = process_pdf_to_images(file_content)
             if not images:
                 return {"success": False, "message": "No images extracted from PDF."}
@@ -664,9 +850,10 @@ async def upload_basic(file: UploadFile = File(...)):
                 "height": images[0].height,
                 "images": [image_to_base64(img) for img in images],
                 "widths": [img.width for img in images],
-                "heights": [img.height for img in images]
+                "heights": [img.height for img in images],
+                "doc_id": document.doc_id
             }
-        elif file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+        elif document.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
             img = Image.open(BytesIO(file_content)).convert('RGB')
             return {
                 "success": True,
@@ -675,7 +862,8 @@ async def upload_basic(file: UploadFile = File(...)):
                 "height": img.height,
                 "images": [image_to_base64(img)],
                 "widths": [img.width],
-                "heights": [img.height]
+                "heights": [img.height],
+                "doc_id": document.doc_id
             }
         else:
             raise HTTPException(status_code=400, detail="Type de fichier non supporté")
@@ -687,953 +875,187 @@ async def upload_basic(file: UploadFile = File(...)):
 
 @app.post("/ocr-preview")
 async def ocr_preview(
-    file: UploadFile = File(...),
+    request: Request,
+    file: UploadFile = File(None),
     template_id: str = Form(None),
+    doc_id: str = Form(None),
+    profile: str = Form(None),
+    deadline_ms: Optional[float] = None,
+    x_deadline_ms: Optional[float] = Header(None),
+    current_user = Depends(require_comptable_or_admin),
+    _slot = Depends(ocr_slot)
 ):
-    import time  # Ensure time module is available in this function
-    MIN_CONFIDENCE = 0.8
-   
-    try:
-        # --- Read file to PIL image ---
-        file_content = await file.read()
-        if file.filename and file.filename.lower().endswith('.pdf'):
-            images = process_pdf_to_images(file_content)
-            img = images[0] if images else None
-        elif file.filename and file.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
-            img = Image.open(BytesIO(file_content)).convert('RGB')
-        else:
-            raise HTTPException(status_code=400, detail="Type de fichier non supporté")
+    """
+    Extraction des champs d'une facture
 
-        if img is None:
-            raise HTTPException(status_code=400, detail="No image available for extraction.")
-            
-        # Standardize the image dimensions before OCR processing
-        img = standardize_image_dimensions(img)
-        img_array = np.array(img)
-        result = ocr.predict(img_array)
-
-        # --- Build detected_boxes with consistent keys ---
-        detected_boxes = []
-        for res in result:
-            rec_polys = res.get('rec_polys', [])
-            rec_texts = res.get('rec_texts', [])
-            rec_scores = res.get('rec_scores', [])
-            for poly, text, score in zip(rec_polys, rec_texts, rec_scores):
-                if score is None or score < MIN_CONFIDENCE or not text or not text.strip():
-                    continue
-                x_coords = [p[0] for p in poly]
-                y_coords = [p[1] for p in poly]
-                left = float(min(x_coords))
-                right = float(max(x_coords))
-                top = float(min(y_coords))
-                bottom = float(max(y_coords))
-                width = right - left
-                height = bottom - top
-                detected_boxes.append({
-                    'left': left,
-                    'top': top,
-                    'right': right,
-                    'bottom': bottom,
-                    'width': width,
-                    'height': height,
-                    'center_x': (left + right) / 2.0,
-                    'center_y': (top + bottom) / 2.0,
-                    'text': text.strip(),
-                    'score': float(score)
-                })
+    Budget de temps: en-tête X-Deadline-Ms ou paramètre deadline_ms (défaut
+    OCR_DEADLINE_MS, 0 = aucun). Les étapes OCR qui ne tiendraient pas dans le
+    budget sont sautées et listées dans "deadline" de la réponse.
+    profile choisit le profil OCR (sinon celui du template, sinon OCR_PROFILE).
+    """
+    request_profile(profile)
+    budget_ms = x_deadline_ms if x_deadline_ms is not None else deadline_ms
+    if budget_ms is None:
+        budget_ms = OCR_DEADLINE_MS
+    if budget_ms < 0:
+        raise HTTPException(status_code=400, detail="Le budget de temps doit être positif")
+    deadline = OcrDeadline(budget_ms) if budget_ms > 0 else None
+
+    document = await resolve_document(file, doc_id, current_user["id"])
+    # Client parti (navigation, nouvelle tentative): l'OCR en attente est abandonné
+    result = await run_unless_disconnected(request, extract_document(document, template_id, deadline, profile))
+    if deadline is not None:
+        result["deadline"] = deadline.to_dict()
+    return result
 
 
-        # -------------------------
-        # Helpers: number & keyword
-        # -------------------------
-        def extract_number(text: str):
-            """Robust number parser (handles , and . as thousand/decimal separators)."""
-            if not text or re.search(r'[A-Za-zÀ-ÿ]', text) and not re.search(r'\d', text):
-                # If text contains letters and no digits -> not a number
-                pass
-            cleaned = re.sub(r'[^\d\-,\.]', '', text)
-            if cleaned == '':
-                return None
-            # If both present, decide which is decimal by last occurrence
-            if ',' in cleaned and '.' in cleaned:
-                if cleaned.rfind(',') > cleaned.rfind('.'):
-                    cleaned = cleaned.replace('.', '').replace(',', '.')
-                else:
-                    cleaned = cleaned.replace(',', '')
-            elif ',' in cleaned:
-                parts = cleaned.split(',')
-                # If last part length == 2 -> probably decimal
-                if len(parts[-1]) == 2:
-                    cleaned = cleaned.replace(',', '.')
-                else:
-                    cleaned = cleaned.replace(',', '')
-            # If too many dots, keep last as decimal
-            if cleaned.count('.') > 1:
-                parts = cleaned.split('.')
-                cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
-            if cleaned in ('', '-', '.'):
-                return None
-            # Final digit check
-            if not re.fullmatch(r'-?\d+(?:\.\d+)?', cleaned):
-                return None
-            try:
-                return float(cleaned)
-            except Exception:
-                return None
- 
-        # -------------------------
-        # Extract HT using position-based mapping
-        # -------------------------
-        ht_extracted = None
-        ht_box = None
-        ht_match = {'value_box': {'left': 0, 'top': 0, 'width': 0, 'height': 0}}
-        try:
-            # Get database connection and cursor
-            connection = get_connection()
-            cursor = connection.cursor(dictionary=True)
-            
-            # Get field ID for montantht
-            cursor.execute("SELECT id FROM field_name WHERE name = 'montantht'")
-            row = cursor.fetchone()
-            if row:
-                ht_field_id = row['id']
-                cursor.execute("""
-                    SELECT `left`, `top`, `width`, `height`
-                    FROM Mappings
-                    WHERE template_id = %s AND field_id = %s
-                    LIMIT 1
-                """, (template_id, ht_field_id))
-                mapping = cursor.fetchone()
-                if mapping:
-                    # Define expansion amounts (in pixels)
-                    expand_x = 100  # Increased from 10 to 100px for better detection
-                    expand_y = 20    # Increased from 5 to 20px for better detection
-                    
-                    # Calculate expanded mapped box coordinates
-                    mapped_left = float(mapping['left']) - expand_x
-                    mapped_right = float(mapping['left']) + float(mapping['width']) + expand_x
-                    mapped_top = float(mapping['top']) - expand_y
-                    mapped_bottom = float(mapping['top']) + float(mapping['height']) + expand_y
-                    
-                    mapped_box = {
-                        'left': mapped_left,
-                        'top': mapped_top,
-                        'right': mapped_right,
-                        'bottom': mapped_bottom
-                    }
-                    
-                    # Find the best matching box in the mapped area
-                    best_match = None
-                    best_score = -1
-                    
-                    for box in detected_boxes:
-                        current_box = {
-                            'left': box['left'],
-                            'top': box['top'],
-                            'right': box['left'] + box['width'],
-                            'bottom': box['top'] + box['height']
-                        }
-                        
-                        # Calculate overlap
-                        x_overlap = max(0, min(mapped_box['right'], current_box['right']) - max(mapped_box['left'], current_box['left']))
-                        y_overlap = max(0, min(mapped_box['bottom'], current_box['bottom']) - max(mapped_box['top'], current_box['top']))
-                        overlap_area = x_overlap * y_overlap
-                        
-                        # Calculate area of current box
-                        box_area = (current_box['right'] - current_box['left']) * (current_box['bottom'] - current_box['top'])
-                        
-                        # Calculate overlap ratio (how much of the box is within the mapped area)
-                        if box_area > 0:
-                            overlap_ratio = overlap_area / box_area
-                            
-                            # Try to extract a number from the box text
-                            val = extract_number(box['text'])
-                            if val is not None and overlap_ratio > 0.3:  # At least 30% overlap
-                                # Calculate center distance for scoring
-                                mapped_center_x = (mapped_box['left'] + mapped_box['right']) / 2
-                                mapped_center_y = (mapped_box['top'] + mapped_box['bottom']) / 2
-                                box_center_x = (current_box['left'] + current_box['right']) / 2
-                                box_center_y = (current_box['top'] + current_box['bottom']) / 2
-                                
-                                # Calculate distance between centers
-                                dx = box_center_x - mapped_center_x
-                                dy = box_center_y - mapped_center_y
-                                distance = (dx**2 + dy**2) ** 0.5
-                                
-                                # Calculate score (higher is better)
-                                score = (overlap_ratio * 0.7) + (1 / (1 + distance) * 0.3)
-                                
-                                if score > best_score:
-                                    best_score = score
-                                    best_match = box
-                                    ht_extracted = val
-                                    ht_box = {
-                                        "left": box['left'],
-                                        "top": box['top'],
-                                        "width": box['width'],
-                                        "height": box['height'],
-                                      
-                                    }
-                                    # Update ht_match with the found coordinates
-                                    ht_match['value_box'].update({
-                                        'left': float(box['left']),
-                                        'top': float(box['top']),
-                                        'width': float(box['width']),
-                                        'height': float(box['height'])
-                                    })
-                    
-                   
-               
-        except Exception as e:
-            print(f"Error extracting HT: {e}")
-            import traceback
-            print(traceback.format_exc())
-        finally:
-            # Ensure cursor and connection are properly closed
-            if 'cursor' in locals():
-                cursor.close()
-            if 'connection' in locals() and connection.is_connected():
-                connection.close()
-        
-        if ht_extracted is None:
-            return {"success": False, "data": {}, "message": "Aucune valeur HT trouvée dans la zone mappée"}
-
-        # -------------------------
-        # Extract TVA using position-based mapping
-        # -------------------------
-        tva_extracted = None
-        tva_box = None
-        tva_match = {'value_box': {'left': 0, 'top': 0, 'width': 0, 'height': 0}}
-        tva_connection = None
-        tva_cursor = None
-        
-        try:
-            # Create new connection and cursor for TVA extraction
-            tva_connection = get_connection()
-            tva_cursor = tva_connection.cursor(dictionary=True, buffered=True)  # Use buffered cursor
-            
-            # Get field ID for tva
-            tva_cursor.execute("SELECT id FROM field_name WHERE name = 'tva'")
-            try:
-                row = tva_cursor.fetchone()
-                    
-                if row and 'id' in row:
-                    tva_field_id = row['id']
-                    # Make sure to consume any remaining results
-                    while tva_cursor.nextset():
-                        pass
-                    
-                    # Execute mapping query
-                    tva_cursor.execute("""
-                        SELECT `left`, `top`, `width`, `height`
-                        FROM Mappings
-                        WHERE template_id = %s AND field_id = %s
-                        LIMIT 1
-                    """, (template_id, tva_field_id))
-                    
-                    # Fetch the mapping result
-                    mapping = tva_cursor.fetchone()
-                        
-                    # Consume any remaining results
-                    while tva_cursor.nextset():
-                        pass
-                if mapping:
-                    # Define expansion amounts (in pixels)
-                    expand_x = 10  # 10px horizontal expansion
-                    expand_y = 5    # 5px vertical expansion
-                    
-                    # Calculate expanded mapped box coordinates
-                    mapped_left = float(mapping['left']) - expand_x
-                    mapped_right = float(mapping['left']) + float(mapping['width']) + expand_x
-                    mapped_top = float(mapping['top']) - expand_y
-                    mapped_bottom = float(mapping['top']) + float(mapping['height']) + expand_y
-                    
-                    mapped_box = {
-                        'left': mapped_left,
-                        'top': mapped_top,
-                        'right': mapped_right,
-                        'bottom': mapped_bottom
-                    }
-                    
-                    # Find the best matching box in the mapped area
-                    best_match = None
-                    best_score = -1
-                    
-                    for box in detected_boxes:
-                        current_box = {
-                            'left': box['left'],
-                            'top': box['top'],
-                            'right': box['left'] + box['width'],
-                            'bottom': box['top'] + box['height']
-                        }
-                        
-                        # Skip if this is a percentage (TVA rate, not amount)
-                        if '%' in box['text']:
-                            continue
-                            
-                        # Calculate overlap
-                        x_overlap = max(0, min(mapped_box['right'], current_box['right']) - max(mapped_box['left'], current_box['left']))
-                        y_overlap = max(0, min(mapped_box['bottom'], current_box['bottom']) - max(mapped_box['top'], current_box['top']))
-                        overlap_area = x_overlap * y_overlap
-                        
-                        # Calculate area of current box
-                        box_area = (current_box['right'] - current_box['left']) * (current_box['bottom'] - current_box['top'])
-                        
-                        # Calculate overlap ratio (how much of the box is within the mapped area)
-                        if box_area > 0:
-                            overlap_ratio = overlap_area / box_area
-                            
-                            # Try to extract a number from the box text
-                            val = extract_number(box['text'])
-                            if val is not None and overlap_ratio > 0.3:  # At least 30% overlap
-                                # Calculate center distance for scoring
-                                mapped_center_x = (mapped_box['left'] + mapped_box['right']) / 2
-                                mapped_center_y = (mapped_box['top'] + mapped_box['bottom']) / 2
-                                box_center_x = (current_box['left'] + current_box['right']) / 2
-                                box_center_y = (current_box['top'] + current_box['bottom']) / 2
-                                
-                                # Calculate distance between centers
-                                dx = box_center_x - mapped_center_x
-                                dy = box_center_y - mapped_center_y
-                                distance = (dx**2 + dy**2) ** 0.5
-                                
-                                # Calculate score (higher is better)
-                                score = (overlap_ratio * 0.7) + (1 / (1 + distance) * 0.3)
-                                
-                                if score > best_score:
-                                    best_score = score
-                                    best_match = box
-                                    tva_extracted = val
-                                    tva_box = {
-                                        "left": box['left'],
-                                        "top": box['top'],
-                                        "width": box['width'],
-                                        "height": box['height'],
-                                       
-                                    }
-                                    # Update tva_match with the found coordinates
-                                    tva_match['value_box'].update({
-                                        'left': float(box['left']),
-                                        'top': float(box['top']),
-                                        'width': float(box['width']),
-                                        'height': float(box['height'])
-                                    })
-                    
-                    if not best_match:
-                        print("No valid TVA value found in mapped area")
-            except Exception as e:
-                print(f"Error in TVA field ID query: {e}")
-                import traceback
-                traceback.print_exc()
-                return {"success": False, "data": {}, "message": f"Erreur lors de l'extraction TVA: {str(e)}"}
-                
-        except Exception as e:
-            print(f"Error extracting TVA: {e}")
-            import traceback
-            traceback.print_exc()
-            return {"success": False, "data": {}, "message": f"Erreur lors de l'extraction TVA: {str(e)}"}
-            
-        finally:
-            # Clean up resources
-            if 'tva_cursor' in locals() and tva_cursor is not None:
-                try:
-                    # Consume any remaining results
-                    while tva_cursor.nextset():
-                        pass
-                except:
-                    pass
-                finally:
-                    try:
-                        tva_cursor.close()
-                    except:
-                        pass
-            
-            if 'tva_connection' in locals() and tva_connection is not None:
-                try:
-                    if tva_connection.is_connected():
-                        tva_connection.close()
-                except:
-                    pass
-        
-        if tva_extracted is None:
-            return {"success": False, "data": {}, "message": "Aucune valeur TVA trouvée dans la zone mappée"}
+@app.post("/extraction-batches")
+async def create_extraction_batch(
+    files: List[UploadFile] = File(None),
+    doc_ids: List[str] = Form(None),
+    template_id: str = Form(None),
+    fournisseur: str = Form(None),
+    stream: str = Form(None),
+    profile: str = Form(None),
+    current_user = Depends(require_comptable_or_admin)
+):
+    """
+    Extraction de plusieurs factures en un seul appel
 
-        # -------------------------
-        # TTC and taux TVA
-        # -------------------------
-     
-        
-        ttc_extracted = round(ht_extracted + tva_extracted, 2)
-     
-        
-        if ht_extracted != 0:
-            raw_taux = (tva_extracted * 100.0) / ht_extracted
-            # Round to nearest integer (0.5 rounds up)
-            taux_tva = int(round(raw_taux))
-         
-        else:
-            taux_tva = 0
-
-        # -------------------------
-        # Extract numFacture using position-based mapping
-        # -------------------------
-        numfacture_value = None
-        numfacture_box = None
-        numfacture_search_area = None
-        numfacture_cursor = None
-        try:
-            # Create new connection and cursor for numFacture extraction
-            numfacture_connection = get_connection()
-            numfacture_cursor = numfacture_connection.cursor(dictionary=True)
-            
-            numfacture_cursor.execute("SELECT id FROM field_name WHERE name = 'numerofacture'")
-            row = numfacture_cursor.fetchone()
-            if row:
-                numfacture_field_id = row['id']
-                numfacture_cursor.execute("""
-                    SELECT `left`, `top`, `width`, `height`
-                    FROM Mappings
-                    WHERE template_id = %s AND field_id = %s
-                    LIMIT 1
-                """, (template_id, numfacture_field_id))
-                mapping = numfacture_cursor.fetchone()
-                if mapping:
-                    mapped_cx = float(mapping['left']) + float(mapping['width']) / 2
-                    mapped_cy = float(mapping['top']) + float(mapping['height']) / 2
-
-                    def is_valid_invoice_number(text):
-                        text = text.strip()
-                        patterns = [
-                            r'(?i)(?:facture|fact|inv|no\.?\s*#?)\s*[\w\-\s/]*\d{2,}',
-                            r'\b\d{4,}[\-\s/]?\d+\b',
-                            r'\b[A-Z]{2,}[-\s]?\d+[-\s]?\d+\b',
-                            r'\b\d{6,}\b'
-                        ]
-                        return any(re.search(p, text) for p in patterns)
-
-                    
-
-                   # print("\n" + "="*60)
-                   # print("🔍 SEARCHING FOR INVOICE NUMBER")
-                   # print("="*60)
-                    numFacture_extraction_start = time.time()
-                    # Define expansion amounts (in pixels)
-                    expand_x = 10  # 10px horizontal expansion
-                    expand_y = 5    # 5px vertical expansion
-                    
-                    # Calculate expanded mapped box coordinates
-                    mapped_left = float(mapping['left']) - expand_x
-                    mapped_right = float(mapping['left']) + float(mapping['width']) + expand_x
-                    mapped_top = float(mapping['top']) - expand_y
-                    mapped_bottom = float(mapping['top']) + float(mapping['height']) + expand_y
-                    
-                    # print(f"Mapped box (expanded): left={mapped_left:.1f}, top={mapped_top:.1f}, f"right={mapped_right:.1f}, bottom={mapped_bottom:.1f}") "
-                         
-                    
-                    def boxes_intersect(box1, box2):
-                        """Check if two boxes intersect or touch each other."""
-                        return not (box1['right'] < box2['left'] or 
-                                 box1['left'] > box2['right'] or 
-                                 box1['bottom'] < box2['top'] or 
-                                 box1['top'] > box2['bottom'])
-                    
-                    def calculate_box_distance(box1, box2):
-                        """Calculate distance between two boxes with overlap handling.
-                        
-                        Returns:
-                            tuple: (distance, overlap_area_ratio) where:
-                                - distance: Minimum distance between box edges (0 if overlapping)
-                                - overlap_area_ratio: Ratio of overlap area to smaller box area (0-1)
-                        """
-                        # Calculate horizontal distance and overlap
-                        if box1['right'] < box2['left']:
-                            dx = box2['left'] - box1['right']
-                            h_overlap = 0
-                        elif box2['right'] < box1['left']:
-                            dx = box1['left'] - box2['right']
-                            h_overlap = 0
-                        else:
-                            dx = 0
-                            # Calculate horizontal overlap
-                            h_overlap = min(box1['right'], box2['right']) - max(box1['left'], box2['left'])
-                        
-                        # Calculate vertical distance and overlap
-                        if box1['bottom'] < box2['top']:
-                            dy = box2['top'] - box1['bottom']
-                            v_overlap = 0
-                        elif box2['bottom'] < box1['top']:
-                            dy = box1['top'] - box2['bottom']
-                            v_overlap = 0
-                        else:
-                            dy = 0
-                            # Calculate vertical overlap
-                            v_overlap = min(box1['bottom'], box2['bottom']) - max(box1['top'], box2['top'])
-                        
-                        # Calculate overlap area and ratio
-                        overlap_area = h_overlap * v_overlap if h_overlap > 0 and v_overlap > 0 else 0
-                        area1 = (box1['right'] - box1['left']) * (box1['bottom'] - box1['top'])
-                        area2 = (box2['right'] - box2['left']) * (box2['bottom'] - box2['top'])
-                        smaller_area = min(area1, area2)
-                        overlap_ratio = overlap_area / smaller_area if smaller_area > 0 else 0
-                        
-                        # Calculate center-to-center distance for ranking overlapping boxes
-                        center1_x = (box1['left'] + box1['right']) / 2
-                        center1_y = (box1['top'] + box1['bottom']) / 2
-                        center2_x = (box2['left'] + box2['right']) / 2
-                        center2_y = (box2['top'] + box2['bottom']) / 2
-                        center_distance = ((center1_x - center2_x) ** 2 + (center1_y - center2_y) ** 2) ** 0.5
-                        
-                        # If boxes overlap, use a combination of multiple factors
-                        if overlap_ratio > 0:
-                            # 1. Normalize center distance by the diagonal of the mapped box
-                            mapped_diag = ((mapped_box['right'] - mapped_box['left']) ** 2 + 
-                                         (mapped_box['bottom'] - mapped_box['top']) ** 2) ** 0.5
-                            norm_center_dist = center_distance / mapped_diag if mapped_diag > 0 else 0
-                            
-                            # 2. Calculate aspect ratio similarity (prefer boxes with similar aspect ratio to mapped box)
-                            mapped_ar = (mapped_box['right'] - mapped_box['left']) / max(1, (mapped_box['bottom'] - mapped_box['top']))
-                            box_ar = (box2['right'] - box2['left']) / max(1, (box2['bottom'] - box2['top']))
-                           
-                            
-                            # 3. Position within mapped area (prefer boxes closer to the center)
-                            mapped_center_x = (mapped_box['left'] + mapped_box['right']) / 2
-                            mapped_center_y = (mapped_box['top'] + mapped_box['bottom']) / 2
-                            box_center_x = (box2['left'] + box2['right']) / 2
-                            box_center_y = (box2['top'] + box2['bottom']) / 2
-                            
-                            # Normalize position difference (0 to 1, where 0 is at center)
-                            x_pos_ratio = abs(box_center_x - mapped_center_x) / max(1, (mapped_box['right'] - mapped_box['left']) / 2)
-                            y_pos_ratio = abs(box_center_y - mapped_center_y) / max(1, (mapped_box['bottom'] - mapped_box['top']) / 2)
-                            pos_score = 1 - ((x_pos_ratio + y_pos_ratio) / 2)  # 1 at center, decreasing towards edges
-                            
-                            # Combine all factors with weights
-                            overlap_weight = 0.7  
-                            center_dist_weight = 0.2
-                            pos_weight = 0.1  
-                            
-                            # Calculate score (higher is better)
-                            score = (overlap_ratio * overlap_weight) + \
-                                   ((1 - norm_center_dist) * center_dist_weight) + \
-                                   (pos_score * pos_weight)
-                            
-                            # Return score (higher is better) and overlap_ratio for reference
-                            return (score, overlap_ratio)
-                        
-                        # For non-overlapping boxes, use edge-to-edge distance
-                        return ((dx**2 + dy**2) ** 0.5, 0)
-                    
-                    candidates = []
-                    best_match = None
-                    
-                    # Create expanded mapped box for intersection test
-                    mapped_box = {
-                        'left': mapped_left,
-                        'top': mapped_top,
-                        'right': mapped_right,
-                        'bottom': mapped_bottom
-                    }
-                    
-                    for box in detected_boxes:
-                        text = box["text"].strip()
-                        is_valid = is_valid_invoice_number(text)
-                        
-                        # Create a copy of the box with explicit coordinates for clarity
-                        current_box = {
-                            'left': box['left'],
-                            'top': box['top'],
-                            'right': box['left'] + box['width'],
-                            'bottom': box['top'] + box['height']
-                        }
-                        
-                        # Check if boxes intersect
-                        if not boxes_intersect(mapped_box, current_box):
-                            continue
-                            
-                        # Calculate distance and overlap between boxes
-                        distance, overlap_ratio = calculate_box_distance(mapped_box, current_box)
-                        
-                        # Calculate box centers for reference
-                        mapped_center_x = (mapped_box['left'] + mapped_box['right']) / 2
-                        mapped_center_y = (mapped_box['top'] + mapped_box['bottom']) / 2
-                        box_center_x = (current_box['left'] + current_box['right']) / 2
-                        box_center_y = (current_box['top'] + current_box['bottom']) / 2
-                        
-                   
-                        
-                        if is_valid:
-                            candidates.append({
-                                'distance': distance,
-                                'overlap_ratio': overlap_ratio,
-                                'box': box,
-                                'text': text,
-                                'center_x': box_center_x,
-                                'center_y': box_center_y
-                            })
-                    
-                    # Sort candidates by score (descending - higher score is better)
-                    if candidates:
-                        candidates.sort(key=lambda x: -x['distance'])  # Negative for descending sort
-                        best_match = candidates[0]
-                        
-                     
-                        for i, cand in enumerate(candidates[:3], 1):
-                            overlap_info = f"{cand['overlap_ratio']*100:.1f}% overlap" if cand['overlap_ratio'] > 0 else "no overlap"
-                      
-                        
-                        # Only process best_match if we found valid candidates
-                        numfacture_value = best_match["text"].strip()
-                        numfacture_box = {
-                            "left": best_match["box"]["left"],
-                            "top": best_match["box"]["top"],
-                            "width": best_match["box"]["width"],
-                            "height": best_match["box"]["height"],
-                       
-                        }
-                        
-                        # Use the same expansion values for visualization as used in detection
-                        numfacture_search_area = {
-                            "left": mapped_left,
-                            "top": mapped_top,
-                            "width": mapped_right - mapped_left,
-                            "height": mapped_bottom - mapped_top,
-                            "type": "search_area"  # Add type to identify it in frontend
-                        }
-                        num_facture_time = time.time() - numFacture_extraction_start
-                     
-                    else:
-                        print("\n❌ No valid invoice number candidates found within search radius")
-        except Exception as e:
-            import traceback
-            print(f"Error extracting numFacture: {e}")
-            print(traceback.format_exc())
-        finally:
-            if 'cursor' in locals() and cursor:
-                cursor.close()
-            if 'connection' in locals() and connection and getattr(connection, 'is_connected', lambda: True)():
-                try:
-                    connection.close()
-                except Exception:
-                    pass
-
-        # -------------------------
-        # Date extraction (using box-based matching)
-        # -------------------------
-   
-        date_extraction_start = time.time()
-        datefacturation_value = None
-        datefacturation_box = None
-        try:
-            connection = get_connection()
-            cursor = connection.cursor(dictionary=True)
-            cursor.execute("SELECT id FROM field_name WHERE name = 'datefacturation'")
-            row = cursor.fetchone()
-            if row:
-                date_field_id = row['id']
-                cursor.execute("""
-                    SELECT `left`, `top`, `width`, `height`
-                    FROM Mappings
-                    WHERE template_id = %s AND field_id = %s
-                    LIMIT 1
-                """, (template_id, date_field_id))
-                mapping = cursor.fetchone()
-                if mapping:
-                    # Define expansion amounts (in pixels)
-                    expand_x = 20  # 20px horizontal expansion
-                    expand_y = 10   # 10px vertical expansion
-                    
-                    # Calculate expanded mapped box coordinates
-                    mapped_left = float(mapping['left']) - expand_x
-                    mapped_right = float(mapping['left']) + float(mapping['width']) + expand_x
-                    mapped_top = float(mapping['top']) - expand_y
-                    mapped_bottom = float(mapping['top']) + float(mapping['height']) + expand_y
-                    
-                    mapped_cx = float(mapping['left']) + float(mapping['width']) / 2
-                    mapped_cy = float(mapping['top']) + float(mapping['height']) / 2
-                    
-                  #  print(f"Mapped box (expanded): left={mapped_left:.1f}, top={mapped_top:.1f}, right={mapped_right:.1f}, bottom={mapped_bottom:.1f}")
-                    
-                    def parse_date_try(text):
-                        text = text.strip()
-                        # Skip if text is too short or doesn't contain digits
-                        if len(text) < 3 or not any(c.isdigit() for c in text):
-                            return None
-                            
-                        # For very short texts, ensure they look like dates (contain / or - or .)
-                        if len(text) < 5 and not any(sep in text for sep in ['/', '-', '.']):
-                            return None
-                            
-                        # Clean the text (keep only date-like patterns)
-                        clean_text = re.sub(r'[^0-9/\-\.\s]', ' ', text.lower())
-                        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
-                        
-                        # Use dateparser with more flexible settings
-                        settings = {
-                            'DATE_ORDER': 'DMY',
-                            'PREFER_DAY_OF_MONTH': 'first',
-                            'STRICT_PARSING': False,
-                            'REQUIRE_PARTS': ['month', 'year'],
-                            'PARSERS': ['relative-time', 'absolute-time', 'custom-formats', 'timestamp'],
-                            'PREFER_LOCALE_DATE_ORDER': True,
-                            'RELATIVE_BASE': datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
-                        }
-                        
-                        # Add common date formats to help with parsing
-                        custom_formats = [
-                            '%m/%Y',    # 3/2025
-                            '%m/%y',    # 3/25
-                            '%d/%m/%Y', # 01/03/2025
-                            '%d-%m-%Y', # 01-03-2025
-                            '%d.%m.%Y', # 01.03.2025
-                            '%Y/%m/%d', # 2025/03/01
-                            '%Y-%m-%d', # 2025-03-01
-                        ]
-                        
-                        # Try with custom formats first
-                        for fmt in custom_formats:
-                            try:
-                                dt = datetime.strptime(clean_text, fmt)
-                                if 1900 <= dt.year <= 2100 and 1 <= dt.month <= 12:
-                                    return dt.date()
-                            except ValueError:
-                                continue
-                        
-                        dt = dateparser.parse(clean_text, languages=['fr'], settings=settings)
-                        if dt:
-                            # Ensure the date is within reasonable bounds
-                            if 1900 <= dt.year <= 2100 and 1 <= dt.month <= 12:
-                                return dt.date()
-                        
-                        return None  # No valid date found
-                    
-                    def boxes_intersect(box1, box2):
-                        """Check if two boxes intersect or touch each other."""
-                        return not (box1['right'] < box2['left'] or 
-                                 box1['left'] > box2['right'] or 
-                                 box1['bottom'] < box2['top'] or 
-                                 box1['top'] > box2['bottom'])
-                    
-                    def calculate_box_distance(box1, box2):
-                        """Calculate distance between two boxes with overlap handling."""
-                        # Calculate horizontal and vertical overlap
-                        h_overlap = max(0, min(box1['right'], box2['right']) - max(box1['left'], box2['left']))
-                        v_overlap = max(0, min(box1['bottom'], box2['bottom']) - max(box1['top'], box2['top']))
-                        
-                        # Calculate overlap area and ratio
-                        overlap_area = h_overlap * v_overlap
-                        area1 = (box1['right'] - box1['left']) * (box1['bottom'] - box1['top'])
-                        area2 = (box2['right'] - box2['left']) * (box2['bottom'] - box2['top'])
-                        smaller_area = min(area1, area2)
-                        overlap_ratio = overlap_area / smaller_area if smaller_area > 0 else 0
-                        
-                        # Calculate center-to-center distance for ranking
-                        center1_x = (box1['left'] + box1['right']) / 2
-                        center1_y = (box1['top'] + box1['bottom']) / 2
-                        center2_x = (box2['left'] + box2['right']) / 2
-                        center2_y = (box2['top'] + box2['bottom']) / 2
-                        center_distance = math.sqrt((center1_x - center2_x) ** 2 + (center1_y - center2_y) ** 2)
-                        
-                        # If boxes overlap, use a combination of multiple factors
-                        if overlap_ratio > 0:
-                            # 1. Normalize center distance by the diagonal of the mapped box
-                            mapped_diag = math.sqrt((mapped_box['right'] - mapped_box['left']) ** 2 + 
-                                                 (mapped_box['bottom'] - mapped_box['top']) ** 2)
-                            norm_center_dist = center_distance / mapped_diag if mapped_diag > 0 else 0
-                            
-                            # 2. Calculate aspect ratio similarity
-                            mapped_ar = (mapped_box['right'] - mapped_box['left']) / max(1, (mapped_box['bottom'] - mapped_box['top']))
-                            box_ar = (box2['right'] - box2['left']) / max(1, (box2['bottom'] - box2['top']))
-                            ar_similarity = 1 - (abs(mapped_ar - box_ar) / max(mapped_ar, box_ar))
-                            
-                            # 3. Position within mapped area (prefer boxes closer to the center)
-                            mapped_center_x = (mapped_box['left'] + mapped_box['right']) / 2
-                            mapped_center_y = (mapped_box['top'] + mapped_box['bottom']) / 2
-                            box_center_x = (box2['left'] + box2['right']) / 2
-                            box_center_y = (box2['top'] + box2['bottom']) / 2
-                            
-                            # Normalize position difference (0 to 1, where 0 is at center)
-                            x_pos_ratio = abs(box_center_x - mapped_center_x) / max(1, (mapped_box['right'] - mapped_box['left']) / 2)
-                            y_pos_ratio = abs(box_center_y - mapped_center_y) / max(1, (mapped_box['bottom'] - mapped_box['top']) / 2)
-                            pos_score = 1 - ((x_pos_ratio + y_pos_ratio) / 2)  # 1 at center, decreasing towards edges
-                            
-                            # Combine all factors with weights
-                            overlap_weight = 2
-                            center_dist_weight = 0.2
-                            pos_weight = 0.1  
-                            
-                            # Calculate score (higher is better)
-                            score = (overlap_ratio * overlap_weight) + \
-                                   ((1 - norm_center_dist) * center_dist_weight) + \
-                                   (pos_score * pos_weight)
-                            
-                            return (score, overlap_ratio)
-                        
-                        # For non-overlapping boxes, use edge-to-edge distance (lower is better)
-                        dx = max(0, max(box1['left'], box2['left']) - min(box1['right'], box2['right']))
-                        dy = max(0, max(box1['top'], box2['top']) - min(box1['bottom'], box2['bottom']))
-                        distance = math.sqrt(dx**2 + dy**2)
-                        
-                        # Normalize distance by the diagonal of the mapped box
-                        mapped_diag = math.sqrt((mapped_box['right'] - mapped_box['left']) ** 2 + 
-                                             (mapped_box['bottom'] - mapped_box['top']) ** 2)
-                        normalized_distance = distance / mapped_diag if mapped_diag > 0 else 1.0
-                        
-                        # Convert to a score where higher is better
-                        score = 1.0 / (1.0 + normalized_distance)
-                        
-                        return (score, 0.0)
-                    
-                    # Create expanded mapped box for intersection test
-                    mapped_box = {
-                        'left': mapped_left,
-                        'top': mapped_top,
-                        'right': mapped_right,
-                        'bottom': mapped_bottom
-                    }
-                    
-                    candidates = []
-                    
-                    for box in detected_boxes:
-                        text = box["text"].strip()
-                        
-                        # Create a copy of the box with explicit coordinates for clarity
-                        current_box = {
-                            'left': box['left'],
-                            'top': box['top'],
-                            'right': box['left'] + box['width'],
-                            'bottom': box['top'] + box['height']
-                        }
-                        
-                        # Check if boxes intersect
-                        if not boxes_intersect(mapped_box, current_box):
-                            continue
-                            
-                        # Calculate distance and overlap between boxes
-                        score, overlap_ratio = calculate_box_distance(mapped_box, current_box)
-                        
-                        # Try to parse the date
-                        dt = parse_date_try(text)
-                        
-                        # Calculate box centers for reference
-                   
-                        box_center_x = (current_box['left'] + current_box['right']) / 2
-                        box_center_y = (current_box['top'] + current_box['bottom']) / 2
-                        
-                  
-                        candidates.append({
-                            'score': score,
-                            'overlap_ratio': overlap_ratio,
-                            'box': box,
-                            'text': text,
-                            'date': dt,
-                            'center_x': box_center_x,
-                            'center_y': box_center_y
-                        })
-                    
-                    # Sort candidates by score (descending - higher score is better)
-                    if candidates:
-                        candidates.sort(key=lambda x: -x['score'])
-                        
-                 
-                    
-                        best_match = candidates[0]
-                     
-                        
-                        datefacturation_value = best_match['date'].strftime('%Y-%m-%d')  # normalized output
-                        datefacturation_box = {
-                            "left": best_match["box"]["left"],
-                            "top": best_match["box"]["top"],
-                            "width": best_match["box"]["width"],
-                            "height": best_match["box"]["height"],
-                        }
-        except Exception as e:
-            print(f"\n=== ERROR in dateFacturation extraction ===")
-            print(f"Error type: {type(e).__name__}")
-            print(f"Error message: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            
+    Les fichiers (ou doc_ids) sont traités en parallèle sur le pool OCR. La réponse
+    contient un batch_id; les résultats sont lus au fil de l'eau avec
+    GET /extraction-batches/{batch_id}/events, ou directement dans la réponse avec
+    stream=ndjson|sse. Les doublons sont vérifiés une seule fois à la fin du lot.
+    """
+    # Requête validée avant de lire et stocker les fichiers: un lot refusé n'écrit rien dans le store
+    file_count = len(files or []) + len(doc_ids or [])
+    if not file_count:
+        raise HTTPException(status_code=400, detail="Aucun fichier à traiter")
+    if file_count > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Trop de fichiers (max {BATCH_MAX_FILES})")
+    if stream and stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format de flux non supporté: {stream}")
+    request_profile(profile)
+
+    documents = [await resolve_document(f, None, current_user["id"], store=True) for f in files or []]
+    documents += [await resolve_document(None, d, current_user["id"]) for d in doc_ids or []]
+
+    async def extract(document: DocumentInput) -> Dict[str, Any]:
+        result = await extract_document(document, template_id, profile_name=profile)
+        # Mêmes compléments que le frontend avant la vérification des doublons
+        data = result.get("data") or {}
+        if data.get("numFacture") and not data.get("numeroFacture"):
+            data["numeroFacture"] = data["numFacture"]
+        data["fournisseur"] = fournisseur or ""
+        return result
 
-            if 'cursor' in locals() and cursor:
-                try:
-                    print(f"Cursor has results: {cursor.with_rows}")
-                except:
-                    print("Could not check cursor status")
-        finally:
-            # Clean up resources
-            if 'cursor' in locals() and cursor:
-                try:
-                    # Consume any remaining results
-                    while cursor.nextset():
-                        pass
-                except Exception as e:
-                    print(f"Error consuming cursor results: {e}")
-                try:
-                    cursor.close()
-                except Exception as e:
-                    print(f"Error closing cursor: {e}")
-                    
-            if 'connection' in locals() and connection:
-                try:
-                    if getattr(connection, 'is_connected', lambda: False)():
-                        connection.close()
-                except Exception as e:
-                    print(f"Error closing connection: {e}")
-
-        # -------------------------
-        # Prepare response
-        # -------------------------
-      
-        result_data = {
-            "montantHT": ht_extracted,
-            "montantTVA": tva_extracted,
-            "montantTTC": ttc_extracted,
-            "tauxTVA": taux_tva,
-            "numFacture": numfacture_value,
-            "boxHT": {
-                "left": ht_match['value_box']['left'],
-                "top": ht_match['value_box']['top'],
-                "width": ht_match['value_box']['width'],
-                "height": ht_match['value_box']['height']
-            },
-            "boxTVA": {
-                "left": tva_match['value_box']['left'],
-                "top": tva_match['value_box']['top'],
-                "width": tva_match['value_box']['width'],
-                "height": tva_match['value_box']['height']
-            },
-            "boxNumFacture": numfacture_box,
-            "boxNumFactureSearchArea": numfacture_search_area,
-            "dateFacturation": datefacturation_value,
-            "boxDateFacturation": datefacturation_box,
-            "template_id": template_id,
-            # Debug info
-            "ht_match": {
-                "search_area": ht_match.get('search_area'),
-                "keyword_box": ht_match.get('keyword_box'),
-                "value_box": ht_match.get('value_box')
-            },
-            "tva_match": {
-                "search_area": tva_match.get('search_area'),
-                "keyword_box": tva_match.get('keyword_box'),
-                "value_box": tva_match.get('value_box')
-            }
-        }
+    items = [
+        {"index": i, "doc_id": document.doc_id, "filename": document.filename}
+        for i, document in enumerate(documents)
+    ]
+    batch = batch_manager.create(documents, items, extract, current_user["id"])
+    if stream:
+        return StreamingResponse(
+            batch.subscribe(stream),
+            media_type=STREAM_MEDIA_TYPES[stream],
+            headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+        )
+    return {"success": True, "batch_id": batch.batch_id, "total": len(items), "items": items}
 
-        return {
-            "success": True,
-            "data": result_data,
-            "message": "Extraction réussie"
-        }
 
+@app.post("/extraction-jobs")
+async def create_extraction_jobs(
+    files: List[UploadFile] = File(None),
+    doc_ids: List[str] = Form(None),
+    template_id: str = Form(None),
+    fournisseur: str = Form(None),
+    priority: int = Form(0),
+    current_user = Depends(require_comptable_or_admin),
+    db = Depends(get_async_db)
+):
+    """
+    Met en file des extractions durables (une par fichier), traitées par les workers
+
+    Les jobs survivent à la requête HTTP et aux redémarrages de l'API; voir
+    run_worker.py. Le résultat est lu avec GET /extraction-jobs/{job_id}.
+    """
+    documents = [await resolve_document(f, None, current_user["id"]) for f in files or []]
+    documents += [await resolve_document(None, d, current_user["id"]) for d in doc_ids or []]
+    if not documents:
+        raise HTTPException(status_code=400, detail="Aucun fichier à traiter")
+    if len(documents) > BATCH_MAX_FILES:
+        raise HTTPException(status_code=400, detail=f"Trop de fichiers (max {BATCH_MAX_FILES})")
+    try:
+        jobs = await enqueue_jobs(db, documents, template_id, fournisseur, priority, current_user["id"])
     except Exception as e:
-        import traceback
-        error_details = traceback.format_exc()
-        logging.error(f"Error in ocr_preview: {str(e)}\n{error_details}")
-        return {
-            "success": False,
-            "data": {"error": str(e), "traceback": error_details},
-            "message": f"Erreur lors de l'extraction: {str(e)}"
-        }
+        logging.error(f"Error enqueuing extraction jobs: {e}")
+        raise HTTPException(status_code=500, detail=f"Erreur lors de la création des jobs: {str(e)}")
+    return {"success": True, "jobs": [job.to_dict(include_result=False) for job in jobs]}
+
+
+@app.get("/extraction-jobs")
+async def list_extraction_jobs(
+    status: str = None,
+    limit: int = 100,
+    current_user = Depends(require_comptable_or_admin),
+    db = Depends(get_async_db)
+):
+    """Derniers jobs d'extraction de l'utilisateur (sans les résultats)"""
+    jobs = await ExtractionJobRepository(db).get_by_user(current_user["id"], status, min(max(limit, 1), 500))
+    return {"success": True, "jobs": [job.to_dict(include_result=False) for job in jobs]}
+
+
+@app.get("/extraction-jobs/stats")
+async def extraction_job_stats(
+    current_user = Depends(require_comptable_or_admin),
+    db = Depends(get_async_db)
+):
+    """Nombre de jobs par état (toute la file)"""
+    return {"success": True, "counts": await ExtractionJobRepository(db).count_by_status()}
+
+
+@app.get("/extraction-jobs/{job_id}")
+async def get_extraction_job(
+    job_id: int,
+    current_user = Depends(require_comptable_or_admin),
+    db = Depends(get_async_db)
+):
+    """État et résultat d'un job d'extraction"""
+    job = await ExtractionJobRepository(db).get_by_id(job_id)
+    if job is None or (job.created_by != current_user["id"] and current_user["role"] != "admin"):
+        raise HTTPException(status_code=404, detail="Job introuvable")
+    return {"success": True, "job": job.to_dict()}
+
+
+def _get_batch(batch_id: str, current_user) -> ExtractionBatch:
+    batch = batch_manager.get(batch_id)
+    if batch is None or (batch.user_id != current_user["id"] and current_user["role"] != "admin"):
+        raise HTTPException(status_code=404, detail="Lot introuvable ou expiré")
+    return batch
+
+
+@app.get("/extraction-batches/{batch_id}")
+async def get_extraction_batch(batch_id: str, current_user = Depends(require_comptable_or_admin)):
+    """État d'un lot et résultats déjà disponibles"""
+    batch = _get_batch(batch_id, current_user)
+    return {"success": True, **batch.summary(), "items": batch.items, "results": batch.results}
+
+
+@app.get("/extraction-batches/{batch_id}/events")
+async def stream_extraction_batch(
+    batch_id: str,
+    stream: str = "ndjson",
+    current_user = Depends(require_comptable_or_admin)
+):
+    """Résultats d'un lot en flux (NDJSON ou SSE): batch, result (un par fichier), duplicates, done"""
+    if stream not in STREAM_MEDIA_TYPES:
+        raise HTTPException(status_code=400, detail=f"Format de flux non supporté: {stream}")
+    batch = _get_batch(batch_id, current_user)
+    return StreamingResponse(
+        batch.subscribe(stream),
+        media_type=STREAM_MEDIA_TYPES[stream],
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
 
 
 class CheckDuplicateRequest(BaseModel):
@@ -0,0 +1,176 @@
+"""
+Admission control in front of the OCR endpoints
+
+At most OCR_MAX_IN_FLIGHT requests run OCR at the same time and at most
+OCR_MAX_WAITING wait for a slot. Beyond that, requests are rejected at once
+with a Retry-After estimated from the measured service time, instead of piling
+up page rasters in memory and pushing every request towards its timeout.
+
+Background work (extraction batches) takes its slots from the same budget
+through background_slot(): it is never rejected but holds at most
+OCR_BACKGROUND_SHARE of the slots, so a large batch cannot starve the
+interactive requests.
+"""
+import asyncio
+import math
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Dict, Optional
+
+from starlette.responses import JSONResponse
+
+from ocr.ocr_config import (
+    OCR_ADMISSION_TIMEOUT, OCR_BACKGROUND_SHARE, OCR_MAX_IN_FLIGHT, OCR_MAX_WAITING, OCR_SERVICE_TIME_INITIAL
+)
+
+# Poids de la dernière mesure dans la moyenne glissante du temps de service
+_SERVICE_TIME_ALPHA = 0.2
+
+
+class OcrOverloaded(Exception):
+    """Raised when an OCR request is not admitted"""
+
+    def __init__(self, retry_after: int, reason: str):
+        super().__init__(reason)
+        self.retry_after = retry_after
+        self.reason = reason
+
+
+def overloaded_response(exc: OcrOverloaded) -> JSONResponse:
+    """429 response of a request that was not admitted"""
+    return JSONResponse(
+        status_code=429,
+        content={"detail": f"{exc.reason}, veuillez réessayer dans {exc.retry_after} s"},
+        headers={"Retry-After": str(exc.retry_after)},
+    )
+
+
+class OcrAdmissionController:
+    """Bounded number of running and waiting OCR requests"""
+
+    def __init__(
+        self,
+        max_in_flight: int = OCR_MAX_IN_FLIGHT,
+        max_waiting: int = OCR_MAX_WAITING,
+        timeout: float = OCR_ADMISSION_TIMEOUT,
+        initial_service_time: float = OCR_SERVICE_TIME_INITIAL,
+        background_share: float = OCR_BACKGROUND_SHARE,
+    ):
+        self.max_in_flight = max(1, max_in_flight)
+        self.max_waiting = max(0, max_waiting)
+        self.timeout = timeout
+        self.service_time = initial_service_time
+        # Au moins un slot pour les lots, sinon ils ne progresseraient jamais
+        self.max_background = min(self.max_in_flight, max(1, math.floor(self.max_in_flight * background_share)))
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._background_semaphore: Optional[asyncio.Semaphore] = None
+        self._in_flight = 0
+        self._waiting = 0
+        self._background_in_flight = 0
+        self._background_waiting = 0
+        self._counters = {"admitted": 0, "rejected": 0, "timed_out": 0, "background_admitted": 0}
+
+    @property
+    def load(self) -> int:
+        """Requests running or waiting for a slot"""
+        return self._in_flight + self._waiting
+
+    def retry_after(self) -> int:
+        """Seconds until a new request would likely get a slot"""
+        rounds = (self._waiting + 1) / self.max_in_flight
+        return max(1, math.ceil(self.service_time * rounds))
+
+    def _record(self, elapsed: float) -> None:
+        self.service_time += _SERVICE_TIME_ALPHA * (elapsed - self.service_time)
+
+    def _semaphores(self) -> None:
+        # Créés dans la boucle d'événements qui les utilise
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.max_in_flight)
+            self._background_semaphore = asyncio.Semaphore(self.max_background)
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        """
+        Hold one OCR slot for the duration of the block
+
+        Raises:
+            OcrOverloaded: If the waiting queue is full or no slot frees up in time
+        """
+        self._semaphores()
+        # Compté avant tout await: une rafale de requêtes ne peut pas dépasser la limite
+        if self.load >= self.max_in_flight + self.max_waiting:
+            self._counters["rejected"] += 1
+            raise OcrOverloaded(self.retry_after(), "File d'attente OCR pleine")
+
+        self._waiting += 1
+        try:
+            await asyncio.wait_for(self._semaphore.acquire(), self.timeout)
+        except asyncio.TimeoutError:
+            self._counters["timed_out"] += 1
+            raise OcrOverloaded(self.retry_after(), "Délai d'attente OCR dépassé")
+        finally:
+            self._waiting -= 1
+
+        self._in_flight += 1
+        self._counters["admitted"] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._semaphore.release()
+            self._record(time.perf_counter() - started)
+
+    @asynccontextmanager
+    async def background_slot(self) -> AsyncIterator[None]:
+        """
+        Hold one OCR slot for background work for the duration of the block
+
+        Waits without limit (no 429) but at most max_background slots are held
+        by background work at a time; the others stay available to slot().
+        """
+        self._semaphores()
+        self._background_waiting += 1
+        try:
+            await self._background_semaphore.acquire()
+            try:
+                await self._semaphore.acquire()
+            except BaseException:
+                self._background_semaphore.release()
+                raise
+        finally:
+            self._background_waiting -= 1
+
+        self._in_flight += 1
+        self._background_in_flight += 1
+        self._counters["background_admitted"] += 1
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self._in_flight -= 1
+            self._background_in_flight -= 1
+            self._semaphore.release()
+            self._background_semaphore.release()
+            self._record(time.perf_counter() - started)
+
+    def stats(self) -> Dict[str, Any]:
+        """Current occupancy and counters"""
+        return {
+            **self._counters,
+            "in_flight": self._in_flight,
+            "waiting": self._waiting,
+            "max_in_flight": self.max_in_flight,
+            "max_waiting": self.max_waiting,
+            "background_in_flight": self._background_in_flight,
+            "background_waiting": self._background_waiting,
+            "max_background": self.max_background,
+            "saturated": self.load >= self.max_in_flight + self.max_waiting,
+            "service_time_avg": round(self.service_time, 3),
+            "retry_after": self.retry_after(),
+        }
+
+
+# Shared admission controller of the OCR endpoints
+ocr_admission = OcrAdmissionController()
@@ -0,0 +1,169 @@
+"""
+Micro-batching scheduler grouping concurrent OCR pages into one predict call
+"""
+import asyncio
+import logging
+from collections import Counter
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from PIL import Image
+
+from documents.document_config import PDF_RENDER_SCALE
+from ocr.ocr_config import OCR_BATCH_WINDOW_MS, OCR_MAX_BATCH_SIZE
+from ocr.ocr_pool import OcrWorkerPool, ocr_pool
+from ocr.ocr_profiles import OcrProfile, get_profile
+
+
+class OcrBatchScheduler:
+    """Collect pages arriving within a short window and submit them as one batch"""
+
+    def __init__(
+        self,
+        pool: OcrWorkerPool,
+        window_ms: float = OCR_BATCH_WINDOW_MS,
+        max_batch_size: int = OCR_MAX_BATCH_SIZE,
+        profile: Optional[OcrProfile] = None,
+    ):
+        self.pool = pool
+        # Seules les pages d'un même profil peuvent partager un predict
+        self.profile = profile or pool.profile
+        self.window = max(0.0, window_ms) / 1000.0
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: List[Tuple[np.ndarray, asyncio.Future]] = []
+        self._timer: Optional[asyncio.TimerHandle] = None
+        self._tasks = set()
+        # Statistics
+        self._batches = 0
+        self._pages = 0
+        self._fill_histogram = Counter()
+        self._last_fill = 0.0
+
+    async def predict(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """Awaitable equivalent of PaddleOCR.predict for a single image"""
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        self._pending.append((image, future))
+
+        if len(self._pending) >= self.max_batch_size or self.window == 0:
+            self._flush()
+        elif self._timer is None:
+            self._timer = loop.call_later(self.window, self._flush)
+
+        return [await future]
+
+    def _flush(self) -> None:
+        """Submit the pending pages (at most max_batch_size) as one batch"""
+        if self._timer is not None:
+            self._timer.cancel()
+            self._timer = None
+
+        # Ignorer les requêtes annulées pendant l'attente
+        self._pending = [(img, fut) for img, fut in self._pending if not fut.done()]
+        batch = self._pending[:self.max_batch_size]
+        self._pending = self._pending[self.max_batch_size:]
+
+        if batch:
+            self._record(len(batch))
+            task = asyncio.create_task(self._run(batch))
+            self._tasks.add(task)
+            task.add_done_callback(self._tasks.discard)
+            # Tous les appelants partis (clients déconnectés): retirer le batch de la file du pool
+            for _, future in batch:
+                future.add_done_callback(lambda _, batch=batch, task=task: self._drop_if_abandoned(batch, task))
+
+        if self._pending:
+            if len(self._pending) >= self.max_batch_size:
+                self._flush()
+            else:
+                self._timer = asyncio.get_running_loop().call_later(self.window, self._flush)
+
+    def _drop_if_abandoned(self, batch: List[Tuple[np.ndarray, asyncio.Future]], task: asyncio.Task) -> None:
+        if not task.done() and all(future.cancelled() for _, future in batch):
+            task.cancel()
+
+    async def _run(self, batch: List[Tuple[np.ndarray, asyncio.Future]]) -> None:
+        """Run one batched predict and fan the results back to the callers"""
+        try:
+            results = await self.pool.predict_batch([img for img, _ in batch], self.profile)
+        except Exception as e:
+            for _, future in batch:
+                if not future.done():
+                    future.set_exception(e)
+            return
+
+        for (_, future), result in zip(batch, results):
+            if not future.done():
+                future.set_result(result)
+
+    def _record(self, size: int) -> None:
+        self._batches += 1
+        self._pages += size
+        self._fill_histogram[size] += 1
+        self._last_fill = size / self.max_batch_size
+        logging.debug(f"OCR batch of {size}/{self.max_batch_size} page(s) ({self._last_fill:.0%} full)")
+
+    def stats(self) -> Dict[str, Any]:
+        """Batch fill statistics"""
+        return {
+            "profile": self.profile.name,
+            "window_ms": self.window * 1000.0,
+            "max_batch_size": self.max_batch_size,
+            "pending": len(self._pending),
+            "batches": self._batches,
+            "pages": self._pages,
+            "average_fill": (self._pages / (self._batches * self.max_batch_size)) if self._batches else 0.0,
+            "last_fill": self._last_fill,
+            "fill_histogram": {str(size): count for size, count in sorted(self._fill_histogram.items())},
+        }
+
+
+# Shared scheduler of the default profile in front of the OCR pool
+ocr_scheduler = OcrBatchScheduler(ocr_pool)
+_schedulers: Dict[str, OcrBatchScheduler] = {ocr_scheduler.profile.name: ocr_scheduler}
+
+
+def get_scheduler(profile: Optional[OcrProfile] = None) -> OcrBatchScheduler:
+    """Scheduler of a profile (created on first use, all share the OCR pool)"""
+    profile = profile or get_profile()
+    scheduler = _schedulers.get(profile.name)
+    if scheduler is None:
+        scheduler = OcrBatchScheduler(ocr_pool, profile=profile)
+        _schedulers[profile.name] = scheduler
+    return scheduler
+
+
+def scheduler_stats() -> Dict[str, Any]:
+    """Batch fill statistics of every profile used so far"""
+    return {name: scheduler.stats() for name, scheduler in _schedulers.items()}
+
+
+def _scale_result(res: Dict[str, Any], factor: float) -> Dict[str, Any]:
+    res = dict(res)
+    res['rec_polys'] = [
+        [[float(pt[0]) * factor, float(pt[1]) * factor] for pt in poly]
+        for poly in res.get('rec_polys', [])
+    ]
+    res['doc_preprocessor_res'] = {}
+    return res
+
+
+async def predict_with_profile(
+    image: np.ndarray, profile: Optional[OcrProfile] = None, page_scale: float = PDF_RENDER_SCALE
+) -> List[Dict[str, Any]]:
+    """
+    OCR one image with a profile, polygons returned in the coordinates of the given image
+
+    Profiles with a lower resolution than page_scale (scale of the page the
+    image comes from) OCR a downscaled copy of the image.
+    """
+    profile = profile or get_profile()
+    scale = profile.image_scale(page_scale)
+    if scale >= 1.0:
+        return await get_scheduler(profile).predict(image)
+    height, width = image.shape[:2]
+    size = (max(1, round(width * scale)), max(1, round(height * scale)))
+    small = np.asarray(Image.fromarray(image).resize(size, Image.Resampling.BILINEAR))
+    result = await get_scheduler(profile).predict(small)
+    return [_scale_result(res, 1.0 / scale) for res in result]
@@ -0,0 +1,241 @@
+"""
+Content-addressed OCR result cache (byte-bounded memory LRU + size-capped disk store)
+
+Pages are kept as OcrPage (ocr/ocr_page.py) in memory and as flat .ocrp files
+on disk, read back without parsing.
+
+The disk entries are indexed in memory (LRU order, sizes) from one walk of the
+cache directory; above the quota the least recently used files are removed down
+to OCR_CACHE_DISK_LOW_WATER of it. get_async / put_async serve memory hits
+directly and do the disk I/O in a thread, off the event loop.
+"""
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, List, Optional, Tuple
+
+from ocr.ocr_config import OCR_CACHE_DIR, OCR_CACHE_DISK_LOW_WATER, OCR_CACHE_DISK_MB, OCR_CACHE_MEMORY_MB
+from ocr.ocr_page import OcrPage, OcrPageError
+
+# Suffixe des entrées disque (format plat de OcrPage)
+DISK_SUFFIX = ".ocrp"
+
+
+def file_digest(content: bytes) -> str:
+    """sha256 of the uploaded file bytes"""
+    return hashlib.sha256(content).hexdigest()
+
+
+def make_cache_key(file_hash: str, page_index: int, render_scale: Any, params: Dict[str, Any]) -> str:
+    """Build the cache key from the file hash, page, render scale and OCR parameters"""
+    params_json = json.dumps(params, sort_keys=True, default=str)
+    raw = f"{file_hash}:{page_index}:{render_scale}:{params_json}"
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class OcrResultCache:
+    """Two-tier cache of OCR boxes keyed by make_cache_key()"""
+
+    def __init__(
+        self,
+        memory_bytes: int = int(OCR_CACHE_MEMORY_MB * 1024 * 1024),
+        disk_dir: Optional[str] = OCR_CACHE_DIR,
+        disk_bytes: int = int(OCR_CACHE_DISK_MB * 1024 * 1024),
+        disk_low_water: float = OCR_CACHE_DISK_LOW_WATER,
+    ):
+        self.memory_bytes = memory_bytes
+        self.disk_dir = disk_dir
+        self.disk_bytes = disk_bytes
+        self.disk_low_water = disk_low_water
+        self._memory: "OrderedDict[str, Tuple[OcrPage, int]]" = OrderedDict()
+        self._memory_used = 0
+        # Fichiers du cache disque, du moins au plus récemment utilisé (None: pas encore lu)
+        self._disk_index: "Optional[OrderedDict[str, int]]" = None
+        self._disk_used = 0
+        # Les accès disque se font depuis des threads
+        self._lock = threading.RLock()
+        self._counters = {
+            "memory_hits": 0,
+            "disk_hits": 0,
+            "misses": 0,
+            "memory_evictions": 0,
+            "disk_evictions": 0,
+        }
+
+    # -------------------------
+    # Memory tier
+    # -------------------------
+    def _memory_get(self, key: str) -> Optional[OcrPage]:
+        with self._lock:
+            entry = self._memory.get(key)
+            if entry is None:
+                return None
+            self._memory.move_to_end(key)
+            self._counters["memory_hits"] += 1
+            return entry[0]
+
+    def _memory_put(self, key: str, boxes: OcrPage, size: int) -> None:
+        with self._lock:
+            if size > self.memory_bytes:
+                return
+            if key in self._memory:
+                self._memory_used -= self._memory.pop(key)[1]
+            self._memory[key] = (boxes, size)
+            self._memory_used += size
+            while self._memory_used > self.memory_bytes and self._memory:
+                _, (_, evicted_size) = self._memory.popitem(last=False)
+                self._memory_used -= evicted_size
+                self._counters["memory_evictions"] += 1
+
+    # -------------------------
+    # Disk tier
+    # -------------------------
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.disk_dir, key[:2], f"{key}{DISK_SUFFIX}")
+
+    def _disk_entries(self) -> List[Tuple[float, int, str]]:
+        entries = []
+        for root, _, files in os.walk(self.disk_dir):
+            for name in files:
+                if not name.endswith(DISK_SUFFIX):
+                    continue
+                path = os.path.join(root, name)
+                try:
+                    st = os.stat(path)
+                except OSError:
+                    continue
+                entries.append((st.st_mtime, st.st_size, path))
+        return entries
+
+    def _index(self) -> "OrderedDict[str, int]":
+        """Index of the disk entries, built from one walk of the cache directory"""
+        with self._lock:
+            if self._disk_index is None:
+                self._disk_index = OrderedDict((path, size) for _, size, path in sorted(self._disk_entries()))
+                self._disk_used = sum(self._disk_index.values())
+            return self._disk_index
+
+    def _disk_read(self, path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                data = f.read()
+            os.utime(path)  # Marque l'entrée comme récemment utilisée (ordre LRU après redémarrage)
+        except FileNotFoundError:
+            return None
+        except OSError as e:
+            logging.warning(f"OCR cache read failed for {path}: {e}")
+            return None
+        with self._lock:
+            index = self._index()
+            if path in index:
+                index.move_to_end(path)
+        return data
+
+    def _disk_get(self, key: str) -> Optional[OcrPage]:
+        if not self.disk_dir:
+            return None
+        data = self._disk_read(self._disk_path(key))
+        if data is None:
+            return None
+        try:
+            return OcrPage.from_buffer(data)
+        except OcrPageError as e:
+            logging.warning(f"OCR cache entry {key} ignored: {e}")
+            return None
+
+    def _disk_put(self, key: str, data: bytes) -> None:
+        if not self.disk_dir or len(data) > self.disk_bytes:
+            return
+        path = self._disk_path(key)
+        try:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+            with open(tmp_path, "wb") as f:
+                f.write(data)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logging.warning(f"OCR cache write failed for {key}: {e}")
+            return
+        with self._lock:
+            index = self._index()
+            self._disk_used += len(data) - index.pop(path, 0)
+            index[path] = len(data)
+            if self._disk_used > self.disk_bytes:
+                self._disk_evict()
+
+    def _disk_evict(self) -> None:
+        """Remove the least recently used files down to the low-water mark of the quota"""
+        index = self._index()
+        target = self.disk_bytes * self.disk_low_water
+        while index and self._disk_used > target:
+            path, size = index.popitem(last=False)
+            self._disk_used -= size
+            try:
+                os.remove(path)
+                self._counters["disk_evictions"] += 1
+            except FileNotFoundError:
+                continue
+            except OSError as e:
+                logging.warning(f"OCR cache eviction failed for {path}: {e}")
+
+    def _load(self, key: str) -> Optional[OcrPage]:
+        """Disk lookup of a memory miss (blocking)"""
+        boxes = self._disk_get(key)
+        with self._lock:
+            if boxes is not None:
+                self._memory_put(key, boxes, boxes.nbytes)
+                self._counters["disk_hits"] += 1
+            else:
+                self._counters["misses"] += 1
+        return boxes
+
+    # -------------------------
+    # Public API
+    # -------------------------
+    def get(self, key: str) -> Optional[OcrPage]:
+        """Return the cached boxes for key, or None on a miss (blocking on a memory miss)"""
+        boxes = self._memory_get(key)
+        return boxes if boxes is not None else self._load(key)
+
+    def put(self, key: str, boxes: OcrPage) -> None:
+        """Store the boxes of a page in both tiers (blocking)"""
+        self._memory_put(key, boxes, boxes.nbytes)
+        self._disk_put(key, boxes.to_bytes())
+
+    async def get_async(self, key: str) -> Optional[OcrPage]:
+        """get() with the disk lookup run in a thread"""
+        boxes = self._memory_get(key)
+        if boxes is not None:
+            return boxes
+        if not self.disk_dir:
+            return self._load(key)
+        return await asyncio.to_thread(self._load, key)
+
+    async def put_async(self, key: str, boxes: OcrPage) -> None:
+        """put() with the disk write run in a thread"""
+        self._memory_put(key, boxes, boxes.nbytes)
+        if self.disk_dir:
+            await asyncio.to_thread(self._disk_put, key, boxes.to_bytes())
+
+    def stats(self) -> Dict[str, Any]:
+        """Hit/miss/eviction counters and tier occupancy"""
+        with self._lock:
+            lookups = self._counters["memory_hits"] + self._counters["disk_hits"] + self._counters["misses"]
+            hits = self._counters["memory_hits"] + self._counters["disk_hits"]
+            return {
+                **self._counters,
+                "hit_ratio": (hits / lookups) if lookups else 0.0,
+                "memory_entries": len(self._memory),
+                "memory_bytes": self._memory_used,
+                "memory_limit_bytes": self.memory_bytes,
+                "disk_bytes": self._disk_used if self.disk_dir and self._disk_index is not None else 0,
+                "disk_limit_bytes": self.disk_bytes,
+            }
+
+
+# Shared OCR result cache
+ocr_cache = OcrResultCache()
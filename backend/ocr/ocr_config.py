@@ -0,0 +1,66 @@
+import os
+
+# Paramètres du prédicteur PaddleOCR (identiques pour chaque worker)
+OCR_PARAMS = {
+    "lang": "fr",
+    "use_doc_orientation_classify": False,
+    "use_doc_unwarping": False,
+    "use_textline_orientation": False,
+    "text_det_input_shape": [3, 1440, 1440],
+    "precision": "fp32",
+    "enable_mkldnn": True,
+    "text_det_unclip_ratio": 1.3,
+    "text_rec_score_thresh": 0.8,
+}
+
+# Configuration du pool de workers OCR
+OCR_WORKERS = max(1, int(os.getenv("OCR_WORKERS", "2")))  # Nombre de processus PaddleOCR
+OCR_QUEUE_SIZE = max(1, int(os.getenv("OCR_QUEUE_SIZE", "32")))  # Taille max de la file de soumission
+# Threads CPU par worker (par défaut: cœurs disponibles répartis entre les workers)
+OCR_CPU_THREADS = int(os.getenv("OCR_CPU_THREADS", str(max(1, (os.cpu_count() or 1) // OCR_WORKERS))))
+
+# Micro-batching des requêtes OCR concurrentes
+OCR_BATCH_WINDOW_MS = float(os.getenv("OCR_BATCH_WINDOW_MS", "25"))  # Fenêtre de regroupement
+OCR_MAX_BATCH_SIZE = max(1, int(os.getenv("OCR_MAX_BATCH_SIZE", "4")))  # Pages max par predict
+
+# Cache des résultats OCR (mémoire LRU + disque)
+OCR_CACHE_MEMORY_MB = float(os.getenv("OCR_CACHE_MEMORY_MB", "64"))
+OCR_CACHE_DISK_MB = float(os.getenv("OCR_CACHE_DISK_MB", "512"))
+# Au-delà du quota, le cache disque est vidé jusqu'à cette fraction du quota
+OCR_CACHE_DISK_LOW_WATER = float(os.getenv("OCR_CACHE_DISK_LOW_WATER", "0.9"))
+OCR_CACHE_DIR = os.getenv(
+    "OCR_CACHE_DIR",
+    os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "cache", "ocr")
+)
+
+# Extraction directe de la couche texte des PDF numériques (sans OCR)
+OCR_TEXT_LAYER_ENABLED = os.getenv("OCR_TEXT_LAYER_ENABLED", "true").lower() == "true"
+OCR_TEXT_LAYER_MIN_WORDS = int(os.getenv("OCR_TEXT_LAYER_MIN_WORDS", "5"))  # Mots min pour une couche exploitable
+
+# OCR limité aux zones mappées du template (ROI)
+OCR_ROI_ENABLED = os.getenv("OCR_ROI_ENABLED", "true").lower() == "true"
+OCR_ROI_MARGIN_X = int(os.getenv("OCR_ROI_MARGIN_X", "60"))  # Contexte autour de chaque zone (px à PDF_RENDER_SCALE)
+OCR_ROI_MARGIN_Y = int(os.getenv("OCR_ROI_MARGIN_Y", "24"))
+
+# Contrôle d'admission des endpoints OCR (au-delà: 429 + Retry-After)
+OCR_MAX_IN_FLIGHT = max(1, int(os.getenv("OCR_MAX_IN_FLIGHT", str(OCR_WORKERS * OCR_MAX_BATCH_SIZE))))  # Requêtes OCR simultanées
+OCR_MAX_WAITING = max(0, int(os.getenv("OCR_MAX_WAITING", "16")))  # Requêtes en attente d'un slot
+OCR_ADMISSION_TIMEOUT = float(os.getenv("OCR_ADMISSION_TIMEOUT", "30"))  # Attente max d'un slot (s)
+OCR_SERVICE_TIME_INITIAL = float(os.getenv("OCR_SERVICE_TIME_INITIAL", "2.0"))  # Estimation avant la 1re mesure (s)
+OCR_BACKGROUND_SHARE = float(os.getenv("OCR_BACKGROUND_SHARE", "0.5"))  # Part des slots accessible aux lots
+
+# Abandon du travail OCR quand le client HTTP se déconnecte
+OCR_DISCONNECT_POLL = float(os.getenv("OCR_DISCONNECT_POLL", "0.25"))  # Vérification de la connexion (s)
+
+# Budget de temps de /ocr-preview (profil de repli: OCR_DEADLINE_FALLBACK_PROFILE, voir ocr_profiles.py)
+OCR_DEADLINE_MS = float(os.getenv("OCR_DEADLINE_MS", "15000"))  # Budget par défaut (0 = aucun)
+
+# Modèles embarqués (chargés hors ligne, sans téléchargement au démarrage)
+OCR_MODEL_DIR = os.getenv("OCR_MODEL_DIR", "")  # Répertoire du bundle (vide = cache PaddleX, téléchargement possible)
+OCR_MODEL_VERIFY = os.getenv("OCR_MODEL_VERIFY", "true").lower() == "true"  # Vérifie les sha256 du manifeste
+OCR_DETECTION_MODEL = os.getenv("OCR_DETECTION_MODEL", "PP-OCRv5_server_det")  # Détection sans modèle imposé par le profil
+OCR_RECOGNITION_MODEL = os.getenv("OCR_RECOGNITION_MODEL", "latin_PP-OCRv5_mobile_rec")  # Reconnaissance (lang=fr)
+
+# Inférence de chauffe au démarrage (GET /health/ready répond 503 tant qu'elle n'est pas finie)
+OCR_WARMUP_ENABLED = os.getenv("OCR_WARMUP_ENABLED", "true").lower() == "true"
+OCR_WARMUP_PROFILES = os.getenv("OCR_WARMUP_PROFILES", "")  # Profils chauffés (vide = profil par défaut, "all" = tous)
@@ -0,0 +1,86 @@
+"""
+Per-request time budget of the extraction OCR
+
+The pipeline measures how long each OCR stage of each profile takes (moving
+average, queueing included) and, given the time left before the deadline, skips
+the stages that would not fit: ROI OCR, then full-page OCR with the requested
+profile in favour of OCR_DEADLINE_FALLBACK_PROFILE. The stages skipped are
+reported in the response.
+"""
+import time
+from typing import Any, Dict, List
+
+# Étapes OCR dont la durée est mesurée, par profil ("roi:fast", "ocr:accurate", ...)
+STAGE_ROI = "roi"
+STAGE_OCR = "ocr"
+
+_STAGE_TIME_ALPHA = 0.2
+
+
+def stage_name(stage: str, profile_name: str) -> str:
+    return f"{stage}:{profile_name}"
+
+
+class StageTimes:
+    """Moving average of the duration of each OCR stage"""
+
+    def __init__(self):
+        self._averages: Dict[str, float] = {}
+        self._samples: Dict[str, int] = {}
+
+    def record(self, stage: str, elapsed: float) -> None:
+        average = self._averages.get(stage)
+        if average is None:
+            self._averages[stage] = elapsed
+        else:
+            self._averages[stage] = average + _STAGE_TIME_ALPHA * (elapsed - average)
+        self._samples[stage] = self._samples.get(stage, 0) + 1
+
+    def estimate(self, stage: str, default: float) -> float:
+        """Measured average, or default before the first measurement"""
+        return self._averages.get(stage, default)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            stage: {"average_ms": round(average * 1000.0, 1), "samples": self._samples[stage]}
+            for stage, average in sorted(self._averages.items())
+        }
+
+
+class OcrDeadline:
+    """Time budget of one extraction and the stages skipped to meet it"""
+
+    def __init__(self, budget_ms: float):
+        self.budget_ms = budget_ms
+        self.started = time.perf_counter()
+        self.expires_at = self.started + budget_ms / 1000.0
+        self.skipped: List[Dict[str, Any]] = []
+        self.degraded = False
+
+    def remaining(self) -> float:
+        """Seconds left before the deadline (negative once expired)"""
+        return self.expires_at - time.perf_counter()
+
+    def fits(self, stage: str, default: float) -> bool:
+        """True if the stage is expected to finish before the deadline"""
+        return stage_times.estimate(stage, default) <= self.remaining()
+
+    def skip(self, stage: str, default: float) -> None:
+        self.skipped.append({
+            "stage": stage,
+            "estimate_ms": round(stage_times.estimate(stage, default) * 1000.0, 1),
+            "remaining_ms": round(self.remaining() * 1000.0, 1),
+        })
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "budget_ms": self.budget_ms,
+            "elapsed_ms": round((time.perf_counter() - self.started) * 1000.0, 1),
+            "exceeded": self.remaining() < 0,
+            "degraded": self.degraded,
+            "skipped": self.skipped,
+        }
+
+
+# Durées mesurées, partagées par toutes les requêtes
+stage_times = StageTimes()
@@ -0,0 +1,50 @@
+"""
+Cancellation of OCR work whose HTTP client has disconnected
+
+The OCR call of a request runs in a task while the connection is polled with
+Request.is_disconnected(). When the client is gone the task is cancelled: its
+pages still waiting in the batcher or the pool queue are dropped, and the work
+stops at the next step instead of producing a response nobody reads.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Dict, TypeVar
+
+from starlette.requests import Request
+
+from ocr.ocr_config import OCR_DISCONNECT_POLL
+
+T = TypeVar("T")
+
+_counters = {"disconnected": 0}
+
+
+class ClientDisconnected(Exception):
+    """Raised when the client of a request disconnected during its OCR work"""
+
+
+async def run_unless_disconnected(request: Request, awaitable: Awaitable[T], poll: float = OCR_DISCONNECT_POLL) -> T:
+    """
+    Await an OCR computation, cancelling it if the client disconnects meanwhile
+
+    Raises:
+        ClientDisconnected: If the client disconnected before the result was ready
+    """
+    task = asyncio.ensure_future(awaitable)
+    try:
+        while True:
+            done, _ = await asyncio.wait({task}, timeout=poll)
+            if done:
+                return task.result()
+            if await request.is_disconnected():
+                _counters["disconnected"] += 1
+                logging.info(f"Client disconnected from {request.url.path}, OCR work cancelled")
+                raise ClientDisconnected()
+    finally:
+        if not task.done():
+            task.cancel()
+
+
+def stats() -> Dict[str, Any]:
+    """Number of requests whose OCR work was cancelled"""
+    return dict(_counters)
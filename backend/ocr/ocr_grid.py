@@ -0,0 +1,128 @@
+"""
+Uniform-grid spatial index over the OCR boxes of a page
+
+The page extent is cut into square cells sized for a few boxes each. Every box
+is registered in the cells it covers, stored cell by cell in one flat array
+(CSR layout), so the boxes of a row of cells are a single contiguous slice.
+A rectangle query only reads the cells it covers, then checks the candidates
+exactly: zone lookups no longer scan all the boxes of statements and long
+invoices. Built once per page from the OCR output.
+"""
+import math
+from typing import Any, Dict, Sequence, Tuple
+
+import numpy as np
+
+Rect = Tuple[float, float, float, float]
+
+# Nombre moyen visé de boîtes par cellule, et taille minimale d'une cellule (pixels)
+GRID_BOXES_PER_CELL = 4
+GRID_MIN_CELL = 8.0
+
+
+def box_rects(boxes: Sequence[Dict[str, Any]], dtype: Any = np.float64) -> np.ndarray:
+    """(N, 4) array of (left, top, right, bottom) from boxes with left/top/width/height"""
+    return np.array(
+        [(b['left'], b['top'], b['left'] + b['width'], b['top'] + b['height']) for b in boxes],
+        dtype=np.float64,
+    ).reshape(-1, 4).astype(dtype)
+
+
+class BoxGrid:
+    """Rectangle-intersection and nearest-box queries over (N, 4) box rectangles"""
+
+    def __init__(self, rects: np.ndarray):
+        self.rects = rects
+        count = len(rects)
+        if count:
+            self.origin = (float(rects[:, 0].min()), float(rects[:, 1].min()))
+            extent_w = max(float(rects[:, 2].max()) - self.origin[0], 1.0)
+            extent_h = max(float(rects[:, 3].max()) - self.origin[1], 1.0)
+        else:
+            self.origin, extent_w, extent_h = (0.0, 0.0), 1.0, 1.0
+        self.cell = max(GRID_MIN_CELL, math.sqrt(extent_w * extent_h * GRID_BOXES_PER_CELL / max(count, 1)))
+        self.columns = int(extent_w // self.cell) + 1
+        self.rows = int(extent_h // self.cell) + 1
+
+        # Plage de cellules couverte par chaque boîte
+        cx0, cy0, cx1, cy1 = self._cell_range(rects[:, 0], rects[:, 1], rects[:, 2], rects[:, 3])
+        span_x = cx1 - cx0 + 1
+        per_box = span_x * (cy1 - cy0 + 1)
+        box_ids = np.repeat(np.arange(count), per_box)
+        # Rang de chaque entrée dans les cellules de sa boîte
+        rank = np.arange(len(box_ids)) - np.repeat(np.cumsum(per_box) - per_box, per_box)
+        span_x = np.repeat(span_x, per_box)
+        cells = ((np.repeat(cy0, per_box) + rank // span_x) * self.columns
+                 + np.repeat(cx0, per_box) + rank % span_x)
+
+        order = np.argsort(cells, kind="stable")
+        self._ids = box_ids[order]
+        self._starts = np.searchsorted(cells[order], np.arange(self.columns * self.rows + 1))
+
+    def __len__(self) -> int:
+        return len(self.rects)
+
+    def _cell_range(self, left, top, right, bottom) -> Tuple[Any, Any, Any, Any]:
+        """Cell columns/rows covered by rectangles, clipped to the grid"""
+        def index(value, origin, limit):
+            return np.clip(np.floor((np.asarray(value, dtype=np.float64) - origin) / self.cell), 0, limit - 1).astype(np.int64)
+        return (index(left, self.origin[0], self.columns), index(top, self.origin[1], self.rows),
+                index(right, self.origin[0], self.columns), index(bottom, self.origin[1], self.rows))
+
+    def _cell_span(self, low: float, high: float, origin: float, limit: int) -> Tuple[int, int]:
+        """First and last cell (clipped) covered by [low, high] along one axis"""
+        first = min(max(math.floor((low - origin) / self.cell), 0), limit - 1)
+        last = min(max(math.floor((high - origin) / self.cell), 0), limit - 1)
+        return first, last
+
+    def query(self, rect: Rect) -> np.ndarray:
+        """
+        Indices (ascending) of the boxes touching or overlapping rect
+
+        Args:
+            rect: (left, top, right, bottom) in the coordinates of the boxes
+        """
+        if not len(self):
+            return np.empty(0, dtype=np.int64)
+        left, top, right, bottom = (self.rects.dtype.type(v) for v in rect)
+        cx0, cx1 = self._cell_span(float(left), float(right), self.origin[0], self.columns)
+        cy0, cy1 = self._cell_span(float(top), float(bottom), self.origin[1], self.rows)
+        if cx0 > cx1 or cy0 > cy1:
+            # Zone inversée (mapping mal enregistré): aucune boîte, comme le parcours linéaire
+            return np.empty(0, dtype=np.int64)
+        # Les cellules d'une ligne sont contiguës: une tranche par ligne
+        slices = [
+            self._ids[self._starts[row * self.columns + cx0]:self._starts[row * self.columns + cx1 + 1]]
+            for row in range(cy0, cy1 + 1)
+        ]
+        candidates = np.unique(np.concatenate(slices)) if len(slices) > 1 else np.unique(slices[0])
+        r = self.rects[candidates]
+        hit = (r[:, 2] >= left) & (r[:, 0] <= right) & (r[:, 3] >= top) & (r[:, 1] <= bottom)
+        return candidates[hit]
+
+    def distances(self, x: float, y: float, indices: np.ndarray) -> np.ndarray:
+        """Distance from (x, y) to the rectangles of indices (0 inside a box)"""
+        r = self.rects[indices]
+        dx = np.maximum(np.maximum(r[:, 0] - x, x - r[:, 2]), 0)
+        dy = np.maximum(np.maximum(r[:, 1] - y, y - r[:, 3]), 0)
+        return np.hypot(dx, dy)
+
+    def nearest(self, x: float, y: float, k: int = 1) -> np.ndarray:
+        """
+        Indices of the k boxes closest to the point (x, y), closest first
+
+        The search square doubles until it holds k boxes within its half-side:
+        any box closer than that radius touches the square.
+        """
+        k = min(k, len(self))
+        if k <= 0:
+            return np.empty(0, dtype=np.int64)
+        radius = self.cell / 2
+        while True:
+            candidates = self.query((x - radius, y - radius, x + radius, y + radius))
+            distances = self.distances(x, y, candidates)
+            inside = np.count_nonzero(distances <= radius)
+            if inside >= k or len(candidates) == len(self):
+                order = np.argsort(distances, kind="stable")[:k]
+                return candidates[order]
+            radius *= 2
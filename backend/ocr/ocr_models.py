@@ -0,0 +1,184 @@
+"""
+Offline PaddleOCR model bundle
+
+When OCR_MODEL_DIR is set, the predictors load their detection and recognition
+models from that directory instead of the PaddleX cache, and never contact the
+model hosts. The bundle holds one sub-directory per model and a manifest.json
+with the sha256 of every file, checked at startup:
+
+    models/
+    ├── manifest.json
+    ├── PP-OCRv5_server_det/
+    └── latin_PP-OCRv5_mobile_rec/
+
+Build it once (in the image, with network access):
+    python -m ocr.ocr_models build models/ [--profiles all]
+"""
+import argparse
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Optional
+
+from ocr.ocr_config import OCR_DETECTION_MODEL, OCR_MODEL_DIR, OCR_MODEL_VERIFY, OCR_RECOGNITION_MODEL
+from ocr.ocr_profiles import OCR_PROFILES, get_profile
+
+MANIFEST_NAME = "manifest.json"
+
+# Lu par PaddleX à l'import: pas de vérification de connectivité des sources de modèles
+OFFLINE_ENV = {"PADDLE_PDX_DISABLE_MODEL_SOURCE_CHECK": "True"}
+
+
+class ModelBundleError(Exception):
+    """Raised when the model bundle is missing, incomplete or corrupted"""
+
+
+def model_names(params: Dict[str, Any]) -> List[str]:
+    """Detection and recognition model names used by a set of PaddleOCR parameters"""
+    return [
+        params.get("text_detection_model_name") or OCR_DETECTION_MODEL,
+        params.get("text_recognition_model_name") or OCR_RECOGNITION_MODEL,
+    ]
+
+
+@lru_cache(maxsize=None)
+def load_manifest(bundle_dir: str = OCR_MODEL_DIR) -> Dict[str, Any]:
+    """
+    Manifest of a bundle: {"models": [...], "files": {relative path: sha256}}
+
+    Raises:
+        ModelBundleError: If the manifest is missing or unreadable
+    """
+    path = os.path.join(bundle_dir, MANIFEST_NAME)
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError) as e:
+        raise ModelBundleError(f"Manifeste des modèles OCR illisible ({path}): {e}")
+
+
+def bundle_params(params: Dict[str, Any], bundle_dir: str = OCR_MODEL_DIR) -> Dict[str, Any]:
+    """
+    PaddleOCR parameters loading the models from the bundle (unchanged without bundle)
+
+    Raises:
+        ModelBundleError: If a model used by params is not in the bundle
+    """
+    if not bundle_dir:
+        return params
+    available = set(load_manifest(bundle_dir).get("models", []))
+    det_model, rec_model = model_names(params)
+    missing = [name for name in (det_model, rec_model) if name not in available]
+    if missing:
+        raise ModelBundleError(f"Modèles absents du bundle {bundle_dir}: {', '.join(missing)}")
+    return {
+        **params,
+        "text_detection_model_name": det_model,
+        "text_detection_model_dir": os.path.join(bundle_dir, det_model),
+        "text_recognition_model_name": rec_model,
+        "text_recognition_model_dir": os.path.join(bundle_dir, rec_model),
+    }
+
+
+def _sha256(path: str) -> str:
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(1024 * 1024), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def verify_bundle(bundle_dir: str = OCR_MODEL_DIR, check: bool = OCR_MODEL_VERIFY) -> Dict[str, Any]:
+    """
+    Check every file of the manifest against its sha256 (blocking, run in a thread)
+
+    Args:
+        bundle_dir: Bundle directory
+        check: Compute the checksums (False: only read the manifest)
+
+    Returns:
+        Summary of the bundle (directory, models, files checked)
+
+    Raises:
+        ModelBundleError: If a file is missing or its checksum differs
+    """
+    manifest = load_manifest(bundle_dir)
+    files = manifest.get("files", {})
+    if check:
+        for relative_path, expected in files.items():
+            path = os.path.join(bundle_dir, relative_path)
+            if not os.path.isfile(path):
+                raise ModelBundleError(f"Fichier de modèle manquant: {relative_path}")
+            if _sha256(path) != expected:
+                raise ModelBundleError(f"Somme de contrôle invalide: {relative_path}")
+    return {
+        "dir": bundle_dir,
+        "models": manifest.get("models", []),
+        "files": len(files),
+        "verified": check,
+    }
+
+
+def build_bundle(bundle_dir: str, params_list: Iterable[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Download the models used by params_list and write them with their manifest to bundle_dir
+
+    The models are fetched by PaddleOCR itself into a temporary PaddleX cache,
+    then copied, so the bundle holds exactly what the predictors load.
+    """
+    cache_home = tempfile.mkdtemp(prefix="paddlex-")
+    os.environ["PADDLE_PDX_CACHE_HOME"] = cache_home  # Avant l'import de paddleocr
+    from paddleocr import PaddleOCR
+
+    names: List[str] = []
+    for params in params_list:
+        det_model, rec_model = model_names(params)
+        PaddleOCR(**{**params, "text_detection_model_name": det_model, "text_recognition_model_name": rec_model})
+        names.extend(name for name in (det_model, rec_model) if name not in names)
+
+    os.makedirs(bundle_dir, exist_ok=True)
+    files = {}
+    for name in names:
+        source = os.path.join(cache_home, "official_models", name)
+        target = os.path.join(bundle_dir, name)
+        if os.path.exists(target):
+            shutil.rmtree(target)
+        shutil.copytree(source, target)
+        for root, _, filenames in os.walk(target):
+            for filename in filenames:
+                path = os.path.join(root, filename)
+                files[os.path.relpath(path, bundle_dir).replace(os.sep, "/")] = _sha256(path)
+    shutil.rmtree(cache_home, ignore_errors=True)
+
+    manifest = {"models": names, "files": dict(sorted(files.items()))}
+    with open(os.path.join(bundle_dir, MANIFEST_NAME), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def main(argv: Optional[List[str]] = None) -> None:
+    parser = argparse.ArgumentParser(description="PaddleOCR model bundle")
+    sub = parser.add_subparsers(dest="command", required=True)
+    build = sub.add_parser("build", help="Download the models and write the bundle")
+    build.add_argument("dir")
+    build.add_argument("--profiles", default="all", help="Comma-separated profile names, or all")
+    verify = sub.add_parser("verify", help="Check the checksums of a bundle")
+    verify.add_argument("dir")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+    if args.command == "build":
+        names = list(OCR_PROFILES) if args.profiles == "all" else [n.strip() for n in args.profiles.split(",")]
+        manifest = build_bundle(args.dir, [get_profile(name).params for name in names])
+        logging.info(f"Bundle written to {args.dir}: {', '.join(manifest['models'])} ({len(manifest['files'])} files)")
+    else:
+        summary = verify_bundle(args.dir, check=True)
+        logging.info(f"Bundle {args.dir} OK: {', '.join(summary['models'])} ({summary['files']} files)")
+
+
+if __name__ == "__main__":
+    main()
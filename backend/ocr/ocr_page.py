@@ -0,0 +1,247 @@
+"""
+Columnar OCR boxes of one page (arrays plus a text blob)
+
+A page holds N boxes as:
+    bboxes   (N, 4) float32  left, top, right, bottom
+    scores   (N,)   float32
+    ids      (N,)   int32    index of the box in the OCR result
+    offsets  (N+1,) uint32   text i = blob[offsets[i]:offsets[i + 1]] (UTF-8)
+
+instead of one dict per box, so a page takes a few dozen bytes per box and the
+polygon -> bbox conversion is one NumPy reduction. It is stored as a flat file
+(16-byte header then the arrays and the blob) that can be read back without
+copy, from bytes or a memory map. Iterating a page still yields the historical
+box dicts (id, left, top, width, height, text, score).
+"""
+import mmap
+import os
+import struct
+from typing import Any, Dict, Iterator, List, Optional, Sequence
+
+import numpy as np
+
+FILE_MAGIC = b"OCRP"
+FILE_VERSION = 1
+# magic, version, réservé, nombre de boîtes, taille du texte
+_HEADER = struct.Struct("<4sHHII")
+
+
+class OcrPageError(ValueError):
+    """Raised when a serialized page is truncated or of an unknown format"""
+
+
+def _offsets(encoded: Sequence[bytes]) -> np.ndarray:
+    offsets = np.zeros(len(encoded) + 1, dtype=np.uint32)
+    np.cumsum([len(text) for text in encoded], out=offsets[1:])
+    return offsets
+
+
+class OcrPage:
+    """Boxes of one page in columnar form (arrays are read-only)"""
+
+    __slots__ = ("bboxes", "scores", "ids", "offsets", "blob")
+
+    def __init__(self, bboxes: np.ndarray, scores: np.ndarray, ids: np.ndarray, offsets: np.ndarray, blob: Any):
+        self.bboxes = bboxes
+        self.scores = scores
+        self.ids = ids
+        self.offsets = offsets
+        self.blob = blob
+        for array in (bboxes, scores, ids, offsets):
+            array.flags.writeable = False
+
+    # -------------------------
+    # Construction
+    # -------------------------
+    @classmethod
+    def empty(cls) -> "OcrPage":
+        return cls.from_arrays(np.empty((0, 4)), [], [], [])
+
+    @classmethod
+    def from_arrays(cls, bboxes: Any, scores: Sequence[float], ids: Sequence[int], texts: Sequence[str]) -> "OcrPage":
+        encoded = [text.encode("utf-8") for text in texts]
+        return cls(
+            np.ascontiguousarray(bboxes, dtype=np.float32).reshape(-1, 4),
+            np.asarray(scores, dtype=np.float32).reshape(-1),
+            np.asarray(ids, dtype=np.int32).reshape(-1),
+            _offsets(encoded),
+            b"".join(encoded),
+        )
+
+    @classmethod
+    def from_boxes(cls, boxes: Sequence[Dict[str, Any]]) -> "OcrPage":
+        """Page from box dicts (text layer, cache entries written before the columnar format)"""
+        bboxes = np.array(
+            [(b['left'], b['top'], b['left'] + b['width'], b['top'] + b['height']) for b in boxes],
+            dtype=np.float64,
+        )
+        return cls.from_arrays(
+            bboxes,
+            [b['score'] for b in boxes],
+            [b.get('id', i) for i, b in enumerate(boxes)],
+            [b['text'] for b in boxes],
+        )
+
+    @classmethod
+    def from_result(cls, result: List[Dict[str, Any]]) -> "OcrPage":
+        """Page from PaddleOCR results (rec_polys, rec_texts, rec_scores), empty texts dropped"""
+        bboxes, scores, ids, texts = [], [], [], []
+        for res in result:
+            rec_polys = res.get('rec_polys', [])
+            rec_texts = res.get('rec_texts', [])
+            rec_scores = res.get('rec_scores', [])
+            doc_pre_res = res.get('doc_preprocessor_res', {})
+            original_points = doc_pre_res.get('original_points') if isinstance(doc_pre_res, dict) else None
+            count = min(len(rec_polys), len(rec_texts), len(rec_scores))
+            keep = [
+                i for i in range(count)
+                if rec_scores[i] is not None and rec_texts[i] and rec_texts[i].strip()
+            ]
+            if not keep:
+                continue
+            if original_points:
+                polys = [original_points[i] if i < len(original_points) else rec_polys[i] for i in keep]
+            elif isinstance(rec_polys, np.ndarray):
+                polys = rec_polys[keep]
+            else:
+                polys = [rec_polys[i] for i in keep]
+            try:
+                # Polygones de même nombre de points: un seul tableau (K, P, 2)
+                points = np.asarray(polys, dtype=np.float64)
+                bboxes.append(np.concatenate([points.min(axis=1), points.max(axis=1)], axis=1))
+            except ValueError:
+                bboxes.append(np.array([
+                    np.concatenate([np.min(p, axis=0), np.max(p, axis=0)])
+                    for p in (np.asarray(poly, dtype=np.float64).reshape(-1, 2) for poly in polys)
+                ]))
+            scores.extend(float(rec_scores[i]) for i in keep)
+            ids.extend(keep)
+            texts.extend(str(rec_texts[i]).strip() for i in keep)
+        if not ids:
+            return cls.empty()
+        return cls.from_arrays(np.concatenate(bboxes), scores, ids, texts)
+
+    @classmethod
+    def concat(cls, pages: Sequence["OcrPage"]) -> "OcrPage":
+        """Pages joined in order, ids renumbered 0..N-1"""
+        pages = [page for page in pages if len(page)]
+        if not pages:
+            return cls.empty()
+        blobs = [bytes(page.blob) for page in pages]
+        starts = np.cumsum([0] + [len(blob) for blob in blobs[:-1]])
+        offsets = np.concatenate(
+            [pages[0].offsets[:1]] + [page.offsets[1:] + start for page, start in zip(pages, starts)]
+        ).astype(np.uint32)
+        count = sum(len(page) for page in pages)
+        return cls(
+            np.concatenate([page.bboxes for page in pages]),
+            np.concatenate([page.scores for page in pages]),
+            np.arange(count, dtype=np.int32),
+            offsets,
+            b"".join(blobs),
+        )
+
+    def translated(self, dx: float, dy: float) -> "OcrPage":
+        """Same boxes shifted by (dx, dy)"""
+        shift = np.array([dx, dy, dx, dy], dtype=np.float32)
+        return OcrPage(self.bboxes + shift, self.scores, self.ids, self.offsets, self.blob)
+
+    # -------------------------
+    # Access
+    # -------------------------
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    def text(self, i: int) -> str:
+        return bytes(self.blob[self.offsets[i]:self.offsets[i + 1]]).decode("utf-8")
+
+    def texts(self) -> List[str]:
+        return [self.text(i) for i in range(len(self))]
+
+    def box(self, i: int) -> Dict[str, Any]:
+        """Historical box dict of box i"""
+        left, top, right, bottom = (float(v) for v in self.bboxes[i])
+        return {
+            'id': int(self.ids[i]),
+            'left': left,
+            'top': top,
+            'width': right - left,
+            'height': bottom - top,
+            'text': self.text(i),
+            'score': float(self.scores[i]),
+        }
+
+    def __getitem__(self, i: int) -> Dict[str, Any]:
+        if not -len(self) <= i < len(self):
+            raise IndexError(i)
+        return self.box(i % len(self))
+
+    def __iter__(self) -> Iterator[Dict[str, Any]]:
+        return (self.box(i) for i in range(len(self)))
+
+    def to_boxes(self) -> List[Dict[str, Any]]:
+        return list(self)
+
+    @property
+    def nbytes(self) -> int:
+        return (self.bboxes.nbytes + self.scores.nbytes + self.ids.nbytes + self.offsets.nbytes
+                + len(self.blob) + _HEADER.size)
+
+    # -------------------------
+    # Flat file
+    # -------------------------
+    def to_bytes(self) -> bytes:
+        header = _HEADER.pack(FILE_MAGIC, FILE_VERSION, 0, len(self), len(self.blob))
+        return b"".join((
+            header,
+            self.bboxes.astype("<f4", copy=False).tobytes(),
+            self.scores.astype("<f4", copy=False).tobytes(),
+            self.ids.astype("<i4", copy=False).tobytes(),
+            self.offsets.astype("<u4", copy=False).tobytes(),
+            bytes(self.blob),
+        ))
+
+    @classmethod
+    def from_buffer(cls, buffer: Any) -> "OcrPage":
+        """
+        Page over a serialized buffer (bytes, memoryview, mmap), without copy
+
+        Raises:
+            OcrPageError: If the buffer is not a complete serialized page
+        """
+        if len(buffer) < _HEADER.size:
+            raise OcrPageError("Page OCR tronquée")
+        magic, version, _, count, blob_size = _HEADER.unpack_from(buffer, 0)
+        if magic != FILE_MAGIC or version != FILE_VERSION:
+            raise OcrPageError(f"Format de page OCR inconnu ({magic!r}, version {version})")
+        position = _HEADER.size
+        arrays = []
+        for dtype, shape in (("<f4", (count, 4)), ("<f4", (count,)), ("<i4", (count,)), ("<u4", (count + 1,))):
+            size = int(np.prod(shape))
+            if position + size * 4 > len(buffer):
+                raise OcrPageError("Page OCR tronquée")
+            arrays.append(np.frombuffer(buffer, dtype=dtype, count=size, offset=position).reshape(shape))
+            position += size * 4
+        if position + blob_size > len(buffer):
+            raise OcrPageError("Page OCR tronquée")
+        blob = memoryview(buffer)[position:position + blob_size]
+        return cls(*arrays, blob)
+
+    def save(self, path: str) -> None:
+        with open(path, "wb") as f:
+            f.write(self.to_bytes())
+
+    @classmethod
+    def load(cls, path: str, use_mmap: bool = False) -> "OcrPage":
+        """Read a saved page; with use_mmap the arrays are views of the mapped file"""
+        with open(path, "rb") as f:
+            if use_mmap and os.fstat(f.fileno()).st_size:
+                return cls.from_buffer(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ))
+            return cls.from_buffer(f.read())
+
+
+def as_page(boxes: Optional[Any]) -> Optional[OcrPage]:
+    """OcrPage from a page or box dicts (None stays None)"""
+    if boxes is None or isinstance(boxes, OcrPage):
+        return boxes
+    return OcrPage.from_boxes(boxes)
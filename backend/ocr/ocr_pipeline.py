@@ -0,0 +1,175 @@
+"""
+Shared OCR entry point used by the extraction endpoints
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from documents.document_config import PDF_RENDER_SCALE
+from ocr.ocr_batcher import predict_with_profile
+from ocr.ocr_cache import make_cache_key, ocr_cache
+from ocr.ocr_config import OCR_ROI_ENABLED, OCR_TEXT_LAYER_ENABLED
+from ocr.ocr_deadline import STAGE_OCR, STAGE_ROI, OcrDeadline, stage_name, stage_times
+from ocr.ocr_grid import BoxGrid
+from ocr.ocr_page import OcrPage, as_page
+from ocr.ocr_profiles import OcrProfile, fallback_profile, get_profile
+from ocr.ocr_roi import Rect, build_rois, ocr_regions, roi_signature
+from ocr.ocr_singleflight import ocr_singleflight
+
+
+# Path taken to obtain the boxes of a page (reported in the responses)
+PATH_TEXT_LAYER = "text_layer"
+PATH_OCR_CACHE = "ocr_cache"
+PATH_ROI = "roi"
+PATH_OCR = "ocr"
+PATH_OCR_DEGRADED = "ocr_degraded"
+
+
+def boxes_from_result(result: List[Dict[str, Any]]) -> OcrPage:
+    """Convert OCR results into the columnar boxes of the page (left/top/right/bottom, text, score)"""
+    return OcrPage.from_result(result)
+
+
+async def _roi_boxes(
+    image: np.ndarray,
+    zones: Dict[str, Rect],
+    file_hash: str,
+    page_index: int,
+    render_scale: Any,
+    profile: OcrProfile,
+    page_scale: float,
+) -> Tuple[Optional[OcrPage], bool]:
+    """
+    OCR the template zones only
+
+    Returns:
+        (boxes, from_cache), boxes being None when a field zone found no text
+    """
+    rois = build_rois(zones, image.shape[1], image.shape[0], page_scale=page_scale)
+    key = make_cache_key(
+        file_hash, page_index, render_scale, {**profile.cache_params(page_scale), "rois": roi_signature(rois)}
+    )
+    boxes = await ocr_cache.get_async(key)
+    if boxes is not None:
+        return boxes, True
+
+    started = time.perf_counter()
+    results = await ocr_regions(image, rois, profile, page_scale)
+    boxes = OcrPage.concat([boxes_from_result(result) for result in results])
+
+    stage_times.record(stage_name(STAGE_ROI, profile.name), time.perf_counter() - started)
+
+    grid = BoxGrid(boxes.bboxes)
+    empty_fields = [field for field, zone in zones.items() if not len(grid.query(zone))]
+    if empty_fields:
+        logging.info(f"ROI OCR found no text for {empty_fields}, falling back to full page")
+        return None, False
+
+    await ocr_cache.put_async(key, boxes)
+    return boxes, False
+
+
+async def _full_page_boxes(
+    image: np.ndarray, key: str, profile: OcrProfile, page_scale: float
+) -> OcrPage:
+    """OCR the whole page with a profile and cache the boxes"""
+    started = time.perf_counter()
+    result = await predict_with_profile(image, profile, page_scale)
+    stage_times.record(stage_name(STAGE_OCR, profile.name), time.perf_counter() - started)
+    boxes = boxes_from_result(result)
+    await ocr_cache.put_async(key, boxes)
+    return boxes
+
+
+async def get_page_boxes(
+    file_hash: str,
+    page_index: int,
+    render_scale: Any,
+    render_page: Callable[[], np.ndarray],
+    read_text_layer: Optional[Callable[[], Optional[List[Dict[str, Any]]]]] = None,
+    zones: Optional[Dict[str, Rect]] = None,
+    deadline: Optional[OcrDeadline] = None,
+    profile: Optional[OcrProfile] = None,
+    page_scale: float = PDF_RENDER_SCALE,
+) -> Tuple[OcrPage, str]:
+    """
+    Return the boxes of one page and the path used to obtain them
+
+    The PDF text layer is tried first, then the OCR cache. When the template
+    search zones are given, OCR runs on those zones only and falls back to the
+    full page if a zone finds no text. Concurrent calls for the same page share
+    one computation.
+
+    With a deadline, the stages expected to overrun it are skipped: ROI OCR,
+    then full-page OCR with the profile, replaced by the fallback profile.
+
+    Args:
+        file_hash: sha256 of the uploaded file bytes
+        page_index: Index of the page in the document
+        render_scale: Scale used to rasterize the page
+        render_page: Callable returning the page as an array (only called for OCR, in a thread)
+        read_text_layer: Callable returning the text-layer boxes, or None if unusable (called in a thread)
+        zones: Optional search rectangles per field, (left, top, right, bottom)
+        deadline: Optional time budget, updated with the stages skipped
+        profile: OCR profile (default: OCR_PROFILE)
+        page_scale: Render scale of the image returned by render_page (zones and boxes
+            are in its coordinates)
+
+    Returns:
+        (boxes, path) where boxes is an OcrPage (iterating it yields the box dicts) and
+        path one of PATH_TEXT_LAYER, PATH_OCR_CACHE, PATH_ROI, PATH_OCR, PATH_OCR_DEGRADED
+    """
+    if read_text_layer is not None and OCR_TEXT_LAYER_ENABLED:
+        boxes = as_page(await asyncio.to_thread(read_text_layer))
+        if boxes is not None:
+            return boxes, PATH_TEXT_LAYER
+
+    profile = profile or get_profile()
+    key = make_cache_key(file_hash, page_index, render_scale, profile.cache_params(page_scale))
+    boxes = await ocr_cache.get_async(key)
+    if boxes is not None:
+        return boxes, PATH_OCR_CACHE
+
+    # Rendu fait une seule fois, hors de la boucle d'événements, et seulement par l'appelant qui lance le calcul
+    rendered: List[np.ndarray] = []
+
+    async def page_image() -> np.ndarray:
+        if not rendered:
+            rendered.append(await asyncio.to_thread(render_page))
+        return rendered[0]
+
+    async def roi_boxes() -> Tuple[Optional[OcrPage], bool]:
+        return await _roi_boxes(await page_image(), zones, file_hash, page_index, render_scale, profile, page_scale)
+
+    async def full_page_boxes(cache_key: str, ocr_profile: OcrProfile) -> OcrPage:
+        return await _full_page_boxes(await page_image(), cache_key, ocr_profile, page_scale)
+
+    use_roi = bool(zones) and OCR_ROI_ENABLED
+    roi_stage, roi_default = stage_name(STAGE_ROI, profile.name), profile.expected_seconds / 3
+    if use_roi and deadline is not None and not deadline.fits(roi_stage, roi_default):
+        deadline.skip(roi_stage, roi_default)
+        use_roi = False
+    if use_roi:
+        # Même page, même profil et mêmes zones déjà en cours: attendre ce calcul
+        boxes, from_cache = await ocr_singleflight.run((key, tuple(sorted(zones.items()))), roi_boxes)
+        if boxes is not None:
+            return boxes, PATH_OCR_CACHE if from_cache else PATH_ROI
+
+    ocr_stage = stage_name(STAGE_OCR, profile.name)
+    fallback = fallback_profile()
+    if (deadline is not None and fallback.name != profile.name
+            and not deadline.fits(ocr_stage, profile.expected_seconds)):
+        deadline.skip(ocr_stage, profile.expected_seconds)
+        deadline.degraded = True
+        fallback_key = make_cache_key(file_hash, page_index, render_scale, fallback.cache_params(page_scale))
+        boxes = await ocr_cache.get_async(fallback_key)
+        if boxes is not None:
+            return boxes, PATH_OCR_CACHE
+        boxes = await ocr_singleflight.run(fallback_key, lambda: full_page_boxes(fallback_key, fallback))
+        return boxes, PATH_OCR_DEGRADED
+
+    boxes = await ocr_singleflight.run(key, lambda: full_page_boxes(key, profile))
+    return boxes, PATH_OCR
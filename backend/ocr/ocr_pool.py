@@ -0,0 +1,223 @@
+"""
+Process pool running PaddleOCR inference outside of the event loop
+"""
+import asyncio
+import logging
+import multiprocessing
+import os
+import threading
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+
+from ocr.ocr_config import OCR_CPU_THREADS, OCR_QUEUE_SIZE, OCR_WORKERS
+from ocr.ocr_models import OFFLINE_ENV, bundle_params
+from ocr.ocr_profiles import OcrProfile, get_profile
+
+
+# Predictors of the current worker process, one per profile (built on first use)
+_predictors: Dict[str, Any] = {}
+
+
+def _get_predictor(profile_name: str, params: Dict[str, Any]) -> Any:
+    predictor = _predictors.get(profile_name)
+    if predictor is None:
+        if "text_detection_model_dir" in params:
+            os.environ.update(OFFLINE_ENV)  # Modèles du bundle: aucun accès réseau
+        from paddleocr import PaddleOCR
+        predictor = PaddleOCR(**params)
+        _predictors[profile_name] = predictor
+    return predictor
+
+
+def _init_worker(profile_name: str, params: Dict[str, Any]) -> None:
+    """Build the predictor of the default profile once per worker process"""
+    _get_predictor(profile_name, params)
+
+
+def _plain(value: Any) -> Any:
+    """Convert numpy values to plain Python structures"""
+    if isinstance(value, np.ndarray):
+        return value.tolist()
+    if isinstance(value, (list, tuple)):
+        return [_plain(v) for v in value]
+    if isinstance(value, np.generic):
+        return value.item()
+    return value
+
+
+def _normalize_result(res: Any) -> Dict[str, Any]:
+    """Convert a PaddleOCR result into a picklable dict with the same keys"""
+    doc_pre_res = res.get('doc_preprocessor_res') or {}
+    normalized_pre_res = {}
+    if hasattr(doc_pre_res, 'get'):
+        if doc_pre_res.get('original_points') is not None:
+            normalized_pre_res['original_points'] = _plain(doc_pre_res.get('original_points'))
+        for key in ['doc_img', 'output_img', 'rot_img']:
+            if doc_pre_res.get(key) is not None:
+                normalized_pre_res[key] = np.asarray(doc_pre_res.get(key))
+                break
+
+    return {
+        'rec_polys': _plain(res.get('rec_polys', [])),
+        'rec_texts': [str(t) for t in res.get('rec_texts', [])],
+        'rec_scores': [None if s is None else float(s) for s in res.get('rec_scores', [])],
+        'doc_preprocessor_res': normalized_pre_res,
+    }
+
+
+def _run_predict(images: List[np.ndarray], profile_name: str, params: Dict[str, Any]) -> List[Dict[str, Any]]:
+    """Run one predict call in the worker with the predictor of a profile, one result per input image"""
+    predictor = _get_predictor(profile_name, params)
+    results = predictor.predict(images[0] if len(images) == 1 else images)
+    return [_normalize_result(res) for res in results]
+
+
+class OcrWorkerPool:
+    """Bounded async submission queue in front of PaddleOCR worker processes"""
+
+    def __init__(
+        self,
+        workers: int = OCR_WORKERS,
+        queue_size: int = OCR_QUEUE_SIZE,
+        profile: Optional[OcrProfile] = None,
+    ):
+        self.workers = max(1, workers)
+        self.queue_size = queue_size
+        self.profile = profile or get_profile()
+        self._profiles_used = {self.profile.name}
+        self._executor: Optional[ProcessPoolExecutor] = None
+        # Incrémentée à chaque remplacement de l'executor après un crash
+        self._generation = 0
+        self._restart_lock = threading.Lock()
+        self._queue: Optional[asyncio.Queue] = None
+        self._dispatchers: List[asyncio.Task] = []
+        self._running = 0
+        self._dropped = 0
+
+    def _create_executor(self) -> ProcessPoolExecutor:
+        # spawn: Paddle n'est pas fork-safe une fois initialisé
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.profile.name, self.predictor_params(self.profile)),
+        )
+
+    @staticmethod
+    def predictor_params(profile: OcrProfile) -> Dict[str, Any]:
+        """PaddleOCR constructor parameters of a profile in this pool (models of the bundle if any)"""
+        params = bundle_params(dict(profile.params))
+        params.setdefault("cpu_threads", OCR_CPU_THREADS)
+        return params
+
+    async def start(self) -> None:
+        """Start the worker processes and the dispatcher tasks"""
+        if self._executor is not None:
+            return
+        self._executor = self._create_executor()
+        self._queue = asyncio.Queue(maxsize=self.queue_size)
+        self._dispatchers = [
+            asyncio.create_task(self._dispatch()) for _ in range(self.workers)
+        ]
+        logging.info(f"OCR pool started with {self.workers} worker(s), queue size {self.queue_size}")
+
+    async def shutdown(self) -> None:
+        """Stop dispatchers and terminate the worker processes"""
+        for task in self._dispatchers:
+            task.cancel()
+        self._dispatchers = []
+        if self._executor is not None:
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = None
+        self._queue = None
+
+    def _restart_executor(self, generation: int) -> None:
+        """
+        Replace the executor of generation after a worker crash
+
+        Every dispatcher running on the broken executor sees the error: only the
+        first one replaces it, and the broken executor is shut down.
+        """
+        with self._restart_lock:
+            if generation != self._generation or self._executor is None:
+                return
+            broken, self._executor = self._executor, self._create_executor()
+            self._generation += 1
+        logging.error("OCR worker crashed, pool restarted")
+        broken.shutdown(wait=False, cancel_futures=True)
+
+    async def _dispatch(self) -> None:
+        """Feed queued jobs to the process pool, one job per worker at a time"""
+        loop = asyncio.get_running_loop()
+        while True:
+            images, profile, future = await self._queue.get()
+            try:
+                if future.done():
+                    self._dropped += 1  # Appelant annulé pendant l'attente: pas de predict
+                    continue
+                self._running += 1
+                generation = self._generation
+                try:
+                    results = await loop.run_in_executor(
+                        self._executor, _run_predict, images, profile.name, self.predictor_params(profile)
+                    )
+                finally:
+                    self._running -= 1
+                if not future.done():
+                    future.set_result(results)
+            except asyncio.CancelledError:
+                if not future.done():
+                    future.cancel()
+                raise
+            except BrokenProcessPool as e:
+                logging.error(f"OCR worker crashed: {e}")
+                self._restart_executor(generation)
+                if not future.done():
+                    future.set_exception(e)
+            except Exception as e:
+                if not future.done():
+                    future.set_exception(e)
+            finally:
+                self._queue.task_done()
+
+    async def predict_batch(
+        self, images: List[np.ndarray], profile: Optional[OcrProfile] = None
+    ) -> List[Dict[str, Any]]:
+        """
+        Run OCR on several images in one predict call, one result per image
+
+        Args:
+            images: Page (or crop) arrays
+            profile: Profile whose predictor runs the batch (default: the pool profile)
+        """
+        profile = profile or self.profile
+        self._profiles_used.add(profile.name)
+        if self._executor is None:
+            await self.start()
+        future = asyncio.get_running_loop().create_future()
+        # Bloque l'appelant quand la file est pleine (backpressure)
+        await self._queue.put((list(images), profile, future))
+        return await future
+
+    async def predict(self, image: np.ndarray) -> List[Dict[str, Any]]:
+        """Awaitable equivalent of PaddleOCR.predict for a single image"""
+        return await self.predict_batch([image])
+
+    def stats(self) -> Dict[str, Any]:
+        """Current pool occupancy"""
+        return {
+            "workers": self.workers,
+            "queue_size": self.queue_size,
+            "queued": self._queue.qsize() if self._queue is not None else 0,
+            "running": self._running,
+            "dropped": self._dropped,
+            "default_profile": self.profile.name,
+            "profiles_used": sorted(self._profiles_used),
+        }
+
+
+# Shared pool used by every OCR call site
+ocr_pool = OcrWorkerPool()
@@ -0,0 +1,106 @@
+"""
+Named OCR performance profiles (fast / balanced / accurate)
+
+A profile sets the resolution of the image given to the OCR, the detection
+input size, the detection model variant (mobile or server) and the thresholds.
+Each worker process builds the predictor of a profile the first time it is
+used, so unused profiles cost nothing. The profile is chosen per request
+(`profile` form field), per template (templates.ocr_profile) or by OCR_PROFILE.
+
+Boxes are returned in the coordinates of the page image given to the OCR.
+A page rendered at PDF_RENDER_SCALE is downscaled for profiles with a lower
+render scale; the extraction renders directly at the profile scale and scales
+the (normalized) template zones to it.
+"""
+import os
+from typing import Any, Dict, NamedTuple, Optional
+
+from documents.document_config import PDF_RENDER_SCALE
+from ocr.ocr_config import OCR_PARAMS
+
+
+class OcrProfile(NamedTuple):
+    """Settings of one OCR profile"""
+    name: str
+    # Résolution de l'image OCR (PDF_RENDER_SCALE = image standardisée, plus petit = réduite)
+    render_scale: float
+    # Paramètres du constructeur PaddleOCR
+    params: Dict[str, Any]
+    # Durée d'un OCR pleine page supposée avant la première mesure (s)
+    expected_seconds: float
+    description: str
+
+    def image_scale(self, page_scale: float = PDF_RENDER_SCALE) -> float:
+        """Factor applied before OCR to a page image rendered at page_scale"""
+        return min(1.0, self.render_scale / page_scale)
+
+    def cache_params(self, page_scale: float = PDF_RENDER_SCALE) -> Dict[str, Any]:
+        """Parameters identifying the results of this profile in the OCR cache"""
+        scale = self.image_scale(page_scale)
+        if scale == 1.0:
+            return self.params
+        return {**self.params, "ocr_scale": scale}
+
+
+def _variant_params(det_model: str, det_size: int, rec_thresh: float) -> Dict[str, Any]:
+    return {
+        **OCR_PARAMS,
+        "text_detection_model_name": det_model,
+        "text_det_input_shape": [3, det_size, det_size],
+        "text_det_limit_side_len": det_size,
+        "text_det_limit_type": "max",
+        "text_rec_score_thresh": rec_thresh,
+    }
+
+
+OCR_PROFILES: Dict[str, OcrProfile] = {
+    "fast": OcrProfile(
+        name="fast",
+        render_scale=1.5,
+        params=_variant_params("PP-OCRv5_mobile_det", 960, 0.7),
+        expected_seconds=1.0,
+        description="Détection mobile 960 px sur image réduite: scans propres, PDF simples",
+    ),
+    "balanced": OcrProfile(
+        name="balanced",
+        render_scale=PDF_RENDER_SCALE,
+        params=_variant_params("PP-OCRv5_server_det", 1152, 0.8),
+        expected_seconds=2.0,
+        description="Détection serveur 1152 px sur l'image standardisée",
+    ),
+    # Réglages historiques: mêmes clés de cache que les résultats déjà calculés
+    "accurate": OcrProfile(
+        name="accurate",
+        render_scale=PDF_RENDER_SCALE,
+        params=dict(OCR_PARAMS),
+        expected_seconds=3.0,
+        description="Paramètres d'origine (détection 1440 px, fp32)",
+    ),
+}
+
+OCR_PROFILE = os.getenv("OCR_PROFILE", "accurate")  # Profil par défaut
+OCR_DEADLINE_FALLBACK_PROFILE = os.getenv("OCR_DEADLINE_FALLBACK_PROFILE", "fast")  # Profil quand le budget est trop court
+
+if OCR_PROFILE not in OCR_PROFILES:
+    raise ValueError(f"OCR_PROFILE inconnu: {OCR_PROFILE} (profils: {', '.join(OCR_PROFILES)})")
+if OCR_DEADLINE_FALLBACK_PROFILE not in OCR_PROFILES:
+    raise ValueError(f"OCR_DEADLINE_FALLBACK_PROFILE inconnu: {OCR_DEADLINE_FALLBACK_PROFILE}")
+
+
+def get_profile(name: Optional[str] = None) -> OcrProfile:
+    """
+    Profile by name, the default profile when name is empty
+
+    Raises:
+        ValueError: If the profile does not exist
+    """
+    if not name:
+        return OCR_PROFILES[OCR_PROFILE]
+    profile = OCR_PROFILES.get(name)
+    if profile is None:
+        raise ValueError(f"Profil OCR inconnu: {name} (profils: {', '.join(OCR_PROFILES)})")
+    return profile
+
+
+def fallback_profile() -> OcrProfile:
+    return OCR_PROFILES[OCR_DEADLINE_FALLBACK_PROFILE]
@@ -0,0 +1,108 @@
+"""
+Region-of-interest OCR: run OCR on the mapped template zones only
+"""
+import asyncio
+from typing import Any, Dict, List, Optional, Tuple
+
+import numpy as np
+
+from documents.document_config import PDF_RENDER_SCALE
+from ocr.ocr_batcher import predict_with_profile
+from ocr.ocr_config import OCR_ROI_MARGIN_X, OCR_ROI_MARGIN_Y
+from ocr.ocr_profiles import OcrProfile
+
+# (left, top, right, bottom) in standardized image pixels
+Rect = Tuple[float, float, float, float]
+
+
+def _overlaps(a: Rect, b: Rect) -> bool:
+    return not (a[2] < b[0] or a[0] > b[2] or a[3] < b[1] or a[1] > b[3])
+
+
+def build_rois(
+    zones: Dict[str, Rect],
+    width: int,
+    height: int,
+    margin_x: float = OCR_ROI_MARGIN_X,
+    margin_y: float = OCR_ROI_MARGIN_Y,
+    page_scale: float = PDF_RENDER_SCALE,
+) -> List[Tuple[int, int, int, int]]:
+    """
+    Turn the field search zones into integer crop rectangles
+
+    Each zone is enlarged by a margin (so that text crossing the zone border is
+    not truncated), clamped to the image, and overlapping crops are merged so
+    that no text is recognized twice. The margins are pixels at PDF_RENDER_SCALE:
+    they are scaled to page_scale, so every profile crops the same page area.
+    """
+    margin_x = margin_x * page_scale / PDF_RENDER_SCALE
+    margin_y = margin_y * page_scale / PDF_RENDER_SCALE
+    rects = []
+    for left, top, right, bottom in zones.values():
+        rects.append((
+            max(0.0, left - margin_x),
+            max(0.0, top - margin_y),
+            min(float(width), right + margin_x),
+            min(float(height), bottom + margin_y),
+        ))
+
+    merged: List[Rect] = []
+    for rect in rects:
+        if rect[2] <= rect[0] or rect[3] <= rect[1]:
+            continue
+        # Fusionner avec toutes les zones qui se chevauchent (transitivement)
+        while True:
+            overlapping = [m for m in merged if _overlaps(m, rect)]
+            if not overlapping:
+                break
+            for m in overlapping:
+                merged.remove(m)
+            rect = (
+                min([rect[0]] + [m[0] for m in overlapping]),
+                min([rect[1]] + [m[1] for m in overlapping]),
+                max([rect[2]] + [m[2] for m in overlapping]),
+                max([rect[3]] + [m[3] for m in overlapping]),
+            )
+        merged.append(rect)
+
+    return [(int(l), int(t), int(np.ceil(r)), int(np.ceil(b))) for l, t, r, b in merged]
+
+
+def _translated_polys(polys: Any, dx: float, dy: float) -> Any:
+    """Polygons shifted by (dx, dy): one (K, P, 2) array when they all have P points"""
+    if not len(polys):
+        return []
+    try:
+        return np.asarray(polys, dtype=np.float64) + (dx, dy)
+    except ValueError:
+        return [np.asarray(poly, dtype=np.float64).reshape(-1, 2) + (dx, dy) for poly in polys]
+
+
+async def ocr_regions(
+    image: np.ndarray,
+    rois: List[Tuple[int, int, int, int]],
+    profile: Optional[OcrProfile] = None,
+    page_scale: float = PDF_RENDER_SCALE,
+) -> List[List[Dict[str, Any]]]:
+    """
+    OCR each crop (submitted together so they share a batch) and return the
+    raw results with polygons translated back to page coordinates
+    """
+    crops = [np.ascontiguousarray(image[top:bottom, left:right]) for left, top, right, bottom in rois]
+    results = await asyncio.gather(*(predict_with_profile(crop, profile, page_scale) for crop in crops))
+
+    translated = []
+    for (left, top, _, _), result in zip(rois, results):
+        page_result = []
+        for res in result:
+            res = dict(res)
+            res['rec_polys'] = _translated_polys(res.get('rec_polys', []), left, top)
+            res['doc_preprocessor_res'] = {}
+            page_result.append(res)
+        translated.append(page_result)
+    return translated
+
+
+def roi_signature(rois: Optional[List[Tuple[int, int, int, int]]]) -> Optional[List[List[int]]]:
+    """JSON-friendly representation of the crops, used in the cache key"""
+    return [list(r) for r in rois] if rois else None
@@ -0,0 +1,73 @@
+"""
+Single-flight coalescing of identical in-flight OCR computations
+
+When the same page of the same file is requested again while its OCR is still
+running (double click, re-upload, prefetch racing the extraction), the second
+caller awaits the first computation instead of starting another predict call.
+"""
+import asyncio
+import logging
+from typing import Any, Awaitable, Callable, Dict, Hashable, TypeVar
+
+T = TypeVar("T")
+
+
+class _Flight:
+    """One running computation and the number of callers awaiting it"""
+
+    def __init__(self, task: asyncio.Task):
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """Run at most one computation per key at a time"""
+
+    def __init__(self):
+        self._flights: Dict[Hashable, _Flight] = {}
+        self._counters = {"leaders": 0, "coalesced": 0, "abandoned": 0}
+
+    def _forget(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    async def run(self, key: Hashable, compute: Callable[[], Awaitable[T]]) -> T:
+        """
+        Return the result of compute(), shared with concurrent callers of the same key
+
+        The computation runs in its own task: a caller that is cancelled does not
+        cancel it for the others. It is only cancelled when every caller is gone.
+        """
+        flight = self._flights.get(key)
+        if flight is None:
+            flight = _Flight(asyncio.ensure_future(compute()))
+            self._flights[key] = flight
+            flight.task.add_done_callback(lambda _: self._forget(key, flight))
+            self._counters["leaders"] += 1
+        else:
+            self._counters["coalesced"] += 1
+            logging.debug(f"OCR computation coalesced with an in-flight one ({flight.waiters} waiting)")
+
+        flight.waiters += 1
+        try:
+            return await asyncio.shield(flight.task)
+        finally:
+            flight.waiters -= 1
+            if flight.waiters == 0 and not flight.task.done():
+                # Plus personne n'attend ce résultat
+                flight.task.cancel()
+                self._forget(key, flight)
+                self._counters["abandoned"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Coalescing counters"""
+        total = self._counters["leaders"] + self._counters["coalesced"]
+        return {
+            **self._counters,
+            "in_flight": len(self._flights),
+            "coalesced_ratio": (self._counters["coalesced"] / total) if total else 0.0,
+        }
+
+
+# Shared single-flight group of the OCR pipeline
+ocr_singleflight = SingleFlight()
@@ -0,0 +1,136 @@
+"""
+Text-layer fast path: word boxes read from born-digital PDFs instead of OCR
+"""
+import logging
+from typing import Any, Dict, List, Optional, Tuple
+
+import pymupdf as fitz
+
+from documents.document_render import fit_size
+from ocr.ocr_config import OCR_TEXT_LAYER_MIN_WORDS
+
+# Max horizontal gap (relative to the line height) between two words of a same segment.
+# PaddleOCR returns line segments rather than words, so words are merged the same way.
+WORD_GAP_RATIO = 0.8
+
+
+def standardized_transform(
+    page_width: float,
+    page_height: float,
+    render_scale: float,
+    target_width: int,
+    target_height: int,
+) -> Tuple[float, float, float, float]:
+    """
+    Mapping from PDF points to the standardized image space
+
+    Mirrors the standardized rendering of documents.document_render.
+
+    Returns:
+        (scale_x, scale_y, offset_x, offset_y)
+    """
+    new_width, new_height = fit_size(page_width * render_scale, page_height * render_scale, target_width, target_height)
+    offset_x = (target_width - new_width) // 2
+    offset_y = (target_height - new_height) // 2
+    return new_width / page_width, new_height / page_height, float(offset_x), float(offset_y)
+
+
+def _is_usable(words: List[Tuple]) -> bool:
+    """A text layer is usable if it has enough real words and no broken encoding"""
+    texts = [w[4] for w in words]
+    meaningful = [t for t in texts if any(c.isalnum() for c in t)]
+    if len(meaningful) < OCR_TEXT_LAYER_MIN_WORDS:
+        return False
+    # Polices sans table ToUnicode: caractères de remplacement ou de contrôle
+    all_chars = "".join(texts)
+    broken = sum(1 for c in all_chars if c == "�" or (ord(c) < 32 and c not in "\t\n"))
+    return broken <= 0.1 * max(1, len(all_chars))
+
+
+def _group_words(words: List[Tuple]) -> List[Dict[str, Any]]:
+    """Merge consecutive words of the same line into OCR-like segments"""
+    segments = []
+    current = None
+    for x0, y0, x1, y1, text, block_no, line_no, _ in words:
+        line_height = y1 - y0
+        if (
+            current is not None
+            and current["line"] == (block_no, line_no)
+            and x0 - current["x1"] <= WORD_GAP_RATIO * max(line_height, current["y1"] - current["y0"])
+        ):
+            current["x1"] = max(current["x1"], x1)
+            current["y0"] = min(current["y0"], y0)
+            current["y1"] = max(current["y1"], y1)
+            current["text"] += " " + text
+            continue
+        current = {"line": (block_no, line_no), "x0": x0, "y0": y0, "x1": x1, "y1": y1, "text": text}
+        segments.append(current)
+    return segments
+
+
+def extract_text_layer_boxes(
+    page: "fitz.Page",
+    render_scale: float,
+    target_width: int,
+    target_height: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """
+    Read word boxes from the page text layer in standardized image coordinates
+
+    Returns:
+        Boxes with the same keys as the OCR boxes, or None if the page has no usable text layer
+    """
+    words = page.get_text("words")
+    if not words or not _is_usable(words):
+        return None
+
+    if page.rotation:
+        # Les coordonnées du texte sont exprimées dans la page non pivotée
+        rotated = []
+        for w in words:
+            rect = fitz.Rect(w[:4]) * page.rotation_matrix
+            rotated.append((rect.x0, rect.y0, rect.x1, rect.y1) + tuple(w[4:]))
+        words = rotated
+
+    scale_x, scale_y, offset_x, offset_y = standardized_transform(
+        page.rect.width, page.rect.height, render_scale, target_width, target_height
+    )
+
+    boxes = []
+    for i, seg in enumerate(_group_words(words)):
+        text = seg["text"].strip()
+        if not text:
+            continue
+        left = seg["x0"] * scale_x + offset_x
+        top = seg["y0"] * scale_y + offset_y
+        boxes.append({
+            'id': i,
+            'left': left,
+            'top': top,
+            'width': (seg["x1"] - seg["x0"]) * scale_x,
+            'height': (seg["y1"] - seg["y0"]) * scale_y,
+            'text': text,
+            'score': 1.0
+        })
+    return boxes
+
+
+def pdf_text_layer_boxes(
+    file_content: bytes,
+    page_index: int,
+    render_scale: float,
+    target_width: int,
+    target_height: int,
+) -> Optional[List[Dict[str, Any]]]:
+    """Open the PDF bytes and extract the text-layer boxes of one page"""
+    try:
+        doc = fitz.open(stream=file_content, filetype="pdf")
+    except Exception as e:
+        logging.warning(f"Text layer: unable to open PDF: {e}")
+        return None
+    try:
+        if page_index < 0 or page_index >= doc.page_count:
+            return None
+        return extract_text_layer_boxes(doc.load_page(page_index), render_scale, target_width, target_height)
+    finally:
+        doc.close()
@@ -0,0 +1,122 @@
+"""
+Startup warm-up of the OCR workers and readiness state (GET /health/ready)
+
+The first predict of a PaddleOCR predictor pays for the model loading and the
+MKLDNN kernel setup. At startup, the model bundle is verified and every worker
+runs one inference on a synthetic invoice page, so the first user request hits
+a warm predictor. The instance reports ready only once this is done.
+"""
+import asyncio
+import logging
+import time
+from typing import Any, Dict, List, Optional
+
+import numpy as np
+from PIL import Image, ImageDraw
+
+from documents.document_config import PDF_RENDER_SCALE
+from documents.document_render import standard_size
+from ocr.ocr_config import OCR_MODEL_DIR, OCR_WARMUP_ENABLED, OCR_WARMUP_PROFILES
+from ocr.ocr_models import verify_bundle
+from ocr.ocr_pool import OcrWorkerPool, ocr_pool
+from ocr.ocr_profiles import OCR_PROFILES, OcrProfile, get_profile
+
+STATUS_STARTING = "starting"
+STATUS_VERIFYING = "verifying"
+STATUS_WARMING = "warming"
+STATUS_READY = "ready"
+STATUS_FAILED = "failed"
+
+_SAMPLE_LINES = [
+    "FACTURE N° FA-2024-00123",
+    "Date de facturation : 15/03/2024",
+    "Désignation            Qté      Prix unitaire",
+    "Prestation de service    1         1 234,50",
+    "Montant HT                         1 234,50 EUR",
+    "TVA 20 %                             246,90 EUR",
+    "Total TTC                          1 481,40 EUR",
+]
+
+
+def synthetic_page(render_scale: float = PDF_RENDER_SCALE) -> np.ndarray:
+    """Standardized white page with a few invoice-like text lines"""
+    width, height = standard_size(render_scale)
+    image = Image.new("RGB", (width, height), (255, 255, 255))
+    draw = ImageDraw.Draw(image)
+    for i, line in enumerate(_SAMPLE_LINES):
+        draw.text((int(width * 0.08), int(height * (0.08 + i * 0.05))), line, fill=(0, 0, 0))
+    return np.asarray(image)
+
+
+def warmup_profiles(setting: str = OCR_WARMUP_PROFILES) -> List[OcrProfile]:
+    """Profiles to warm up: the default one, "all", or a comma-separated list"""
+    if not setting:
+        return [get_profile()]
+    if setting == "all":
+        return list(OCR_PROFILES.values())
+    return [get_profile(name.strip()) for name in setting.split(",") if name.strip()]
+
+
+class OcrReadiness:
+    """Verification and warm-up progress of this instance"""
+
+    def __init__(self, pool: OcrWorkerPool = ocr_pool, enabled: bool = OCR_WARMUP_ENABLED):
+        self.pool = pool
+        self.enabled = enabled
+        self.status = STATUS_STARTING
+        self.error: Optional[str] = None
+        self.bundle: Optional[Dict[str, Any]] = None
+        self.warmup_seconds: Dict[str, float] = {}
+        self._started_at = time.monotonic()
+        self._ready_after: Optional[float] = None
+
+    @property
+    def ready(self) -> bool:
+        return self.status == STATUS_READY
+
+    async def _warm_profile(self, profile: OcrProfile, page: np.ndarray) -> None:
+        # Un job par worker, soumis directement au pool (pas de micro-batch): chaque processus chauffe
+        started = time.perf_counter()
+        await asyncio.gather(*(
+            self.pool.predict_batch([page], profile) for _ in range(self.pool.workers)
+        ))
+        elapsed = time.perf_counter() - started
+        self.warmup_seconds[profile.name] = round(elapsed, 3)
+        logging.info(f"OCR warm-up of profile {profile.name} done in {elapsed:.1f}s")
+
+    async def run(self) -> None:
+        """Verify the model bundle, then warm every worker up; never raises"""
+        try:
+            if OCR_MODEL_DIR:
+                self.status = STATUS_VERIFYING
+                self.bundle = await asyncio.to_thread(verify_bundle)
+                logging.info(f"OCR model bundle verified: {', '.join(self.bundle['models'])}")
+            if self.enabled:
+                self.status = STATUS_WARMING
+                await self.pool.start()
+                for profile in warmup_profiles():
+                    page = await asyncio.to_thread(synthetic_page, min(PDF_RENDER_SCALE, profile.render_scale))
+                    await self._warm_profile(profile, page)
+            self.status = STATUS_READY
+            self._ready_after = time.monotonic() - self._started_at
+        except asyncio.CancelledError:
+            raise
+        except Exception as e:
+            self.status = STATUS_FAILED
+            self.error = str(e)
+            logging.error(f"OCR warm-up failed, instance not ready: {e}")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "status": self.status,
+            "ready": self.ready,
+            "error": self.error,
+            "warmup_enabled": self.enabled,
+            "warmup_seconds": self.warmup_seconds,
+            "ready_after_seconds": None if self._ready_after is None else round(self._ready_after, 3),
+            "model_bundle": self.bundle,
+        }
+
+
+# Readiness of this process (API or job worker)
+ocr_readiness = OcrReadiness()
@@ -0,0 +1,60 @@
+"""
+Standalone extraction worker: drains the extraction_jobs queue with the local OCR pool
+
+Start as many workers as needed, on any node sharing the database:
+    python run_worker.py [--concurrency 4] [--drain] [--create-table]
+"""
+import argparse
+import asyncio
+import logging
+import signal
+
+from dotenv import load_dotenv
+
+load_dotenv()
+
+from database.config import Base, sync_engine  # noqa: E402 (needs DATABASE_URL)
+from database.models import ExtractionJob  # noqa: E402
+from ocr.ocr_pool import ocr_pool  # noqa: E402
+from ocr.ocr_warmup import ocr_readiness  # noqa: E402
+from services.extraction_jobs import JOB_WORKER_CONCURRENCY, ExtractionWorker  # noqa: E402
+
+# Configure logging
+logging.basicConfig(level=logging.INFO, format='%(asctime)s %(levelname)s %(message)s')
+logger = logging.getLogger(__name__)
+
+
+async def run_worker(concurrency: int, drain: bool) -> None:
+    """Start the OCR pool, process jobs until SIGTERM/SIGINT (or an empty queue with drain)"""
+    worker = ExtractionWorker(concurrency=concurrency)
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGINT, signal.SIGTERM):
+        try:
+            loop.add_signal_handler(sig, worker.stop)
+        except NotImplementedError:  # Windows
+            pass
+
+    await ocr_pool.start()
+    try:
+        # Pas de job réclamé tant que les modèles ne sont pas vérifiés et les workers chauffés
+        await ocr_readiness.run()
+        if not ocr_readiness.ready:
+            raise SystemExit(f"OCR not ready: {ocr_readiness.error}")
+        await worker.run(drain=drain)
+    finally:
+        await ocr_pool.shutdown()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Extraction job worker")
+    parser.add_argument("--concurrency", type=int, default=JOB_WORKER_CONCURRENCY)
+    parser.add_argument("--drain", action="store_true", help="Exit when the queue is empty")
+    parser.add_argument("--create-table", action="store_true",
+                        help="Create the extraction_jobs table (SQLite / standalone tests)")
+    args = parser.parse_args()
+
+    if args.create_table:
+        Base.metadata.create_all(bind=sync_engine, tables=[ExtractionJob.__table__])
+        logger.info("extraction_jobs table ready")
+
+    asyncio.run(run_worker(args.concurrency, args.drain))
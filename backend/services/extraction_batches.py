@@ -0,0 +1,189 @@
+"""
+Server-side batch extraction: many invoices processed concurrently, results streamed as they finish
+"""
+import asyncio
+import logging
+import os
+import time
+import uuid
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+
+from database.config import AsyncSessionLocal
+from documents.document_previews import format_event
+from ocr.ocr_admission import OcrAdmissionController, ocr_admission
+from ocr.ocr_config import OCR_MAX_BATCH_SIZE, OCR_WORKERS
+from services.facture_service import FactureService
+
+# Factures traitées en parallèle par lot (par défaut: de quoi remplir tous les batches OCR)
+BATCH_CONCURRENCY = max(1, int(os.getenv("BATCH_CONCURRENCY", str(OCR_WORKERS * OCR_MAX_BATCH_SIZE))))
+BATCH_MAX_FILES = max(1, int(os.getenv("BATCH_MAX_FILES", "200")))
+BATCH_RESULT_TTL = float(os.getenv("BATCH_RESULT_TTL", "3600"))  # Conservation d'un lot terminé (s)
+
+Extractor = Callable[[Any], Awaitable[Dict[str, Any]]]
+
+
+class ExtractionBatch:
+    """State and event log of one batch (late subscribers replay the log)"""
+
+    def __init__(self, batch_id: str, items: List[Dict[str, Any]], user_id: int):
+        self.batch_id = batch_id
+        self.items = items
+        self.user_id = user_id
+        self.results: List[Optional[Dict[str, Any]]] = [None] * len(items)
+        self.duplicates: List[int] = []
+        self.events: List[Dict[str, Any]] = []
+        self.created_at = time.time()
+        self.finished_at: Optional[float] = None
+        self._changed = asyncio.Condition()
+
+    @property
+    def done(self) -> bool:
+        return self.finished_at is not None
+
+    async def emit(self, event: str, payload: Dict[str, Any]) -> None:
+        async with self._changed:
+            self.events.append({"event": event, **payload})
+            self._changed.notify_all()
+
+    async def finish(self) -> None:
+        async with self._changed:
+            self.finished_at = time.time()
+            self.events.append({"event": "done", **self.summary()})
+            self._changed.notify_all()
+
+    async def subscribe(self, kind: str) -> AsyncIterator[bytes]:
+        """Yield every event of the batch (past and future) serialized as NDJSON or SSE"""
+        position = 0
+        while True:
+            async with self._changed:
+                while position >= len(self.events) and not self.done:
+                    await self._changed.wait()
+                pending = self.events[position:]
+            for event in pending:
+                payload = {k: v for k, v in event.items() if k != "event"}
+                yield format_event(kind, event["event"], payload)
+            position += len(pending)
+            if self.done and position >= len(self.events):
+                return
+
+    def summary(self) -> Dict[str, Any]:
+        finished = [r for r in self.results if r is not None]
+        return {
+            "batch_id": self.batch_id,
+            "total": len(self.items),
+            "completed": len(finished),
+            "succeeded": sum(1 for r in finished if r.get("success")),
+            "failed": sum(1 for r in finished if not r.get("success")),
+            "done": self.done,
+            "duplicates": self.duplicates,
+            "elapsed": (self.finished_at or time.time()) - self.created_at,
+        }
+
+
+class ExtractionBatchManager:
+    """
+    Runs extraction batches on the shared OCR pool and keeps their results for a while
+
+    Each document holds a background slot of the OCR admission controller while
+    it is extracted: batches use at most their share of the OCR slots.
+    """
+
+    def __init__(
+        self,
+        concurrency: int = BATCH_CONCURRENCY,
+        result_ttl: float = BATCH_RESULT_TTL,
+        admission: OcrAdmissionController = ocr_admission,
+    ):
+        self.concurrency = concurrency
+        self.result_ttl = result_ttl
+        self.admission = admission
+        self._batches: Dict[str, ExtractionBatch] = {}
+        self._tasks: Dict[str, asyncio.Task] = {}
+        # Limite partagée entre les lots: plusieurs lots simultanés ne saturent pas la file OCR
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def _cleanup(self) -> None:
+        now = time.time()
+        expired = [
+            batch_id for batch_id, batch in self._batches.items()
+            if batch.done and now - batch.finished_at > self.result_ttl
+        ]
+        for batch_id in expired:
+            del self._batches[batch_id]
+
+    def get(self, batch_id: str) -> Optional[ExtractionBatch]:
+        return self._batches.get(batch_id)
+
+    def create(
+        self,
+        documents: List[Any],
+        items: List[Dict[str, Any]],
+        extract: Extractor,
+        user_id: int,
+    ) -> ExtractionBatch:
+        """
+        Start a batch in the background and return it immediately
+
+        Args:
+            documents: One input per file, passed to extract()
+            items: Public description of each file (index, doc_id, filename)
+            extract: Coroutine extracting one document, returning the /ocr-preview response
+            user_id: Owner of the batch, also used for the duplicate check
+        """
+        self._cleanup()
+        if self._semaphore is None:
+            self._semaphore = asyncio.Semaphore(self.concurrency)
+        batch = ExtractionBatch(uuid.uuid4().hex, items, user_id)
+        self._batches[batch.batch_id] = batch
+        task = asyncio.create_task(self._run(batch, documents, extract))
+        self._tasks[batch.batch_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(batch.batch_id, None))
+        return batch
+
+    async def _run_one(self, batch: ExtractionBatch, index: int, document: Any, extract: Extractor) -> None:
+        async with self._semaphore, self.admission.background_slot():
+            started = time.perf_counter()
+            try:
+                result = await extract(document)
+            except Exception as e:
+                logging.error(f"Batch {batch.batch_id}: extraction of item {index} failed: {e}")
+                result = {"success": False, "data": {"error": str(e)}, "message": f"Erreur lors de l'extraction: {str(e)}"}
+        result = {**batch.items[index], **result, "elapsed": time.perf_counter() - started}
+        batch.results[index] = result
+        await batch.emit("result", result)
+
+    async def _run(self, batch: ExtractionBatch, documents: List[Any], extract: Extractor) -> None:
+        await batch.emit("batch", {"batch_id": batch.batch_id, "total": len(documents), "items": batch.items})
+        try:
+            await asyncio.gather(*(
+                self._run_one(batch, index, document, extract) for index, document in enumerate(documents)
+            ))
+            batch.duplicates = await self._check_duplicates(batch)
+            if batch.duplicates:
+                for index in batch.duplicates:
+                    # Nouveau dict: les événements "result" déjà émis restent inchangés pour le rejeu
+                    result = batch.results[index]
+                    batch.results[index] = {**result, "data": {**(result.get("data") or {}), "isDuplicate": True}}
+                await batch.emit("duplicates", {"indices": batch.duplicates})
+        except Exception as e:
+            logging.error(f"Batch {batch.batch_id} failed: {e}")
+            await batch.emit("error", {"detail": str(e)})
+        finally:
+            await batch.finish()
+
+    async def _check_duplicates(self, batch: ExtractionBatch) -> List[int]:
+        """Check all the extracted invoices against the database in one query"""
+        invoices = [
+            (r.get("data") or {}) if r and r.get("success") else {}
+            for r in batch.results
+        ]
+        try:
+            async with AsyncSessionLocal() as session:
+                return await FactureService(session).check_duplicate_invoices(invoices, batch.user_id)
+        except Exception as e:
+            logging.error(f"Batch {batch.batch_id}: duplicate check failed: {e}")
+            return []
+
+
+# Shared batch manager
+batch_manager = ExtractionBatchManager()
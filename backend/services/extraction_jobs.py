@@ -0,0 +1,150 @@
+"""
+Durable extraction jobs: enqueued by the API, processed by standalone workers (run_worker.py)
+
+Jobs live in the extraction_jobs table. Any number of worker processes, on any
+number of nodes, claim them with SELECT ... FOR UPDATE SKIP LOCKED, so OCR
+capacity is added by starting more workers without touching the API nodes.
+"""
+import asyncio
+import json
+import logging
+import os
+import socket
+import uuid
+from typing import Dict, List, Optional
+
+from sqlalchemy.ext.asyncio import AsyncSession
+
+from database.config import AsyncSessionLocal
+from database.models import ExtractionJob
+from database.repositories import ExtractionJobRepository
+from documents.document_store import DocumentInput
+from services.extraction_service import extract_document
+
+# Configuration des workers
+JOB_WORKER_CONCURRENCY = max(1, int(os.getenv("JOB_WORKER_CONCURRENCY", "4")))  # Jobs traités en parallèle
+JOB_POLL_INTERVAL = float(os.getenv("JOB_POLL_INTERVAL", "1.0"))  # Attente quand la file est vide (s)
+JOB_LEASE_SECONDS = float(os.getenv("JOB_LEASE_SECONDS", "600"))  # Au-delà, un job "running" est repris
+JOB_RETRY_DELAY = float(os.getenv("JOB_RETRY_DELAY", "10"))  # Délai avant nouvelle tentative (x tentatives)
+JOB_MAX_ATTEMPTS = max(1, int(os.getenv("JOB_MAX_ATTEMPTS", "3")))
+
+
+async def enqueue_jobs(
+    session: AsyncSession,
+    documents: List[DocumentInput],
+    template_id: Optional[str],
+    fournisseur: Optional[str],
+    priority: int,
+    user_id: int,
+) -> List[ExtractionJob]:
+    """Create one queued job per document"""
+    try:
+        template_id_int = int(template_id) if template_id else None
+    except (TypeError, ValueError):
+        template_id_int = None
+    return await ExtractionJobRepository(session).create_many([
+        {
+            "doc_id": document.doc_id,
+            "filename": document.filename,
+            "document": document.content,
+            "template_id": template_id_int,
+            "fournisseur": fournisseur,
+            "priority": priority,
+            "max_attempts": JOB_MAX_ATTEMPTS,
+            "created_by": user_id,
+        }
+        for document in documents
+    ])
+
+
+class ExtractionWorker:
+    """Claims queued jobs and runs them on the local OCR pool"""
+
+    def __init__(
+        self,
+        worker_id: Optional[str] = None,
+        concurrency: int = JOB_WORKER_CONCURRENCY,
+        poll_interval: float = JOB_POLL_INTERVAL,
+        lease_seconds: float = JOB_LEASE_SECONDS,
+    ):
+        self.worker_id = worker_id or f"{socket.gethostname()}-{os.getpid()}-{uuid.uuid4().hex[:6]}"
+        self.concurrency = concurrency
+        self.poll_interval = poll_interval
+        self.lease_seconds = lease_seconds
+        self._running: Dict[int, asyncio.Task] = {}
+        self._stopping = asyncio.Event()
+        self.processed = 0
+
+    def stop(self) -> None:
+        """Stop claiming jobs; the running ones are finished"""
+        self._stopping.set()
+
+    async def _process(self, job: ExtractionJob) -> None:
+        document = DocumentInput(job.doc_id, job.filename, job.document or b"")
+        try:
+            if not job.document:
+                raise ValueError("Contenu du fichier absent")
+            # Les exceptions (pool OCR cassé, timeout, base perdue) remontent vers fail() et sont retentées
+            result = await extract_document(
+                document, str(job.template_id) if job.template_id else None, raise_errors=True
+            )
+            data = result.get("data") or {}
+            if data.get("numFacture") and not data.get("numeroFacture"):
+                data["numeroFacture"] = data["numFacture"]
+            data["fournisseur"] = job.fournisseur or ""
+            # Une extraction sans résultat est définitive: pas de nouvelle tentative
+            error = None if result.get("success") else (result.get("message") or "Extraction échouée")
+            async with AsyncSessionLocal() as session:
+                await ExtractionJobRepository(session).complete(
+                    job.id, self.worker_id, json.dumps(result, ensure_ascii=False, default=str), error
+                )
+            logging.info(f"Worker {self.worker_id}: job {job.id} {'failed: ' + error if error else 'succeeded'}")
+        except Exception as e:
+            logging.error(f"Worker {self.worker_id}: job {job.id} failed (attempt {job.attempts}): {e}")
+            async with AsyncSessionLocal() as session:
+                await ExtractionJobRepository(session).fail(job.id, self.worker_id, str(e), JOB_RETRY_DELAY)
+        finally:
+            self.processed += 1
+
+    async def run_once(self) -> int:
+        """Requeue expired leases and claim as many jobs as there are free slots"""
+        free = self.concurrency - len(self._running)
+        if free <= 0:
+            return 0
+        async with AsyncSessionLocal() as session:
+            repo = ExtractionJobRepository(session)
+            requeued = await repo.requeue_expired()
+            if requeued:
+                logging.warning(f"Worker {self.worker_id}: {requeued} expired job(s) requeued")
+            jobs = await repo.claim(self.worker_id, free, self.lease_seconds)
+        for job in jobs:
+            task = asyncio.create_task(self._process(job))
+            self._running[job.id] = task
+            task.add_done_callback(lambda _, job_id=job.id: self._running.pop(job_id, None))
+        return len(jobs)
+
+    async def run(self, drain: bool = False) -> None:
+        """
+        Process jobs until stop() is called
+
+        Args:
+            drain: Return as soon as the queue is empty (tests, cron-style runs)
+        """
+        logging.info(f"Worker {self.worker_id} started (concurrency={self.concurrency})")
+        while not self._stopping.is_set():
+            try:
+                claimed = await self.run_once()
+            except Exception as e:
+                logging.error(f"Worker {self.worker_id}: claim failed: {e}")
+                claimed = 0
+            if claimed:
+                continue
+            if drain and not self._running:
+                break
+            # File vide ou tous les slots occupés: attendre un job qui se termine ou le prochain poll
+            waiters = [asyncio.ensure_future(self._stopping.wait())] + list(self._running.values())
+            await asyncio.wait(waiters, timeout=self.poll_interval, return_when=asyncio.FIRST_COMPLETED)
+            waiters[0].cancel()
+        if self._running:
+            await asyncio.gather(*self._running.values(), return_exceptions=True)
+        logging.info(f"Worker {self.worker_id} stopped after {self.processed} job(s)")
@@ -0,0 +1,228 @@
+"""
+Invoice field extraction from one document (OCR boxes matched against the template zones)
+"""
+import logging
+from typing import Any, Dict, Optional
+
+from documents.document_config import PDF_RENDER_SCALE
+from documents.document_render import render_image_array, render_pdf_page_array, standard_size
+from documents.document_store import KIND_IMAGE, KIND_PDF, DocumentInput, document_kind
+from ocr.ocr_deadline import OcrDeadline
+from ocr.ocr_pipeline import PATH_OCR_DEGRADED, get_page_boxes
+from ocr.ocr_profiles import OcrProfile, fallback_profile, get_profile
+from ocr.ocr_text_layer import pdf_text_layer_boxes
+from services.field_extractors import FIELD_EXTRACTORS, run_extractors
+from services.field_matching import PageBoxes
+from services.template_cache import CompiledTemplate, template_cache
+from services.template_coords import TEMPLATE_PAGE_SIZE
+
+# Score OCR minimal des boîtes prises en compte pour les champs
+MIN_CONFIDENCE = 0.8
+
+
+def extraction_profile(
+    compiled_template: Optional[CompiledTemplate], profile_name: Optional[str] = None
+) -> OcrProfile:
+    """OCR profile of an extraction: profile_name, else the template profile, else OCR_PROFILE"""
+    if profile_name:
+        return get_profile(profile_name)
+    if compiled_template and compiled_template.ocr_profile:
+        try:
+            return get_profile(compiled_template.ocr_profile)
+        except ValueError as e:
+            logging.warning(f"Template {compiled_template.template_id}: {e}, default profile used")
+    return get_profile()
+
+
+async def resolve_extraction_profile(template_id: Optional[str], profile_name: Optional[str] = None) -> OcrProfile:
+    """extraction_profile of a template id (default profile if the template cannot be loaded)"""
+    compiled_template = None
+    if template_id and not profile_name:
+        try:
+            compiled_template = await template_cache.get(template_id)
+        except Exception as e:
+            logging.warning(f"Unable to load template {template_id}: {e}")
+    return extraction_profile(compiled_template, profile_name)
+
+
+def extraction_page_scale(profile: OcrProfile) -> float:
+    """Render scale of the extracted pages: directly at the profile resolution (fewer pixels to produce)"""
+    return min(PDF_RENDER_SCALE, profile.render_scale)
+
+
+def extraction_render_scale(filename: str, page_scale: float) -> Any:
+    """Render scale part of the OCR cache key of a page rendered at page_scale (None: unsupported file)"""
+    kind = document_kind(filename)
+    if kind == KIND_PDF:
+        return page_scale
+    if kind == KIND_IMAGE:
+        return "image" if page_scale == PDF_RENDER_SCALE else f"image@{page_scale}"
+    return None
+
+
+def _value_box(box: Dict[str, Any]) -> Dict[str, float]:
+    """Coordinates of a matched box as returned to the frontend"""
+    return {
+        'left': float(box['left']),
+        'top': float(box['top']),
+        'width': float(box['width']),
+        'height': float(box['height']),
+    }
+
+
+async def extract_document(
+    document: DocumentInput,
+    template_id: Optional[str],
+    deadline: Optional[OcrDeadline] = None,
+    profile_name: Optional[str] = None,
+    raise_errors: bool = False,
+) -> Dict[str, Any]:
+    """
+    Extract the invoice fields of one document (shared by /ocr-preview and /extraction-batches)
+
+    With a deadline, the OCR skips the stages that would not fit in the remaining time.
+    The OCR profile is profile_name, else the template profile, else OCR_PROFILE.
+    With raise_errors, an exception is raised instead of being returned as a failed
+    result, so callers that retry (extraction jobs) can tell it from "no field found".
+    """
+    try:
+        # Compiled template (all mappings loaded once, cached per template id)
+        compiled_template = None
+        if template_id:
+            try:
+                compiled_template = await template_cache.get(template_id)
+            except Exception as e:
+                logging.warning(f"Unable to load template {template_id}: {e}")
+
+        ocr_profile = extraction_profile(compiled_template, profile_name)
+        page_scale = extraction_page_scale(ocr_profile)
+        page_size = standard_size(page_scale)
+
+        # --- Read file and get OCR boxes (cached by content hash) ---
+        file_content = document.content
+        if document.filename and document.filename.lower().endswith('.pdf'):
+            render_scale = extraction_render_scale(document.filename, page_scale)
+
+            def render_page():
+                return render_pdf_page_array(file_content, 0, *page_size)
+
+            def read_text_layer():
+                return pdf_text_layer_boxes(file_content, 0, page_scale, *page_size)
+        elif document.filename and document.filename.lower().endswith(('.png', '.jpg', '.jpeg')):
+            render_scale = extraction_render_scale(document.filename, page_scale)
+
+            def render_page():
+                # Standardize the image dimensions before OCR processing
+                return render_image_array(file_content, *page_size)
+            read_text_layer = None
+        else:
+            raise ValueError("Type de fichier non supporté")
+
+        # Zones du template en pixels de l'image standardisée (repère des heuristiques ci-dessous)
+        template_zones = compiled_template.zones_at(*TEMPLATE_PAGE_SIZE) if compiled_template else {}
+
+        # Template-guided ROI OCR: only the mapped zones of the extracted fields are analysed
+        page_zones = compiled_template.zones_at(*page_size) if compiled_template else {}
+        search_zones = {f: page_zones[f] for f in FIELD_EXTRACTORS if f in page_zones}
+        page_boxes, ocr_path = await get_page_boxes(
+            document.doc_id, 0, render_scale, render_page, read_text_layer, search_zones or None, deadline,
+            ocr_profile, page_scale
+        )
+        # Boîtes ramenées dans le repère de l'image standardisée
+        box_scale_x = TEMPLATE_PAGE_SIZE[0] / page_size[0]
+        box_scale_y = TEMPLATE_PAGE_SIZE[1] / page_size[1]
+
+        # -------------------------
+        # Registered field extractors, one pass over the indexed boxes
+        # -------------------------
+        page = PageBoxes(page_boxes, box_scale_x, box_scale_y, min_score=MIN_CONFIDENCE)
+        fields = run_extractors(page, template_zones)
+        if not fields:
+            return {"success": False, "data": {}, "message": "Aucun champ mappé dans le template"}
+        for name, result in fields.items():
+            extractor = FIELD_EXTRACTORS[name]
+            if extractor.required and result.value is None:
+                return {"success": False, "data": {}, "message": extractor.missing_message}
+
+        def field_value(name):
+            result = fields.get(name)
+            return result.value if result else None
+
+        def field_box(name):
+            result = fields.get(name)
+            return _value_box(result.box) if result and result.box else None
+
+        # -------------------------
+        # TTC and taux TVA
+        # -------------------------
+        ht_extracted = field_value('montantht')
+        tva_extracted = field_value('tva')
+        ttc_extracted = None
+        taux_tva = None
+        if ht_extracted is not None and tva_extracted is not None:
+            ttc_extracted = round(ht_extracted + tva_extracted, 2)
+            if ht_extracted != 0:
+                raw_taux = (tva_extracted * 100.0) / ht_extracted
+                # Round to nearest integer (0.5 rounds up)
+                taux_tva = int(round(raw_taux))
+            else:
+                taux_tva = 0
+
+        # Use the same expansion values for visualization as used in detection
+        numfacture_search_area = None
+        if field_value('numerofacture') is not None:
+            zone = template_zones['numerofacture']
+            numfacture_search_area = {
+                "left": zone[0],
+                "top": zone[1],
+                "width": zone[2] - zone[0],
+                "height": zone[3] - zone[1],
+                "type": "search_area"  # Add type to identify it in frontend
+            }
+
+        # -------------------------
+        # Prepare response
+        # -------------------------
+        empty_box = {'left': 0, 'top': 0, 'width': 0, 'height': 0}
+        ht_box = field_box('montantht') or empty_box
+        tva_box = field_box('tva') or empty_box
+        result_data = {
+            "montantHT": ht_extracted,
+            "montantTVA": tva_extracted,
+            "montantTTC": ttc_extracted,
+            "tauxTVA": taux_tva,
+            "numFacture": field_value('numerofacture'),
+            "boxHT": dict(ht_box),
+            "boxTVA": dict(tva_box),
+            "boxNumFacture": field_box('numerofacture'),
+            "boxNumFactureSearchArea": numfacture_search_area,
+            "dateFacturation": field_value('datefacturation'),
+            "boxDateFacturation": field_box('datefacturation'),
+            "template_id": template_id,
+            "ocr_path": ocr_path,
+            "ocr_profile": fallback_profile().name if ocr_path == PATH_OCR_DEGRADED else ocr_profile.name,
+            "doc_id": document.doc_id,
+            # Debug info
+            "ht_match": {"search_area": None, "keyword_box": None, "value_box": dict(ht_box)},
+            "tva_match": {"search_area": None, "keyword_box": None, "value_box": dict(tva_box)},
+            # Tous les champs du registre: valeur, boîte, temps et boîtes analysées
+            "fields": {name: result.to_dict() for name, result in fields.items()},
+        }
+
+        return {
+            "success": True,
+            "data": result_data,
+            "message": "Extraction réussie"
+        }
+
+    except Exception as e:
+        import traceback
+        error_details = traceback.format_exc()
+        logging.error(f"Error in ocr_preview: {str(e)}\n{error_details}")
+        if raise_errors:
+            raise
+        return {
+            "success": False,
+            "data": {"error": str(e), "traceback": error_details},
+            "message": f"Erreur lors de l'extraction: {str(e)}"
+        }
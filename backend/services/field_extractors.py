@@ -0,0 +1,168 @@
+"""
+Registry of the extracted invoice fields
+
+Each field declares the expansion of its search zone, a cheap text predicate,
+the parser turning the text into a value and the scorer ranking the boxes of
+its zone. run_extractors runs every registered field mapped by the template
+over the indexed boxes of the page, and measures each field (time, boxes in the
+zone, boxes parsed). Templates only pay for the fields they map; a new field
+(supplier, due date, ...) is one register_extractor call.
+"""
+import logging
+import time
+from functools import partial
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from ocr.ocr_deadline import StageTimes
+from services.field_matching import (
+    FieldMatch,
+    FieldMatcher,
+    PageBoxes,
+    Rect,
+    Scorer,
+    amount_scores,
+    zone_scores,
+)
+from services.field_parsers import extract_number, is_valid_invoice_number, parse_date_try
+
+# Default expansion for fields without a specific value
+DEFAULT_SEARCH_EXPANSION = (10, 5)
+
+
+class FieldExtractor(NamedTuple):
+    """Declaration of one extracted field"""
+    # Nom du champ dans les mappings (table field_name)
+    name: str
+    # Élargissement de la zone mappée (pixels de l'image standardisée, x et y)
+    expansion: Tuple[int, int]
+    # Filtre rapide sur le texte, avant le parseur
+    predicate: Callable[[str], bool]
+    # Texte -> valeur, None si le texte ne convient pas
+    parser: Callable[[str], Any]
+    scorer: Scorer
+    # Un champ requis mappé mais non trouvé fait échouer l'extraction
+    required: bool = False
+    missing_message: str = ""
+
+    def accept(self, box: Dict[str, Any]) -> Any:
+        text = box['text']
+        return self.parser(text) if self.predicate(text) else None
+
+
+class FieldResult(NamedTuple):
+    """Outcome of one extractor on one page"""
+    match: FieldMatch
+    seconds: float
+
+    @property
+    def value(self) -> Any:
+        return self.match.value
+
+    @property
+    def box(self) -> Optional[Dict[str, Any]]:
+        return self.match.box
+
+    def to_dict(self) -> Dict[str, Any]:
+        box = self.match.box
+        return {
+            "value": self.match.value,
+            "box": None if box is None else {k: float(box[k]) for k in ('left', 'top', 'width', 'height')},
+            "found": box is not None,
+            "candidates": self.match.candidates,
+            "tried": self.match.tried,
+            "ms": round(self.seconds * 1000.0, 3),
+        }
+
+
+def _any_text(text: str) -> bool:
+    return True
+
+
+def _not_percentage(text: str) -> bool:
+    # Taux de TVA ("20 %"), pas un montant
+    return '%' not in text
+
+
+def _stripped(text: str) -> str:
+    return text.strip()
+
+
+def _iso_date(text: str) -> Optional[str]:
+    date = parse_date_try(text)
+    return date.strftime('%Y-%m-%d') if date else None
+
+
+FIELD_EXTRACTORS: Dict[str, FieldExtractor] = {}
+
+
+def register_extractor(extractor: FieldExtractor) -> FieldExtractor:
+    """Add (or replace) the extractor of a field; fields run in registration order"""
+    FIELD_EXTRACTORS[extractor.name] = extractor
+    return extractor
+
+
+register_extractor(FieldExtractor(
+    name='montantht',
+    expansion=(100, 20),
+    predicate=_any_text,
+    parser=extract_number,
+    scorer=amount_scores,
+    required=True,
+    missing_message="Aucune valeur HT trouvée dans la zone mappée",
+))
+register_extractor(FieldExtractor(
+    name='tva',
+    expansion=(10, 5),
+    predicate=_not_percentage,
+    parser=extract_number,
+    scorer=amount_scores,
+    required=True,
+    missing_message="Aucune valeur TVA trouvée dans la zone mappée",
+))
+register_extractor(FieldExtractor(
+    name='numerofacture',
+    expansion=(10, 5),
+    predicate=is_valid_invoice_number,
+    parser=_stripped,
+    scorer=partial(zone_scores, overlap_weight=0.7, touching_score=0.0),
+))
+register_extractor(FieldExtractor(
+    name='datefacturation',
+    expansion=(20, 10),
+    predicate=_any_text,
+    parser=_iso_date,
+    scorer=partial(zone_scores, overlap_weight=2, touching_score=1.0),
+))
+
+
+def search_expansion(field_name: str) -> Tuple[int, int]:
+    """Search-zone expansion (pixels of the standardized image) around a mapped field"""
+    extractor = FIELD_EXTRACTORS.get(field_name)
+    return extractor.expansion if extractor else DEFAULT_SEARCH_EXPANSION
+
+
+def run_extractors(page: PageBoxes, zones: Mapping[str, Rect]) -> Dict[str, FieldResult]:
+    """
+    Run the registered extractors of the fields that have a zone, in one pass over the page
+
+    An extractor that raises is logged and reported as not found.
+    """
+    matcher = FieldMatcher(page, zones)
+    results = {}
+    for name, extractor in FIELD_EXTRACTORS.items():
+        if name not in zones:
+            continue
+        started = time.perf_counter()
+        try:
+            match = matcher.match(name, extractor.scorer, extractor.accept)
+        except Exception as e:
+            logging.error(f"Extraction of field {name} failed: {e}")
+            match = FieldMatch(None, None, 0, 0)
+        elapsed = time.perf_counter() - started
+        field_times.record(name, elapsed)
+        results[name] = FieldResult(match, elapsed)
+    return results
+
+
+# Durée moyenne d'extraction de chaque champ (GET /ocr/stats)
+field_times = StageTimes()
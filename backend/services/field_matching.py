@@ -0,0 +1,213 @@
+"""
+Vectorized matching of the detected boxes against the template field zones
+
+The boxes of a page (ocr/ocr_page.py) are held as an (N, 4) float32 array of
+(left, top, right, bottom) with a uniform-grid index (ocr/ocr_grid.py). Each
+field only reads the boxes touching its zone from the index, then computes
+overlaps, centers and distances for all of them in one vectorized pass. Candidates are ranked by
+score and the text predicate (number, invoice number, date parser) only runs
+on the best ones, until one is accepted.
+"""
+from typing import Any, Callable, Dict, Mapping, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+
+from ocr.ocr_grid import BoxGrid
+from ocr.ocr_page import OcrPage
+
+Rect = Tuple[float, float, float, float]
+
+# Montants: part minimale de la boîte dans la zone, et poids recouvrement / distance des centres
+AMOUNT_MIN_OVERLAP = 0.3
+AMOUNT_OVERLAP_WEIGHT = 0.7
+AMOUNT_DISTANCE_WEIGHT = 0.3
+
+# Champs texte: poids du recouvrement, de la distance normalisée des centres et de la position
+ZONE_CENTER_WEIGHT = 0.2
+ZONE_POSITION_WEIGHT = 0.1
+
+
+class PageBoxes:
+    """
+    Boxes of an OCR page kept for matching: (N, 4) float32 rectangles, grid index,
+    and the box dicts built on demand for the candidates only
+    """
+
+    __slots__ = ("page", "rows", "scale", "rects", "index")
+
+    def __init__(self, page: OcrPage, scale_x: float = 1.0, scale_y: float = 1.0, min_score: float = 0.0):
+        """
+        Args:
+            page: Columnar boxes of the page
+            scale_x, scale_y: Factors from the page coordinates to the zone coordinates
+            min_score: Boxes with a lower OCR score are left out
+        """
+        self.page = page
+        self.rows = np.flatnonzero(page.scores >= min_score)
+        self.scale = np.array([scale_x, scale_y], dtype=np.float64)
+        bboxes = page.bboxes[self.rows].astype(np.float64)
+        # Même calcul que les boîtes dict (gauche + largeur), en float64 puis float32
+        left_top = bboxes[:, :2] * self.scale
+        right_bottom = left_top + (bboxes[:, 2:] - bboxes[:, :2]) * self.scale
+        self.rects = np.concatenate([left_top, right_bottom], axis=1).astype(np.float32)
+        self.index = BoxGrid(self.rects)
+
+    def __len__(self) -> int:
+        return len(self.rows)
+
+    def box(self, i: int) -> Dict[str, Any]:
+        """Box i in zone coordinates (left/top/right/bottom/width/height/center, text, score)"""
+        row = self.rows[i]
+        scale_x, scale_y = self.scale
+        page_left, page_top, page_right, page_bottom = (float(v) for v in self.page.bboxes[row])
+        left, top = page_left * scale_x, page_top * scale_y
+        width, height = (page_right - page_left) * scale_x, (page_bottom - page_top) * scale_y
+        right, bottom = left + width, top + height
+        return {
+            'left': left,
+            'top': top,
+            'right': right,
+            'bottom': bottom,
+            'width': width,
+            'height': height,
+            'center_x': (left + right) / 2.0,
+            'center_y': (top + bottom) / 2.0,
+            'text': self.page.text(row),
+            'score': float(self.page.scores[row]),
+        }
+
+
+class ZoneGeometry(NamedTuple):
+    """Box/zone relations, (N, M) arrays (N boxes, M zones)"""
+    # Boîte et zone se touchent ou se recouvrent
+    intersects: np.ndarray
+    # Surface commune / surface de la boîte
+    box_overlap: np.ndarray
+    # Surface commune / plus petite des deux surfaces
+    min_overlap: np.ndarray
+    center_distance: np.ndarray
+    # Distance des centres / diagonale de la zone
+    norm_center_distance: np.ndarray
+    # 1 au centre de la zone, 0 sur ses bords, négatif au-delà
+    position_score: np.ndarray
+    box_area: np.ndarray
+
+
+def zone_geometry(rects: np.ndarray, zones: np.ndarray) -> ZoneGeometry:
+    """Relations between every box (N, 4) and every zone (M, 4), in one pass"""
+    bl, bt, br, bb = (rects[:, i:i + 1] for i in range(4))
+    zl, zt, zr, zb = (zones[None, :, i] for i in range(4))
+
+    width_overlap = np.minimum(br, zr) - np.maximum(bl, zl)
+    height_overlap = np.minimum(bb, zb) - np.maximum(bt, zt)
+    intersects = (width_overlap >= 0) & (height_overlap >= 0)
+    overlap_area = np.maximum(width_overlap, 0) * np.maximum(height_overlap, 0)
+
+    box_area = (br - bl) * (bb - bt)
+    zone_area = (zr - zl) * (zb - zt)
+    smaller_area = np.minimum(box_area, zone_area)
+
+    box_cx, box_cy = (bl + br) / 2, (bt + bb) / 2
+    zone_cx, zone_cy = (zl + zr) / 2, (zt + zb) / 2
+    dx, dy = box_cx - zone_cx, box_cy - zone_cy
+    center_distance = np.hypot(dx, dy)
+    zone_diag = np.hypot(zr - zl, zb - zt)
+
+    with np.errstate(divide="ignore", invalid="ignore"):
+        box_overlap = np.where(box_area > 0, overlap_area / box_area, 0)
+        min_overlap = np.where(smaller_area > 0, overlap_area / smaller_area, 0)
+        norm_center_distance = np.where(zone_diag > 0, center_distance / zone_diag, 0)
+    x_ratio = np.abs(dx) / np.maximum(1, (zr - zl) / 2)
+    y_ratio = np.abs(dy) / np.maximum(1, (zb - zt) / 2)
+
+    return ZoneGeometry(
+        intersects=intersects,
+        box_overlap=box_overlap,
+        min_overlap=min_overlap,
+        center_distance=center_distance,
+        norm_center_distance=norm_center_distance,
+        position_score=1 - (x_ratio + y_ratio) / 2,
+        box_area=np.broadcast_to(box_area, intersects.shape),
+    )
+
+
+def amount_scores(geometry: ZoneGeometry, column: int) -> np.ndarray:
+    """Amount fields: boxes mostly inside the zone, closest to its center first (-inf: excluded)"""
+    box_overlap = geometry.box_overlap[:, column]
+    scores = (box_overlap * AMOUNT_OVERLAP_WEIGHT
+              + AMOUNT_DISTANCE_WEIGHT / (1 + geometry.center_distance[:, column]))
+    keep = (geometry.box_area[:, column] > 0) & (box_overlap > AMOUNT_MIN_OVERLAP)
+    return np.where(keep, scores, -np.inf)
+
+
+def zone_scores(geometry: ZoneGeometry, column: int, overlap_weight: float, touching_score: float) -> np.ndarray:
+    """
+    Text fields: boxes touching the zone, ranked by overlap, center distance and position
+
+    Args:
+        overlap_weight: Weight of the overlap ratio
+        touching_score: Score of a box that only touches the zone edge
+    """
+    min_overlap = geometry.min_overlap[:, column]
+    scores = (min_overlap * overlap_weight
+              + (1 - geometry.norm_center_distance[:, column]) * ZONE_CENTER_WEIGHT
+              + geometry.position_score[:, column] * ZONE_POSITION_WEIGHT)
+    scores = np.where(min_overlap > 0, scores, touching_score)
+    return np.where(geometry.intersects[:, column], scores, -np.inf)
+
+
+class FieldMatch(NamedTuple):
+    """Best accepted box of a field"""
+    box: Optional[Dict[str, Any]]
+    value: Any
+    # Boîtes touchant la zone, et boîtes passées au parseur
+    candidates: int
+    tried: int
+
+
+Scorer = Callable[[ZoneGeometry, int], np.ndarray]
+
+
+def best_candidate(
+    scores: np.ndarray,
+    boxes: Sequence[Dict[str, Any]],
+    accept: Callable[[Dict[str, Any]], Any],
+) -> FieldMatch:
+    """
+    Highest scoring box accepted by its text predicate (first box on ties)
+
+    Returns:
+        The box and the value returned by accept (both None when no candidate is accepted)
+    """
+    candidates = np.flatnonzero(np.isfinite(scores))
+    tried = 0
+    for index in candidates[np.argsort(-scores[candidates], kind="stable")]:
+        box = boxes[index]
+        tried += 1
+        value = accept(box)
+        if value is not None:
+            return FieldMatch(box, value, len(boxes), tried)
+    return FieldMatch(None, None, len(boxes), tried)
+
+
+class FieldMatcher:
+    """Template zones matched against the boxes of a page through its grid index"""
+
+    def __init__(self, page: PageBoxes, zones: Mapping[str, Rect]):
+        self.page = page
+        self.zones = dict(zones)
+
+    def match(self, field: str, scorer: Scorer, accept: Callable[[Dict[str, Any]], Any]) -> Optional[FieldMatch]:
+        """
+        Best box of the zone of field, ranked by scorer and accepted by accept
+
+        Returns:
+            None when the field has no zone
+        """
+        zone = self.zones.get(field)
+        if zone is None:
+            return None
+        indices = self.page.index.query(zone)
+        boxes = [self.page.box(i) for i in indices]
+        geometry = zone_geometry(self.page.rects[indices], np.array([zone], dtype=np.float32))
+        return best_candidate(scorer(geometry, 0), boxes, accept)
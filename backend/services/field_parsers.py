@@ -0,0 +1,205 @@
+"""
+Text parsers of the extracted fields (amounts, invoice numbers, dates)
+
+The patterns are compiled once and the results of the three parsers are
+memoized (bounded LRU): the same OCR strings come back on every page of a
+supplier. Dates in the common numeric formats (15/03/2024, 15.03.24,
+2024-03-15, 03/2024, ...) are read by a small tokenizer; dateparser is only
+imported and called for the leftovers, with the historical settings.
+"""
+import os
+import re
+from datetime import date, datetime
+from functools import lru_cache
+from typing import Optional
+
+# Nombre de chaînes mémorisées par parseur
+FIELD_PARSER_CACHE_SIZE = int(os.getenv("FIELD_PARSER_CACHE_SIZE", "4096"))
+
+_NOT_NUMBER_CHARS = re.compile(r'[^\d\-,\.]')
+_NUMBER = re.compile(r'-?\d+(?:\.\d+)?')
+
+_INVOICE_NUMBER_PATTERNS = [
+    re.compile(r'(?i)(?:facture|fact|inv|no\.?\s*#?)\s*[\w\-\s/]*\d{2,}'),
+    re.compile(r'\b\d{4,}[\-\s/]?\d+\b'),
+    re.compile(r'\b[A-Z]{2,}[-\s]?\d+[-\s]?\d+\b'),
+    re.compile(r'\b\d{6,}\b'),
+]
+
+_NOT_DATE_CHARS = re.compile(r'[^0-9/\-\.\s]')
+_SPACES = re.compile(r'\s+')
+# Formats strptime historiques, dans leur ordre d'essai
+_MONTH_YEAR = re.compile(r'(\d{1,2})/(\d{4}|\d{2})')                  # %m/%Y, %m/%y
+_DAY_MONTH_YEAR = re.compile(r'(\d{1,2})([/.\-])(\d{1,2})\2(\d{4})')  # %d/%m/%Y, %d-%m-%Y, %d.%m.%Y
+_YEAR_MONTH_DAY = re.compile(r'(\d{4})([/\-])(\d{1,2})\2(\d{1,2})')   # %Y/%m/%d, %Y-%m-%d
+# Jour, mois, année sur 2 chiffres ou séparés par des espaces: lus comme dateparser (ordre DMY)
+_DAY_MONTH_SHORT_YEAR = re.compile(r'(\d{1,2}) ?([/.\-]) ?(\d{1,2}) ?\2 ?(\d{2}|\d{4})')
+_DAY_MONTH_YEAR_SPACED = re.compile(r'(\d{1,2}) (\d{1,2}) (\d{4})')
+_SINGLE_NUMBER = re.compile(r'\d{1,9}')
+_TWO_NUMBERS = re.compile(r'-?\d{1,9} ?[.\-\s] ?\d{1,9}')
+_AMOUNT = re.compile(r'-?\d{1,3}(?: \d{3})+(?: \d{2}| ?\. ?\d{2})?')  # 1 234 50, 12 500.00
+
+_STRPTIME_FORMATS = [
+    '%m/%Y',    # 3/2025
+    '%m/%y',    # 3/25
+    '%d/%m/%Y', # 01/03/2025
+    '%d-%m-%Y', # 01-03-2025
+    '%d.%m.%Y', # 01.03.2025
+    '%Y/%m/%d', # 2025/03/01
+    '%Y-%m-%d', # 2025-03-01
+]
+
+# Résultat du tokenizer quand la chaîne doit passer par dateparser
+_UNDECIDED = object()
+
+
+@lru_cache(maxsize=FIELD_PARSER_CACHE_SIZE)
+def extract_number(text: str):
+    """Robust number parser (handles , and . as thousand/decimal separators)."""
+    cleaned = _NOT_NUMBER_CHARS.sub('', text)
+    if cleaned == '':
+        return None
+    # If both present, decide which is decimal by last occurrence
+    if ',' in cleaned and '.' in cleaned:
+        if cleaned.rfind(',') > cleaned.rfind('.'):
+            cleaned = cleaned.replace('.', '').replace(',', '.')
+        else:
+            cleaned = cleaned.replace(',', '')
+    elif ',' in cleaned:
+        parts = cleaned.split(',')
+        # If last part length == 2 -> probably decimal
+        if len(parts[-1]) == 2:
+            cleaned = cleaned.replace(',', '.')
+        else:
+            cleaned = cleaned.replace(',', '')
+    # If too many dots, keep last as decimal
+    if cleaned.count('.') > 1:
+        parts = cleaned.split('.')
+        cleaned = ''.join(parts[:-1]) + '.' + parts[-1]
+    if cleaned in ('', '-', '.'):
+        return None
+    # Final digit check
+    if not _NUMBER.fullmatch(cleaned):
+        return None
+    try:
+        return float(cleaned)
+    except Exception:
+        return None
+
+
+@lru_cache(maxsize=FIELD_PARSER_CACHE_SIZE)
+def is_valid_invoice_number(text):
+    text = text.strip()
+    return any(p.search(text) for p in _INVOICE_NUMBER_PATTERNS)
+
+
+def _valid_date(year: int, month: int, day: int) -> Optional[date]:
+    """date(year, month, day) within the accepted years, None if it does not exist"""
+    if not 1900 <= year <= 2100:
+        return None
+    try:
+        return date(year, month, day)
+    except ValueError:
+        return None
+
+
+def _short_year(year: str) -> int:
+    # Pivot de strptime (%y): 69-99 -> 19xx, 00-68 -> 20xx
+    value = int(year)
+    if len(year) == 2:
+        return value + (1900 if value >= 69 else 2000)
+    return value
+
+
+def _tokenized_date(clean_text: str):
+    """
+    Date of the common numeric formats, without strptime nor dateparser
+
+    Returns:
+        The date, None when the text cannot be a date, or _UNDECIDED when
+        only dateparser can tell
+    """
+    match = _MONTH_YEAR.fullmatch(clean_text)
+    if match:
+        month, year = match.group(1), match.group(2)
+        if 1 <= int(month) <= 12:
+            parsed = _valid_date(_short_year(year), int(month), 1)
+            if parsed:
+                return parsed
+        return _UNDECIDED
+
+    for pattern, order in ((_DAY_MONTH_YEAR, (4, 3, 1)), (_YEAR_MONTH_DAY, (1, 3, 4))):
+        match = pattern.fullmatch(clean_text)
+        if match:
+            year, month, day = (int(match.group(i)) for i in order)
+            parsed = _valid_date(year, month, day)
+            return parsed if parsed else _UNDECIDED
+
+    match = _DAY_MONTH_SHORT_YEAR.fullmatch(clean_text)
+    if match:
+        parsed = _valid_date(_short_year(match.group(4)), int(match.group(3)), int(match.group(1)))
+        return parsed if parsed else _UNDECIDED
+    match = _DAY_MONTH_YEAR_SPACED.fullmatch(clean_text)
+    if match:
+        parsed = _valid_date(int(match.group(3)), int(match.group(2)), int(match.group(1)))
+        return parsed if parsed else _UNDECIDED
+
+    # Un nombre seul (hors timestamp), deux nombres sans "/" ou un montant ne sont jamais des dates
+    if (_SINGLE_NUMBER.fullmatch(clean_text) or _TWO_NUMBERS.fullmatch(clean_text)
+            or _AMOUNT.fullmatch(clean_text)):
+        return None
+    return _UNDECIDED
+
+
+def _dateparser_date(clean_text: str) -> Optional[date]:
+    """Historical path: the strptime formats, then dateparser (imported on first use)"""
+    import dateparser
+
+    # Use dateparser with more flexible settings
+    settings = {
+        'DATE_ORDER': 'DMY',
+        'PREFER_DAY_OF_MONTH': 'first',
+        'STRICT_PARSING': False,
+        'REQUIRE_PARTS': ['month', 'year'],
+        'PARSERS': ['relative-time', 'absolute-time', 'custom-formats', 'timestamp'],
+        'PREFER_LOCALE_DATE_ORDER': True,
+        'RELATIVE_BASE': datetime.now().replace(hour=0, minute=0, second=0, microsecond=0)
+    }
+
+    # Try with custom formats first
+    for fmt in _STRPTIME_FORMATS:
+        try:
+            dt = datetime.strptime(clean_text, fmt)
+            if 1900 <= dt.year <= 2100 and 1 <= dt.month <= 12:
+                return dt.date()
+        except ValueError:
+            continue
+
+    dt = dateparser.parse(clean_text, languages=['fr'], settings=settings)
+    if dt:
+        # Ensure the date is within reasonable bounds
+        if 1900 <= dt.year <= 2100 and 1 <= dt.month <= 12:
+            return dt.date()
+
+    return None  # No valid date found
+
+
+@lru_cache(maxsize=FIELD_PARSER_CACHE_SIZE)
+def parse_date_try(text):
+    text = text.strip()
+    # Skip if text is too short or doesn't contain digits
+    if len(text) < 3 or not any(c.isdigit() for c in text):
+        return None
+
+    # For very short texts, ensure they look like dates (contain / or - or .)
+    if len(text) < 5 and not any(sep in text for sep in ['/', '-', '.']):
+        return None
+
+    # Clean the text (keep only date-like patterns)
+    clean_text = _NOT_DATE_CHARS.sub(' ', text.lower())
+    clean_text = _SPACES.sub(' ', clean_text).strip()
+
+    parsed = _tokenized_date(clean_text)
+    if parsed is _UNDECIDED:
+        return _dateparser_date(clean_text)
+    return parsed
@@ -0,0 +1,199 @@
+"""
+Speculative background OCR of uploaded documents
+
+The preview endpoints (/upload-basic, /pdf-page-previews, /upload-for-dataprep)
+schedule the OCR of the pages the user is likely to extract next. The boxes land
+in the OCR cache under the key of the later call (same profile, render scale and
+OCR parameters as extract_document or /upload-for-dataprep), so that call is a
+cache hit. Prefetching only runs while no interactive OCR request is running or
+waiting, one page at a time, and is dropped for documents that are deleted.
+"""
+import asyncio
+import logging
+import os
+from collections import OrderedDict
+from typing import Any, Dict, Iterable, Optional, Tuple
+
+from documents.document_render import pdf_page_count, render_image_array, render_pdf_page_array, standard_size
+from documents.document_store import KIND_IMAGE, KIND_PDF, DocumentInput, document_kind
+from ocr.ocr_admission import OcrAdmissionController, ocr_admission
+from ocr.ocr_cache import make_cache_key, ocr_cache
+from ocr.ocr_config import OCR_TEXT_LAYER_ENABLED
+from ocr.ocr_pipeline import get_page_boxes
+from ocr.ocr_pool import OcrWorkerPool, ocr_pool
+from ocr.ocr_profiles import OcrProfile, get_profile
+from ocr.ocr_text_layer import pdf_text_layer_boxes
+from services.extraction_service import extraction_page_scale, extraction_render_scale
+
+OCR_PREFETCH_ENABLED = os.getenv("OCR_PREFETCH_ENABLED", "true").lower() == "true"
+OCR_PREFETCH_PAGES = max(0, int(os.getenv("OCR_PREFETCH_PAGES", "2")))  # Pages suivantes préchargées en DataPrep
+OCR_PREFETCH_MAX_PENDING = max(1, int(os.getenv("OCR_PREFETCH_MAX_PENDING", "32")))  # Pages en attente max
+OCR_PREFETCH_IDLE_POLL = float(os.getenv("OCR_PREFETCH_IDLE_POLL", "0.05"))  # Vérification de l'inactivité (s)
+
+# doc_id, page, profil, échelle de rendu
+PrefetchKey = Tuple[str, int, str, float]
+
+
+class OcrPrefetcher:
+    """Low-priority queue of pages to OCR into the cache while the engine is idle"""
+
+    def __init__(
+        self,
+        admission: OcrAdmissionController = ocr_admission,
+        pool: OcrWorkerPool = ocr_pool,
+        max_pending: int = OCR_PREFETCH_MAX_PENDING,
+        enabled: bool = OCR_PREFETCH_ENABLED,
+    ):
+        self.admission = admission
+        self.pool = pool
+        self.max_pending = max_pending
+        self.enabled = enabled
+        self._pending: "OrderedDict[PrefetchKey, Tuple[DocumentInput, OcrProfile]]" = OrderedDict()
+        self._current: Optional[PrefetchKey] = None
+        self._runner: Optional[asyncio.Task] = None
+        self._page_task: Optional[asyncio.Task] = None
+        self._page_cancelled = False
+        self._wakeup: Optional[asyncio.Event] = None
+        self._counters = {"scheduled": 0, "prefetched": 0, "skipped": 0, "dropped": 0, "cancelled": 0, "errors": 0}
+
+    def _is_idle(self) -> bool:
+        """No interactive OCR request running or waiting, nothing queued in the pool"""
+        return self.admission.load == 0 and self.pool.stats()["queued"] == 0
+
+    def schedule(
+        self,
+        document: DocumentInput,
+        pages: Iterable[int],
+        profile: Optional[OcrProfile] = None,
+        page_scale: Optional[float] = None,
+    ) -> int:
+        """
+        Queue pages of a document for background OCR, returns the number of pages queued
+
+        Never blocks: pages beyond OCR_PREFETCH_MAX_PENDING are dropped.
+
+        Args:
+            profile: Profile of the call expected next (default: OCR_PROFILE)
+            page_scale: Render scale of that call (default: the extraction scale of the profile)
+        """
+        if not self.enabled or document_kind(document.filename) is None:
+            return 0
+        profile = profile or get_profile()
+        page_scale = extraction_page_scale(profile) if page_scale is None else page_scale
+        queued = 0
+        for page_index in pages:
+            key = (document.doc_id, page_index, profile.name, page_scale)
+            if page_index < 0 or key in self._pending or key == self._current:
+                continue
+            if len(self._pending) >= self.max_pending:
+                self._counters["dropped"] += 1
+                continue
+            self._pending[key] = (document, profile)
+            queued += 1
+        if queued:
+            self._counters["scheduled"] += queued
+            self._ensure_runner()
+            self._wakeup.set()
+        return queued
+
+    def cancel(self, doc_id: str) -> int:
+        """Drop the pending pages of a document and abort its page in progress"""
+        keys = [key for key in self._pending if key[0] == doc_id]
+        for key in keys:
+            del self._pending[key]
+        cancelled = len(keys)
+        if self._current and self._current[0] == doc_id and self._page_task is not None:
+            self._page_cancelled = True
+            self._page_task.cancel()
+            cancelled += 1
+        self._counters["cancelled"] += cancelled
+        return cancelled
+
+    async def shutdown(self) -> None:
+        """Drop every pending page and stop the runner"""
+        self._pending.clear()
+        if self._runner is not None:
+            self._runner.cancel()
+            self._runner = None
+
+    def _ensure_runner(self) -> None:
+        if self._runner is None or self._runner.done():
+            self._wakeup = asyncio.Event()
+            self._runner = asyncio.create_task(self._run())
+
+    async def _run(self) -> None:
+        while True:
+            if not self._pending:
+                self._wakeup.clear()
+                await self._wakeup.wait()
+                continue
+            # Céder la place aux requêtes interactives
+            if not self._is_idle():
+                await asyncio.sleep(OCR_PREFETCH_IDLE_POLL)
+                continue
+
+            key, (document, profile) = self._pending.popitem(last=False)
+            self._current = key
+            self._page_cancelled = False
+            self._page_task = asyncio.create_task(self._prefetch_page(document, key[1], profile, key[3]))
+            try:
+                await self._page_task
+            except asyncio.CancelledError:
+                # Seule l'annulation de la page par cancel() est absorbée, pas l'arrêt du runner
+                if not self._page_cancelled:
+                    self._page_task.cancel()
+                    raise
+            except Exception as e:
+                self._counters["errors"] += 1
+                logging.warning(f"OCR prefetch of page {key[1]} of {key[0]} failed: {e}")
+            finally:
+                self._current = None
+                self._page_task = None
+
+    async def _prefetch_page(
+        self, document: DocumentInput, page_index: int, profile: OcrProfile, page_scale: float
+    ) -> None:
+        """OCR one page into the cache, rendered and keyed like the call expected next"""
+        content = document.content
+        target_width, target_height = standard_size(page_scale)
+        kind = document_kind(document.filename)
+        if kind == KIND_PDF:
+            if page_index >= await asyncio.to_thread(pdf_page_count, content):
+                return
+            if OCR_TEXT_LAYER_ENABLED:
+                text_boxes = await asyncio.to_thread(
+                    pdf_text_layer_boxes, content, page_index, page_scale, target_width, target_height
+                )
+                if text_boxes is not None:
+                    self._counters["skipped"] += 1  # PDF numérique: pas d'OCR nécessaire
+                    return
+            render = render_pdf_page_array
+        elif kind == KIND_IMAGE and page_index == 0:
+            def render(data: bytes, _: int, width: int, height: int):
+                return render_image_array(data, width, height)
+        else:
+            return
+
+        render_scale = extraction_render_scale(document.filename, page_scale)
+        key = make_cache_key(document.doc_id, page_index, render_scale, profile.cache_params(page_scale))
+        if await ocr_cache.get_async(key) is not None:
+            self._counters["skipped"] += 1
+            return
+        image = await asyncio.to_thread(render, content, page_index, target_width, target_height)
+        await get_page_boxes(
+            document.doc_id, page_index, render_scale, lambda: image, profile=profile, page_scale=page_scale
+        )
+        self._counters["prefetched"] += 1
+
+    def stats(self) -> Dict[str, Any]:
+        """Counters and pending pages"""
+        return {
+            **self._counters,
+            "enabled": self.enabled,
+            "pending": len(self._pending),
+            "current": list(self._current) if self._current else None,
+        }
+
+
+# Shared prefetcher used by the preview endpoints
+ocr_prefetcher = OcrPrefetcher()
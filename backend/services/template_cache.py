@@ -0,0 +1,128 @@
+"""
+In-process cache of compiled templates (expanded search zones per field)
+"""
+import asyncio
+import logging
+import os
+import time
+from collections import OrderedDict
+from types import MappingProxyType
+from typing import Any, Dict, Mapping, NamedTuple, Optional, Tuple
+
+from database.config import AsyncSessionLocal
+from database.repositories import MappingRepository, TemplateRepository
+from services.field_extractors import search_expansion
+from services.template_coords import TEMPLATE_PAGE_SIZE, mapping_box
+
+# Cache bounds (the TTL limits staleness when several API processes are running)
+TEMPLATE_CACHE_TTL = float(os.getenv("TEMPLATE_CACHE_TTL", "300"))
+TEMPLATE_CACHE_SIZE = int(os.getenv("TEMPLATE_CACHE_SIZE", "256"))
+
+
+class CompiledTemplate(NamedTuple):
+    """Immutable view of a template ready for extraction"""
+    template_id: int
+    # field name -> (left, top, width, height) as fractions of the page
+    mappings: Mapping[str, Tuple[float, float, float, float]]
+    # field name -> expanded search rectangle (left, top, right, bottom) as fractions of the page
+    zones: Mapping[str, Tuple[float, float, float, float]]
+    loaded_at: float
+    # Profil OCR du template (None = profil par défaut)
+    ocr_profile: Optional[str] = None
+
+    def zones_at(self, width: float, height: float) -> Dict[str, Tuple[float, float, float, float]]:
+        """Search rectangles in pixels of a page image of width x height"""
+        return {
+            field_name: (left * width, top * height, right * width, bottom * height)
+            for field_name, (left, top, right, bottom) in self.zones.items()
+        }
+
+
+def compile_template(
+    template_id: int,
+    mappings: Dict[str, Tuple[float, float, float, float]],
+    ocr_profile: Optional[str] = None,
+) -> CompiledTemplate:
+    """Precompute the expanded search rectangle of every mapped field (normalized mappings)"""
+    page_width, page_height = TEMPLATE_PAGE_SIZE
+    zones = {}
+    for field_name, (left, top, width, height) in mappings.items():
+        expand_x, expand_y = search_expansion(field_name)
+        expand_x, expand_y = expand_x / page_width, expand_y / page_height
+        zones[field_name] = (
+            left - expand_x,
+            top - expand_y,
+            left + width + expand_x,
+            top + height + expand_y,
+        )
+    return CompiledTemplate(
+        template_id=template_id,
+        mappings=MappingProxyType(dict(mappings)),
+        zones=MappingProxyType(zones),
+        loaded_at=time.time(),
+        ocr_profile=ocr_profile,
+    )
+
+
+class TemplateCache:
+    """
+    LRU cache of compiled templates keyed by template id
+
+    Entries are invalidated by TemplateService when a template is saved or
+    deleted in this process; the TTL bounds staleness across processes.
+    """
+
+    def __init__(self, ttl_seconds: float = TEMPLATE_CACHE_TTL, max_size: int = TEMPLATE_CACHE_SIZE):
+        self.ttl_seconds = ttl_seconds
+        self.max_size = max_size
+        self._entries: "OrderedDict[int, CompiledTemplate]" = OrderedDict()
+        self._lock = asyncio.Lock()
+
+    async def _load(self, template_id: int) -> CompiledTemplate:
+        """Load all the mappings of a template in one query"""
+        async with AsyncSessionLocal() as session:
+            rows = await MappingRepository(session).get_by_template_id(template_id)
+            ocr_profile = await TemplateRepository(session).get_ocr_profile(template_id)
+        mappings = {}
+        for mapping, field_name in rows:
+            if field_name in mappings:
+                continue
+            mappings[field_name] = mapping_box(mapping)
+        return compile_template(template_id, mappings, ocr_profile)
+
+    async def get(self, template_id: Any) -> Optional[CompiledTemplate]:
+        """Return the compiled template, loading it on a miss (None if the id is invalid)"""
+        try:
+            template_id = int(template_id)
+        except (TypeError, ValueError):
+            return None
+
+        entry = self._entries.get(template_id)
+        if entry is not None and time.time() - entry.loaded_at < self.ttl_seconds:
+            self._entries.move_to_end(template_id)
+            return entry
+
+        async with self._lock:
+            entry = self._entries.get(template_id)
+            if entry is not None and time.time() - entry.loaded_at < self.ttl_seconds:
+                return entry
+            entry = await self._load(template_id)
+            self._entries[template_id] = entry
+            self._entries.move_to_end(template_id)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+            return entry
+
+    def invalidate(self, template_id: Any) -> None:
+        """Drop a template from the cache"""
+        try:
+            self._entries.pop(int(template_id), None)
+        except (TypeError, ValueError):
+            logging.debug(f"Ignoring invalidation of invalid template id {template_id}")
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+
+# Shared compiled-template cache
+template_cache = TemplateCache()
@@ -0,0 +1,62 @@
+"""
+Resolution-independent template coordinates
+
+Mappings are stored as fractions of the page width and height (mappings.normalized = 1),
+so the extraction can scale the zones to the resolution of any OCR profile. The API
+still exchanges pixels of the standardized image by default (units="px"), which is
+what the mapping editor displays; units="normalized" serves the stored values.
+Rows written before the migration hold pixels and are converted when read.
+"""
+from typing import Any, Dict, Optional, Tuple
+
+from documents.document_config import PDF_RENDER_SCALE
+from documents.document_render import standard_size
+
+UNITS_PX = "px"
+UNITS_NORMALIZED = "normalized"
+COORD_UNITS = (UNITS_PX, UNITS_NORMALIZED)
+
+# Image de référence des coordonnées en pixels (éditeur de mappings, 1190x1684)
+TEMPLATE_PAGE_SIZE = standard_size(PDF_RENDER_SCALE)
+
+Box = Tuple[float, float, float, float]
+
+
+def check_units(units: Optional[str]) -> str:
+    """
+    Validated coordinate units, px when not given
+
+    Raises:
+        ValueError: If the units are unknown
+    """
+    if not units:
+        return UNITS_PX
+    if units not in COORD_UNITS:
+        raise ValueError(f"Unités de coordonnées inconnues: {units} ({', '.join(COORD_UNITS)})")
+    return units
+
+
+def to_normalized(box: Box, page_size: Tuple[float, float] = TEMPLATE_PAGE_SIZE) -> Box:
+    """(left, top, width, height) in pixels of page_size -> fractions of the page"""
+    width, height = page_size
+    return box[0] / width, box[1] / height, box[2] / width, box[3] / height
+
+
+def to_pixels(box: Box, page_size: Tuple[float, float] = TEMPLATE_PAGE_SIZE) -> Box:
+    """(left, top, width, height) as fractions of the page -> pixels of page_size"""
+    width, height = page_size
+    return box[0] * width, box[1] * height, box[2] * width, box[3] * height
+
+
+def mapping_box(mapping: Any) -> Box:
+    """Normalized box of a Mapping row (rows not migrated yet hold pixels)"""
+    box = tuple(float(v) if v is not None else 0.0 for v in (mapping.left, mapping.top, mapping.width, mapping.height))
+    return box if mapping.normalized else to_normalized(box)
+
+
+def box_dict(box: Box, units: str = UNITS_PX) -> Dict[str, float]:
+    """API representation of a normalized box in the requested units"""
+    if units == UNITS_PX:
+        # Colonnes FLOAT: arrondi pour ne pas renvoyer 100.00000149 au lieu de 100
+        box = tuple(round(v, 2) for v in to_pixels(box))
+    return dict(zip(("left", "top", "width", "height"), box))
@@ -6,6 +6,9 @@ from typing import Dict, Any, Optional, List
 from sqlalchemy.ext.asyncio import AsyncSession
 from database.repositories import TemplateRepository, MappingRepository, FieldNameRepository
 from database.models import Template, Mapping
+from services.template_cache import template_cache
+from services.template_coords import UNITS_PX, box_dict, mapping_box, to_normalized
+from ocr.ocr_profiles import get_profile
 
 
 class TemplateService:
@@ -17,7 +20,9 @@ class TemplateService:
         self.mapping_repo = MappingRepository(session)
         self.field_repo = FieldNameRepository(session)
     
-    async def save_mapping(self, template_name: str, field_map: Dict[str, Any], current_user_id: int) -> bool:
+    async def save_mapping(
+        self, template_name: str, field_map: Dict[str, Any], current_user_id: int, units: str = UNITS_PX
+    ) -> bool:
         """
         Save field mappings to the database with user ownership check
         
@@ -25,6 +30,7 @@ class TemplateService:
             template_name: The name of the template to save mappings for
             field_map: Dictionary of field names to their data 
             current_user_id: User ID who is creating/updating the template
+            units: Units of the coordinates in field_map (px of the standardized image or normalized)
             
         Returns:
             bool: True if save was successful, False otherwise
@@ -80,14 +86,17 @@ class TemplateService:
                     field = await self.field_repo.get_by_name(field_name)
                     
                     if field:
+                        box = tuple(float(coords.get(k) or 0.0) for k in ('left', 'top', 'width', 'height'))
+                        if units == UNITS_PX:
+                            box = to_normalized(box)
                         mappings_data.append({
                             "template_id": template_id,
                             "field_id": field.id,
-                            "left": coords.get('left', 0.0),
-                            "top": coords.get('top', 0.0),
-                            "width": coords.get('width', 0.0),
-                            "height": coords.get('height', 0.0),
-                     
+                            "left": box[0],
+                            "top": box[1],
+                            "width": box[2],
+                            "height": box[3],
+                            "normalized": True,
                             "created_by": current_user_id
                         })
             
@@ -95,18 +104,22 @@ class TemplateService:
             if mappings_data:
                 await self.mapping_repo.create_mappings(mappings_data)
             
+            # 6. Drop the compiled version used by the extraction
+            template_cache.invalidate(template_id)
+            
             return True
             
         except Exception as e:
             await self.session.rollback()
             raise e
     
-    async def load_mapping(self, template_id: str) -> Dict[str, Any]:
+    async def load_mapping(self, template_id: str, units: str = UNITS_PX) -> Dict[str, Any]:
         """
         Load field mappings from the database using field names
         
         Args:
             template_id: The template ID to load mappings for
+            units: Units of the returned coordinates (px of the standardized image or normalized)
             
         Returns:
             Dict containing the mappings or error information
@@ -128,19 +141,14 @@ class TemplateService:
             field_map = {}
             for mapping, field_name in mappings:
                 try:
-                    field_map[field_name] = {
-                        'left': float(mapping.left) if mapping.left is not None else 0.0,
-                        'top': float(mapping.top) if mapping.top is not None else 0.0,
-                        'width': float(mapping.width) if mapping.width is not None else 0.0,
-                        'height': float(mapping.height) if mapping.height is not None else 0.0,
-                  
-                    }
+                    field_map[field_name] = box_dict(mapping_box(mapping), units)
                 except (ValueError, TypeError) as e:
                     # Log error but continue processing other fields
                     print(f"Error processing coordinates for field {field_name}: {e}")
             
             return {
                 "status": "success",
+                "units": units,
                 "mappings": {
                     template_id: field_map
                 }
@@ -192,6 +200,7 @@ class TemplateService:
             success = await self.template_repo.delete_template_and_mappings(template_id_int)
             
             if success:
+                template_cache.invalidate(template_id_int)
                 return {
                     "success": True,
                     "message": f"Template '{template_id}' and its mappings have been successfully deleted"
@@ -208,12 +217,54 @@ class TemplateService:
                 "message": f"Error deleting template: {str(e)}"
             }
     
-    async def get_all_templates(self, current_user_id: int) -> Dict[str, Any]:
+    async def set_ocr_profile(self, template_id: str, profile_name: Optional[str], current_user_id: int) -> Dict[str, Any]:
+        """
+        Set the OCR profile used to extract the invoices of a template
+
+        Args:
+            template_id: The template ID
+            profile_name: Name of the profile, empty to use the default profile
+            current_user_id: User ID who owns the template
+
+        Returns:
+            Dict containing the result of the update
+        """
+        try:
+            template_id_int = int(template_id)
+        except ValueError:
+            return {"success": False, "message": f"Invalid template ID: {template_id}"}
+
+        if profile_name:
+            try:
+                get_profile(profile_name)
+            except ValueError as e:
+                return {"success": False, "message": str(e)}
+
+        template = await self.template_repo.get_by_id(template_id_int)
+        if not template:
+            return {"success": False, "message": f"Template with ID {template_id} not found"}
+        if template.created_by != current_user_id:
+            return {"success": False, "message": "You don't have permission to modify this template"}
+
+        template.ocr_profile = profile_name or None
+        template.updated_at = datetime.utcnow()
+        self.session.add(template)
+        await self.session.commit()
+        template_cache.invalidate(template_id_int)
+        return {
+            "success": True,
+            "template_id": template_id_int,
+            "ocr_profile": template.ocr_profile,
+            "message": "Profil OCR mis à jour"
+        }
+
+    async def get_all_templates(self, current_user_id: int, units: str = UNITS_PX) -> Dict[str, Any]:
         """
         Get all templates and their mappings for the current user
         
         Args:
             current_user_id: User ID to get templates for
+            units: Units of the returned coordinates (px of the standardized image or normalized)
             
         Returns:
             Dict containing all templates and their mappings in the EXACT same format as the old code
@@ -236,19 +287,14 @@ class TemplateService:
                 
                 for mapping, field_name in mappings:
                     try:
-                        result[template.id]['fields'][field_name] = {
-                            'left': float(mapping.left) if mapping.left is not None else 0.0,
-                            'top': float(mapping.top) if mapping.top is not None else 0.0,
-                            'width': float(mapping.width) if mapping.width is not None else 0.0,
-                            'height': float(mapping.height) if mapping.height is not None else 0.0,
-                         
-                        }
+                        result[template.id]['fields'][field_name] = box_dict(mapping_box(mapping), units)
                     except (ValueError, TypeError) as e:
                         # Log error but continue processing other fields
                         print(f"Error processing coordinates for field {field_name}: {e}")
             
             return {
                 "status": "success",
+                "units": units,
                 "mappings": result,
                 "count": sum(len(result[tid]['fields']) for tid in result),
                 "template_count": len(result)
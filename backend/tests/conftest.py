@@ -0,0 +1,16 @@
+"""
+Test setup: backend modules importable, throwaway SQLite database, no persistent OCR cache
+
+Run from backend/ with `python -m pytest tests` (requires pytest and aiosqlite).
+"""
+import os
+import sys
+import tempfile
+
+# Avant tout import de database.config (qui lit DATABASE_URL à l'import)
+_TEST_DIR = tempfile.mkdtemp(prefix="ocr-tests-")
+os.environ.setdefault("DATABASE_URL", f"sqlite:///{os.path.join(_TEST_DIR, 'tests.db')}")
+os.environ.setdefault("OCR_CACHE_DIR", os.path.join(_TEST_DIR, "ocr-cache"))
+os.environ.setdefault("DOCUMENT_STORE_DIR", os.path.join(_TEST_DIR, "documents"))
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,122 @@
+"""
+GET /documents/{doc_id}/pages/{n}: binary images, ETag revalidation, size
+variants and ownership, on a temporary store
+"""
+from io import BytesIO
+
+import pymupdf as fitz
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+from PIL import Image
+
+from auth.auth_jwt import require_comptable_or_admin
+from documents import document_routes
+from documents.document_render import render_page_variant, standard_size
+from documents.document_routes import _etag_matches, router
+from documents.document_store import DocumentStore
+
+
+def pdf_bytes(pages=2):
+    doc = fitz.open()
+    for n in range(pages):
+        doc.new_page(width=300, height=400).insert_text((20, 40), f"Facture page {n + 1}")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+@pytest.fixture
+def store(tmp_path, monkeypatch):
+    store = DocumentStore(root=str(tmp_path), ttl_seconds=3600, disk_bytes=10_000_000,
+                          memory_bytes=1_000_000, max_file_bytes=5_000_000, cleanup_interval=3600)
+    monkeypatch.setattr(document_routes, "document_store", store)
+    return store
+
+
+@pytest.fixture
+def user():
+    return {"id": 1, "role": "comptable"}
+
+
+@pytest.fixture
+def client(store, user):
+    app = FastAPI()
+    app.include_router(router)
+    app.dependency_overrides[require_comptable_or_admin] = lambda: user
+    return TestClient(app)
+
+
+@pytest.fixture
+def doc_id(store):
+    return store.put(pdf_bytes(), "facture.pdf", owner_id=1).doc_id
+
+
+def open_image(response):
+    return Image.open(BytesIO(response.content))
+
+
+def test_page_is_served_as_binary_with_cache_headers(client, doc_id):
+    response = client.get(f"/documents/{doc_id}/pages/1", params={"format": "png"})
+    assert response.status_code == 200
+    assert response.headers["content-type"] == "image/png"
+    assert response.headers["cache-control"].startswith("private")
+    assert open_image(response).size == (600, 800)
+
+    etag = response.headers["etag"]
+    again = client.get(f"/documents/{doc_id}/pages/1", params={"format": "png"}, headers={"If-None-Match": etag})
+    assert again.status_code == 304 and again.content == b""
+    assert again.headers["etag"] == etag
+
+
+def test_render_options_change_the_etag(client, doc_id):
+    url = f"/documents/{doc_id}/pages/0"
+    etags = {client.get(url, params=params).headers["etag"] for params in (
+        {}, {"size": "preview"}, {"width": 120}, {"format": "png"}, {"quality": 50},
+    )}
+    assert len(etags) == 5
+    assert client.get(f"/documents/{doc_id}/pages/1").headers["etag"] not in etags
+
+
+@pytest.mark.parametrize("params, expected", [
+    ({"size": "preview", "format": "jpg"}, ("image/jpeg", (300, 400))),
+    ({"size": "standard", "format": "webp"}, ("image/webp", standard_size(2))),
+    ({"size": "full", "width": 150, "format": "png"}, ("image/png", (150, 200))),
+])
+def test_size_variants(client, doc_id, params, expected):
+    response = client.get(f"/documents/{doc_id}/pages/0", params=params)
+    assert (response.headers["content-type"], open_image(response).size) == expected
+
+
+@pytest.mark.parametrize("params", [{"format": "gif"}, {"size": "huge"}, {"quality": 0}, {"width": 0}])
+def test_invalid_options_are_rejected(client, doc_id, params):
+    assert client.get(f"/documents/{doc_id}/pages/0", params=params).status_code == 400
+
+
+def test_unknown_page_or_document_is_404(client, doc_id):
+    assert client.get(f"/documents/{doc_id}/pages/2").status_code == 404
+    # Même avec If-None-Match: pas de 304 immuable pour une page qui n'existe pas
+    assert client.get(f"/documents/{doc_id}/pages/2", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get(f"/documents/{doc_id}/pages/-1", headers={"If-None-Match": "*"}).status_code == 404
+    assert client.get(f"/documents/{'0' * 64}/pages/0").status_code == 404
+
+
+def test_other_users_get_404_even_with_a_valid_etag(client, doc_id, user):
+    etag = client.get(f"/documents/{doc_id}/pages/0").headers["etag"]
+    user["id"] = 2
+    assert client.get(f"/documents/{doc_id}/pages/0").status_code == 404
+    assert client.get(f"/documents/{doc_id}/pages/0", headers={"If-None-Match": etag}).status_code == 404
+
+
+def test_etag_matching():
+    assert _etag_matches('"a", "b"', '"b"')
+    assert _etag_matches("*", '"b"')
+    assert not _etag_matches('"a"', '"b"')
+    assert not _etag_matches(None, '"b"')
+
+
+def test_images_are_rendered_as_before_for_image_documents():
+    buffer = BytesIO()
+    Image.new("RGB", (400, 100), (10, 20, 30)).save(buffer, format="PNG")
+    img = render_page_variant(buffer.getvalue(), False, 0, "full", 2, max_width=200)
+    assert img.size == (200, 50) and img.getpixel((100, 25)) == (10, 20, 30)
@@ -0,0 +1,126 @@
+"""
+Streamed page previews: event order, one PDF open per stream, no page work
+before the meta event, and the PDF closed when the client goes away
+"""
+import asyncio
+import base64
+import json
+import time
+from io import BytesIO
+
+import pymupdf as fitz
+import pytest
+from PIL import Image
+
+from documents import document_previews
+from documents.document_previews import STREAM_NDJSON, STREAM_SSE, stream_page_previews
+
+
+def pdf_bytes(sizes):
+    doc = fitz.open()
+    for width, height in sizes:
+        doc.new_page(width=width, height=height).insert_text((20, 40), "Facture")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+PDF = pdf_bytes([(595, 842), (842, 595), (300, 400), (595, 842), (200, 200)])
+
+
+@pytest.fixture
+def opened(monkeypatch):
+    """Documents opened by the preview streams"""
+    documents = []
+    open_document = document_previews._PreviewDocument.__init__
+
+    def tracking_init(self, file_content):
+        open_document(self, file_content)
+        documents.append(self)
+
+    monkeypatch.setattr(document_previews._PreviewDocument, "__init__", tracking_init)
+    return documents
+
+
+def closed(document, timeout=5.0):
+    """The PDF is closed in the preview pool once the stream ends"""
+    end = time.monotonic() + timeout
+    while not document.doc.is_closed and time.monotonic() < end:
+        time.sleep(0.01)
+    return document.doc.is_closed
+
+
+def collect(events, limit=None):
+    async def main():
+        lines = []
+        async for line in events:
+            lines.append(json.loads(line))
+            if limit is not None and len(lines) >= limit:
+                await events.aclose()
+                break
+        return lines
+    return asyncio.run(main())
+
+
+def test_ndjson_stream_renders_pages_in_order(opened):
+    events = collect(stream_page_previews(PDF, "doc", STREAM_NDJSON, first_page=1, last_page=3, width=150))
+    assert [e["event"] for e in events] == ["meta", "page", "page", "page", "done"]
+    assert events[0] == {"event": "meta", "doc_id": "doc", "total_pages": 5, "first_page": 1, "last_page": 3}
+    assert [e["page_number"] for e in events[1:4]] == [1, 2, 3]
+    for event in events[1:4]:
+        header, data = event["image"].split(",", 1)
+        img = Image.open(BytesIO(base64.b64decode(data)))
+        assert header == "data:image/jpeg;base64"
+        assert (img.width, img.height) == (event["width"], event["height"])
+        assert event["width"] <= 150
+    assert len(opened) == 1 and closed(opened[0])
+
+
+def test_url_mode_sizes_pages_without_rendering(opened, monkeypatch):
+    def no_render(*args, **kwargs):
+        raise AssertionError("url mode must not render pages")
+
+    monkeypatch.setattr(document_previews, "pdf_page_variant", no_render)
+    events = collect(stream_page_previews(PDF, "doc", STREAM_NDJSON, width=400, image_url=lambda n: f"/p/{n}"))
+    pages = events[1:-1]
+    assert [(p["image"], p["width"], p["height"]) for p in pages] == [
+        ("/p/0", 400, 566), ("/p/1", 400, 283), ("/p/2", 300, 400), ("/p/3", 400, 566), ("/p/4", 200, 200),
+    ]
+    assert events[-1] == {"event": "done", "pages": 5}
+    assert len(opened) == 1 and closed(opened[0])
+
+
+def test_meta_is_sent_before_any_page_is_loaded(opened, monkeypatch):
+    loaded = []
+    preview_size = document_previews._PreviewDocument.preview_size
+
+    def tracking_size(self, page_index, width):
+        loaded.append(page_index)
+        return preview_size(self, page_index, width)
+
+    monkeypatch.setattr(document_previews._PreviewDocument, "preview_size", tracking_size)
+
+    async def main():
+        events = stream_page_previews(PDF, "doc", STREAM_NDJSON, image_url=lambda n: f"/p/{n}")
+        meta = json.loads(await events.__anext__())
+        pages_loaded = list(loaded)
+        await events.aclose()
+        return meta, pages_loaded
+
+    meta, pages_loaded = asyncio.run(main())
+    assert meta["event"] == "meta" and pages_loaded == []
+
+
+def test_client_disconnect_closes_the_pdf(opened):
+    events = collect(stream_page_previews(PDF, "doc", STREAM_NDJSON), limit=2)
+    assert [e["event"] for e in events] == ["meta", "page"]
+    assert closed(opened[0])
+
+
+def test_sse_format():
+    async def main():
+        return [line async for line in stream_page_previews(PDF, "doc", STREAM_SSE, last_page=0)]
+
+    events = asyncio.run(main())
+    assert events[0].startswith(b"event: meta\ndata: {")
+    assert events[-1] == b'event: done\ndata: {"pages": 1}\n\n'
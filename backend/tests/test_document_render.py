@@ -0,0 +1,108 @@
+"""
+Standardized page arrays: fit size, centering on a white canvas, and the same
+result as the former PNG round-trip within resampling noise
+"""
+from io import BytesIO
+
+import numpy as np
+import pymupdf as fitz
+import pytest
+from PIL import Image
+
+from documents.document_render import (
+    fit_size,
+    page_pixel_size,
+    page_to_image,
+    pdf_page_count,
+    pdf_to_images,
+    render_image_array,
+    render_pdf_page_array,
+    standard_size,
+)
+
+TARGET = standard_size(2)
+
+
+def pdf_bytes(sizes):
+    doc = fitz.open()
+    for width, height in sizes:
+        page = doc.new_page(width=width, height=height)
+        # Page entièrement noire: les marges blanches viennent uniquement du canvas
+        page.draw_rect(page.rect, color=(0, 0, 0), fill=(0, 0, 0))
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def png_bytes(width, height, color=(0, 0, 0)):
+    buffer = BytesIO()
+    Image.new("RGB", (width, height), color).save(buffer, format="PNG")
+    return buffer.getvalue()
+
+
+def content_box(array):
+    """Bounding box (x0, y0, x1, y1) of the non-white pixels"""
+    ys, xs = np.nonzero(array.min(axis=2) < 128)
+    return xs.min(), ys.min(), xs.max() + 1, ys.max() + 1
+
+
+def test_standard_and_fit_sizes():
+    assert TARGET == (1190, 1684)
+    assert fit_size(595, 842, *TARGET) == (1190, 1684)
+    assert fit_size(842, 595, *TARGET) == (1190, 840)
+    assert fit_size(100, 1000, *TARGET) == (168, 1684)
+
+
+def test_a4_page_fills_the_canvas():
+    array = render_pdf_page_array(pdf_bytes([(595, 842)]), 0, *TARGET)
+    assert array.shape == (TARGET[1], TARGET[0], 3) and array.dtype == np.uint8
+    x0, y0, x1, y1 = content_box(array)
+    assert (x0, x1) == (0, TARGET[0])
+    assert abs((y1 - y0) - TARGET[1]) <= 1
+
+
+def test_landscape_page_is_centered_vertically():
+    array = render_pdf_page_array(pdf_bytes([(595, 842), (842, 595)]), 1, *TARGET)
+    x0, y0, x1, y1 = content_box(array)
+    assert (x0, x1) == (0, TARGET[0])
+    assert abs((y1 - y0) - 840) <= 1
+    assert abs(y0 - (TARGET[1] - y1)) <= 1
+    assert (array[:y0 - 1] == 255).all() and (array[y1 + 1:] == 255).all()
+
+
+def test_image_is_fitted_and_centered():
+    array = render_image_array(png_bytes(100, 1000), *TARGET)
+    assert array.shape == (TARGET[1], TARGET[0], 3)
+    x0, y0, x1, y1 = content_box(array)
+    assert (y0, y1) == (0, TARGET[1])
+    assert x1 - x0 == 168 and x0 == (TARGET[0] - 168) // 2
+
+
+def test_pdf_render_matches_png_round_trip():
+    content = pdf_bytes([(300, 400)])
+    doc = fitz.open(stream=content, filetype="pdf")
+    png = doc.load_page(0).get_pixmap(matrix=fitz.Matrix(2, 2)).tobytes("png")
+    doc.close()
+    expected = render_image_array(png, *TARGET)
+    actual = render_pdf_page_array(content, 0, *TARGET)
+    assert actual.shape == expected.shape
+    # Même boîte de contenu au pixel près (seul le rééchantillonnage diffère)
+    assert np.abs(np.array(content_box(actual)) - np.array(content_box(expected))).max() <= 1
+
+
+def test_preview_helpers():
+    content = pdf_bytes([(595, 842), (200, 300)])
+    assert pdf_page_count(content) == 2
+    images = pdf_to_images(content, 1.5)
+    doc = fitz.open(stream=content, filetype="pdf")
+    try:
+        for page, img in zip(doc, images):
+            assert page_pixel_size(page, 1.5) == img.size == page_to_image(page, 1.5).size
+    finally:
+        doc.close()
+    assert [img.size for img in images] == [(893, 1263), (300, 450)]
+
+
+def test_out_of_range_page_raises():
+    with pytest.raises(Exception):
+        render_pdf_page_array(pdf_bytes([(595, 842)]), 3, *TARGET)
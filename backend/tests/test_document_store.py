@@ -0,0 +1,148 @@
+"""
+DocumentStore on a temporary directory: content addressing, concurrent puts of
+the same bytes, disk accounting, TTL and quota eviction
+"""
+import hashlib
+import os
+import threading
+
+import pymupdf as fitz
+import pytest
+
+from documents.document_store import KIND_IMAGE, KIND_PDF, DocumentStore
+
+
+def pdf_bytes(pages=2):
+    doc = fitz.open()
+    for n in range(pages):
+        doc.new_page().insert_text((72, 72), f"Facture page {n + 1}")
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def disk_files(root):
+    return sorted(name for _, _, files in os.walk(root) for name in files)
+
+
+@pytest.fixture
+def store(tmp_path):
+    return DocumentStore(root=str(tmp_path), ttl_seconds=3600, disk_bytes=10_000_000,
+                         memory_bytes=1_000_000, max_file_bytes=5_000_000, cleanup_interval=3600)
+
+
+def test_put_is_content_addressed_and_deduplicated(store):
+    content = pdf_bytes(3)
+    first = store.put(content, "facture.pdf")
+    again = store.put(content, "copie.pdf")
+    assert first.doc_id == hashlib.sha256(content).hexdigest()
+    assert (first.kind, first.page_count, first.size) == (KIND_PDF, 3, len(content))
+    assert again == first
+    meta, stored = store.get(first.doc_id)
+    assert meta == first and stored == content
+    assert store.stats()["uploads"] == 1 and store.stats()["deduplicated"] == 1
+
+
+def test_put_rejects_unsupported_and_unreadable_files(store):
+    with pytest.raises(ValueError):
+        store.put(b"hello", "notes.txt")
+    with pytest.raises(ValueError):
+        store.put(b"not a pdf", "broken.pdf")
+    with pytest.raises(ValueError):
+        store.put(b"x" * (store.max_file_bytes + 1), "huge.png")
+
+
+@pytest.mark.parametrize("attempt", range(5))
+def test_concurrent_puts_of_the_same_document_succeed(store, attempt):
+    content = os.urandom(2_000_000)
+    barrier = threading.Barrier(8)
+    results, errors = [], []
+
+    def upload():
+        barrier.wait()
+        try:
+            results.append(store.put(content, "scan.png"))
+        except Exception as e:
+            errors.append(e)
+
+    threads = [threading.Thread(target=upload) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert errors == []
+    assert len({document.doc_id for document in results}) == 1
+    doc_id = results[0].doc_id
+    # Aucun fichier temporaire laissé, fichier compté une seule fois
+    assert disk_files(store.root) == [f"{doc_id}.bin", f"{doc_id}.json"]
+    assert store.stats()["disk_bytes"] == len(content)
+    assert store.get(doc_id)[1] == content
+
+
+def test_expired_documents_are_not_served(store):
+    document = store.put(os.urandom(1000), "scan.png")
+    store.ttl_seconds = -1
+    assert store.get(document.doc_id) is None
+    assert disk_files(store.root) == []
+
+
+def test_quota_evicts_least_recently_used(store):
+    store.disk_bytes = 2500
+    old = store.put(os.urandom(1000), "old.png")
+    last_access = os.path.getmtime(store._data_path(old.doc_id)) - 100
+    os.utime(store._data_path(old.doc_id), (last_access, last_access))
+    recent = store.put(os.urandom(1000), "recent.png")
+    new = store.put(os.urandom(1000), "new.jpg")
+    assert store.get_meta(old.doc_id) is None
+    assert store.get_meta(recent.doc_id) is not None
+    assert store.get_meta(new.doc_id).kind == KIND_IMAGE
+    stats = store.stats()
+    assert stats["evictions"] == 1 and stats["disk_bytes"] == 2000
+
+
+def test_delete(store):
+    document = store.put(os.urandom(1000), "scan.png")
+    assert store.delete(document.doc_id)
+    assert not store.delete(document.doc_id)
+    assert store.get(document.doc_id) is None
+    assert store.stats()["disk_bytes"] == 0
+
+
+def test_stats_use_running_totals(store, monkeypatch):
+    kept = store.put(os.urandom(1000), "kept.png")
+    removed = store.put(os.urandom(500), "removed.png")
+    store.put(os.urandom(1000), "kept.png")
+    store.put(store.get(kept.doc_id)[1], "dup.png")  # Doublon: ni document ni octet en plus
+
+    def no_walk():
+        raise AssertionError("stats() must not walk the store directory")
+
+    monkeypatch.setattr(store, "_entries", no_walk)
+    store.delete(removed.doc_id)
+    stats = store.stats()
+    assert (stats["documents"], stats["disk_bytes"]) == (2, 2000)
+    monkeypatch.undo()
+    store.cleanup()
+    assert (store.stats()["documents"], store.stats()["disk_bytes"]) == (2, 2000)
+
+
+def test_documents_are_only_resolved_for_their_owners(store):
+    content = os.urandom(1000)
+    document = store.put(content, "scan.png", owner_id=1)
+    assert document.owners == (1,)
+    assert store.get(document.doc_id, 2) is None
+    assert store.get_meta(document.doc_id, 2) is None
+    assert not store.delete(document.doc_id, 2)
+    assert store.get(document.doc_id, 1)[1] == content
+    assert "owners" not in document.public_dict()
+
+    # Même contenu envoyé par un second utilisateur: un seul fichier, deux propriétaires
+    shared = store.put(content, "copie.png", owner_id=2)
+    assert shared.doc_id == document.doc_id and shared.owners == (1, 2)
+    assert store.get(document.doc_id, 2)[1] == content
+    assert store.delete(document.doc_id, 1)
+    assert store.get_meta(document.doc_id, 1) is None
+    assert store.get_meta(document.doc_id, 2).owners == (2,)
+    assert store.delete(document.doc_id, 2)
+    assert disk_files(store.root) == []
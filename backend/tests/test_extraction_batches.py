@@ -0,0 +1,126 @@
+"""
+Extraction batches: results streamed as they finish, failures reported per
+item, late subscribers replaying the log, duplicates flagged once at the end
+"""
+import asyncio
+import json
+
+from ocr.ocr_admission import OcrAdmissionController
+from services.extraction_batches import ExtractionBatchManager
+
+
+def make_manager(monkeypatch, duplicates=()):
+    manager = ExtractionBatchManager(concurrency=4, admission=OcrAdmissionController(max_in_flight=8, max_waiting=8))
+    checked = []
+
+    async def check_duplicates(batch):
+        checked.append([r["data"] for r in batch.results])
+        return list(duplicates)
+
+    monkeypatch.setattr(manager, "_check_duplicates", check_duplicates)
+    return manager, checked
+
+
+def items_for(documents):
+    return [{"index": i, "doc_id": f"doc{i}", "filename": f"f{i}.pdf"} for i in range(len(documents))]
+
+
+async def read(batch, kind="ndjson"):
+    return [json.loads(line) async for line in batch.subscribe(kind)]
+
+
+def test_results_are_streamed_in_completion_order(monkeypatch):
+    manager, checked = make_manager(monkeypatch)
+    delays = [0.05, 0.01, 0.03]
+
+    async def extract(index):
+        await asyncio.sleep(delays[index])
+        return {"success": True, "data": {"numeroFacture": str(index)}}
+
+    async def main():
+        batch = manager.create([0, 1, 2], items_for(delays), extract, user_id=1)
+        return batch, await read(batch)
+
+    batch, events = asyncio.run(main())
+    assert [e["event"] for e in events] == ["batch", "result", "result", "result", "done"]
+    assert [e["index"] for e in events[1:4]] == [1, 2, 0]
+    assert events[1]["filename"] == "f1.pdf" and events[1]["elapsed"] >= 0
+    summary = events[-1]
+    assert (summary["total"], summary["succeeded"], summary["failed"], summary["done"]) == (3, 3, 0, True)
+    assert checked == [[{"numeroFacture": "0"}, {"numeroFacture": "1"}, {"numeroFacture": "2"}]]
+    assert manager.get(batch.batch_id) is batch
+
+
+def test_a_failing_item_does_not_stop_the_batch(monkeypatch):
+    manager, _ = make_manager(monkeypatch)
+
+    async def extract(index):
+        if index == 1:
+            raise RuntimeError("PDF illisible")
+        return {"success": True, "data": {}}
+
+    async def main():
+        batch = manager.create([0, 1, 2], items_for([0, 1, 2]), extract, user_id=1)
+        return await read(batch)
+
+    events = asyncio.run(main())
+    failed = [e for e in events if e["event"] == "result" and not e["success"]]
+    assert len(failed) == 1 and failed[0]["index"] == 1
+    assert "PDF illisible" in failed[0]["data"]["error"]
+    assert (events[-1]["succeeded"], events[-1]["failed"]) == (2, 1)
+
+
+def test_late_subscribers_replay_every_event(monkeypatch):
+    manager, _ = make_manager(monkeypatch, duplicates=[0])
+
+    async def extract(index):
+        return {"success": True, "data": {}}
+
+    async def main():
+        batch = manager.create([0, 1], items_for([0, 1]), extract, user_id=1)
+        live = await read(batch)
+        assert batch.done
+        return batch, live, await read(batch), [line async for line in batch.subscribe("sse")]
+
+    batch, live, replay, sse = asyncio.run(main())
+    assert replay == live
+    assert [e["event"] for e in live] == ["batch", "result", "result", "duplicates", "done"]
+    assert live[3]["indices"] == [0] and live[-1]["duplicates"] == [0]
+    assert batch.results[0]["data"]["isDuplicate"] and "isDuplicate" not in batch.results[1]["data"]
+    assert sse[0].startswith(b"event: batch\ndata: ") and sse[-1].startswith(b"event: done\ndata: ")
+
+
+def test_concurrency_is_shared_between_batches(monkeypatch):
+    manager, _ = make_manager(monkeypatch)
+    running, peak = [0], [0]
+
+    async def extract(index):
+        running[0] += 1
+        peak[0] = max(peak[0], running[0])
+        await asyncio.sleep(0.01)
+        running[0] -= 1
+        return {"success": True, "data": {}}
+
+    async def main():
+        batches = [manager.create(list(range(6)), items_for(range(6)), extract, user_id=1) for _ in range(3)]
+        await asyncio.gather(*(read(batch) for batch in batches))
+
+    asyncio.run(main())
+    assert peak[0] == manager.concurrency
+
+
+def test_finished_batches_expire(monkeypatch):
+    manager, _ = make_manager(monkeypatch)
+    manager.result_ttl = -1
+
+    async def extract(index):
+        return {"success": True, "data": {}}
+
+    async def main():
+        first = manager.create([0], items_for([0]), extract, user_id=1)
+        await read(first)
+        manager.create([0], items_for([0]), extract, user_id=1)
+        return first
+
+    first = asyncio.run(main())
+    assert manager.get(first.batch_id) is None
@@ -0,0 +1,228 @@
+"""
+Extraction job queue against SQLite: claim, complete, fail with retry, expired
+leases, and drain runs of ExtractionWorker with a stubbed extract_document or OCR step
+"""
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+from sqlalchemy import select
+
+from database.config import AsyncSessionLocal, async_engine
+from database.models import JOB_FAILED, JOB_QUEUED, JOB_RUNNING, JOB_SUCCEEDED, ExtractionJob
+from database.repositories import ExtractionJobRepository
+from services import extraction_jobs, extraction_service
+from services.extraction_jobs import ExtractionWorker
+
+USER_ID = 1
+
+
+def run(coro):
+    """Run a test coroutine on its own loop, then release the pooled connections of that loop"""
+    async def main():
+        try:
+            return await coro
+        finally:
+            await async_engine.dispose()
+    return asyncio.run(main())
+
+
+@pytest.fixture(autouse=True)
+def jobs_table():
+    async def reset():
+        async with async_engine.begin() as connection:
+            await connection.run_sync(ExtractionJob.__table__.drop, checkfirst=True)
+            await connection.run_sync(ExtractionJob.__table__.create)
+    run(reset())
+
+
+async def enqueue(*jobs):
+    """Create jobs from (filename, priority, max_attempts), returns their ids"""
+    async with AsyncSessionLocal() as session:
+        created = await ExtractionJobRepository(session).create_many([
+            {
+                "doc_id": f"{i:064x}",
+                "filename": filename,
+                "document": b"%PDF-" + filename.encode(),
+                "priority": priority,
+                "max_attempts": max_attempts,
+                "created_by": USER_ID,
+            }
+            for i, (filename, priority, max_attempts) in enumerate(jobs)
+        ])
+        return [job.id for job in created]
+
+
+async def claim(worker_id, limit=10, lease_seconds=60.0):
+    async with AsyncSessionLocal() as session:
+        return await ExtractionJobRepository(session).claim(worker_id, limit, lease_seconds)
+
+
+async def job(job_id):
+    async with AsyncSessionLocal() as session:
+        return await ExtractionJobRepository(session).get_by_id(job_id)
+
+
+async def document_of(job_id):
+    async with AsyncSessionLocal() as session:
+        result = await session.execute(select(ExtractionJob.document).where(ExtractionJob.id == job_id))
+        return result.scalar_one()
+
+
+def test_claim_orders_by_priority_and_never_hands_a_job_twice():
+    async def scenario():
+        low, high, mid = await enqueue(("low.pdf", 0, 3), ("high.pdf", 5, 3), ("mid.pdf", 1, 3))
+        first = await claim("w1", limit=2)
+        second = await claim("w2", limit=2)
+        third = await claim("w3", limit=2)
+        return low, high, mid, first, second, third
+
+    low, high, mid, first, second, third = run(scenario())
+    assert [j.id for j in first] == [high, mid]
+    assert [j.id for j in second] == [low]
+    assert third == []
+    for claimed, worker_id in ((first[0], "w1"), (second[0], "w2")):
+        assert claimed.status == JOB_RUNNING
+        assert claimed.worker_id == worker_id
+        assert claimed.attempts == 1
+        assert claimed.lease_until > datetime.utcnow()
+        assert claimed.document.startswith(b"%PDF-")
+
+
+def test_claim_skips_jobs_not_yet_available():
+    async def scenario():
+        (job_id,) = await enqueue(("later.pdf", 0, 3))
+        async with AsyncSessionLocal() as session:
+            stored = await session.get(ExtractionJob, job_id)
+            stored.available_at = datetime.utcnow() + timedelta(hours=1)
+            await session.commit()
+        return await claim("w1")
+
+    assert run(scenario()) == []
+
+
+def test_complete_only_by_the_claiming_worker():
+    async def scenario():
+        ok, empty = await enqueue(("ok.pdf", 0, 3), ("empty.pdf", 0, 3))
+        await claim("w1")
+        async with AsyncSessionLocal() as session:
+            repo = ExtractionJobRepository(session)
+            stolen = await repo.complete(ok, "w2", '{"success": true}')
+            completed = await repo.complete(ok, "w1", '{"success": true}')
+            again = await repo.complete(ok, "w1", '{"success": true}')
+            no_result = await repo.complete(empty, "w1", '{"success": false}', "Aucune valeur HT")
+        return stolen, completed, again, no_result, await job(ok), await job(empty), await document_of(ok)
+
+    stolen, completed, again, no_result, ok, empty, content = run(scenario())
+    assert (stolen, completed, again, no_result) == (False, True, False, True)
+    assert ok.status == JOB_SUCCEEDED and ok.result == '{"success": true}' and ok.lease_until is None
+    assert content is None  # Contenu du fichier vidé une fois le job terminé
+    assert empty.status == JOB_FAILED and empty.error == "Aucune valeur HT"
+
+
+def test_fail_requeues_until_max_attempts():
+    async def scenario():
+        (job_id,) = await enqueue(("flaky.pdf", 0, 2))
+        states = []
+        for attempt in range(2):
+            claimed = await claim("w1")
+            assert [j.id for j in claimed] == [job_id]
+            async with AsyncSessionLocal() as session:
+                assert await ExtractionJobRepository(session).fail(job_id, "w1", f"boom {attempt}", 0)
+            states.append(await job(job_id))
+        return states, await claim("w1"), await document_of(job_id)
+
+    (retried, failed), leftover, content = run(scenario())
+    assert retried.status == JOB_QUEUED and retried.attempts == 1 and retried.error == "boom 0"
+    assert failed.status == JOB_FAILED and failed.attempts == 2 and failed.error == "boom 1"
+    assert failed.finished_at is not None and content is None
+    assert leftover == []
+
+
+def test_fail_delays_the_retry_and_ignores_other_workers():
+    async def scenario():
+        (job_id,) = await enqueue(("slow.pdf", 0, 3))
+        await claim("w1")
+        async with AsyncSessionLocal() as session:
+            repo = ExtractionJobRepository(session)
+            other = await repo.fail(job_id, "w2", "not mine", 0)
+            mine = await repo.fail(job_id, "w1", "boom", 60)
+        return other, mine, await job(job_id), await claim("w1")
+
+    other, mine, queued, claimed = run(scenario())
+    assert (other, mine) == (False, True)
+    assert queued.status == JOB_QUEUED
+    assert queued.available_at > datetime.utcnow() + timedelta(seconds=50)
+    assert claimed == []
+
+
+def test_requeue_expired_leases():
+    async def scenario():
+        retry, last = await enqueue(("retry.pdf", 1, 3), ("last.pdf", 0, 1))
+        # Bail déjà expiré: le worker est considéré comme mort
+        await claim("dead", lease_seconds=-1)
+        async with AsyncSessionLocal() as session:
+            changed = await ExtractionJobRepository(session).requeue_expired()
+        return changed, await job(retry), await job(last), [j.id for j in await claim("w2")]
+
+    changed, retry, last, reclaimed = run(scenario())
+    assert changed == 2
+    assert retry.status == JOB_QUEUED and retry.lease_until is None
+    assert last.status == JOB_FAILED and last.error == "Worker lease expired"
+    assert reclaimed == [retry.id]
+
+
+def test_worker_drain_with_stubbed_extraction(monkeypatch):
+    calls = []
+
+    async def fake_extract_document(document, template_id, *args, **kwargs):
+        calls.append(document.filename)
+        if document.filename == "crash.pdf" and calls.count("crash.pdf") == 1:
+            raise RuntimeError("OCR worker crashed")
+        if document.filename == "empty.pdf":
+            return {"success": False, "data": {}, "message": "Aucune valeur HT trouvée"}
+        return {"success": True, "data": {"montantHT": 100.0, "numFacture": "FA-1"}}
+
+    monkeypatch.setattr(extraction_jobs, "extract_document", fake_extract_document)
+    monkeypatch.setattr(extraction_jobs, "JOB_RETRY_DELAY", 0)
+
+    async def scenario():
+        ok, crash, empty = await enqueue(("ok.pdf", 0, 3), ("crash.pdf", 0, 3), ("empty.pdf", 0, 3))
+        worker = ExtractionWorker(worker_id="w1", concurrency=2, poll_interval=0.01)
+        await asyncio.wait_for(worker.run(drain=True), timeout=30)
+        async with AsyncSessionLocal() as session:
+            counts = await ExtractionJobRepository(session).count_by_status()
+        return worker, await job(ok), await job(crash), await job(empty), counts
+
+    worker, ok, crash, empty, counts = run(scenario())
+    assert sorted(calls) == ["crash.pdf", "crash.pdf", "empty.pdf", "ok.pdf"]
+    assert worker.processed == 4
+    assert ok.status == JOB_SUCCEEDED and '"numeroFacture": "FA-1"' in ok.result
+    assert crash.status == JOB_SUCCEEDED and crash.attempts == 2
+    assert empty.status == JOB_FAILED and empty.error == "Aucune valeur HT trouvée"
+    assert counts == {JOB_SUCCEEDED: 2, JOB_FAILED: 1}
+
+
+def test_worker_retries_when_the_ocr_step_raises(monkeypatch):
+    calls = []
+
+    async def broken_get_page_boxes(*args, **kwargs):
+        calls.append(args[0])
+        raise RuntimeError("A process in the process pool was terminated abruptly")
+
+    monkeypatch.setattr(extraction_service, "get_page_boxes", broken_get_page_boxes)
+    monkeypatch.setattr(extraction_jobs, "JOB_RETRY_DELAY", 60)
+
+    async def scenario():
+        (job_id,) = await enqueue(("broken.pdf", 0, 3))
+        worker = ExtractionWorker(worker_id="w1", concurrency=1, poll_interval=0.01)
+        await asyncio.wait_for(worker.run(drain=True), timeout=30)
+        return await job(job_id), await document_of(job_id)
+
+    retried, content = run(scenario())
+    assert len(calls) == 1
+    # Exception de l'OCR: nouvelle tentative différée, pas un échec définitif
+    assert retried.status == JOB_QUEUED and retried.attempts == 1
+    assert "terminated abruptly" in retried.error
+    assert retried.available_at > datetime.utcnow() + timedelta(seconds=50)
+    assert content is not None
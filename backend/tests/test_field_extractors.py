@@ -0,0 +1,101 @@
+"""
+Field extractor registry: only mapped fields run, each with its predicate,
+parser and scorer; a failing extractor is reported as not found; new fields
+are one register_extractor call
+"""
+import pytest
+
+from ocr.ocr_page import OcrPage
+from services import field_extractors
+from services.field_extractors import (
+    DEFAULT_SEARCH_EXPANSION,
+    FIELD_EXTRACTORS,
+    FieldExtractor,
+    register_extractor,
+    run_extractors,
+    search_expansion,
+)
+from services.field_matching import PageBoxes, zone_scores
+
+BOXES = [
+    (100, 100, 220, 120, "1 234,50"),     # Montant HT
+    (100, 200, 160, 220, "20 %"),         # Taux de TVA, pas un montant
+    (170, 200, 260, 220, "246,90"),       # Montant TVA
+    (100, 300, 260, 320, "FA-2024-00123"),
+    (100, 400, 200, 420, "Date"),
+    (210, 400, 320, 420, "15/03/2024"),
+    (100, 500, 300, 520, "ACME SARL"),
+]
+
+ZONES = {
+    "montantht": (90, 95, 230, 125),
+    "tva": (90, 195, 270, 225),
+    "numerofacture": (90, 295, 270, 325),
+    "datefacturation": (90, 395, 330, 425),
+}
+
+
+@pytest.fixture
+def page():
+    return PageBoxes(OcrPage.from_arrays(
+        [box[:4] for box in BOXES], [0.9] * len(BOXES), list(range(len(BOXES))), [box[4] for box in BOXES]
+    ))
+
+
+@pytest.fixture
+def registry(monkeypatch):
+    """Registry restored after the test"""
+    monkeypatch.setattr(field_extractors, "FIELD_EXTRACTORS", dict(FIELD_EXTRACTORS))
+    return field_extractors.FIELD_EXTRACTORS
+
+
+def test_mapped_fields_are_extracted(page):
+    results = run_extractors(page, ZONES)
+    assert list(results) == ["montantht", "tva", "numerofacture", "datefacturation"]
+    values = {name: result.value for name, result in results.items()}
+    assert values == {
+        "montantht": 1234.5,
+        "tva": 246.9,
+        "numerofacture": "FA-2024-00123",
+        "datefacturation": "2024-03-15",
+    }
+    tva = results["tva"].to_dict()
+    assert tva["found"] and tva["box"]["left"] == 170.0 and tva["candidates"] == 2
+    assert FIELD_EXTRACTORS["montantht"].required and not FIELD_EXTRACTORS["numerofacture"].required
+
+
+def test_templates_only_pay_for_their_fields(page):
+    results = run_extractors(page, {"tva": ZONES["tva"]})
+    assert list(results) == ["tva"]
+    empty = run_extractors(page, {"montantht": (900, 900, 950, 950)})
+    assert empty["montantht"].to_dict()["found"] is False and empty["montantht"].value is None
+
+
+def test_a_failing_extractor_is_reported_as_not_found(page, registry):
+    def broken_parser(text):
+        raise RuntimeError("parseur cassé")
+
+    register_extractor(registry["tva"]._replace(parser=broken_parser))
+    results = run_extractors(page, ZONES)
+    assert results["tva"].box is None and results["tva"].match.candidates == 0
+    assert results["montantht"].value == 1234.5
+
+
+def test_new_fields_are_one_registration(page, registry):
+    register_extractor(FieldExtractor(
+        name="fournisseur",
+        expansion=(40, 10),
+        predicate=lambda text: text.isupper() or " " in text,
+        parser=str.strip,
+        scorer=lambda geometry, column: zone_scores(geometry, column, overlap_weight=1, touching_score=0.0),
+    ))
+    results = run_extractors(page, {**ZONES, "fournisseur": (90, 495, 310, 525)})
+    assert list(results)[-1] == "fournisseur" and results["fournisseur"].value == "ACME SARL"
+    assert search_expansion("fournisseur") == (40, 10)
+    assert search_expansion("champ_inconnu") == DEFAULT_SEARCH_EXPANSION
+
+
+def test_field_times_are_recorded(page):
+    before = field_extractors.field_times.stats().get("tva", {}).get("samples", 0)
+    run_extractors(page, {"tva": ZONES["tva"]})
+    assert field_extractors.field_times.stats()["tva"]["samples"] == before + 1
@@ -0,0 +1,123 @@
+"""
+Vectorized field matching: geometry against a per-box reference, scorers,
+candidate ranking with fallback to the next box, and zone queries through the grid
+"""
+import math
+
+import numpy as np
+import pytest
+
+from ocr.ocr_page import OcrPage
+from services.field_matching import (
+    FieldMatcher,
+    PageBoxes,
+    amount_scores,
+    best_candidate,
+    zone_geometry,
+    zone_scores,
+)
+
+
+def make_page(boxes, scores=None):
+    """OcrPage from (left, top, right, bottom, text) tuples"""
+    return OcrPage.from_arrays(
+        [box[:4] for box in boxes],
+        scores or [0.9] * len(boxes),
+        list(range(len(boxes))),
+        [box[4] for box in boxes],
+    )
+
+
+def reference_geometry(box, zone):
+    """Per-box computation the vectorized version replaced"""
+    bl, bt, br, bb = box
+    zl, zt, zr, zb = zone
+    width_overlap = min(br, zr) - max(bl, zl)
+    height_overlap = min(bb, zb) - max(bt, zt)
+    overlap = max(width_overlap, 0) * max(height_overlap, 0)
+    box_area = (br - bl) * (bb - bt)
+    zone_area = (zr - zl) * (zb - zt)
+    dx, dy = (bl + br) / 2 - (zl + zr) / 2, (bt + bb) / 2 - (zt + zb) / 2
+    return {
+        "intersects": width_overlap >= 0 and height_overlap >= 0,
+        "box_overlap": overlap / box_area if box_area > 0 else 0,
+        "min_overlap": overlap / min(box_area, zone_area) if min(box_area, zone_area) > 0 else 0,
+        "center_distance": math.hypot(dx, dy),
+        "position_score": 1 - (abs(dx) / max(1, (zr - zl) / 2) + abs(dy) / max(1, (zb - zt) / 2)) / 2,
+    }
+
+
+def test_geometry_matches_the_per_box_reference():
+    rng = np.random.default_rng(3)
+    origins = rng.uniform(0, 500, size=(200, 2))
+    sizes = rng.uniform(0, 120, size=(200, 2))
+    rects = np.concatenate([origins, origins + sizes], axis=1).astype(np.float32)
+    zones = np.array([[100, 100, 300, 160], [0, 0, 50, 50], [250, 400, 251, 401]], dtype=np.float32)
+    geometry = zone_geometry(rects, zones)
+    assert geometry.intersects.shape == (200, 3)
+    for i, rect in enumerate(rects.astype(np.float64)):
+        for j, zone in enumerate(zones.astype(np.float64)):
+            expected = reference_geometry(rect, zone)
+            assert bool(geometry.intersects[i, j]) == expected["intersects"]
+            for name in ("box_overlap", "min_overlap", "center_distance", "position_score"):
+                assert getattr(geometry, name)[i, j] == pytest.approx(expected[name], rel=1e-4, abs=1e-4)
+
+
+def test_amount_scores_keep_boxes_mostly_inside_the_zone():
+    zone = np.array([[100, 100, 300, 140]], dtype=np.float32)
+    rects = np.array([
+        [190, 110, 210, 130],  # Centrée
+        [110, 110, 130, 130],  # Dans la zone, loin du centre
+        [280, 110, 380, 130],  # 20 % dans la zone
+        [500, 500, 520, 520],  # Hors zone
+    ], dtype=np.float32)
+    scores = amount_scores(zone_geometry(rects, zone), 0)
+    assert scores[0] > scores[1] > -np.inf
+    assert np.isneginf(scores[2]) and np.isneginf(scores[3])
+
+
+def test_zone_scores_rank_touching_boxes_last():
+    zone = np.array([[100, 100, 300, 140]], dtype=np.float32)
+    rects = np.array([
+        [300, 110, 340, 130],  # Touche le bord droit
+        [150, 110, 250, 130],  # Dedans
+        [400, 110, 440, 130],  # Hors zone
+    ], dtype=np.float32)
+    scores = zone_scores(zone_geometry(rects, zone), 0, overlap_weight=2, touching_score=1.0)
+    assert scores[0] == 1.0 and scores[1] > 2 and np.isneginf(scores[2])
+    no_touch = zone_scores(zone_geometry(rects, zone), 0, overlap_weight=0.7, touching_score=0.0)
+    assert no_touch[0] == 0.0
+
+
+def test_best_candidate_falls_back_to_the_next_box():
+    boxes = [{"text": "Date"}, {"text": "15/03/2024"}, {"text": "hors zone"}, {"text": "16/03/2024"}]
+    scores = np.array([3.0, 2.0, -np.inf, 2.0])
+
+    def accept(box):
+        return box["text"] if box["text"][0].isdigit() else None
+
+    match = best_candidate(scores, boxes, accept)
+    # Meilleure boîte non interprétable: la suivante est essayée, la première en cas d'égalité
+    assert (match.value, match.tried, match.candidates) == ("15/03/2024", 2, 4)
+    none = best_candidate(scores, boxes, lambda box: None)
+    assert (none.box, none.value, none.tried) == (None, None, 3)
+
+
+def test_page_boxes_filter_and_scale():
+    page = make_page([(10, 20, 50, 30, "1 234,50"), (60, 20, 90, 30, "bruit")], scores=[0.9, 0.2])
+    boxes = PageBoxes(page, scale_x=2.0, scale_y=0.5, min_score=0.5)
+    assert len(boxes) == 1
+    box = boxes.box(0)
+    assert (box["left"], box["top"], box["width"], box["height"]) == (20.0, 10.0, 80.0, 5.0)
+    assert (box["center_x"], box["center_y"], box["text"]) == (60.0, 12.5, "1 234,50")
+    assert boxes.rects.tolist() == [[20.0, 10.0, 100.0, 15.0]]
+
+
+def test_matcher_only_reads_the_boxes_near_the_zone():
+    texts = [(x * 60, y * 40, x * 60 + 50, y * 40 + 20, f"{x},{y}") for x in range(20) for y in range(40)]
+    page = PageBoxes(make_page(texts))
+    matcher = FieldMatcher(page, {"montantht": (118, 78, 172, 104)})
+    match = matcher.match("montantht", amount_scores, lambda box: box["text"])
+    assert match.value == "2,2"
+    assert match.candidates < 10  # Index de grille: seules les boîtes proches sont construites
+    assert matcher.match("tva", amount_scores, lambda box: box["text"]) is None
@@ -0,0 +1,110 @@
+"""
+Field parsers: the date tokenizer must give the same dates as the historical path
+(strptime formats then dateparser) on OCR-like strings
+"""
+import random
+
+import pytest
+
+from services import field_parsers
+from services.field_parsers import extract_number, is_valid_invoice_number, parse_date_try
+
+SEPARATORS = ['/', '-', '.', ' ', ' / ', '- ', ' .']
+PREFIXES = ['', 'Date: ', 'Le ', 'Facture du ', 'échéance ', 'N° ', '(', 'date facture ']
+SUFFIXES = ['', ' ', ')', ' TTC', 'h', ' 12:30', ' réf 42']
+
+
+def historical_parse_date(text):
+    """parse_date_try before the tokenizer: every cleaned string went through _dateparser_date"""
+    text = text.strip()
+    if len(text) < 3 or not any(c.isdigit() for c in text):
+        return None
+    if len(text) < 5 and not any(sep in text for sep in ['/', '-', '.']):
+        return None
+    clean_text = field_parsers._SPACES.sub(' ', field_parsers._NOT_DATE_CHARS.sub(' ', text.lower())).strip()
+    return field_parsers._dateparser_date(clean_text)
+
+
+def number(rng, low, high):
+    value = rng.randint(low, high)
+    return str(value).zfill(rng.choice([1, 2])) if value < 100 else str(value)
+
+
+def date_corpus(count, seed=2024):
+    """Dates in every order and separator, out-of-range parts, amounts and invoice numbers"""
+    rng = random.Random(seed)
+    strings = []
+    for _ in range(count):
+        sep = rng.choice(SEPARATORS)
+        day, month = number(rng, 0, 35), number(rng, 0, 14)
+        year = rng.choice([number(rng, 0, 99), number(rng, 1890, 2110), str(rng.randint(100, 999))])
+        kind = rng.randrange(8)
+        if kind == 0:
+            core = sep.join((day, month, year))
+        elif kind == 1:
+            core = sep.join((year, month, day))
+        elif kind == 2:
+            core = sep.join((month, year))
+        elif kind == 3:
+            core = sep.join((day, month))
+        elif kind == 4:
+            core = rng.choice(['1 234,50', '12 500.00', '-3.5', '1.234.567', '0,99', '42'])
+        elif kind == 5:
+            core = rng.choice(['FA-2024-001', 'INV 123456', '2024/0042', 'n° 000123'])
+        elif kind == 6:
+            core = ''.join(rng.choice('0123456789/-. ') for _ in range(rng.randint(1, 12)))
+        else:
+            core = sep.join((day, month, year)) + rng.choice([' au ', ' - ']) + sep.join((day, month, year))
+        strings.append(rng.choice(PREFIXES) + core + rng.choice(SUFFIXES))
+    return strings
+
+
+FIXED_CASES = [
+    '15/03/2024', '15.03.24', '2024-03-15', '03/2024', '3/25', '31/02/2024', '00/00/0000',
+    '15 03 2024', '1 / 3 / 2024', '2024/3/1', '13/2024', 'Date: 01-03-2025', '  ', '', 'abc',
+    '1-2', '12/3', '12.5', '1234', '12345', '20240315', '2024-03-15 12:30', '15/03/1899', '15/03/2101',
+]
+
+
+@pytest.fixture(autouse=True)
+def clear_caches():
+    parse_date_try.cache_clear()
+    yield
+    parse_date_try.cache_clear()
+
+
+@pytest.mark.parametrize("text", FIXED_CASES)
+def test_parse_date_fixed_cases(text):
+    assert parse_date_try(text) == historical_parse_date(text)
+
+
+def test_parse_date_matches_historical_parser():
+    diffs = []
+    for text in date_corpus(5000):
+        parsed, expected = parse_date_try(text), historical_parse_date(text)
+        if parsed != expected:
+            diffs.append((text, parsed, expected))
+    assert diffs == []
+
+
+def test_parse_date_tokenized_formats():
+    assert parse_date_try('15/03/2024').isoformat() == '2024-03-15'
+    assert parse_date_try('Le 15.03.24').isoformat() == '2024-03-15'
+    assert parse_date_try('2024-03-15').isoformat() == '2024-03-15'
+    assert parse_date_try('03/2024').isoformat() == '2024-03-01'
+    assert parse_date_try('12') is None
+
+
+def test_extract_number():
+    assert extract_number('1.234,50 €') == 1234.5
+    assert extract_number('1,234.50') == 1234.5
+    assert extract_number('12,50') == 12.5
+    assert extract_number('1,234') == 1234
+    assert extract_number('-3.5') == -3.5
+    assert extract_number('TTC') is None
+
+
+def test_is_valid_invoice_number():
+    assert is_valid_invoice_number('FA-2024-001')
+    assert is_valid_invoice_number('123456')
+    assert not is_valid_invoice_number('abc')
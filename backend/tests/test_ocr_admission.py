@@ -0,0 +1,165 @@
+"""
+OCR admission control: rejection when saturated (429 over HTTP), slot
+timeouts, and the background share used by extraction batches
+"""
+import asyncio
+
+import httpx
+import pytest
+from fastapi import Depends, FastAPI
+
+from ocr.ocr_admission import OcrAdmissionController, OcrOverloaded, overloaded_response
+from services.extraction_batches import ExtractionBatchManager
+
+
+async def hold(slot, entered, release):
+    async with slot:
+        entered.append(1)
+        await release.wait()
+
+
+def test_full_controller_rejects_at_once_with_retry_after():
+    async def scenario():
+        admission = OcrAdmissionController(max_in_flight=2, max_waiting=1, timeout=5, initial_service_time=3.0)
+        release = asyncio.Event()
+        entered = []
+        holders = [asyncio.create_task(hold(admission.slot(), entered, release)) for _ in range(3)]
+        await asyncio.sleep(0.01)
+        stats = admission.stats()
+        with pytest.raises(OcrOverloaded) as rejected:
+            async with admission.slot():
+                pass
+        release.set()
+        await asyncio.gather(*holders)
+        return stats, rejected.value, admission.stats(), len(entered)
+
+    busy, rejected, idle, entered = asyncio.run(scenario())
+    assert (busy["in_flight"], busy["waiting"], busy["saturated"]) == (2, 1, True)
+    assert rejected.retry_after == 3  # (1 en attente + 1) / 2 slots x 3 s
+    assert entered == 3
+    assert idle["in_flight"] == 0 and idle["rejected"] == 1 and idle["admitted"] == 3
+
+
+def test_full_controller_returns_429_over_http():
+    admission = OcrAdmissionController(max_in_flight=1, max_waiting=0, timeout=5, initial_service_time=2.0)
+    app = FastAPI()
+    app.add_exception_handler(OcrOverloaded, lambda request, exc: overloaded_response(exc))
+
+    async def ocr_slot():
+        async with admission.slot():
+            yield
+
+    @app.post("/ocr")
+    async def ocr(_slot=Depends(ocr_slot)):
+        await release.wait()
+        return {"success": True}
+
+    async def scenario():
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            running = asyncio.create_task(client.post("/ocr"))
+            await asyncio.sleep(0.05)
+            rejected = await client.post("/ocr")
+            release.set()
+            return await running, rejected
+
+    release = asyncio.Event()
+    admitted, rejected = asyncio.run(scenario())
+    assert admitted.status_code == 200
+    assert rejected.status_code == 429
+    assert rejected.headers["retry-after"] == "2"
+    assert "File d'attente OCR pleine" in rejected.json()["detail"]
+
+
+def test_waiting_past_the_timeout_is_rejected():
+    async def scenario():
+        admission = OcrAdmissionController(max_in_flight=1, max_waiting=4, timeout=0.05)
+        release = asyncio.Event()
+        holder = asyncio.create_task(hold(admission.slot(), [], release))
+        await asyncio.sleep(0.01)
+        with pytest.raises(OcrOverloaded):
+            async with admission.slot():
+                pass
+        release.set()
+        await holder
+        return admission.stats()
+
+    stats = asyncio.run(scenario())
+    assert stats["timed_out"] == 1 and stats["waiting"] == 0
+
+
+def test_background_slots_leave_room_for_interactive_requests():
+    async def scenario():
+        admission = OcrAdmissionController(max_in_flight=4, max_waiting=0, timeout=1, background_share=0.5)
+        release = asyncio.Event()
+        entered = []
+        background = [asyncio.create_task(hold(admission.background_slot(), entered, release)) for _ in range(10)]
+        await asyncio.sleep(0.01)
+        busy = admission.stats()
+        # Les lots n'occupent que leur part: deux requêtes interactives passent encore
+        interactive = [asyncio.create_task(hold(admission.slot(), [], release)) for _ in range(2)]
+        await asyncio.sleep(0.01)
+        full = admission.stats()
+        with pytest.raises(OcrOverloaded):
+            async with admission.slot():
+                pass
+        release.set()
+        await asyncio.gather(*background, *interactive)
+        return busy, full, len(entered), admission.stats()
+
+    busy, full, entered, idle = asyncio.run(scenario())
+    assert (busy["max_background"], busy["background_in_flight"], busy["background_waiting"]) == (2, 2, 8)
+    assert busy["in_flight"] == 2 and busy["waiting"] == 0 and not busy["saturated"]
+    assert full["in_flight"] == 4 and full["saturated"]
+    assert entered == 10
+    assert idle["background_admitted"] == 10 and idle["background_in_flight"] == 0 and idle["in_flight"] == 0
+
+
+def test_cancelled_background_waiter_releases_its_share():
+    async def scenario():
+        admission = OcrAdmissionController(max_in_flight=1, max_waiting=0, timeout=1, background_share=1)
+        release = asyncio.Event()
+        interactive = asyncio.create_task(hold(admission.slot(), [], release))
+        await asyncio.sleep(0.01)
+        waiter = asyncio.create_task(hold(admission.background_slot(), [], release))
+        await asyncio.sleep(0.01)
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        release.set()
+        await interactive
+        entered = []
+        await hold(admission.background_slot(), entered, release)
+        return entered, admission.stats()
+
+    entered, stats = asyncio.run(scenario())
+    assert entered == [1] and stats["background_waiting"] == 0 and stats["in_flight"] == 0
+
+
+def test_batch_documents_hold_background_slots(monkeypatch):
+    async def scenario():
+        admission = OcrAdmissionController(max_in_flight=4, max_waiting=0, timeout=1, background_share=0.5)
+        manager = ExtractionBatchManager(concurrency=10, admission=admission)
+        running, peak = 0, 0
+
+        async def extract(document):
+            nonlocal running, peak
+            running += 1
+            peak = max(peak, running)
+            await asyncio.sleep(0.01)
+            running -= 1
+            return {"success": True, "data": {"document": document}}
+
+        async def no_duplicates(batch):
+            return []
+
+        monkeypatch.setattr(manager, "_check_duplicates", no_duplicates)
+        items = [{"index": i} for i in range(8)]
+        batch = manager.create(list(range(8)), items, extract, user_id=1)
+        events = [line async for line in batch.subscribe("ndjson")]
+        return peak, batch.summary(), len(events), admission.stats()
+
+    peak, summary, events, stats = asyncio.run(scenario())
+    assert peak == 2
+    assert summary["succeeded"] == 8 and summary["done"]
+    assert events == 10  # batch, 8 résultats, done
+    assert stats["background_admitted"] == 8 and stats["admitted"] == 0
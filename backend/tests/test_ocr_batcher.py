@@ -0,0 +1,134 @@
+"""
+OcrBatchScheduler with a fake pool: concurrent pages share one predict, large
+bursts are split, errors and cancellations reach every caller
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from ocr import ocr_batcher
+from ocr.ocr_batcher import OcrBatchScheduler, predict_with_profile
+from ocr.ocr_profiles import get_profile
+
+
+class FakePool:
+    """predict_batch returning one result per image, tagged with the image value"""
+
+    def __init__(self, delay=0.0, error=None):
+        self.profile = get_profile()
+        self.batches = []
+        self.delay = delay
+        self.error = error
+        self.cancelled = 0
+
+    async def predict_batch(self, images, profile=None):
+        self.batches.append(([int(img[0, 0, 0]) for img in images], profile.name))
+        try:
+            await asyncio.sleep(self.delay)
+        except asyncio.CancelledError:
+            self.cancelled += 1
+            raise
+        if self.error:
+            raise self.error
+        height, width = images[0].shape[:2]
+        return [
+            {'rec_polys': [[[0, 0], [width, 0], [width, height], [0, height]]],
+             'rec_texts': [str(int(img[0, 0, 0]))], 'rec_scores': [0.9], 'doc_preprocessor_res': {}}
+            for img in images
+        ]
+
+
+def image(value, size=(8, 8)):
+    return np.full((size[1], size[0], 3), value, dtype=np.uint8)
+
+
+def test_concurrent_pages_share_one_predict():
+    async def scenario():
+        pool = FakePool()
+        scheduler = OcrBatchScheduler(pool, window_ms=20, max_batch_size=4)
+        results = await asyncio.gather(*(scheduler.predict(image(v)) for v in (1, 2, 3)))
+        return pool.batches, results, scheduler.stats()
+
+    batches, results, stats = asyncio.run(scenario())
+    assert batches == [([1, 2, 3], get_profile().name)]
+    assert [r[0]['rec_texts'] for r in results] == [["1"], ["2"], ["3"]]
+    assert stats["batches"] == 1 and stats["pages"] == 3 and stats["fill_histogram"] == {"3": 1}
+
+
+def test_bursts_are_split_at_max_batch_size():
+    async def scenario():
+        pool = FakePool()
+        scheduler = OcrBatchScheduler(pool, window_ms=100, max_batch_size=2)
+        results = await asyncio.wait_for(
+            asyncio.gather(*(scheduler.predict(image(v)) for v in range(5))), timeout=5
+        )
+        return pool.batches, results
+
+    batches, results = asyncio.run(scenario())
+    assert [values for values, _ in batches[:2]] == [[0, 1], [2, 3]]
+    assert sorted(v for values, _ in batches for v in values) == [0, 1, 2, 3, 4]
+    assert [r[0]['rec_texts'] for r in results] == [[str(v)] for v in range(5)]
+
+
+def test_zero_window_sends_pages_alone():
+    async def scenario():
+        pool = FakePool()
+        scheduler = OcrBatchScheduler(pool, window_ms=0, max_batch_size=4)
+        await asyncio.gather(*(scheduler.predict(image(v)) for v in (1, 2)))
+        return pool.batches
+
+    assert [values for values, _ in asyncio.run(scenario())] == [[1], [2]]
+
+
+def test_errors_reach_every_caller_of_the_batch():
+    async def scenario():
+        scheduler = OcrBatchScheduler(FakePool(error=RuntimeError("worker crashed")), window_ms=10)
+        return await asyncio.gather(*(scheduler.predict(image(v)) for v in (1, 2)), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["worker crashed", "worker crashed"]
+
+
+def test_abandoned_batch_is_cancelled():
+    async def scenario():
+        pool = FakePool(delay=10)
+        scheduler = OcrBatchScheduler(pool, window_ms=5, max_batch_size=4)
+        callers = [asyncio.create_task(scheduler.predict(image(v))) for v in (1, 2)]
+        await asyncio.sleep(0.05)
+        for caller in callers:
+            caller.cancel()
+        await asyncio.gather(*callers, return_exceptions=True)
+        await asyncio.sleep(0.01)
+        return pool
+
+    pool = asyncio.run(scenario())
+    assert len(pool.batches) == 1 and pool.cancelled == 1
+
+
+def test_cancelled_waiters_are_not_sent():
+    async def scenario():
+        pool = FakePool()
+        scheduler = OcrBatchScheduler(pool, window_ms=30, max_batch_size=4)
+        gone = asyncio.create_task(scheduler.predict(image(1)))
+        kept = asyncio.create_task(scheduler.predict(image(2)))
+        await asyncio.sleep(0)
+        gone.cancel()
+        return await kept, pool.batches
+
+    result, batches = asyncio.run(scenario())
+    assert result[0]['rec_texts'] == ["2"] and [values for values, _ in batches] == [[2]]
+
+
+def test_lower_resolution_profile_ocrs_a_downscaled_copy(monkeypatch):
+    fast = get_profile("fast")
+    pool = FakePool()
+    pool.profile = fast
+    scheduler = OcrBatchScheduler(pool, window_ms=0, profile=fast)
+    monkeypatch.setattr(ocr_batcher, "get_scheduler", lambda profile=None: scheduler)
+
+    result = asyncio.run(predict_with_profile(image(7, (400, 600)), fast, page_scale=2))
+    # Image réduite à 1,5/2 pour l'OCR, polygones ramenés dans le repère de la page
+    assert fast.image_scale(2) == pytest.approx(0.75)
+    assert result[0]['rec_polys'] == [[[0.0, 0.0], [400.0, 0.0], [400.0, 600.0], [0.0, 600.0]]]
+    assert pool.batches == [([7], "fast")]
@@ -0,0 +1,137 @@
+"""
+OcrResultCache on a temporary directory: keys, memory LRU, disk tier with
+quota, corrupted entries, and cache hits that skip rendering and the OCR pool
+"""
+import asyncio
+import os
+
+import numpy as np
+import pytest
+
+from ocr import ocr_pipeline
+from ocr.ocr_cache import OcrResultCache, file_digest, make_cache_key
+from ocr.ocr_page import OcrPage
+from ocr.ocr_profiles import get_profile
+
+
+def page(n, text="Total"):
+    """Page of n boxes"""
+    bboxes = np.array([[i, 10 * i, i + 50, 10 * i + 8] for i in range(n)], dtype=np.float32)
+    return OcrPage.from_arrays(bboxes, [0.9] * n, list(range(n)), [f"{text} {i}" for i in range(n)])
+
+
+def key(i):
+    return make_cache_key(file_digest(str(i).encode()), 0, 2, {"lang": "fr"})
+
+
+def disk_files(root):
+    return sorted(name for _, _, files in os.walk(root) for name in files)
+
+
+def test_cache_key_identifies_page_scale_and_params():
+    base = make_cache_key("f" * 64, 0, 2, {"lang": "fr", "a": 1})
+    assert base == make_cache_key("f" * 64, 0, 2, {"a": 1, "lang": "fr"})
+    assert len({
+        base,
+        make_cache_key("e" * 64, 0, 2, {"lang": "fr", "a": 1}),
+        make_cache_key("f" * 64, 1, 2, {"lang": "fr", "a": 1}),
+        make_cache_key("f" * 64, 0, 1.5, {"lang": "fr", "a": 1}),
+        make_cache_key("f" * 64, 0, 2, {"lang": "fr", "a": 2}),
+    }) == 5
+
+
+def test_memory_tier_is_a_byte_bounded_lru():
+    one = page(10)
+    cache = OcrResultCache(memory_bytes=int(one.nbytes * 2.5), disk_dir=None)
+    for i in range(3):
+        cache.put(key(i), page(10, f"p{i}"))
+    assert cache.get(key(0)) is None  # Le plus ancien est sorti
+    assert cache.get(key(1)).text(0) == "p1 0"
+    cache.put(key(3), page(10, "p3"))  # key(1) vient d'être lu: key(2) sort
+    assert cache.get(key(2)) is None and cache.get(key(1)) is not None
+    stats = cache.stats()
+    assert stats["memory_entries"] == 2 and stats["memory_evictions"] == 2
+    assert stats["memory_bytes"] <= cache.memory_bytes
+
+
+def test_disk_tier_survives_a_restart(tmp_path):
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    cache.put(key(1), page(5))
+    restarted = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    boxes = restarted.get(key(1))
+    assert boxes.to_boxes() == page(5).to_boxes()
+    assert restarted.get(key(1)) is not None
+    assert restarted.get(key(2)) is None
+    stats = restarted.stats()
+    assert (stats["disk_hits"], stats["memory_hits"], stats["misses"]) == (1, 1, 1)
+    assert stats["hit_ratio"] == pytest.approx(2 / 3)
+
+
+def test_disk_quota_evicts_down_to_the_low_water_mark(tmp_path):
+    size = len(page(20).to_bytes())
+    cache = OcrResultCache(memory_bytes=0, disk_dir=str(tmp_path), disk_bytes=size * 4, disk_low_water=0.5)
+    for i in range(5):
+        cache.put(key(i), page(20))
+        os.utime(cache._disk_path(key(i)), (1000 + i, 1000 + i))
+    stats = cache.stats()
+    assert stats["disk_evictions"] == 3 and stats["disk_bytes"] == 2 * size
+    assert [cache.get(key(i)) is not None for i in range(5)] == [False, False, False, True, True]
+    assert len(disk_files(tmp_path)) == 2
+
+
+def test_corrupted_entries_are_misses(tmp_path):
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    path = cache._disk_path(key(8))
+    os.makedirs(os.path.dirname(path))
+    with open(path, "wb") as f:
+        f.write(b"OCRP\x01")
+    assert cache.get(key(8)) is None
+
+
+def test_async_memory_hits_stay_on_the_event_loop(tmp_path, monkeypatch):
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    threads = []
+    to_thread = asyncio.to_thread
+
+    async def tracking_to_thread(func, *args):
+        threads.append(func.__name__)
+        return await to_thread(func, *args)
+
+    monkeypatch.setattr(asyncio, "to_thread", tracking_to_thread)
+
+    async def scenario():
+        await cache.put_async(key(1), page(4))
+        hit = await cache.get_async(key(1))
+        miss = await cache.get_async(key(2))
+        return hit, miss
+
+    hit, miss = asyncio.run(scenario())
+    assert len(hit) == 4 and miss is None
+    assert threads == ["_disk_put", "_load"]
+
+
+def test_cache_hit_skips_rendering_and_the_ocr_pool(tmp_path, monkeypatch):
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", cache)
+    calls = []
+
+    async def fake_predict(image, profile=None, page_scale=2):
+        calls.append("predict")
+        return [{'rec_polys': [[[1, 2], [30, 2], [30, 12], [1, 12]]], 'rec_texts': ['Total'],
+                 'rec_scores': [0.95], 'doc_preprocessor_res': {}}]
+
+    def render_page():
+        calls.append("render")
+        return np.zeros((100, 80, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", fake_predict)
+    profile = get_profile()
+
+    async def extract():
+        return await ocr_pipeline.get_page_boxes("a" * 64, 0, 2, render_page, profile=profile)
+
+    first, first_path = asyncio.run(extract())
+    second, second_path = asyncio.run(extract())
+    assert (first_path, second_path) == (ocr_pipeline.PATH_OCR, ocr_pipeline.PATH_OCR_CACHE)
+    assert calls == ["render", "predict"]
+    assert second.to_boxes() == first.to_boxes()
@@ -0,0 +1,98 @@
+"""
+Deadline fallback: stages that would overrun the budget are skipped, full-page
+OCR degrades to the fallback profile, and the skipped stages are reported
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from ocr import ocr_deadline, ocr_pipeline
+from ocr.ocr_cache import OcrResultCache, make_cache_key
+from ocr.ocr_deadline import OcrDeadline, StageTimes
+from ocr.ocr_page import OcrPage
+from ocr.ocr_profiles import fallback_profile, get_profile
+from ocr.ocr_singleflight import SingleFlight
+
+FILE_HASH = "c" * 64
+
+
+@pytest.fixture
+def stage_times(monkeypatch):
+    times = StageTimes()
+    monkeypatch.setattr(ocr_deadline, "stage_times", times)
+    monkeypatch.setattr(ocr_pipeline, "stage_times", times)
+    return times
+
+
+@pytest.fixture
+def predictions(tmp_path, monkeypatch, stage_times):
+    """Profiles used by the (fake) OCR engine"""
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path)))
+    monkeypatch.setattr(ocr_pipeline, "ocr_singleflight", SingleFlight())
+    profiles = []
+
+    async def fake_predict(image, profile=None, page_scale=2):
+        profiles.append(profile.name)
+        return [{'rec_polys': [[[1, 2], [30, 2], [30, 12], [1, 12]]], 'rec_texts': ['Total'],
+                 'rec_scores': [0.95], 'doc_preprocessor_res': {}}]
+
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", fake_predict)
+    return profiles
+
+
+def page_boxes(deadline, profile, zones=None):
+    def render_page():
+        return np.zeros((200, 160, 3), dtype=np.uint8)
+
+    return asyncio.run(ocr_pipeline.get_page_boxes(
+        FILE_HASH, 0, 2, render_page, zones=zones, deadline=deadline, profile=profile))
+
+
+def test_stage_estimates_use_measurements_once_available(stage_times):
+    deadline = OcrDeadline(500)
+    assert deadline.fits("ocr:fast", 0.1) and not deadline.fits("ocr:fast", 1.0)
+    stage_times.record("ocr:fast", 0.2)
+    stage_times.record("ocr:fast", 0.7)
+    assert stage_times.estimate("ocr:fast", 5.0) == pytest.approx(0.3)
+    assert deadline.fits("ocr:fast", 5.0)
+    deadline.skip("ocr:accurate", 3.0)
+    report = deadline.to_dict()
+    assert report["budget_ms"] == 500 and not report["exceeded"] and not report["degraded"]
+    assert report["skipped"][0]["stage"] == "ocr:accurate" and report["skipped"][0]["estimate_ms"] == 3000.0
+
+
+def test_short_budget_degrades_to_the_fallback_profile(predictions):
+    deadline = OcrDeadline(500)  # Profil accurate: 3 s attendues
+    boxes, path = page_boxes(deadline, get_profile("accurate"))
+    assert path == ocr_pipeline.PATH_OCR_DEGRADED
+    assert predictions == [fallback_profile().name]
+    report = deadline.to_dict()
+    assert report["degraded"] and [s["stage"] for s in report["skipped"]] == ["ocr:accurate"]
+    assert len(boxes) == 1
+
+
+def test_roi_is_skipped_before_the_full_page(predictions):
+    deadline = OcrDeadline(500)
+    zones = {"montantht": (10.0, 10.0, 100.0, 40.0)}
+    _, path = page_boxes(deadline, get_profile("accurate"), zones)
+    assert path == ocr_pipeline.PATH_OCR_DEGRADED
+    assert [s["stage"] for s in deadline.skipped] == ["roi:accurate", "ocr:accurate"]
+
+
+def test_fallback_result_already_cached_is_used(predictions):
+    fallback = fallback_profile()
+    cached = OcrPage.from_arrays([[1, 2, 31, 12]], [0.9], [0], ["En cache"])
+    ocr_pipeline.ocr_cache.put(make_cache_key(FILE_HASH, 0, 2, fallback.cache_params(2)), cached)
+    deadline = OcrDeadline(500)
+    boxes, path = page_boxes(deadline, get_profile("accurate"))
+    assert path == ocr_pipeline.PATH_OCR_CACHE and predictions == []
+    assert deadline.degraded and boxes.text(0) == "En cache"
+
+
+def test_enough_budget_or_no_deadline_keeps_the_profile(predictions, stage_times):
+    _, path = page_boxes(OcrDeadline(10_000), get_profile("accurate"))
+    assert path == ocr_pipeline.PATH_OCR and predictions == ["accurate"]
+    assert stage_times.stats()["ocr:accurate"]["samples"] == 1
+    _, path = page_boxes(None, get_profile("balanced"))
+    assert path == ocr_pipeline.PATH_OCR and predictions == ["accurate", "balanced"]
@@ -0,0 +1,84 @@
+"""
+Disconnect cancellation: the OCR work of a request is cancelled when its
+client goes away, and work shared with another request keeps running
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+
+from ocr import ocr_disconnect
+from ocr.ocr_disconnect import ClientDisconnected, run_unless_disconnected
+from ocr.ocr_singleflight import SingleFlight
+
+
+class FakeRequest:
+    def __init__(self, disconnect_after=None):
+        self.url = SimpleNamespace(path="/ocr-preview")
+        self.disconnect_after = disconnect_after
+        self.polls = 0
+
+    async def is_disconnected(self):
+        self.polls += 1
+        return self.disconnect_after is not None and self.polls > self.disconnect_after
+
+
+def test_result_is_returned_while_the_client_is_connected():
+    async def work():
+        await asyncio.sleep(0.03)
+        return {"success": True}
+
+    request = FakeRequest()
+    assert asyncio.run(run_unless_disconnected(request, work(), poll=0.005)) == {"success": True}
+    assert request.polls > 0
+
+
+def test_disconnect_cancels_the_ocr_work():
+    cancelled = []
+    before = ocr_disconnect.stats()["disconnected"]
+
+    async def work():
+        try:
+            await asyncio.sleep(5)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+
+    async def scenario():
+        with pytest.raises(ClientDisconnected):
+            await run_unless_disconnected(FakeRequest(disconnect_after=2), work(), poll=0.005)
+        await asyncio.sleep(0)
+
+    asyncio.run(scenario())
+    assert cancelled == [1]
+    assert ocr_disconnect.stats()["disconnected"] == before + 1
+
+
+def test_errors_of_the_work_are_raised():
+    async def work():
+        raise ValueError("PDF illisible")
+
+    with pytest.raises(ValueError, match="PDF illisible"):
+        asyncio.run(run_unless_disconnected(FakeRequest(), work(), poll=0.005))
+
+
+def test_shared_work_survives_one_disconnected_client():
+    flights = SingleFlight()
+    computed = []
+
+    async def ocr_page():
+        await asyncio.sleep(0.05)
+        computed.append(1)
+        return "boxes"
+
+    async def scenario():
+        gone = asyncio.create_task(run_unless_disconnected(
+            FakeRequest(disconnect_after=1), flights.run("page", ocr_page), poll=0.005))
+        stays = asyncio.create_task(run_unless_disconnected(
+            FakeRequest(), flights.run("page", ocr_page), poll=0.005))
+        with pytest.raises(ClientDisconnected):
+            await gone
+        return await stays
+
+    assert asyncio.run(scenario()) == "boxes"
+    assert computed == [1]
@@ -0,0 +1,103 @@
+"""
+BoxGrid against brute force: rectangle queries (touching counts) and k nearest boxes
+"""
+import numpy as np
+import pytest
+
+from ocr.ocr_grid import BoxGrid, box_rects
+
+
+def random_rects(rng, count, dtype=np.float64):
+    """Boxes of a page, with integer corners (shared edges) and some degenerate ones"""
+    left = rng.integers(-50, 1500, count)
+    top = rng.integers(-50, 2000, count)
+    width = rng.integers(0, 300, count) * (rng.random(count) > 0.05)
+    height = rng.integers(0, 40, count) * (rng.random(count) > 0.05)
+    return np.stack([left, top, left + width, top + height], axis=1).astype(dtype)
+
+
+def brute_force_query(rects, rect):
+    left, top, right, bottom = (rects.dtype.type(v) for v in rect)
+    hit = (rects[:, 2] >= left) & (rects[:, 0] <= right) & (rects[:, 3] >= top) & (rects[:, 1] <= bottom)
+    return np.flatnonzero(hit)
+
+
+def brute_force_distances(rects, x, y):
+    dx = np.maximum(np.maximum(rects[:, 0] - x, x - rects[:, 2]), 0)
+    dy = np.maximum(np.maximum(rects[:, 1] - y, y - rects[:, 3]), 0)
+    return np.hypot(dx, dy)
+
+
+@pytest.mark.parametrize("count", [1, 2, 7, 60, 500, 3000])
+@pytest.mark.parametrize("dtype", [np.float64, np.float32])
+def test_query_matches_brute_force(count, dtype):
+    rng = np.random.default_rng(count)
+    rects = random_rects(rng, count, dtype)
+    grid = BoxGrid(rects)
+    for _ in range(300):
+        x, y = rng.integers(-200, 1900), rng.integers(-200, 2300)
+        # Zones entières (bords partagés avec les boîtes) ou fractionnaires, parfois hors de la page
+        if rng.random() < 0.5:
+            rect = (x, y, x + rng.integers(0, 600), y + rng.integers(0, 200))
+        else:
+            rect = (x + rng.random(), y + rng.random(), x + rng.random() * 600, y + rng.random() * 200)
+        expected = brute_force_query(rects, rect)
+        assert np.array_equal(grid.query(rect), expected), rect
+
+
+def test_query_of_points_and_whole_page():
+    rng = np.random.default_rng(1)
+    rects = random_rects(rng, 800)
+    grid = BoxGrid(rects)
+    assert np.array_equal(grid.query((-1e9, -1e9, 1e9, 1e9)), np.arange(len(rects)))
+    assert len(grid.query((1e6, 1e6, 1e6 + 1, 1e6 + 1))) == 0
+    for i, (left, top, right, bottom) in enumerate(rects[:50]):
+        # Coin d'une boîte: la boîte le touche
+        assert i in grid.query((right, bottom, right, bottom))
+        assert np.array_equal(grid.query((left, top, left, top)), brute_force_query(rects, (left, top, left, top)))
+
+
+@pytest.mark.parametrize("rect", [
+    (500, 900, 100, 1000),   # left > right
+    (100, 1000, 500, 900),   # top > bottom
+    (500, 1000, 100, 900),   # les deux
+    (1e6, 0, -1e6, 2000),    # inversée sur toute la largeur de la page
+])
+def test_inverted_query_matches_brute_force(rect):
+    rng = np.random.default_rng(7)
+    rects = random_rects(rng, 500)
+    found = BoxGrid(rects).query(rect)
+    assert found.dtype == np.int64
+    assert np.array_equal(found, brute_force_query(rects, rect))
+    assert len(found) == 0
+
+
+@pytest.mark.parametrize("count", [1, 5, 200, 2000])
+def test_nearest_matches_brute_force(count):
+    rng = np.random.default_rng(count + 100)
+    rects = random_rects(rng, count)
+    grid = BoxGrid(rects)
+    for _ in range(200):
+        x, y = rng.uniform(-300, 2000), rng.uniform(-300, 2500)
+        k = int(rng.integers(1, 8))
+        found = grid.nearest(x, y, k)
+        expected = np.sort(brute_force_distances(rects, x, y))[:k]
+        assert len(found) == min(k, count)
+        # Mêmes distances (les ex aequo peuvent être dans un autre ordre), du plus proche au plus loin
+        assert np.allclose(grid.distances(x, y, found), expected)
+        assert np.all(np.diff(grid.distances(x, y, found)) >= 0)
+
+
+def test_empty_grid():
+    grid = BoxGrid(np.empty((0, 4)))
+    assert len(grid) == 0
+    assert len(grid.query((0, 0, 100, 100))) == 0
+    assert len(grid.nearest(10, 10, 3)) == 0
+
+
+def test_box_rects_from_box_dicts():
+    boxes = [{'left': 10, 'top': 20, 'width': 30, 'height': 5}, {'left': 1.5, 'top': 2, 'width': 0, 'height': 0}]
+    rects = box_rects(boxes, np.float32)
+    assert rects.dtype == np.float32
+    assert rects.tolist() == [[10, 20, 40, 25], [1.5, 2, 1.5, 2]]
+    assert box_rects([]).shape == (0, 4)
@@ -0,0 +1,145 @@
+"""
+OcrPage: same boxes as the historical PaddleOCR conversion, and lossless flat-file round trips
+"""
+import random
+
+import numpy as np
+import pytest
+
+from ocr.ocr_page import OcrPage, OcrPageError, as_page
+
+TEXTS = ['1 234,50', '', ' ', 'Été 20 €', ' FA-2024 ', '日本語', None, 'x']
+
+
+def historical_boxes(result):
+    """Box dicts built one by one from the PaddleOCR results, as before the columnar page"""
+    boxes = []
+    for res in result:
+        rec_polys = res.get('rec_polys', [])
+        rec_texts = res.get('rec_texts', [])
+        rec_scores = res.get('rec_scores', [])
+        doc_pre_res = res.get('doc_preprocessor_res', {})
+        original_points = doc_pre_res.get('original_points') if isinstance(doc_pre_res, dict) else None
+        for i, (poly, text, score) in enumerate(zip(rec_polys, rec_texts, rec_scores)):
+            if score is None or not text or not text.strip():
+                continue
+            points = original_points[i] if original_points and i < len(original_points) else poly
+            xs = [float(p[0]) for p in points]
+            ys = [float(p[1]) for p in points]
+            boxes.append({
+                'id': i,
+                'left': min(xs),
+                'top': min(ys),
+                'width': max(xs) - min(xs),
+                'height': max(ys) - min(ys),
+                'text': str(text).strip(),
+                'score': float(score),
+            })
+    return boxes
+
+
+def random_result(rng):
+    """PaddleOCR output: list, int16 array or ragged polygons, missing scores, empty texts"""
+    result = []
+    for _ in range(rng.randint(0, 3)):
+        count = rng.randint(0, 30)
+        ragged = rng.random() < 0.2
+        polys = [
+            [[rng.randint(0, 2000), rng.randint(0, 3000)] for _ in range(rng.choice([4, 5]) if ragged else 4)]
+            for _ in range(count)
+        ]
+        if count and not ragged and rng.random() < 0.3:
+            polys = np.array(polys, dtype=np.int16)
+        # Listes de longueurs différentes: zip s'arrête à la plus courte
+        texts = [rng.choice(TEXTS) for _ in range(count + rng.randint(-1, 1))]
+        scores = [None if rng.random() < 0.1 else np.float32(rng.random()) for _ in range(count)]
+        res = {'rec_polys': polys, 'rec_texts': texts, 'rec_scores': scores, 'doc_preprocessor_res': {}}
+        if rng.random() < 0.2:
+            res['doc_preprocessor_res'] = {'original_points': [
+                [[rng.randint(0, 99), rng.randint(0, 99)], [rng.randint(100, 199), rng.randint(100, 199)]] * 2
+                for _ in range(rng.randint(0, count))
+            ]}
+        result.append(res)
+    return result
+
+
+def test_from_result_matches_historical_boxes():
+    rng = random.Random(0)
+    for _ in range(2000):
+        result = random_result(rng)
+        expected = historical_boxes(result)
+        page = OcrPage.from_result(result)
+        assert page.to_boxes() == expected
+        assert OcrPage.from_boxes(expected).to_boxes() == expected
+
+
+def test_from_result_without_boxes():
+    assert len(OcrPage.from_result([])) == 0
+    assert len(OcrPage.from_result([{'rec_polys': [[[0, 0]] * 4], 'rec_texts': [' '], 'rec_scores': [0.9]}])) == 0
+
+
+def sample_page():
+    return OcrPage.from_boxes([
+        {'id': 3, 'left': 1, 'top': 2, 'width': 3, 'height': 4, 'text': 'Été', 'score': 0.5},
+        {'id': 7, 'left': 10.5, 'top': 20, 'width': 0, 'height': 8, 'text': '1 234,50 €', 'score': 1},
+    ])
+
+
+def test_access():
+    page = sample_page()
+    assert len(page) == 2
+    assert page.texts() == ['Été', '1 234,50 €']
+    assert page[-1] == page[1] == page.box(1)
+    assert page[0] == {'id': 3, 'left': 1.0, 'top': 2.0, 'width': 3.0, 'height': 4.0, 'text': 'Été', 'score': 0.5}
+    with pytest.raises(IndexError):
+        page[2]
+    assert as_page(page) is page
+    assert as_page(None) is None
+    assert as_page(page.to_boxes()).to_boxes() == page.to_boxes()
+
+
+def test_concat_and_translated():
+    page = sample_page()
+    joined = OcrPage.concat([page, OcrPage.empty(), page.translated(100, 200)])
+    assert [b['id'] for b in joined] == [0, 1, 2, 3]
+    assert joined.texts() == page.texts() * 2
+    assert [(b['left'], b['top']) for b in joined][2:] == [(101.0, 202.0), (110.5, 220.0)]
+    assert len(OcrPage.concat([])) == 0
+
+
+def test_bytes_round_trip():
+    rng = random.Random(1)
+    for _ in range(200):
+        page = OcrPage.from_result(random_result(rng))
+        assert OcrPage.from_buffer(page.to_bytes()).to_boxes() == page.to_boxes()
+    empty = OcrPage.from_buffer(OcrPage.empty().to_bytes())
+    assert len(empty) == 0
+
+
+@pytest.mark.parametrize("use_mmap", [False, True])
+def test_save_load_round_trip(tmp_path, use_mmap):
+    page = sample_page()
+    path = str(tmp_path / "page.ocrp")
+    page.save(path)
+    loaded = OcrPage.load(path, use_mmap=use_mmap)
+    assert loaded.to_boxes() == page.to_boxes()
+    assert not loaded.bboxes.flags.writeable
+
+
+def test_load_empty_file_with_mmap(tmp_path):
+    path = tmp_path / "empty.ocrp"
+    path.write_bytes(b"")
+    with pytest.raises(OcrPageError):
+        OcrPage.load(str(path), use_mmap=True)
+
+
+@pytest.mark.parametrize("buffer", [
+    b"",
+    b"OCRP",
+    b"XXXX" + bytes(12),
+    sample_page().to_bytes()[:-1],
+    sample_page().to_bytes()[:24],
+])
+def test_from_buffer_rejects_bad_buffers(buffer):
+    with pytest.raises(OcrPageError):
+        OcrPage.from_buffer(buffer)
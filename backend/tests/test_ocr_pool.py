@@ -0,0 +1,171 @@
+"""
+OcrWorkerPool with a thread executor and a stubbed predict: work runs off the
+event loop, a crash restarts the pool once, cancelled callers are dropped
+"""
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+
+import numpy as np
+import pytest
+
+from ocr import ocr_pool as ocr_pool_module
+from ocr.ocr_pool import OcrWorkerPool, _normalize_result
+from ocr.ocr_profiles import get_profile
+
+
+class ThreadWorkerPool(OcrWorkerPool):
+    """Same dispatching, executors that can be inspected (no PaddleOCR process)"""
+
+    def __init__(self, *args, **kwargs):
+        self.executors = []
+        super().__init__(*args, **kwargs)
+
+    def _create_executor(self):
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        self.executors.append(executor)
+        return executor
+
+
+def image(value=0):
+    return np.full((4, 4, 3), value, dtype=np.uint8)
+
+
+def fake_result(text):
+    return {'rec_polys': [[[0, 0], [1, 0], [1, 1], [0, 1]]], 'rec_texts': [text], 'rec_scores': [0.9],
+            'doc_preprocessor_res': {}}
+
+
+def run(coro):
+    return asyncio.run(coro)
+
+
+def test_predict_runs_off_the_event_loop(monkeypatch):
+    threads = []
+
+    def fake_run_predict(images, profile_name, params):
+        threads.append(threading.current_thread())
+        time.sleep(0.2)
+        return [fake_result(f"{profile_name}:{int(img[0, 0, 0])}") for img in images]
+
+    monkeypatch.setattr(ocr_pool_module, "_run_predict", fake_run_predict)
+
+    async def scenario():
+        pool = ThreadWorkerPool(workers=2, queue_size=4)
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                ticks += 1
+                await asyncio.sleep(0.01)
+
+        ticking = asyncio.create_task(ticker())
+        try:
+            batch, single = await asyncio.gather(pool.predict_batch([image(1), image(2)]), pool.predict(image(3)))
+        finally:
+            ticking.cancel()
+            await pool.shutdown()
+        return batch, single, ticks
+
+    batch, single, ticks = run(scenario())
+    profile = get_profile().name
+    assert [r['rec_texts'] for r in batch] == [[f"{profile}:1"], [f"{profile}:2"]]
+    assert single[0]['rec_texts'] == [f"{profile}:3"]
+    assert all(thread is not threading.main_thread() for thread in threads)
+    # La boucle a continué de tourner pendant les 0,2 s de predict
+    assert ticks >= 10
+
+
+def test_crash_restarts_the_pool_once(monkeypatch):
+    calls = []
+    started = threading.Barrier(3)
+
+    def crashing_run_predict(images, profile_name, params):
+        calls.append(1)
+        if len(calls) <= 3:
+            started.wait(timeout=5)
+            raise BrokenProcessPool("A process in the process pool was terminated abruptly")
+        return [fake_result("ok") for _ in images]
+
+    monkeypatch.setattr(ocr_pool_module, "_run_predict", crashing_run_predict)
+
+    async def scenario():
+        pool = ThreadWorkerPool(workers=3, queue_size=8)
+        crashed = await asyncio.gather(*(pool.predict(image()) for _ in range(3)), return_exceptions=True)
+        after = await pool.predict(image())
+        executors = list(pool.executors)
+        await pool.shutdown()
+        return crashed, after, executors, pool._generation
+
+    crashed, after, executors, generation = run(scenario())
+    assert all(isinstance(e, BrokenProcessPool) for e in crashed)
+    assert after[0]['rec_texts'] == ["ok"]
+    # Trois dispatchers ont vu le crash: un seul remplacement, l'ancien executor arrêté
+    assert len(executors) == 2 and generation == 1
+    assert executors[0]._shutdown
+
+
+def test_cancelled_callers_are_dropped_before_predict(monkeypatch):
+    calls = []
+    release = threading.Event()
+
+    def slow_run_predict(images, profile_name, params):
+        calls.append(len(images))
+        release.wait(timeout=5)
+        return [fake_result("ok") for _ in images]
+
+    monkeypatch.setattr(ocr_pool_module, "_run_predict", slow_run_predict)
+
+    async def scenario():
+        pool = ThreadWorkerPool(workers=1, queue_size=4)
+        first = asyncio.create_task(pool.predict(image()))
+        await asyncio.sleep(0.05)
+        queued = asyncio.create_task(pool.predict(image()))
+        await asyncio.sleep(0.01)
+        queued.cancel()
+        release.set()
+        result = await first
+        await pool._queue.join()
+        stats = pool.stats()
+        await pool.shutdown()
+        return result, queued.cancelled(), stats
+
+    result, cancelled, stats = run(scenario())
+    assert result[0]['rec_texts'] == ["ok"] and cancelled
+    assert calls == [1] and stats["dropped"] == 1 and stats["running"] == 0
+
+
+def test_worker_errors_reach_the_caller(monkeypatch):
+    def failing_run_predict(images, profile_name, params):
+        raise RuntimeError("bad image")
+
+    monkeypatch.setattr(ocr_pool_module, "_run_predict", failing_run_predict)
+
+    async def scenario():
+        pool = ThreadWorkerPool(workers=1, queue_size=2)
+        try:
+            with pytest.raises(RuntimeError, match="bad image"):
+                await pool.predict(image())
+            return len(pool.executors)
+        finally:
+            await pool.shutdown()
+
+    assert run(scenario()) == 1
+
+
+def test_normalized_results_are_plain_python():
+    raw = {
+        'rec_polys': [np.array([[1, 2], [3, 4]], dtype=np.int16)],
+        'rec_texts': [np.str_("12,50")],
+        'rec_scores': [np.float32(0.5), None],
+        'doc_preprocessor_res': {'original_points': np.zeros((1, 4, 2)), 'output_img': np.zeros((2, 2, 3))},
+    }
+    result = _normalize_result(raw)
+    assert result['rec_polys'] == [[[1, 2], [3, 4]]]
+    assert result['rec_texts'] == ["12,50"] and type(result['rec_texts'][0]) is str
+    assert result['rec_scores'] == [0.5, None]
+    assert result['doc_preprocessor_res']['original_points'] == [[[0.0, 0.0]] * 4]
+    assert result['doc_preprocessor_res']['output_img'].shape == (2, 2, 3)
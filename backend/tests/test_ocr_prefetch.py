@@ -0,0 +1,163 @@
+"""
+Speculative OCR: pages land in the cache under the key of the later
+extraction, only while the OCR engine is idle, and are dropped on cancel
+"""
+import asyncio
+
+import pymupdf as fitz
+import pytest
+
+from documents.document_store import DocumentInput
+from ocr import ocr_pipeline
+from ocr.ocr_admission import OcrAdmissionController
+from ocr.ocr_cache import OcrResultCache, file_digest
+from ocr.ocr_profiles import get_profile
+from services import ocr_prefetch
+from services.extraction_service import extraction_page_scale, extraction_render_scale
+from services.ocr_prefetch import OcrPrefetcher
+
+
+class IdlePool:
+    def stats(self):
+        return {"queued": 0}
+
+
+def pdf_document(pages=3, text=False):
+    doc = fitz.open()
+    for n in range(pages):
+        page = doc.new_page()
+        page.draw_rect(fitz.Rect(50, 50, 200, 80), fill=(0, 0, 0))
+        if text:
+            page.insert_text((72, 150), f"Facture FA-{n} Total HT 1250,00 TVA 250,00 Net à payer 1500,00")
+    content = doc.tobytes()
+    doc.close()
+    return DocumentInput(file_digest(content), "scan.pdf", content)
+
+
+@pytest.fixture
+def predictions(tmp_path, monkeypatch):
+    """Pages sent to the (fake) OCR engine"""
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", cache)
+    monkeypatch.setattr(ocr_prefetch, "ocr_cache", cache)
+    monkeypatch.setattr(ocr_prefetch, "OCR_PREFETCH_IDLE_POLL", 0.01)
+    calls = []
+
+    async def fake_predict(image, profile=None, page_scale=2):
+        calls.append(image.shape)
+        await asyncio.sleep(0.01)
+        return [{'rec_polys': [[[1, 2], [30, 2], [30, 12], [1, 12]]], 'rec_texts': ['Total'],
+                 'rec_scores': [0.95], 'doc_preprocessor_res': {}}]
+
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", fake_predict)
+    return calls
+
+
+def make_prefetcher(admission=None, max_pending=32):
+    admission = admission or OcrAdmissionController(max_in_flight=2, max_waiting=2)
+    return OcrPrefetcher(admission=admission, pool=IdlePool(), max_pending=max_pending, enabled=True)
+
+
+async def drained(prefetcher, timeout=5.0):
+    for _ in range(int(timeout / 0.01)):
+        stats = prefetcher.stats()
+        if stats["pending"] == 0 and stats["current"] is None:
+            return stats
+        await asyncio.sleep(0.01)
+    raise AssertionError("prefetch did not finish")
+
+
+def test_prefetched_pages_are_cache_hits_for_the_extraction(predictions):
+    document = pdf_document()
+    profile = get_profile()
+    page_scale = extraction_page_scale(profile)
+
+    async def scenario():
+        prefetcher = make_prefetcher()
+        assert prefetcher.schedule(document, [0, 1, 5]) == 3
+        stats = await drained(prefetcher)
+        await prefetcher.shutdown()
+        boxes, path = await ocr_pipeline.get_page_boxes(
+            document.doc_id, 1, extraction_render_scale(document.filename, page_scale),
+            lambda: pytest.fail("a cache hit must not render the page"), profile=profile, page_scale=page_scale,
+        )
+        return stats, path
+
+    stats, path = asyncio.run(scenario())
+    assert path == ocr_pipeline.PATH_OCR_CACHE
+    assert len(predictions) == 2  # Page 5 hors du document: ignorée
+    assert (stats["scheduled"], stats["prefetched"], stats["errors"]) == (3, 2, 0)
+
+
+def test_prefetch_waits_for_interactive_requests(predictions):
+    admission = OcrAdmissionController(max_in_flight=2, max_waiting=2)
+
+    async def scenario():
+        prefetcher = make_prefetcher(admission)
+        release = asyncio.Event()
+
+        async def interactive():
+            async with admission.slot():
+                await release.wait()
+
+        request = asyncio.create_task(interactive())
+        await asyncio.sleep(0.01)
+        prefetcher.schedule(pdf_document(), [0])
+        await asyncio.sleep(0.1)
+        while_busy = len(predictions)
+        release.set()
+        await request
+        await drained(prefetcher)
+        await prefetcher.shutdown()
+        return while_busy
+
+    assert asyncio.run(scenario()) == 0
+    assert len(predictions) == 1
+
+
+def test_cancel_drops_the_pages_of_a_document(predictions):
+    kept, scanned = pdf_document(2), pdf_document(3)
+    dropped = DocumentInput("d" * 64, scanned.filename, scanned.content)
+
+    async def scenario():
+        prefetcher = make_prefetcher()
+        prefetcher.schedule(dropped, [0, 1, 2])
+        prefetcher.schedule(kept, [0, 1])
+        cancelled = prefetcher.cancel(dropped.doc_id)
+        stats = await drained(prefetcher)
+        await prefetcher.shutdown()
+        return cancelled, stats
+
+    cancelled, stats = asyncio.run(scenario())
+    assert cancelled == 3 and stats["cancelled"] == 3
+    assert stats["prefetched"] == 2 and len(predictions) == 2
+
+
+def test_queue_is_bounded_and_deduplicated(predictions):
+    document = pdf_document()
+
+    async def scenario():
+        prefetcher = make_prefetcher(max_pending=2)
+        first = prefetcher.schedule(document, [0, 1, 2, -1])
+        again = prefetcher.schedule(document, [0, 1])
+        stats = prefetcher.stats()
+        await prefetcher.shutdown()
+        return first, again, stats
+
+    first, again, stats = asyncio.run(scenario())
+    assert (first, again) == (2, 0)
+    assert (stats["pending"], stats["dropped"]) == (2, 1)
+
+
+def test_digital_pdfs_and_unsupported_files_are_not_ocred(predictions):
+    async def scenario():
+        prefetcher = make_prefetcher()
+        skipped = prefetcher.schedule(DocumentInput("e" * 64, "notes.txt", b"texte"), [0])
+        prefetcher.schedule(pdf_document(1, text=True), [0])
+        stats = await drained(prefetcher)
+        await prefetcher.shutdown()
+        return skipped, stats
+
+    skipped, stats = asyncio.run(scenario())
+    assert skipped == 0
+    assert (stats["skipped"], stats["prefetched"]) == (1, 0) and predictions == []
@@ -0,0 +1,85 @@
+"""
+OCR profiles: lookup, cache keys that separate profiles and resolutions, and
+downscaled OCR whose boxes come back in the coordinates of the given image
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from ocr import ocr_batcher
+from ocr.ocr_config import OCR_PARAMS
+from ocr.ocr_profiles import OCR_PROFILES, get_profile
+from services.extraction_service import extraction_page_scale, extraction_render_scale
+
+
+def test_lookup():
+    assert get_profile("fast").name == "fast"
+    assert get_profile(None) is get_profile("")
+    with pytest.raises(ValueError, match="Profil OCR inconnu"):
+        get_profile("ultra")
+
+
+def test_cache_params_separate_profiles_and_resolutions():
+    # accurate garde les paramètres historiques: les entrées déjà en cache restent valides
+    assert get_profile("accurate").cache_params(2) == OCR_PARAMS
+    fast = get_profile("fast")
+    assert fast.image_scale(2) == 0.75 and fast.cache_params(2)["ocr_scale"] == 0.75
+    assert fast.image_scale(1.5) == 1.0 and "ocr_scale" not in fast.cache_params(1.5)
+    assert len({repr(sorted(profile.cache_params(2).items())) for profile in OCR_PROFILES.values()}) == 3
+
+
+def test_extraction_renders_at_the_profile_scale():
+    assert extraction_page_scale(get_profile("fast")) == 1.5
+    assert extraction_page_scale(get_profile("accurate")) == 2
+    assert extraction_render_scale("a.pdf", 1.5) == 1.5
+    assert extraction_render_scale("a.png", 2) == "image"
+    assert extraction_render_scale("a.png", 1.5) == "image@1.5"
+    assert extraction_render_scale("a.txt", 2) is None
+
+
+class FakeScheduler:
+    def __init__(self):
+        self.shapes = []
+
+    async def predict(self, image):
+        self.shapes.append(image.shape)
+        return [{'rec_polys': [[[30, 15], [60, 15], [60, 30], [30, 30]]], 'rec_texts': ['Total'],
+                 'rec_scores': [0.9], 'doc_preprocessor_res': {'output_img': image}}]
+
+
+@pytest.fixture
+def schedulers(monkeypatch):
+    created = {}
+
+    def get_scheduler(profile=None):
+        return created.setdefault(profile.name, FakeScheduler())
+
+    monkeypatch.setattr(ocr_batcher, "get_scheduler", get_scheduler)
+    return created
+
+
+def test_low_resolution_profile_ocrs_a_downscaled_copy(schedulers):
+    image = np.zeros((400, 200, 3), dtype=np.uint8)
+    result = asyncio.run(ocr_batcher.predict_with_profile(image, get_profile("fast"), page_scale=2))
+    assert schedulers["fast"].shapes == [(300, 150, 3)]
+    # Boîtes ramenées dans les coordonnées de l'image donnée
+    assert result[0]['rec_polys'][0] == [[40.0, 20.0], [80.0, 20.0], [80.0, 40.0], [40.0, 40.0]]
+    assert result[0]['doc_preprocessor_res'] == {}
+
+
+def test_full_resolution_profiles_ocr_the_image_as_is(schedulers):
+    image = np.zeros((400, 200, 3), dtype=np.uint8)
+    result = asyncio.run(ocr_batcher.predict_with_profile(image, get_profile("balanced"), page_scale=2))
+    assert schedulers["balanced"].shapes == [(400, 200, 3)]
+    assert result[0]['rec_polys'][0][0] == [30, 15]
+    asyncio.run(ocr_batcher.predict_with_profile(image, get_profile("fast"), page_scale=1.5))
+    assert schedulers["fast"].shapes == [(400, 200, 3)]
+
+
+def test_each_profile_gets_its_own_scheduler_on_the_shared_pool():
+    fast = ocr_batcher.get_scheduler(get_profile("fast"))
+    assert ocr_batcher.get_scheduler(get_profile("fast")) is fast
+    assert fast.pool is ocr_batcher.get_scheduler().pool
+    assert ocr_batcher.get_scheduler(get_profile("balanced")) is not fast
+    assert "fast" in ocr_batcher.scheduler_stats()
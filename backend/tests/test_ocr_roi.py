@@ -0,0 +1,101 @@
+"""
+ROI crops of the template zones: margins scaled to the profile resolution,
+clamping and merging of the crops, boxes translated back to the page, and the
+full-page fallback when a zone finds no text
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from documents.document_config import PDF_RENDER_SCALE
+from ocr import ocr_pipeline, ocr_roi
+from ocr.ocr_cache import OcrResultCache
+from ocr.ocr_roi import build_rois
+
+
+def test_margins_follow_the_page_scale():
+    zones = {"montantht": (400.0, 1000.0, 600.0, 1040.0)}
+    full = build_rois(zones, 2000, 3000, margin_x=60, margin_y=24, page_scale=PDF_RENDER_SCALE)
+    # Même zone sur une page rendue deux fois moins grande: même découpe, à l'échelle
+    half_zones = {name: tuple(v / 2 for v in rect) for name, rect in zones.items()}
+    half = build_rois(half_zones, 1000, 1500, margin_x=60, margin_y=24, page_scale=PDF_RENDER_SCALE / 2)
+    assert full == [(340, 976, 660, 1064)]
+    assert half == [(170, 488, 330, 532)]
+
+
+@pytest.mark.parametrize("page_scale", [0.5, 1, PDF_RENDER_SCALE, 3])
+def test_crop_covers_the_same_page_fraction_at_any_scale(page_scale):
+    ratio = page_scale / PDF_RENDER_SCALE
+    width, height = round(2000 * ratio), round(3000 * ratio)
+    zones = {"tva": (800 * ratio, 1500 * ratio, 1000 * ratio, 1540 * ratio)}
+    ((left, top, right, bottom),) = build_rois(zones, width, height, margin_x=60, margin_y=24, page_scale=page_scale)
+    assert left / width == pytest.approx(740 / 2000, abs=1 / width)
+    assert right / width == pytest.approx(1060 / 2000, abs=1 / width)
+    assert top / height == pytest.approx(1476 / 3000, abs=1 / height)
+    assert bottom / height == pytest.approx(1564 / 3000, abs=1 / height)
+
+
+def test_crops_are_clamped_and_merged():
+    zones = {
+        "numerofacture": (10.0, 5.0, 200.0, 30.0),
+        "datefacturation": (150.0, 20.0, 300.0, 40.0),  # chevauche numerofacture
+        "montantht": (900.0, 1900.0, 1000.0, 1990.0),  # déborde en bas à droite
+        "vide": (500.0, 500.0, 500.0, 500.0),
+    }
+    rois = build_rois(zones, 1000, 2000, margin_x=20, margin_y=10, page_scale=PDF_RENDER_SCALE)
+    assert sorted(rois) == [(0, 0, 320, 50), (480, 490, 520, 510), (880, 1890, 1000, 2000)]
+
+
+def fake_page_ocr(texts_at):
+    """predict_with_profile stub: one box per (x, y, text) falling inside the image"""
+    calls = []
+
+    async def predict(image, profile=None, page_scale=PDF_RENDER_SCALE):
+        calls.append(image.shape[:2])
+        origin = int(image[0, 0, 0]), int(image[0, 0, 1])
+        height, width = image.shape[:2]
+        polys, texts = [], []
+        for x, y, text in texts_at:
+            x, y = x - origin[0], y - origin[1]
+            if 0 <= x < width - 20 and 0 <= y < height - 10:
+                polys.append([[x, y], [x + 20, y], [x + 20, y + 10], [x, y + 10]])
+                texts.append(text)
+        return [{'rec_polys': polys, 'rec_texts': texts, 'rec_scores': [0.9] * len(texts),
+                 'doc_preprocessor_res': {}}]
+
+    return predict, calls
+
+
+def page_image(width=200, height=250):
+    """Each pixel holds its own (x, y) so a crop knows its origin"""
+    ys, xs = np.mgrid[0:height, 0:width]
+    return np.stack([xs, ys, np.zeros_like(xs)], axis=2).astype(np.uint8)
+
+
+def test_regions_are_ocred_together_and_translated_back(monkeypatch):
+    predict, calls = fake_page_ocr([(30, 40, "FA-1"), (150, 200, "100,00")])
+    monkeypatch.setattr(ocr_roi, "predict_with_profile", predict)
+    results = asyncio.run(ocr_roi.ocr_regions(page_image(), [(20, 30, 80, 60), (140, 190, 190, 230)]))
+    assert calls == [(30, 60), (40, 50)]
+    assert [r[0]['rec_texts'] for r in results] == [["FA-1"], ["100,00"]]
+    assert np.asarray(results[0][0]['rec_polys'])[0].tolist() == [[30, 40], [50, 40], [50, 50], [30, 50]]
+    assert np.asarray(results[1][0]['rec_polys'])[0].tolist() == [[150, 200], [170, 200], [170, 210], [150, 210]]
+
+
+@pytest.mark.parametrize("texts_at, expected_path, expected_calls", [
+    ([(30, 40, "FA-1"), (150, 200, "100,00")], "roi", 2),
+    # Zone de montantht vide: OCR de la page entière
+    ([(30, 40, "FA-1")], "ocr", 3),
+])
+def test_roi_path_and_full_page_fallback(tmp_path, monkeypatch, texts_at, expected_path, expected_calls):
+    predict, calls = fake_page_ocr(texts_at)
+    monkeypatch.setattr(ocr_roi, "predict_with_profile", predict)
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", predict)
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", OcrResultCache(disk_dir=str(tmp_path)))
+    zones = {"numerofacture": (25.0, 35.0, 60.0, 55.0), "montantht": (145.0, 195.0, 180.0, 215.0)}
+    boxes, path = asyncio.run(ocr_pipeline.get_page_boxes(
+        "c" * 64, 0, PDF_RENDER_SCALE, page_image, zones=zones, page_scale=PDF_RENDER_SCALE
+    ))
+    assert path == expected_path and len(calls) == expected_calls
+    assert sorted(boxes.texts()) == sorted(text for _, _, text in texts_at)
@@ -0,0 +1,113 @@
+"""
+Single-flight: concurrent identical requests run OCR once, errors reach every
+caller, and a computation is only cancelled once all its callers are gone
+"""
+import asyncio
+
+import numpy as np
+import pytest
+
+from ocr import ocr_pipeline
+from ocr.ocr_cache import OcrResultCache
+from ocr.ocr_profiles import get_profile
+from ocr.ocr_singleflight import SingleFlight
+
+
+def test_concurrent_callers_share_one_computation():
+    flights = SingleFlight()
+    calls = []
+
+    async def compute():
+        calls.append(1)
+        await asyncio.sleep(0.02)
+        return object()
+
+    async def scenario():
+        results = await asyncio.gather(*(flights.run("page", compute) for _ in range(5)))
+        other = await flights.run("page", compute)  # Calcul terminé: la clé est libérée
+        return results, other
+
+    results, other = asyncio.run(scenario())
+    assert all(result is results[0] for result in results) and other is not results[0]
+    assert len(calls) == 2
+    stats = flights.stats()
+    assert (stats["leaders"], stats["coalesced"], stats["in_flight"]) == (2, 4, 0)
+
+
+def test_errors_reach_every_caller():
+    flights = SingleFlight()
+
+    async def compute():
+        await asyncio.sleep(0.01)
+        raise RuntimeError("OCR en échec")
+
+    async def scenario():
+        return await asyncio.gather(*(flights.run("page", compute) for _ in range(3)), return_exceptions=True)
+
+    errors = asyncio.run(scenario())
+    assert [str(e) for e in errors] == ["OCR en échec"] * 3
+    assert flights.stats()["in_flight"] == 0
+
+
+def test_computation_survives_until_the_last_caller_leaves():
+    flights = SingleFlight()
+    finished, cancelled = [], []
+
+    async def compute():
+        try:
+            await asyncio.sleep(0.05)
+        except asyncio.CancelledError:
+            cancelled.append(1)
+            raise
+        finished.append(1)
+        return "boxes"
+
+    async def scenario():
+        first = asyncio.create_task(flights.run("a", compute))
+        second = asyncio.create_task(flights.run("a", compute))
+        await asyncio.sleep(0.01)
+        first.cancel()
+        result = await second
+
+        alone = asyncio.create_task(flights.run("b", compute))
+        await asyncio.sleep(0.01)
+        alone.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await alone
+        await asyncio.sleep(0.01)
+        return result
+
+    assert asyncio.run(scenario()) == "boxes"
+    assert finished == [1] and cancelled == [1]
+    assert flights.stats()["abandoned"] == 1 and flights.stats()["in_flight"] == 0
+
+
+def test_concurrent_identical_requests_run_ocr_once(tmp_path, monkeypatch):
+    cache = OcrResultCache(memory_bytes=10_000_000, disk_dir=str(tmp_path))
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", cache)
+    monkeypatch.setattr(ocr_pipeline, "ocr_singleflight", SingleFlight())
+    calls = []
+
+    async def fake_predict(image, profile=None, page_scale=2):
+        calls.append("predict")
+        await asyncio.sleep(0.02)
+        return [{'rec_polys': [[[1, 2], [30, 2], [30, 12], [1, 12]]], 'rec_texts': ['Total'],
+                 'rec_scores': [0.95], 'doc_preprocessor_res': {}}]
+
+    def render_page():
+        calls.append("render")
+        return np.zeros((100, 80, 3), dtype=np.uint8)
+
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", fake_predict)
+    profile = get_profile()
+
+    async def scenario():
+        return await asyncio.gather(*(
+            ocr_pipeline.get_page_boxes("a" * 64, 0, 2, render_page, profile=profile) for _ in range(4)
+        ))
+
+    results = asyncio.run(scenario())
+    assert calls == ["render", "predict"]
+    assert [path for _, path in results] == [ocr_pipeline.PATH_OCR] * 4
+    assert all(boxes.to_boxes() == results[0][0].to_boxes() for boxes, _ in results)
+    assert ocr_pipeline.ocr_singleflight.stats()["coalesced"] == 3
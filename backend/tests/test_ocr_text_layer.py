@@ -0,0 +1,93 @@
+"""
+Text-layer fast path: segments of a born-digital PDF placed where the
+standardized rendering draws them, unusable layers rejected, no OCR when usable
+"""
+import asyncio
+
+import numpy as np
+import pymupdf as fitz
+import pytest
+
+from documents.document_render import render_pdf_page_array, standard_size
+from ocr import ocr_pipeline
+from ocr.ocr_cache import OcrResultCache
+from ocr.ocr_text_layer import pdf_text_layer_boxes
+
+LINES = [
+    ((60, 100), "FACTURE N° FA-2024-017"),
+    ((60, 140), "Date : 12/03/2024"),
+    ((320, 400), "Total HT 1 234,50"),
+    ((320, 430), "TVA 246,90"),
+]
+
+
+def pdf_bytes(lines=LINES, size=(595, 842), rotation=0):
+    doc = fitz.open()
+    page = doc.new_page(width=size[0], height=size[1])
+    for point, text in lines:
+        page.insert_text(point, text, fontsize=11)
+    page.set_rotation(rotation)
+    content = doc.tobytes()
+    doc.close()
+    return content
+
+
+def ink_bbox(image, box, pad=6):
+    """Bounding box of the dark pixels around a box of the standardized image"""
+    top, left = int(box['top']) - pad, int(box['left']) - pad
+    window = image[top:int(box['top'] + box['height']) + pad, left:int(box['left'] + box['width']) + pad]
+    ys, xs = np.nonzero(window.min(axis=2) < 128)
+    return left + xs.min(), top + ys.min(), left + xs.max(), top + ys.max()
+
+
+@pytest.mark.parametrize("size", [(595, 842), (612, 792), (842, 595)])
+def test_segments_match_the_standardized_rendering(size):
+    content = pdf_bytes(size=size)
+    target = standard_size(2)
+    boxes = pdf_text_layer_boxes(content, 0, 2, *target)
+    assert [b['text'] for b in boxes] == [text for _, text in LINES]
+    assert all(b['score'] == 1.0 for b in boxes)
+    image = render_pdf_page_array(content, 0, *target)
+    for box in boxes:
+        x0, y0, x1, y1 = ink_bbox(image, box)
+        # Le texte dessiné est dans la boîte (à quelques pixels près: interlignage de la police)
+        assert box['left'] - 3 <= x0 and x1 <= box['left'] + box['width'] + 3
+        assert box['top'] - 3 <= y0 and y1 <= box['top'] + box['height'] + 3
+
+
+def test_rotated_pages_are_mapped_to_the_rendered_orientation():
+    content = pdf_bytes(rotation=90)
+    target = standard_size(2)
+    boxes = pdf_text_layer_boxes(content, 0, 2, *target)
+    image = render_pdf_page_array(content, 0, *target)
+    for box in boxes:
+        x0, y0, x1, y1 = ink_bbox(image, box)
+        assert box['left'] - 3 <= x0 and x1 <= box['left'] + box['width'] + 3
+        assert box['top'] - 3 <= y0 and y1 <= box['top'] + box['height'] + 3
+
+
+def test_unusable_layers_return_none():
+    target = standard_size(2)
+    assert pdf_text_layer_boxes(pdf_bytes([((60, 100), "Page 1")]), 0, 2, *target) is None
+    assert pdf_text_layer_boxes(pdf_bytes([]), 0, 2, *target) is None
+    assert pdf_text_layer_boxes(pdf_bytes(), 3, 2, *target) is None
+    assert pdf_text_layer_boxes(b"not a pdf", 0, 2, *target) is None
+
+
+def test_usable_text_layer_skips_the_ocr(tmp_path, monkeypatch):
+    monkeypatch.setattr(ocr_pipeline, "ocr_cache", OcrResultCache(disk_dir=str(tmp_path)))
+
+    async def no_predict(*args, **kwargs):
+        raise AssertionError("the text layer must replace the OCR")
+
+    def no_render():
+        raise AssertionError("the page must not be rendered")
+
+    monkeypatch.setattr(ocr_pipeline, "predict_with_profile", no_predict)
+    content = pdf_bytes()
+    target = standard_size(2)
+    boxes, path = asyncio.run(ocr_pipeline.get_page_boxes(
+        "b" * 64, 0, 2, no_render, lambda: pdf_text_layer_boxes(content, 0, 2, *target)
+    ))
+    assert path == ocr_pipeline.PATH_TEXT_LAYER
+    assert boxes.texts() == [text for _, text in LINES]
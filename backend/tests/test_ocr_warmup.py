@@ -0,0 +1,129 @@
+"""
+Offline model bundle and readiness: checksums verified, predictors pointed at
+the bundle, every worker warmed up before the instance reports ready
+"""
+import asyncio
+import hashlib
+import json
+import os
+
+import pytest
+
+from ocr import ocr_warmup
+from ocr.ocr_models import MANIFEST_NAME, ModelBundleError, bundle_params, model_names, verify_bundle
+from ocr.ocr_profiles import get_profile
+from ocr.ocr_warmup import STATUS_FAILED, STATUS_READY, OcrReadiness, synthetic_page, warmup_profiles
+
+
+def write_bundle(root, models):
+    """Bundle with one weights file per model and its manifest"""
+    files = {}
+    for name in models:
+        os.makedirs(root / name)
+        content = f"poids {name}".encode()
+        (root / name / "inference.pdiparams").write_bytes(content)
+        files[f"{name}/inference.pdiparams"] = hashlib.sha256(content).hexdigest()
+    (root / MANIFEST_NAME).write_text(json.dumps({"models": list(models), "files": files}))
+    return str(root)
+
+
+def test_bundle_is_verified_and_used_by_the_predictors(tmp_path):
+    params = get_profile("balanced").params
+    bundle = write_bundle(tmp_path, model_names(params))
+    summary = verify_bundle(bundle, check=True)
+    assert summary["models"] == model_names(params) and summary["files"] == 2
+    det_model, rec_model = model_names(params)
+    loaded = bundle_params(params, bundle)
+    assert loaded["text_detection_model_dir"] == os.path.join(bundle, det_model)
+    assert loaded["text_recognition_model_dir"] == os.path.join(bundle, rec_model)
+    assert bundle_params(params, "") is params
+
+
+def test_corrupted_or_incomplete_bundles_are_rejected(tmp_path):
+    params = get_profile("balanced").params
+    bundle = write_bundle(tmp_path, model_names(params))
+    det_model = model_names(params)[0]
+    (tmp_path / det_model / "inference.pdiparams").write_bytes(b"modifie")
+    with pytest.raises(ModelBundleError, match="Somme de contrôle invalide"):
+        verify_bundle(bundle, check=True)
+    assert verify_bundle(bundle, check=False)["verified"] is False
+    os.remove(tmp_path / det_model / "inference.pdiparams")
+    with pytest.raises(ModelBundleError, match="Fichier de modèle manquant"):
+        verify_bundle(bundle, check=True)
+    with pytest.raises(ModelBundleError, match="Modèles absents du bundle"):
+        bundle_params(get_profile("fast").params, bundle)
+    with pytest.raises(ModelBundleError, match="Manifeste"):
+        verify_bundle(str(tmp_path / "absent"))
+
+
+def test_warmup_profiles_setting():
+    assert [p.name for p in warmup_profiles("")] == [get_profile().name]
+    assert [p.name for p in warmup_profiles("all")] == ["fast", "balanced", "accurate"]
+    assert [p.name for p in warmup_profiles("fast, accurate")] == ["fast", "accurate"]
+    with pytest.raises(ValueError):
+        warmup_profiles("fast,ultra")
+
+
+def test_synthetic_page_is_a_standardized_page_with_text():
+    page = synthetic_page(1.5)
+    assert page.shape == (1263, 892, 3)
+    assert page.min() == 0 and page.mean() > 250
+
+
+class FakePool:
+    def __init__(self, workers=3, error=None):
+        self.workers = workers
+        self.error = error
+        self.started = False
+        self.jobs = []
+
+    async def start(self):
+        self.started = True
+
+    async def predict_batch(self, images, profile):
+        if self.error:
+            raise RuntimeError(self.error)
+        self.jobs.append((profile.name, images[0].shape))
+        await asyncio.sleep(0.01)
+        return [{}]
+
+
+def test_every_worker_is_warmed_up_before_ready(monkeypatch):
+    monkeypatch.setattr(ocr_warmup, "OCR_MODEL_DIR", "")
+    monkeypatch.setattr(ocr_warmup, "warmup_profiles", lambda: [get_profile("fast"), get_profile("accurate")])
+    pool = FakePool(workers=3)
+    readiness = OcrReadiness(pool=pool, enabled=True)
+    assert not readiness.ready
+    asyncio.run(readiness.run())
+    assert readiness.status == STATUS_READY and pool.started
+    assert pool.jobs == [("fast", (1263, 892, 3))] * 3 + [("accurate", (1684, 1190, 3))] * 3
+    stats = readiness.stats()
+    assert set(stats["warmup_seconds"]) == {"fast", "accurate"} and stats["ready_after_seconds"] is not None
+
+
+def test_failures_leave_the_instance_not_ready(monkeypatch, tmp_path):
+    monkeypatch.setattr(ocr_warmup, "OCR_MODEL_DIR", "")
+    failed = OcrReadiness(pool=FakePool(error="predictor indisponible"), enabled=True)
+    asyncio.run(failed.run())
+    assert failed.status == STATUS_FAILED and not failed.ready
+    assert failed.stats()["error"] == "predictor indisponible"
+
+    # Bundle invalide: pas de chauffe, instance jamais prête
+    monkeypatch.setattr(ocr_warmup, "OCR_MODEL_DIR", str(tmp_path))
+
+    def bad_bundle():
+        raise ModelBundleError("Somme de contrôle invalide: det/inference.pdiparams")
+
+    monkeypatch.setattr(ocr_warmup, "verify_bundle", bad_bundle)
+    pool = FakePool()
+    readiness = OcrReadiness(pool=pool, enabled=True)
+    asyncio.run(readiness.run())
+    assert readiness.status == STATUS_FAILED and not pool.started
+
+
+def test_disabled_warmup_is_ready_at_once(monkeypatch):
+    monkeypatch.setattr(ocr_warmup, "OCR_MODEL_DIR", "")
+    pool = FakePool()
+    readiness = OcrReadiness(pool=pool, enabled=False)
+    asyncio.run(readiness.run())
+    assert readiness.ready and pool.jobs == [] and not pool.started
@@ -0,0 +1,102 @@
+"""
+Compiled templates: expanded search zones, and the cache (one load per
+template under concurrency, TTL, LRU bound, invalidation)
+"""
+import asyncio
+
+import pytest
+
+from services import template_cache as template_cache_module
+from services.template_cache import TemplateCache, compile_template
+from services.template_coords import TEMPLATE_PAGE_SIZE
+
+PAGE_WIDTH, PAGE_HEIGHT = TEMPLATE_PAGE_SIZE
+
+
+def test_compile_template_expands_zones_per_field():
+    template = compile_template(7, {
+        "montantht": (0.5, 0.5, 0.1, 0.02),
+        "champ_inconnu": (0.1, 0.1, 0.2, 0.05),
+    }, "scan")
+    # montantht: (100, 20) px autour de la zone, champ inconnu: expansion par défaut (10, 5)
+    assert template.zones["montantht"] == pytest.approx(
+        (0.5 - 100 / PAGE_WIDTH, 0.5 - 20 / PAGE_HEIGHT, 0.6 + 100 / PAGE_WIDTH, 0.52 + 20 / PAGE_HEIGHT))
+    assert template.zones["champ_inconnu"] == pytest.approx(
+        (0.1 - 10 / PAGE_WIDTH, 0.1 - 5 / PAGE_HEIGHT, 0.3 + 10 / PAGE_WIDTH, 0.15 + 5 / PAGE_HEIGHT))
+    assert template.ocr_profile == "scan"
+    with pytest.raises(TypeError):
+        template.zones["montantht"] = (0, 0, 1, 1)
+
+
+def test_zones_at_scales_to_the_page_image():
+    template = compile_template(1, {"tva": (0.25, 0.5, 0.25, 0.1)})
+    left, top, right, bottom = template.zones_at(PAGE_WIDTH, PAGE_HEIGHT)["tva"]
+    assert (left, top) == pytest.approx((0.25 * PAGE_WIDTH - 10, 0.5 * PAGE_HEIGHT - 5))
+    assert (right, bottom) == pytest.approx((0.5 * PAGE_WIDTH + 10, 0.6 * PAGE_HEIGHT + 5))
+    half = template.zones_at(PAGE_WIDTH / 2, PAGE_HEIGHT / 2)["tva"]
+    assert half == pytest.approx((left / 2, top / 2, right / 2, bottom / 2))
+
+
+@pytest.fixture
+def loads(monkeypatch):
+    """Template ids loaded from the database (the load itself is faked)"""
+    loaded = []
+
+    async def fake_load(self, template_id):
+        loaded.append(template_id)
+        await asyncio.sleep(0.01)
+        return compile_template(template_id, {"tva": (0.1, 0.1, 0.1, 0.1)})
+
+    monkeypatch.setattr(TemplateCache, "_load", fake_load)
+    return loaded
+
+
+def test_concurrent_gets_load_the_template_once(loads):
+    cache = TemplateCache(ttl_seconds=60, max_size=8)
+
+    async def main():
+        return await asyncio.gather(*(cache.get(3) for _ in range(10)))
+
+    templates = asyncio.run(main())
+    assert loads == [3]
+    assert all(template is templates[0] for template in templates)
+
+
+def test_hits_skip_the_database_until_the_ttl_expires(loads, monkeypatch):
+    cache = TemplateCache(ttl_seconds=60, max_size=8)
+    now = [1000.0]
+    monkeypatch.setattr(template_cache_module.time, "time", lambda: now[0])
+
+    async def main():
+        first = await cache.get("5")
+        assert await cache.get(5) is first
+        now[0] += 61
+        assert await cache.get(5) is not first
+
+    asyncio.run(main())
+    assert loads == [5, 5]
+
+
+def test_lru_bound_and_invalidation(loads):
+    cache = TemplateCache(ttl_seconds=60, max_size=2)
+
+    async def main():
+        await cache.get(1)
+        await cache.get(2)
+        await cache.get(1)  # 1 devient le plus récent
+        await cache.get(3)  # évince 2
+        await cache.get(1)
+        await cache.get(2)
+        cache.invalidate("1")
+        cache.invalidate("pas un id")
+        await cache.get(1)
+
+    asyncio.run(main())
+    assert loads == [1, 2, 3, 2, 1]
+
+
+def test_invalid_ids_are_not_loaded(loads):
+    cache = TemplateCache()
+    assert asyncio.run(cache.get("abc")) is None
+    assert asyncio.run(cache.get(None)) is None
+    assert loads == []
@@ -0,0 +1,97 @@
+"""
+Normalized template coordinates: unit conversions, rows written before the
+migration, the migration UPDATE itself and compiled templates read from SQLite
+"""
+import asyncio
+from types import SimpleNamespace
+
+import pytest
+from sqlalchemy import create_engine, text
+
+from database.config import AsyncSessionLocal, async_engine
+from database.init_db import MAPPINGS_NORMALIZE_UPDATE
+from database.models import FieldName, Mapping, Template
+from services.template_cache import TemplateCache
+from services.template_coords import (
+    TEMPLATE_PAGE_SIZE, UNITS_NORMALIZED, UNITS_PX, box_dict, check_units, mapping_box, to_normalized, to_pixels
+)
+
+PX_BOX = (119.0, 168.4, 238.0, 84.2)
+NORMALIZED_BOX = (0.1, 0.1, 0.2, 0.05)
+
+
+def test_units():
+    assert check_units(None) == UNITS_PX
+    assert check_units("normalized") == UNITS_NORMALIZED
+    with pytest.raises(ValueError, match="Unités de coordonnées inconnues"):
+        check_units("mm")
+
+
+def test_conversions_round_trip():
+    assert TEMPLATE_PAGE_SIZE == (1190, 1684)
+    assert to_normalized(PX_BOX) == pytest.approx(NORMALIZED_BOX)
+    assert to_pixels(to_normalized(PX_BOX)) == pytest.approx(PX_BOX)
+    assert to_pixels(NORMALIZED_BOX, (595, 842)) == pytest.approx((59.5, 84.2, 119.0, 42.1))
+
+
+def test_legacy_rows_are_read_as_normalized():
+    legacy = SimpleNamespace(left=PX_BOX[0], top=PX_BOX[1], width=PX_BOX[2], height=PX_BOX[3], normalized=False)
+    migrated = SimpleNamespace(left=0.1, top=0.1, width=0.2, height=0.05, normalized=True)
+    assert mapping_box(legacy) == pytest.approx(NORMALIZED_BOX)
+    assert mapping_box(migrated) == NORMALIZED_BOX
+    empty = SimpleNamespace(left=None, top=None, width=None, height=None, normalized=True)
+    assert mapping_box(empty) == (0.0, 0.0, 0.0, 0.0)
+
+
+def test_api_boxes_in_pixels_are_rounded():
+    # 0.1 * 1190 en flottant: 119.00000000000001
+    assert box_dict(NORMALIZED_BOX) == {"left": 119.0, "top": 168.4, "width": 238.0, "height": 84.2}
+    assert box_dict(NORMALIZED_BOX, UNITS_NORMALIZED) == dict(zip(("left", "top", "width", "height"), NORMALIZED_BOX))
+
+
+def test_migration_converts_pixel_rows_once():
+    engine = create_engine("sqlite://")
+    with engine.begin() as conn:
+        conn.execute(text(
+            "CREATE TABLE mappings (id INTEGER PRIMARY KEY, `left` FLOAT, `top` FLOAT, `width` FLOAT,"
+            " `height` FLOAT, normalized INTEGER NOT NULL DEFAULT 0)"
+        ))
+        conn.execute(text("INSERT INTO mappings VALUES (1, 119, 168.4, 238, 84.2, 0), (2, 0.5, 0.5, 0.1, 0.1, 1)"))
+        assert conn.execute(text(MAPPINGS_NORMALIZE_UPDATE)).rowcount == 1
+        assert conn.execute(text(MAPPINGS_NORMALIZE_UPDATE)).rowcount == 0
+        rows = conn.execute(text("SELECT `left`, `top`, `width`, `height`, normalized FROM mappings ORDER BY id")).all()
+    assert tuple(rows[0][:4]) == pytest.approx(NORMALIZED_BOX) and rows[0][4] == 1
+    assert tuple(rows[1]) == (0.5, 0.5, 0.1, 0.1, 1)
+
+
+def test_compiled_template_from_legacy_and_migrated_rows():
+    tables = [FieldName.__table__, Template.__table__, Mapping.__table__]
+
+    async def scenario():
+        try:
+            async with async_engine.begin() as connection:
+                for table in reversed(tables):
+                    await connection.run_sync(table.drop, checkfirst=True)
+                for table in tables:
+                    await connection.run_sync(table.create)
+            async with AsyncSessionLocal() as session:
+                template = Template(name="Fournisseur", ocr_profile="fast", created_by=1)
+                fields = [FieldName(name="tva"), FieldName(name="montantht")]
+                session.add_all([template, *fields])
+                await session.flush()
+                session.add_all([
+                    Mapping(template_id=template.id, field_id=fields[0].id, left=PX_BOX[0], top=PX_BOX[1],
+                            width=PX_BOX[2], height=PX_BOX[3], normalized=False, created_by=1),
+                    Mapping(template_id=template.id, field_id=fields[1].id, left=0.1, top=0.1,
+                            width=0.2, height=0.05, normalized=True, created_by=1),
+                ])
+                await session.commit()
+                template_id = template.id
+            return await TemplateCache().get(template_id)
+        finally:
+            await async_engine.dispose()
+
+    compiled = asyncio.run(scenario())
+    assert compiled.ocr_profile == "fast"
+    assert compiled.mappings["tva"] == pytest.approx(NORMALIZED_BOX)
+    assert compiled.mappings["montantht"] == pytest.approx(NORMALIZED_BOX)